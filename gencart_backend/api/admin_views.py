@@ -12,6 +12,7 @@ from orders.models import Order, OrderItem
 from products.serializers import ProductSerializer, CategorySerializer
 from orders.serializers import OrderSerializer, OrderItemSerializer
 from users.serializers import UserSerializer
+from sentiment_analysis.single_flight import get_flight
 
 User = get_user_model()
 
@@ -23,24 +24,23 @@ def check_admin_status(request):
     is_admin = request.user.is_staff or request.user.is_superuser
     return Response({'is_admin': is_admin})
 
+def _dashboard_totals():
+    return {
+        'total_orders': Order.objects.count(),
+        'total_users': User.objects.count(),
+        'total_products': Product.objects.count(),
+        'total_revenue': Order.objects.filter(status__in=['processing', 'shipped', 'delivered']).aggregate(
+            total=Sum('total_amount')
+        )['total'] or 0,
+    }
+
 # Dashboard statistics
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def dashboard_stats(request):
     """Get dashboard statistics for admin"""
-    # Count total orders
-    total_orders = Order.objects.count()
-
-    # Count total users
-    total_users = User.objects.count()
-
-    # Count total products
-    total_products = Product.objects.count()
-
-    # Calculate total revenue
-    total_revenue = Order.objects.filter(status__in=['processing', 'shipped', 'delivered']).aggregate(
-        total=Sum('total_amount')
-    )['total'] or 0
+    # Concurrent dashboard loads share one set of count/sum queries
+    totals = get_flight('dashboard_stats').do('totals', _dashboard_totals)
 
     # Get recent orders
     recent_orders = Order.objects.order_by('-created_at')[:10]
@@ -48,10 +48,10 @@ def dashboard_stats(request):
     print("Recent orders data:", recent_orders_data)
 
     return Response({
-        'totalOrders': total_orders,
-        'totalUsers': total_users,
-        'totalProducts': total_products,
-        'totalRevenue': total_revenue,
+        'totalOrders': totals['total_orders'],
+        'totalUsers': totals['total_users'],
+        'totalProducts': totals['total_products'],
+        'totalRevenue': totals['total_revenue'],
         'recentOrders': recent_orders_data
     })
 
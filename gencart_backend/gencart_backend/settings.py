@@ -223,6 +223,72 @@ AUTH_USER_MODEL = 'users.User'
 # Sentiment analysis settings
 SENTIMENT_MODEL_TYPE = os.environ.get('SENTIMENT_MODEL_TYPE', 'naive_bayes')
 SENTIMENT_TREND_DAYS_DEFAULT = int(os.environ.get('SENTIMENT_TREND_DAYS_DEFAULT', '30'))
+# Cached review sentiment summaries (global / per product), dropped on review writes
+SENTIMENT_AGGREGATE_CACHE = os.environ.get('SENTIMENT_AGGREGATE_CACHE', 'default')
+SENTIMENT_AGGREGATE_CACHE_TIMEOUT = int(os.environ.get('SENTIMENT_AGGREGATE_CACHE_TIMEOUT', '300'))
+# Prediction cache: in-process LRU size (0 disables) and optional shared Django cache alias
+SENTIMENT_PREDICTION_CACHE_SIZE = int(os.environ.get('SENTIMENT_PREDICTION_CACHE_SIZE', '4096'))
+SENTIMENT_PREDICTION_SHARED_CACHE = os.environ.get('SENTIMENT_PREDICTION_SHARED_CACHE', '') or None
+SENTIMENT_PREDICTION_CACHE_TIMEOUT = int(os.environ.get('SENTIMENT_PREDICTION_CACHE_TIMEOUT', '3600'))
+# NB -> BERT cascade: NB confidence below the threshold escalates to BERT.
+# SENTIMENT_BERT_MODEL_DIR points at a local save_pretrained() directory (offline use)
+SENTIMENT_CASCADE_THRESHOLD = float(os.environ.get('SENTIMENT_CASCADE_THRESHOLD', '0.75'))
+SENTIMENT_BERT_MODEL_DIR = os.environ.get('SENTIMENT_BERT_MODEL_DIR', '') or None
+# BERT micro-batching: collect requests for up to MAX_WAIT_MS or MAX_BATCH items per forward pass.
+# SENTIMENT_BERT_WORKER_URL sends BERT requests to `manage.py run_sentiment_worker` instead
+SENTIMENT_BERT_MICROBATCH = os.environ.get('SENTIMENT_BERT_MICROBATCH', 'False') == 'True'
+SENTIMENT_BERT_MAX_BATCH = int(os.environ.get('SENTIMENT_BERT_MAX_BATCH', '32'))
+SENTIMENT_BERT_MAX_WAIT_MS = float(os.environ.get('SENTIMENT_BERT_MAX_WAIT_MS', '10'))
+SENTIMENT_BERT_REQUEST_TIMEOUT = float(os.environ.get('SENTIMENT_BERT_REQUEST_TIMEOUT', '5'))
+SENTIMENT_BERT_NUM_THREADS = int(os.environ.get('SENTIMENT_BERT_NUM_THREADS', '0')) or None
+SENTIMENT_BERT_QUANTIZE = os.environ.get('SENTIMENT_BERT_QUANTIZE', 'False') == 'True'
+SENTIMENT_BERT_WORKER_URL = os.environ.get('SENTIMENT_BERT_WORKER_URL', '') or None
+# Incremental NB updates: build a candidate model once the OOV share of consumed unigram tokens
+# exceeds the threshold (in-domain English reviews run ~17% against the shipped model);
+# reviews created within the last LAG_SECONDS are left for the next run
+SENTIMENT_INCREMENTAL_DRIFT_THRESHOLD = float(os.environ.get('SENTIMENT_INCREMENTAL_DRIFT_THRESHOLD', '0.35'))
+SENTIMENT_INCREMENTAL_LAG_SECONDS = int(os.environ.get('SENTIMENT_INCREMENTAL_LAG_SECONDS', '30'))
+# Seconds before a training lock left behind by a dead process expires
+SENTIMENT_TRAINING_LOCK_TIMEOUT = int(os.environ.get('SENTIMENT_TRAINING_LOCK_TIMEOUT', '3600'))
+# Append emotion lexicon match counts (Aho-Corasick, see lexicon.py) to NB features when training from reviews
+SENTIMENT_NB_LEXICON_FEATURES = os.environ.get('SENTIMENT_NB_LEXICON_FEATURES', 'False') == 'True'
+# Opt-in on-disk feature store for NB training (feature_store.py); empty disables it.
+# Least recently used entries are evicted past MAX_MB, and entries unused for MAX_AGE_DAYS
+SENTIMENT_FEATURE_STORE_DIR = os.environ.get('SENTIMENT_FEATURE_STORE_DIR', '')
+SENTIMENT_FEATURE_STORE_MAX_MB = float(os.environ.get('SENTIMENT_FEATURE_STORE_MAX_MB', '512'))
+SENTIMENT_FEATURE_STORE_MAX_AGE_DAYS = float(os.environ.get('SENTIMENT_FEATURE_STORE_MAX_AGE_DAYS', '30'))
+# Opt-in SQLite cache of Vietnamese word segmentations (tokenization.py); empty disables it.
+# The oldest entries are evicted past MAX_ENTRIES
+SENTIMENT_TOKEN_CACHE_PATH = os.environ.get('SENTIMENT_TOKEN_CACHE_PATH', '')
+SENTIMENT_TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get('SENTIMENT_TOKEN_CACHE_MAX_ENTRIES', '200000'))
+SENTIMENT_TOKEN_LRU_SIZE = int(os.environ.get('SENTIMENT_TOKEN_LRU_SIZE', '10000'))
+# Process pool size for large segmentation batches; 0 uses all cores
+SENTIMENT_TOKENIZE_PROCESSES = int(os.environ.get('SENTIMENT_TOKENIZE_PROCESSES', '0')) or None
+# JSON written by `manage.py benchmark_sentiment_analyzers`; get_algorithm_info serves its numbers
+SENTIMENT_BENCHMARK_REPORT = os.environ.get(
+    'SENTIMENT_BENCHMARK_REPORT', str(BASE_DIR.parent / 'assets' / 'reports' / 'sentiment_benchmarks.json'))
+# Live sentiment stream (/api/sentiment/stream/). CacheBroker shares events between worker
+# processes through SENTIMENT_EVENT_BROKER_CACHE; InProcessBroker keeps them in one process
+SENTIMENT_EVENT_BROKER = os.environ.get('SENTIMENT_EVENT_BROKER', 'sentiment_analysis.events.InProcessBroker')
+SENTIMENT_EVENT_BROKER_OPTIONS = (
+    {'cache_alias': os.environ.get('SENTIMENT_EVENT_BROKER_CACHE', 'default')}
+    if SENTIMENT_EVENT_BROKER.endswith('CacheBroker') else {}
+)
+SENTIMENT_STREAM_AGGREGATE_INTERVAL = float(os.environ.get('SENTIMENT_STREAM_AGGREGATE_INTERVAL', '10'))
+SENTIMENT_STREAM_KEEPALIVE = float(os.environ.get('SENTIMENT_STREAM_KEEPALIVE', '15'))
+SENTIMENT_STREAM_MAX_SECONDS = float(os.environ.get('SENTIMENT_STREAM_MAX_SECONDS', '300'))
+# Under WSGI each open stream holds a worker thread, so streams are cut short there
+SENTIMENT_STREAM_WSGI_MAX_SECONDS = float(os.environ.get('SENTIMENT_STREAM_WSGI_MAX_SECONDS', '30'))
+# Write-time near-duplicate detection (MinHash LSH, see duplicates.py): minimum estimated
+# similarity, and whether flagged duplicates skip sentiment model scoring
+SENTIMENT_DUPLICATE_THRESHOLD = float(os.environ.get('SENTIMENT_DUPLICATE_THRESHOLD', '0.8'))
+SENTIMENT_DUPLICATE_SKIP_SCORING = os.environ.get('SENTIMENT_DUPLICATE_SKIP_SCORING', 'True') == 'True'
+# Budget of `manage.py rescore_sentiments`, which relabels reviews scored by an older model version
+SENTIMENT_RESCORE_ROWS_PER_SEC = float(os.environ.get('SENTIMENT_RESCORE_ROWS_PER_SEC', '20'))
+# Product detail views are buffered per process and written once this many are pending
+# or this many seconds have passed (products/view_counts.py)
+PRODUCT_VIEW_FLUSH_SIZE = int(os.environ.get('PRODUCT_VIEW_FLUSH_SIZE', '100'))
+PRODUCT_VIEW_FLUSH_SECONDS = float(os.environ.get('PRODUCT_VIEW_FLUSH_SECONDS', '60'))
 
 # Logging configuration
 LOGGING = {
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:54
+
+from django.db import migrations, models
+
+
+def backfill_effective_sentiment(apps, schema_editor):
+    from sentiment_analysis.rollups import backfill_effective_sentiment as backfill
+    backfill(review_model=apps.get_model('products', 'Review'), only_stale=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_primary_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='effective_sentiment',
+            field=models.CharField(choices=[('positive', 'Positive'), ('negative', 'Negative'), ('neutral', 'Neutral')], default='neutral', editable=False, help_text="Analyzer sentiment, or the rating's when not analyzed yet (kept in sync on save)", max_length=10),
+        ),
+        # Before the indexes, so the backfill does not maintain them row by row
+        migrations.RunPython(backfill_effective_sentiment, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', 'effective_sentiment'], name='review_product_effective_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['created_at', 'effective_sentiment'], name='review_created_effective_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('sentiment__isnull', True)), fields=['id'], name='review_unanalyzed_idx'),
+        ),
+    ]
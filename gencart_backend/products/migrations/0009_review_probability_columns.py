@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:57
+
+import django.core.validators
+from django.db import migrations, models
+
+LABELS = ('positive', 'neutral', 'negative')
+
+
+def copy_scores_to_columns(apps, schema_editor):
+    # One UPDATE in SQL instead of deserializing every review's JSON in Python
+    from django.db.models.fields.json import KeyTextTransform
+    from django.db.models.functions import Cast
+    Review = apps.get_model('products', 'Review')
+    Review.objects.filter(sentiment_scores__isnull=False).update(**{
+        f'p_{label}': Cast(KeyTextTransform(label, 'sentiment_scores'), models.FloatField())
+        for label in LABELS
+    })
+
+
+def copy_columns_to_scores(apps, schema_editor):
+    Review = apps.get_model('products', 'Review')
+    batch = []
+    columns = [f'p_{label}' for label in LABELS]
+    for review in Review.objects.only('id', *columns).iterator(chunk_size=2000):
+        scores = {label: getattr(review, f'p_{label}') for label in LABELS if getattr(review, f'p_{label}') is not None}
+        if scores:
+            review.sentiment_scores = scores
+            batch.append(review)
+        if len(batch) >= 2000:
+            Review.objects.bulk_update(batch, ['sentiment_scores'])
+            batch = []
+    if batch:
+        Review.objects.bulk_update(batch, ['sentiment_scores'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_review_effective_sentiment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='p_negative',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(1.0)]),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='p_neutral',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(1.0)]),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='p_positive',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(1.0)]),
+        ),
+        migrations.RunPython(copy_scores_to_columns, copy_columns_to_scores),
+        migrations.RemoveField(
+            model_name='review',
+            name='sentiment_scores',
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_review_probability_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='sentiment_model_version',
+            field=models.CharField(blank=True, default='', help_text='Version of the model that produced `sentiment` (see sentiment_analysis/model_versions.py)', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['sentiment_model_version', 'product'], name='review_model_version_idx'),
+        ),
+    ]
@@ -42,6 +42,8 @@ class Product(models.Model):
     is_active = models.BooleanField(default=True)
     # New CDN image URL (e.g., Cloudinary secure_url)
     primary_image = models.URLField(blank=True, null=True, help_text="Primary product image (CDN URL)")
+    # Detail page views; re-scoring after a model update starts with the most viewed products
+    view_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -90,6 +92,17 @@ class Product(models.Model):
         qs = getattr(self, 'reviews', None)
         return qs.count() if qs is not None else 0
 
+def rating_sentiment(rating):
+    """Sentiment implied by a star rating, used for reviews the analyzer has not labeled."""
+    if rating is None:
+        return 'neutral'
+    if rating >= 4:
+        return 'positive'
+    if rating <= 2:
+        return 'negative'
+    return 'neutral'
+
+
 class Review(models.Model):
     SENTIMENT_CHOICES = [
         ('positive', 'Positive'),
@@ -118,24 +131,70 @@ class Review(models.Model):
         validators=[MinValueValidator(0.0), MaxValueValidator(1.0)],
         help_text="Confidence score of the sentiment prediction (0-1)"
     )
-    sentiment_scores = models.JSONField(
-        null=True, 
-        blank=True,
-        help_text="Detailed probability scores for each sentiment category"
-    )
+    # Class probabilities as typed columns so analytics aggregate them in SQL;
+    # `sentiment_scores` exposes them in the old JSON shape
+    p_positive = models.FloatField(null=True, blank=True, validators=[MinValueValidator(0.0), MaxValueValidator(1.0)])
+    p_neutral = models.FloatField(null=True, blank=True, validators=[MinValueValidator(0.0), MaxValueValidator(1.0)])
+    p_negative = models.FloatField(null=True, blank=True, validators=[MinValueValidator(0.0), MaxValueValidator(1.0)])
     sentiment_analyzed_at = models.DateTimeField(
         null=True, 
         blank=True,
         help_text="When the sentiment analysis was last performed"
     )
+    sentiment_model_version = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        help_text="Version of the model that produced `sentiment` (see sentiment_analysis/model_versions.py)"
+    )
+    effective_sentiment = models.CharField(
+        max_length=10,
+        choices=SENTIMENT_CHOICES,
+        default='neutral',
+        editable=False,
+        help_text="Analyzer sentiment, or the rating's when not analyzed yet (kept in sync on save)"
+    )
 
     class Meta:
         unique_together = ('product', 'user')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'effective_sentiment'], name='review_product_effective_idx'),
+            models.Index(fields=['created_at', 'effective_sentiment'], name='review_created_effective_idx'),
+            models.Index(fields=['sentiment_model_version', 'product'], name='review_model_version_idx'),
+            # Backlog of reviews still waiting for sentiment analysis
+            models.Index(fields=['id'], condition=models.Q(sentiment__isnull=True), name='review_unanalyzed_idx'),
+        ]
 
     def __str__(self):
         return f"Review by {self.user.username} for {self.product.name}"
 
+    PROBABILITY_FIELDS = {'positive': 'p_positive', 'neutral': 'p_neutral', 'negative': 'p_negative'}
+
+    @property
+    def sentiment_scores(self):
+        """Probability per sentiment category ({'positive': .., 'neutral': .., 'negative': ..}) or None."""
+        scores = {label: getattr(self, field) for label, field in self.PROBABILITY_FIELDS.items()
+                  if getattr(self, field) is not None}
+        return scores or None
+
+    @sentiment_scores.setter
+    def sentiment_scores(self, scores):
+        scores = scores or {}
+        for label, field in self.PROBABILITY_FIELDS.items():
+            value = scores.get(label)
+            setattr(self, field, float(value) if value is not None else None)
+
+    def apply_sentiment_result(self, result):
+        """Copy an analyzer result (sentiment, confidence, probabilities, model_version) onto the review."""
+        self.sentiment = result.get('sentiment')
+        self.sentiment_confidence = result.get('confidence')
+        self.sentiment_scores = result.get('probabilities')
+        self.sentiment_model_version = result.get('model_version', '')
+
+    def compute_effective_sentiment(self):
+        return self.sentiment if self.sentiment is not None else rating_sentiment(self.rating)
+
     def save(self, *args, **kwargs):
         from orders.models import OrderItem
         has_purchased = OrderItem.objects.filter(
@@ -148,6 +207,15 @@ class Review(models.Model):
         if self.sentiment and not self.sentiment_analyzed_at:
             from django.utils import timezone
             self.sentiment_analyzed_at = timezone.now()
+
+        self.effective_sentiment = self.compute_effective_sentiment()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = [f for f in update_fields if f != 'sentiment_scores'] + (
+                list(self.PROBABILITY_FIELDS.values()) if 'sentiment_scores' in update_fields else [])
+            if {'sentiment', 'rating'} & set(update_fields):
+                update_fields.append('effective_sentiment')
+            kwargs['update_fields'] = update_fields
         
         super().save(*args, **kwargs)
     
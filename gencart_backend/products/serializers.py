@@ -1,3 +1,4 @@
+from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import serializers
 from .models import Category, Product, Review
 
@@ -63,16 +64,19 @@ class ReviewSerializer(serializers.ModelSerializer):
     user_last_name = serializers.CharField(source='user.last_name', read_only=True)
     sentiment_display = serializers.ReadOnlyField()
     sentiment_emoji = serializers.ReadOnlyField()
+    sentiment_scores = serializers.ReadOnlyField()
     
     class Meta:
         model = Review
         fields = ['id', 'product', 'user', 'user_name', 'user_first_name', 'user_last_name', 
                   'rating', 'title', 'comment', 'verified_purchase', 
-                  'sentiment', 'sentiment_confidence', 'sentiment_scores', 'sentiment_analyzed_at',
+                  'sentiment', 'sentiment_confidence', 'sentiment_scores', 'p_positive', 'p_neutral', 'p_negative',
+                  'sentiment_analyzed_at',
                   'sentiment_display', 'sentiment_emoji',
                   'created_at', 'updated_at']
         read_only_fields = ['product', 'user', 'verified_purchase', 'sentiment', 'sentiment_confidence', 
-                           'sentiment_scores', 'sentiment_analyzed_at', 'created_at', 'updated_at']
+                           'sentiment_scores', 'p_positive', 'p_neutral', 'p_negative',
+                           'sentiment_analyzed_at', 'created_at', 'updated_at']
 
     def create(self, validated_data):
         # Set the user from the request
@@ -94,19 +98,27 @@ class ProductSerializer(serializers.ModelSerializer):
     reviews = ReviewSerializer(many=True, read_only=True)
     average_rating = serializers.ReadOnlyField()
     total_reviews = serializers.ReadOnlyField()
+    review_highlights = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = ['id', 'name', 'slug', 'description', 'price', 'discount_price',
                   'category', 'category_id', 'inventory', 'is_active',
                   'primary_image', 'created_at', 'updated_at', 'image_url', 
-                  'reviews', 'average_rating', 'total_reviews']
+                  'reviews', 'average_rating', 'total_reviews', 'review_highlights']
     read_only_fields = ['slug', 'created_at', 'updated_at']
 
     def get_image_url(self, obj):
         # Return None since we removed the image field
         return obj.image_url
 
+    def get_review_highlights(self, obj):
+        # Precomputed by `manage.py build_review_highlights`; None until the first run
+        try:
+            return obj.review_highlights.as_dict()
+        except ObjectDoesNotExist:
+            return None
+
 class ProductListSerializer(serializers.ModelSerializer):
     """
     Simplified serializer for listing products
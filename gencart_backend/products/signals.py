@@ -1,23 +1,112 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.db import transaction
 from django.dispatch import receiver
 from .models import Review
-from sentiment_analysis.services import SentimentAnalysisService
+from sentiment_analysis.aggregates import invalidate_sentiment_aggregates
+from sentiment_analysis.duplicates import duplicate_skips_scoring, fingerprint_review
+from sentiment_analysis.events import publish_review_scored
+from sentiment_analysis.rollups import apply_review_change, review_contribution
+from sentiment_analysis.services import SentimentAnalysisService, detect_language, review_scoring_text
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Rollup receivers are connected before the analysis receiver below: its nested save() then
+# moves the review's already-counted contribution from the rating's sentiment to the label.
+ROLLUP_STATE = '_sentiment_rollup_contribution'
+# Stored title + comment of an existing review, to re-fingerprint it only when the text changes
+TEXT_STATE = '_review_scoring_text'
+
+
+@receiver(pre_save, sender=Review)
+def capture_review_rollup_state(sender, instance: Review, raw=False, **kwargs):
+    """Remember what an existing review currently contributes to the sentiment rollups."""
+    if raw or instance._state.adding or hasattr(instance, ROLLUP_STATE) or instance.pk is None:
+        return
+    stored = Review.objects.filter(pk=instance.pk).only(
+        'id', 'product_id', 'rating', 'created_at', 'sentiment', 'sentiment_confidence', 'effective_sentiment',
+        'title', 'comment',
+    ).first()
+    setattr(instance, ROLLUP_STATE, review_contribution(stored) if stored else None)
+    if stored:
+        setattr(instance, TEXT_STATE, review_scoring_text(stored.title, stored.comment))
+
+
+@receiver(post_save, sender=Review)
+def publish_review_scored_event(sender, instance: Review, raw=False, **kwargs):
+    """Push review.scored to the live stream when a review's analyzer label is new or changed.
+
+    Connected before update_review_rollups, which replaces the pre-save state compared here.
+    """
+    if raw or instance.sentiment is None:
+        return
+    old = getattr(instance, ROLLUP_STATE, None)
+    if old is not None and old.analyzed and old == review_contribution(instance):
+        return
+    transaction.on_commit(lambda: publish_review_scored(instance))
+
+
+@receiver(post_save, sender=Review)
+def update_review_rollups(sender, instance: Review, raw=False, **kwargs):
+    if raw:
+        return
+    new = review_contribution(instance)
+    try:
+        apply_review_change(getattr(instance, ROLLUP_STATE, None), new)
+        setattr(instance, ROLLUP_STATE, new)
+    except Exception as e:
+        logger.error(f"Sentiment rollup update failed for review {instance.id}: {e}")
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_rollups(sender, instance: Review, **kwargs):
+    try:
+        apply_review_change(getattr(instance, ROLLUP_STATE, None) or review_contribution(instance), None)
+    except Exception as e:
+        logger.error(f"Sentiment rollup update failed for deleted review {instance.id}: {e}")
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_aggregates(sender, instance: Review, raw=False, **kwargs):
+    """Drop cached global and product sentiment summaries after any review change."""
+    if raw:
+        return
+    try:
+        invalidate_sentiment_aggregates([instance.product_id])
+    except Exception as e:
+        logger.error(f"Sentiment aggregate invalidation failed for review {instance.id}: {e}")
+
+
+@receiver(post_save, sender=Review)
+def flag_near_duplicate_review(sender, instance: Review, created, raw=False, **kwargs):
+    """Fingerprint new or re-worded reviews and remember which earlier review they copy (see duplicates.py)."""
+    if raw:
+        return
+    text = review_scoring_text(instance.title, instance.comment)
+    if not created and getattr(instance, TEXT_STATE, text) == text:
+        return
+    try:
+        instance._near_duplicate = fingerprint_review(instance)
+        setattr(instance, TEXT_STATE, text)
+    except Exception as e:
+        logger.error(f"Near-duplicate check failed for review {instance.id}: {e}")
+
+
 @receiver(post_save, sender=Review)
 def analyze_review_sentiment_signal(sender, instance: Review, created, **kwargs):
     """Automatically analyze sentiment when a new review is created."""
     if created and not instance.sentiment:
+        if getattr(instance, '_near_duplicate', None) and duplicate_skips_scoring():
+            logger.info(f"Skipping sentiment analysis for near-duplicate review {instance.id}")
+            return
         try:
-            # Use configured default (now naive_bayes) or explicit system aggregator
-            service = SentimentAnalysisService(model_type='naive_bayes')
+            # Route to the model of the review's language (EN/VI)
+            language = detect_language(review_scoring_text(instance.title, instance.comment))
+            service = SentimentAnalysisService(language=language, model_type='naive_bayes')
             result = service.analyze_review_with_title(instance.title or '', instance.comment or '')
-            instance.sentiment = result.get('sentiment')
-            instance.sentiment_confidence = result.get('confidence')
-            instance.sentiment_scores = result.get('probabilities')
-            instance.save(update_fields=['sentiment','sentiment_confidence','sentiment_scores','sentiment_analyzed_at','updated_at'])
+            instance.apply_sentiment_result(result)
+            instance.save(update_fields=['sentiment','sentiment_confidence','p_positive','p_neutral','p_negative','sentiment_model_version','sentiment_analyzed_at','updated_at'])
             logger.info(f"Sentiment analyzed for review {instance.id}: {instance.sentiment}")
         except Exception as e:
             logger.error(f"Sentiment analysis failed for review {instance.id}: {e}")
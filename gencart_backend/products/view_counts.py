@@ -0,0 +1,77 @@
+"""
+Buffered product detail view counts (Product.view_count).
+
+Counting a view with an UPDATE on every product detail GET takes a row lock on hot
+products in the request path. Views are instead added to an in-process counter and
+written in one UPDATE per distinct increment, from a background thread, once
+PRODUCT_VIEW_FLUSH_SIZE views are buffered or PRODUCT_VIEW_FLUSH_SECONDS have passed
+since the last flush. The re-scoring job (sentiment_analysis/rescoring.py) flushes before
+it reads the counts. Views buffered by a process that exits are lost; the counts only
+order re-scoring work, so they need not be exact.
+"""
+from collections import Counter, defaultdict
+from typing import Optional
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+_pending: Counter = Counter()
+_lock = threading.Lock()
+_last_flush: Optional[float] = None
+_flushing = threading.Event()
+
+
+def record_product_view(product_id: int):
+    """Count one detail view; the database is written later, outside the request."""
+    global _last_flush
+    now = time.monotonic()
+    with _lock:
+        _pending[product_id] += 1
+        if _last_flush is None:
+            _last_flush = now
+        due = (sum(_pending.values()) >= getattr(settings, 'PRODUCT_VIEW_FLUSH_SIZE', 100)
+               or now - _last_flush >= getattr(settings, 'PRODUCT_VIEW_FLUSH_SECONDS', 60))
+        if not due or _flushing.is_set():
+            return
+        _flushing.set()
+    threading.Thread(target=_flush_in_background, name='product-view-flush', daemon=True).start()
+
+
+def _flush_in_background():
+    try:
+        flush_product_views()
+    except Exception as e:
+        logger.error(f"Product view count flush failed: {e}")
+    finally:
+        _flushing.clear()
+        close_old_connections()
+
+
+def flush_product_views() -> int:
+    """Write buffered views to Product.view_count; returns the number of views written."""
+    from .models import Product
+    global _last_flush
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    by_increment = defaultdict(list)
+    for product_id, views in pending.items():
+        by_increment[views].append(product_id)
+    while by_increment:
+        views, product_ids = by_increment.popitem()
+        try:
+            Product.objects.filter(pk__in=product_ids).update(view_count=F('view_count') + views)
+        except Exception:
+            # Keep the unwritten views for the next flush
+            with _lock:
+                for increment, ids in [(views, product_ids), *by_increment.items()]:
+                    _pending.update({product_id: increment for product_id in ids})
+            raise
+    return sum(pending.values())
@@ -11,8 +11,43 @@ import time
 from .models import Category, Product, Review
 from .serializers import CategorySerializer, ProductSerializer, ProductListSerializer, ReviewSerializer
 from .filters import ProductFilter
+from .view_counts import record_product_view
 from orders.models import OrderItem
+from sentiment_analysis.aggregates import product_sentiment_aggregates, sentiment_aggregates
+from sentiment_analysis.rollups import sentiment_trends
 from sentiment_analysis.services import SentimentAnalysisService
+from sentiment_analysis.single_flight import get_flight
+
+
+def sentiment_trends_response(request):
+    """Shared by the product and review `sentiment_trends` actions; reads the rollup table.
+
+    Query params: days, product, mode ('analyzed' | 'effective'), granularity
+    ('hour' | 'day' | 'week' | 'month') and tz (IANA name, default TIME_ZONE).
+    """
+    product_id = request.query_params.get('product')
+    try:
+        product_id = int(product_id) if product_id else None
+        trends = sentiment_trends(
+            days=request.query_params.get('days', 30),
+            product_id=product_id,
+            mode=request.query_params.get('mode', 'analyzed'),
+            granularity=request.query_params.get('granularity', 'day'),
+            tz=request.query_params.get('tz'),
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'scope': 'product' if product_id else 'global',
+        'product_id': product_id,
+        **trends,
+    })
+
+
+def _alert_candidates():
+    products = list(Product.objects.only('id', 'name')[:200])  # limit for performance
+    return products, product_sentiment_aggregates(p.id for p in products)
+
 
 class CategoryViewSet(viewsets.ModelViewSet):
     """
@@ -228,6 +263,9 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         queryset = Product.objects.all()
+        if self.action == 'retrieve':
+            # Highlights ride along in the product query (see sentiment_analysis/highlights.py)
+            queryset = queryset.select_related('review_highlights')
 
         # Annotate with average rating and review count for sorting
         queryset = queryset.annotate(
@@ -266,6 +304,13 @@ class ProductViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        # Most-viewed products are re-scored first after a model update (sentiment_analysis/rescoring.py);
+        # views are buffered and written in batches outside the request
+        record_product_view(response.data['id'])
+        return response
+
     def paginate_queryset(self, queryset):
         # Check if pagination should be disabled
         if self.request.query_params.get('no_pagination', '').lower() in ['true', '1', 'yes']:
@@ -369,42 +414,16 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def sentiment_trends(self, request):
-        days = int(request.query_params.get('days', 30))
-        product_id = request.query_params.get('product')
-        from django.utils import timezone
-        from datetime import timedelta
-        from products.models import Review
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=days)
-        qs = Review.objects.filter(created_at__gte=start_date, sentiment__isnull=False)
-        if product_id:
-            qs = qs.filter(product_id=product_id)
-        # annotate by date & sentiment
-        data = qs.extra({'date': "DATE(created_at)"}).values('date', 'sentiment').annotate(count=Count('id')).order_by('date')
-        trends = {}
-        for row in data:
-            d = str(row['date'])
-            trends.setdefault(d, {'positive':0,'negative':0,'neutral':0})
-            trends[d][row['sentiment']] = row['count']
-        dates = sorted(trends.keys())
-        result = {
-            'scope': 'product' if product_id else 'global',
-            'product_id': int(product_id) if product_id else None,
-            'dates': dates,
-            'positive': [trends[d]['positive'] for d in dates],
-            'neutral': [trends[d]['neutral'] for d in dates],
-            'negative': [trends[d]['negative'] for d in dates]
-        }
-        return Response(result)
+        return sentiment_trends_response(request)
 
     @action(detail=False, methods=['get'])
     def sentiment_alerts(self, request):
         threshold = float(request.query_params.get('negative_percent', 40))
-        service = SentimentAnalysisService()
         alert_products = []
         candidates = []
-        for product in Product.objects.all()[:200]:  # limit for performance
-            summary = service.get_product_sentiment_summary(product.id)
+        products, summaries = get_flight('sentiment_alerts').do('first_200', _alert_candidates)
+        for product in products:
+            summary = summaries[product.id]
             coverage = summary.get('analysis_coverage', 0) or 0
             if coverage >= 50:
                 dist = summary.get('sentiment_distribution_percent', {})
@@ -435,34 +454,16 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def sentiment_overview(self, request):
-        from products.models import Review
-        reviews = Review.objects.filter(sentiment__isnull=False)
-        total = reviews.count()
-        if total == 0:
-            return Response({
-                'scope': 'global',
-                'total_reviews': 0,
-                'sentiment_counts': {'positive': 0, 'neutral': 0, 'negative': 0},
-                'sentiment_distribution': {'positive': 0, 'neutral': 0, 'negative': 0},
-                'average_confidence': 0,
-                'overall_sentiment': 'neutral'
-            })
-        counts = {
-            'positive': reviews.filter(sentiment='positive').count(),
-            'neutral': reviews.filter(sentiment='neutral').count(),
-            'negative': reviews.filter(sentiment='negative').count(),
-        }
-        distribution = {k: (v/total)*100 for k, v in counts.items()}
-        from django.db.models import Avg
-        avg_conf = reviews.aggregate(a=Avg('sentiment_confidence'))['a'] or 0
-        overall = max(counts, key=counts.get)
+        summary = sentiment_aggregates()
+        counts = {k: summary['sentiment_counts'][k] for k in ('positive', 'neutral', 'negative')}
+        total = summary['analyzed_reviews']
         return Response({
             'scope': 'global',
             'total_reviews': total,
             'sentiment_counts': counts,
-            'sentiment_distribution': distribution,
-            'average_confidence': avg_conf,
-            'overall_sentiment': overall
+            'sentiment_distribution': {k: (v / total) * 100 if total else 0 for k, v in counts.items()},
+            'average_confidence': summary['average_confidence'] if total else 0,
+            'overall_sentiment': max(counts, key=counts.get) if total else 'neutral'
         })
 
 class ReviewViewSet(viewsets.ModelViewSet):
@@ -533,30 +534,4 @@ class ReviewViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def sentiment_trends(self, request):
-        days = int(request.query_params.get('days', 30))
-        product_id = request.query_params.get('product')
-        from django.utils import timezone
-        from datetime import timedelta
-        from products.models import Review
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=days)
-        qs = Review.objects.filter(created_at__gte=start_date, sentiment__isnull=False)
-        if product_id:
-            qs = qs.filter(product_id=product_id)
-        # annotate by date & sentiment
-        data = qs.extra({'date': "DATE(created_at)"}).values('date', 'sentiment').annotate(count=Count('id')).order_by('date')
-        trends = {}
-        for row in data:
-            d = str(row['date'])
-            trends.setdefault(d, {'positive':0,'negative':0,'neutral':0})
-            trends[d][row['sentiment']] = row['count']
-        dates = sorted(trends.keys())
-        result = {
-            'scope': 'product' if product_id else 'global',
-            'product_id': int(product_id) if product_id else None,
-            'dates': dates,
-            'positive': [trends[d]['positive'] for d in dates],
-            'neutral': [trends[d]['neutral'] for d in dates],
-            'negative': [trends[d]['negative'] for d in dates]
-        }
-        return Response(result)
+        return sentiment_trends_response(request)
@@ -0,0 +1,138 @@
+"""
+Review sentiment aggregates in one round trip, cached per scope.
+
+sentiment_aggregates() answers the product summary, the global overview and the
+statistics endpoint with a single conditional aggregation (Count(filter=Q(...))) over
+the reviews instead of one query per count. product_sentiment_aggregates() does the
+same for many products with one GROUP BY (used by sentiment alerts).
+
+Results are cached under the 'global' or 'product:<id>' scope in the Django cache
+named by SENTIMENT_AGGREGATE_CACHE, and concurrent misses for one scope share a single
+computation (single_flight.CacheSingleFlight); review saves and deletes drop the affected scopes
+(see products/signals.py). With a per-process cache (the LocMem default) other
+processes only notice changes after SENTIMENT_AGGREGATE_CACHE_TIMEOUT.
+"""
+from typing import Dict, Iterable, List, Optional
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, Q
+
+from .single_flight import get_cache_flight
+
+logger = logging.getLogger(__name__)
+
+SENTIMENTS = ('positive', 'neutral', 'negative')
+CACHE_PREFIX = 'sentiment_summary'
+
+
+def _aggregations() -> Dict:
+    analyzed = Q(sentiment__isnull=False)
+    aggregations = {
+        'total': Count('id'),
+        'analyzed': Count('id', filter=analyzed),
+        'average_confidence': Avg('sentiment_confidence', filter=analyzed),
+    }
+    for sentiment in SENTIMENTS:
+        aggregations[f'analyzed_{sentiment}'] = Count('id', filter=Q(sentiment=sentiment))
+        aggregations[f'effective_{sentiment}'] = Count('id', filter=Q(effective_sentiment=sentiment))
+    return aggregations
+
+
+def _percentages(counts: Dict[str, int], total: int) -> Dict[str, float]:
+    return {k: (v / total) * 100 if total > 0 else 0.0 for k, v in counts.items()}
+
+
+def summarize(row: Dict) -> Dict:
+    """Turn one aggregation row into the summary dict the sentiment endpoints return."""
+    total = row['total'] or 0
+    analyzed = row['analyzed'] or 0
+    coverage = (analyzed / total * 100) if total > 0 else 0
+    sentiment_counts = {s: row[f'analyzed_{s}'] for s in ('positive', 'negative', 'neutral')}
+    effective_counts = {s: row[f'effective_{s}'] for s in SENTIMENTS}
+    # Overall sentiment decision: use analyzed if coverage >= 50%, else effective
+    source_counts = sentiment_counts if coverage >= 50 else effective_counts
+    overall = max(source_counts, key=source_counts.get) if sum(source_counts.values()) > 0 else 'neutral'
+    return {
+        'total_reviews': total,
+        'analyzed_reviews': analyzed,
+        'unanalyzed_reviews': total - analyzed,
+        'analysis_coverage': coverage,
+        'sentiment_counts': sentiment_counts,
+        'sentiment_distribution_percent': _percentages(sentiment_counts, analyzed),
+        'effective_sentiment_counts': effective_counts,
+        'effective_sentiment_distribution_percent': _percentages(effective_counts, total),
+        'average_confidence': float(row['average_confidence'] or 0.0),
+        'overall_sentiment': overall,
+    }
+
+
+def _cache():
+    try:
+        from django.core.cache import caches
+        return caches[getattr(settings, 'SENTIMENT_AGGREGATE_CACHE', 'default')]
+    except Exception as e:
+        logger.warning(f"Sentiment aggregate cache unavailable: {e}")
+        return None
+
+
+def _flight():
+    return get_cache_flight('sentiment_aggregates',
+                            cache_alias=getattr(settings, 'SENTIMENT_AGGREGATE_CACHE', 'default'))
+
+
+def scope_key(product_id: Optional[int] = None) -> str:
+    return f"{CACHE_PREFIX}:product:{int(product_id)}" if product_id is not None else f"{CACHE_PREFIX}:global"
+
+
+def compute_sentiment_aggregates(product_id: Optional[int] = None, model_version: Optional[str] = None) -> Dict:
+    from products.models import Review
+    reviews = Review.objects.all()
+    if product_id is not None:
+        reviews = reviews.filter(product_id=product_id)
+    if model_version is not None:
+        reviews = reviews.filter(sentiment_model_version=model_version)
+    return summarize(reviews.aggregate(**_aggregations()))
+
+
+def sentiment_aggregates(product_id: Optional[int] = None, model_version: Optional[str] = None) -> Dict:
+    """Summary for one product, or all reviews when product_id is None.
+
+    Cached, and coalesced: concurrent misses for the same scope run one query. Restricting
+    to reviews labeled by one model_version is an uncached admin query.
+    """
+    if model_version is not None:
+        return compute_sentiment_aggregates(product_id, model_version)
+    return _flight().get_or_compute(
+        scope_key(product_id),
+        lambda: compute_sentiment_aggregates(product_id),
+        getattr(settings, 'SENTIMENT_AGGREGATE_CACHE_TIMEOUT', 300),
+    )
+
+
+def product_sentiment_aggregates(product_ids: Iterable[int]) -> Dict[int, Dict]:
+    """Summaries for many products with one grouped query (products without reviews included)."""
+    from products.models import Review
+    product_ids: List[int] = list(product_ids)
+    rows = (
+        Review.objects.filter(product_id__in=product_ids)
+        .values('product_id')
+        .annotate(**_aggregations())
+        .order_by()
+    )
+    found = {row['product_id']: summarize(row) for row in rows}
+    empty = summarize({'total': 0, 'analyzed': 0, 'average_confidence': None,
+                       **{f'{kind}_{s}': 0 for kind in ('analyzed', 'effective') for s in SENTIMENTS}})
+    return {pid: found.get(pid, empty) for pid in product_ids}
+
+
+def invalidate_sentiment_aggregates(product_ids: Iterable[Optional[int]] = ()):
+    """Drop the global scope and the given products' scopes, now and again after commit."""
+    cache = _cache()
+    if cache is None:
+        return
+    keys = [scope_key()] + [scope_key(pid) for pid in set(product_ids) if pid is not None]
+    cache.delete_many(keys)
+    # A request reading between the write and its commit may have re-cached the old numbers
+    transaction.on_commit(lambda: cache.delete_many(keys))
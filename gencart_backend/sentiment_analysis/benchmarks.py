@@ -0,0 +1,391 @@
+"""
+Reproducible benchmarks for the sentiment analyzers.
+
+Every analyzer is measured in its own forked process on the fixed corpora below:
+
+    cold_start_ms            construct the analyzer and load its model files
+    latency_p50/p95/p99_ms   single-text predict() over the corpus (after warm-up); each
+                             percentile is the lowest of the per-round values
+    throughput_per_sec       texts/sec for a batch of `batch_size` texts (predict_batch when
+                             available), best of up to three runs
+    rss_mb / rss_delta_mb    resident memory after the run, and growth caused by loading + running
+    accuracy                 on the corpus' positive/negative texts (the Kaggle models are binary)
+
+Results are written as JSON (default: assets/reports/sentiment_benchmarks.json, see
+SENTIMENT_BENCHMARK_REPORT) and SentimentAnalysisSystem.get_algorithm_info() serves the
+latest report instead of hard-coded figures. compare_reports() flags regressions
+against a previous report: a metric must get worse both relatively and by more than its
+absolute floor, so scheduler noise on sub-millisecond latencies or a few MB of RSS does
+not fail a run.
+"""
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# repo root = three levels up from this file: gencart_backend/sentiment_analysis/benchmarks.py
+REPO_ROOT = Path(__file__).resolve().parents[2]
+KAGGLE_MODELS_DIR = REPO_ROOT / 'kaggle_sentiment_models'
+DEFAULT_REPORT_PATH = REPO_ROOT / 'assets' / 'reports' / 'sentiment_benchmarks.json'
+
+# (text, label) with label in {'positive', 'negative', 'neutral'}; never change existing entries,
+# results are only comparable across runs on the same corpus (its hash is recorded)
+BENCHMARK_CORPUS: Dict[str, List[Tuple[str, str]]] = {
+    'en': [
+        ("Excellent quality and fast delivery.", 'positive'),
+        ("Good value for money.", 'positive'),
+        ("This product is amazing! Great quality.", 'positive'),
+        ("Love it, works exactly as described and the battery lasts all day.", 'positive'),
+        ("Highly recommend this seller, packaging was perfect.", 'positive'),
+        ("Fits perfectly and looks even better than in the photos.", 'positive'),
+        ("Very happy with this purchase, will buy again.", 'positive'),
+        ("Sound is clear and the bass is strong for the price.", 'positive'),
+        ("Average experience, nothing special.", 'neutral'),
+        ("It's okay, nothing special but works fine.", 'neutral'),
+        ("Arrived on time. Haven't used it much yet.", 'neutral'),
+        ("Not as described, a bit disappointed.", 'negative'),
+        ("Poor build quality and late delivery.", 'negative'),
+        ("Terrible quality, waste of money.", 'negative'),
+        ("Stopped working after two days, asking for a refund.", 'negative'),
+        ("The screen cracked in the box and support never answered.", 'negative'),
+        ("Cheap plastic, smells bad and the zipper broke immediately.", 'negative'),
+        ("Worst purchase this year, do not buy.", 'negative'),
+    ],
+    'vi': [
+        ("Tuyệt vời! Sản phẩm vượt mong đợi.", 'positive'),
+        ("Khá tốt, sẽ mua lại.", 'positive'),
+        ("Sản phẩm rất tốt, giao hàng nhanh", 'positive'),
+        ("Chất lượng tuyệt vời, đóng gói cẩn thận, rất hài lòng.", 'positive'),
+        ("Giá rẻ mà dùng rất ổn, shop tư vấn nhiệt tình.", 'positive'),
+        ("Hàng đẹp giống hình, đáng tiền.", 'positive'),
+        ("Ổn nhưng còn có thể cải thiện.", 'neutral'),
+        ("Hàng nhận được bình thường, chưa dùng nhiều.", 'neutral'),
+        ("Chưa hài lòng về chất lượng.", 'negative'),
+        ("Rất tệ, không nên mua.", 'negative'),
+        ("Giao hàng chậm, sản phẩm bị hỏng.", 'negative'),
+        ("Thất vọng, hàng kém chất lượng, phí tiền.", 'negative'),
+        ("Dùng được hai ngày thì hư, shop không trả lời.", 'negative'),
+    ],
+}
+
+# Relative change in the "worse" direction that counts as a regression
+REGRESSION_METRICS = {
+    'cold_start_ms': 'lower',
+    'latency_p95_ms': 'lower',
+    'latency_p99_ms': 'lower',
+    'throughput_per_sec': 'higher',
+    'rss_delta_mb': 'lower',
+}
+# Smallest absolute change (in the metric's unit) that can count as a regression
+REGRESSION_FLOORS = {
+    'cold_start_ms': 50.0,
+    'latency_p95_ms': 0.5,
+    'latency_p99_ms': 1.0,
+    'throughput_per_sec': 100.0,
+    'rss_delta_mb': 32.0,
+}
+
+
+def corpus_hash(language: str) -> str:
+    digest = hashlib.sha256()
+    for text, label in BENCHMARK_CORPUS[language]:
+        digest.update(f"{label}\t{text}\n".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def current_rss_mb() -> float:
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class _KaggleLogisticRegression:
+    """predict()/predict_batch() over the Kaggle TF-IDF + logistic regression pickles."""
+
+    def __init__(self, language: str = 'en'):
+        import joblib
+        from .models import SentimentPreprocessor
+        model_path = KAGGLE_MODELS_DIR / 'logistic_regression_model.pkl'
+        vec_path = KAGGLE_MODELS_DIR / 'tfidf_vectorizer.pkl'
+        if not (model_path.exists() and vec_path.exists()):
+            raise FileNotFoundError(f"Kaggle pickles not found in {KAGGLE_MODELS_DIR}")
+        self.model = joblib.load(model_path)
+        self.vectorizer = joblib.load(vec_path)
+        self.preprocessor = SentimentPreprocessor(language)
+
+    def _results(self, X) -> List[Dict]:
+        probabilities = self.model.predict_proba(X)
+        classes = [int(c) for c in self.model.classes_]
+        results = []
+        for row in probabilities:
+            best = classes[int(np.argmax(row))]
+            results.append({
+                'sentiment': 'positive' if best == 1 else 'negative',
+                'confidence': float(row.max()),
+            })
+        return results
+
+    def predict(self, text: str) -> Dict:
+        return self._results(self.vectorizer.transform([self.preprocessor.preprocess(text)]))[0]
+
+    def predict_batch(self, texts: List[str]) -> List[Dict]:
+        return self._results(self.vectorizer.transform(self.preprocessor.preprocess_many(texts)))
+
+
+class _TextBlobFallback:
+    def __init__(self, language: str = 'en'):
+        from .models import BERTSentimentAnalyzer
+        self._analyzer = BERTSentimentAnalyzer(language)
+
+    def predict(self, text: str) -> Dict:
+        return self._analyzer._textblob_fallback(text)
+
+
+def _naive_bayes(language: str):
+    from .models import NaiveBayesSentimentAnalyzer
+    analyzer = NaiveBayesSentimentAnalyzer(language)
+    analyzer.load_model()
+    if not analyzer.is_trained:
+        raise FileNotFoundError(f"No trained Naive Bayes model for '{language}'")
+    return analyzer
+
+
+def _bert(language: str):
+    from django.conf import settings
+    from .models import BERTSentimentAnalyzer, TRANSFORMERS_AVAILABLE
+    model_dir = getattr(settings, 'SENTIMENT_BERT_MODEL_DIR', None)
+    if not TRANSFORMERS_AVAILABLE:
+        raise ImportError('transformers is not installed')
+    if not model_dir:
+        # Benchmarks only use local models: downloads would dominate cold start
+        raise FileNotFoundError('SENTIMENT_BERT_MODEL_DIR is not set')
+    analyzer = BERTSentimentAnalyzer(language, model_dir=model_dir)
+    analyzer.load_model()
+    if not analyzer.is_loaded:
+        raise RuntimeError(f"Could not load BERT model from {model_dir}")
+    return analyzer
+
+
+# name -> (algorithm key used by get_algorithm_info, corpus language, factory)
+ANALYZERS: Dict[str, Tuple[str, str, Callable]] = {
+    'naive_bayes_en': ('naive_bayes', 'en', lambda: _naive_bayes('en')),
+    'naive_bayes_vi': ('naive_bayes', 'vi', lambda: _naive_bayes('vi')),
+    'kaggle_logreg_en': ('kaggle_logreg', 'en', lambda: _KaggleLogisticRegression('en')),
+    'textblob_en': ('textblob', 'en', lambda: _TextBlobFallback('en')),
+    'bert_en': ('bert', 'en', lambda: _bert('en')),
+}
+
+
+def measure_analyzer(factory: Callable, language: str, rounds: int = 5, warmup: int = 3,
+                     batch_size: int = 1000) -> Dict:
+    """Measure one analyzer in the current process."""
+    corpus = BENCHMARK_CORPUS[language]
+    texts = [text for text, _ in corpus]
+    rss_before = current_rss_mb()
+
+    started = time.perf_counter()
+    analyzer = factory()
+    cold_start = time.perf_counter() - started
+
+    for text in texts[:warmup]:
+        analyzer.predict(text)
+    round_timings = []
+    predictions = {}
+    for _ in range(rounds):
+        timings = []
+        for text in texts:
+            t0 = time.perf_counter()
+            predictions[text] = analyzer.predict(text)
+            timings.append(time.perf_counter() - t0)
+        round_timings.append(np.asarray(timings) * 1000)
+
+    batch = [texts[i % len(texts)] + ('' if i < len(texts) else f' #{i}') for i in range(batch_size)]
+    batch_seconds = float('inf')
+    for _ in range(max(1, min(rounds, 3))):
+        t0 = time.perf_counter()
+        if hasattr(analyzer, 'predict_batch'):
+            analyzer.predict_batch(batch)
+        else:
+            for text in batch:
+                analyzer.predict(text)
+        batch_seconds = min(batch_seconds, time.perf_counter() - t0)
+
+    polar = [(text, label) for text, label in corpus if label != 'neutral']
+    correct = sum(1 for text, label in polar if predictions[text].get('sentiment') == label)
+    rss_after = current_rss_mb()
+
+    def percentile(q):
+        # Lowest per-round value: rounds disturbed by other work on the machine drop out
+        return float(min(np.percentile(timings_ms, q) for timings_ms in round_timings))
+
+    return {
+        'status': 'ok',
+        'language': language,
+        'cold_start_ms': cold_start * 1000,
+        'latency_p50_ms': percentile(50),
+        'latency_p95_ms': percentile(95),
+        'latency_p99_ms': percentile(99),
+        'throughput_per_sec': batch_size / batch_seconds if batch_seconds else float('inf'),
+        'rss_mb': rss_after,
+        'rss_delta_mb': max(0.0, rss_after - rss_before),
+        'accuracy': correct / len(polar) if polar else None,
+        'samples': sum(len(timings_ms) for timings_ms in round_timings),
+    }
+
+
+def _child(conn, name: str, options: Dict):
+    _, language, factory = ANALYZERS[name]
+    try:
+        conn.send(measure_analyzer(factory, language, **options))
+    except Exception as e:
+        conn.send({'status': 'skipped', 'language': language, 'reason': f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def run_isolated(name: str, timeout: float = 600, **options) -> Dict:
+    """Measure an analyzer in a forked child so load time and memory are not polluted by the others."""
+    try:
+        context = multiprocessing.get_context('fork')
+    except ValueError:
+        # No fork (e.g. Windows): measure in-process, memory figures include earlier analyzers
+        _, language, factory = ANALYZERS[name]
+        return measure_analyzer(factory, language, **options)
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_child, args=(child_conn, name, options), daemon=True)
+    process.start()
+    child_conn.close()
+    result = None
+    if parent_conn.poll(timeout):
+        try:
+            result = parent_conn.recv()
+        except EOFError:
+            result = None
+    process.join(5)
+    if process.is_alive():
+        process.kill()
+    if result is None:
+        result = {'status': 'failed', 'reason': f'no result (exit code {process.exitcode})'}
+    return result
+
+
+def run_benchmarks(names: Optional[List[str]] = None, isolated: bool = True, **options) -> Dict:
+    import sklearn
+    names = names or list(ANALYZERS)
+    results = {}
+    for name in names:
+        logger.info(f"Benchmarking {name}")
+        if isolated:
+            result = run_isolated(name, **options)
+        else:
+            _, language, factory = ANALYZERS[name]
+            try:
+                result = measure_analyzer(factory, language, **options)
+            except Exception as e:
+                result = {'status': 'skipped', 'language': language, 'reason': f"{type(e).__name__}: {e}"}
+        result['algorithm'] = ANALYZERS[name][0]
+        results[name] = result
+    return {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'sklearn': sklearn.__version__,
+        },
+        'corpus': {lang: {'texts': len(BENCHMARK_CORPUS[lang]), 'sha256': corpus_hash(lang)}
+                   for lang in BENCHMARK_CORPUS},
+        'options': options,
+        'analyzers': results,
+    }
+
+
+def compare_reports(current: Dict, baseline: Dict, threshold: float = 0.25) -> List[str]:
+    """Human-readable regressions of `current` vs `baseline` beyond a relative threshold
+    and the metric's absolute floor (REGRESSION_FLOORS)."""
+    regressions = []
+    if current.get('corpus') != baseline.get('corpus'):
+        logger.warning('Benchmark corpus changed since the baseline; comparing anyway')
+    for name, result in current.get('analyzers', {}).items():
+        previous = baseline.get('analyzers', {}).get(name)
+        if result.get('status') != 'ok' or not previous or previous.get('status') != 'ok':
+            continue
+        for metric, better in REGRESSION_METRICS.items():
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            worse_by = new - old if better == 'lower' else old - new
+            change = worse_by / old
+            if change > threshold and worse_by > REGRESSION_FLOORS.get(metric, 0.0):
+                regressions.append(f"{name}.{metric}: {old:.2f} -> {new:.2f} ({change:+.0%} worse)")
+    return regressions
+
+
+def report_path() -> Path:
+    from django.conf import settings
+    return Path(getattr(settings, 'SENTIMENT_BENCHMARK_REPORT', None) or DEFAULT_REPORT_PATH)
+
+
+def write_report(report: Dict, path: Optional[Path] = None) -> Path:
+    path = Path(path or report_path())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+_report_cache: Dict[str, Tuple[float, Optional[Dict]]] = {}
+
+
+def load_report(path: Optional[Path] = None) -> Optional[Dict]:
+    """Latest benchmark report, re-read only when the file changes."""
+    path = Path(path or report_path())
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return None
+    cached = _report_cache.get(str(path))
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(path, encoding='utf-8') as f:
+            report = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Unreadable benchmark report {path}: {e}")
+        report = None
+    _report_cache[str(path)] = (mtime, report)
+    return report
+
+
+def algorithm_measurements(algorithm: str, language: Optional[str] = None) -> Optional[Dict]:
+    """Measured numbers for an algorithm from the latest report (preferring `language`)."""
+    report = load_report()
+    if not report:
+        return None
+    candidates = [
+        (name, result) for name, result in report.get('analyzers', {}).items()
+        if result.get('algorithm') == algorithm and result.get('status') == 'ok'
+    ]
+    if not candidates:
+        return None
+    candidates.sort(key=lambda item: item[1].get('language') != language)
+    name, result = candidates[0]
+    return {'analyzer': name, 'measured_at': report.get('generated_at'), **result}
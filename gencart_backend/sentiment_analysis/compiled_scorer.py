@@ -0,0 +1,193 @@
+"""
+Compiled single-text scorer for TF-IDF + MultinomialNB (or LogisticRegression) models.
+
+sklearn's transform/predict_proba path validates input and builds a sparse matrix for
+every call, which dominates latency when scoring one short review. The compiled form
+keeps only what scoring needs (n-gram -> column dict, idf, per-class feature log
+probabilities and class log priors as contiguous arrays) and computes the same
+probabilities with plain NumPy.
+
+Logistic regression fits the same shape: softmax(bias + x @ W) with W = coef_ and
+bias = intercept_ (binary models get an all-zero row for the negative class, since
+softmax([0, z]) == [1 - sigmoid(z), sigmoid(z)]).
+"""
+from typing import Dict, List, Optional, Tuple
+import json
+import re
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+class CompiledNBScorer:
+    """Pure NumPy equivalent of ``model.predict_proba(vectorizer.transform([text]))``."""
+
+    def __init__(self,
+                 vocabulary: Dict[str, int],
+                 idf: Optional[np.ndarray],
+                 feature_log_prob: np.ndarray,
+                 class_log_prior: np.ndarray,
+                 classes: np.ndarray,
+                 ngram_range: Tuple[int, int] = (1, 1),
+                 stop_words=None,
+                 token_pattern: str = r"(?u)\b\w\w+\b",
+                 lowercase: bool = True,
+                 norm: Optional[str] = 'l2',
+                 sublinear_tf: bool = False,
+                 feature_major: bool = False):
+        # Any mapping with .get()/len()/items() works, e.g. model_artifacts.SortedVocabulary
+        self.vocabulary = vocabulary
+        self.idf = None if idf is None else np.ascontiguousarray(idf, dtype=np.float64)
+        # Row per feature so one n-gram's class weights are adjacent in memory.
+        # feature_major=True means the array already has that layout (memory-mapped artifacts).
+        flp = np.asarray(feature_log_prob, dtype=np.float64)
+        self.feature_log_prob = flp if feature_major else np.ascontiguousarray(flp.T)
+        self.class_log_prior = np.ascontiguousarray(class_log_prior, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        self.ngram_range = tuple(ngram_range)
+        self.stop_words = frozenset(stop_words) if stop_words else frozenset()
+        self.token_pattern = token_pattern
+        self._token_re = re.compile(token_pattern)
+        self.lowercase = lowercase
+        self.norm = norm
+        self.sublinear_tf = sublinear_tf
+
+    @classmethod
+    def from_sklearn(cls, vectorizer, model) -> 'CompiledNBScorer':
+        """Compile a fitted TfidfVectorizer (or CountVectorizer) and MultinomialNB/LogisticRegression."""
+        from sklearn.naive_bayes import MultinomialNB
+        from sklearn.linear_model import LogisticRegression
+
+        if isinstance(model, MultinomialNB):
+            weights, bias = model.feature_log_prob_, model.class_log_prior_
+        elif isinstance(model, LogisticRegression):
+            if len(model.classes_) > 2 and getattr(model, 'multi_class', 'auto') == 'ovr':
+                raise ValueError("One-vs-rest LogisticRegression cannot be compiled")
+            weights, bias = model.coef_, model.intercept_
+            if len(model.classes_) == 2:
+                weights = np.vstack([np.zeros_like(weights), weights])
+                bias = np.concatenate([[0.0], bias])
+        else:
+            raise ValueError(f"Only MultinomialNB or LogisticRegression can be compiled, got {type(model).__name__}")
+        if getattr(vectorizer, 'analyzer', 'word') != 'word' or getattr(vectorizer, 'tokenizer', None) is not None \
+                or getattr(vectorizer, 'preprocessor', None) is not None or getattr(vectorizer, 'strip_accents', None):
+            raise ValueError("Only default word analyzers can be compiled")
+        if not hasattr(vectorizer, 'vocabulary_'):
+            raise ValueError("Vectorizer is not fitted")
+        if weights.shape[1] != len(vectorizer.vocabulary_):
+            raise ValueError("Model has features outside the vectorizer vocabulary (e.g. lexicon features)")
+
+        use_idf = getattr(vectorizer, 'use_idf', False)
+        return cls(
+            vocabulary=dict(vectorizer.vocabulary_),
+            idf=vectorizer.idf_ if use_idf else None,
+            feature_log_prob=weights,
+            class_log_prior=bias,
+            classes=model.classes_,
+            ngram_range=vectorizer.ngram_range,
+            stop_words=vectorizer.get_stop_words(),
+            token_pattern=vectorizer.token_pattern,
+            lowercase=vectorizer.lowercase,
+            norm=getattr(vectorizer, 'norm', None),
+            sublinear_tf=getattr(vectorizer, 'sublinear_tf', False),
+        )
+
+    def ngrams(self, text: str) -> List[str]:
+        """Same n-grams as sklearn's word analyzer (stop words removed before joining)."""
+        if self.lowercase:
+            text = text.lower()
+        tokens = self._token_re.findall(text)
+        if self.stop_words:
+            tokens = [t for t in tokens if t not in self.stop_words]
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+        grams = list(tokens) if min_n == 1 else []
+        n_tokens = len(tokens)
+        for n in range(max(min_n, 2), min(max_n, n_tokens) + 1):
+            grams.extend(' '.join(tokens[i:i + n]) for i in range(n_tokens - n + 1))
+        return grams
+
+    def joint_log_likelihood(self, text: str) -> np.ndarray:
+        counts: Dict[int, int] = {}
+        vocab = self.vocabulary
+        for gram in self.ngrams(text):
+            idx = vocab.get(gram)
+            if idx is not None:
+                counts[idx] = counts.get(idx, 0) + 1
+        if not counts:
+            return self.class_log_prior.copy()
+
+        idx = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        if self.sublinear_tf:
+            weights = np.log(weights) + 1.0
+        if self.idf is not None:
+            weights *= self.idf[idx]
+        if self.norm == 'l2':
+            weights /= np.sqrt(np.dot(weights, weights))
+        elif self.norm == 'l1':
+            weights /= np.abs(weights).sum()
+        return self.class_log_prior + weights @ self.feature_log_prob[idx]
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        jll = self.joint_log_likelihood(text)
+        shifted = jll - jll.max()
+        exp = np.exp(shifted)
+        return exp / exp.sum()
+
+    def predict(self, text: str):
+        return self.classes[int(np.argmax(self.joint_log_likelihood(text)))]
+
+    # --- export -----------------------------------------------------------------
+
+    def meta(self) -> Dict:
+        """Tokenizer / weighting settings needed to rebuild the scorer."""
+        return {
+            'format_version': FORMAT_VERSION,
+            'ngram_range': list(self.ngram_range),
+            'stop_words': sorted(self.stop_words),
+            'token_pattern': self.token_pattern,
+            'lowercase': self.lowercase,
+            'norm': self.norm,
+            'sublinear_tf': self.sublinear_tf,
+            'has_idf': self.idf is not None,
+        }
+
+    def save(self, path: str):
+        """Write the scoring table as a single uncompressed .npz file."""
+        terms = np.empty(len(self.vocabulary), dtype=object)
+        for term, i in self.vocabulary.items():
+            terms[i] = term
+        meta = self.meta()
+        np.savez(
+            path,
+            terms=terms.astype(str),
+            idf=self.idf if self.idf is not None else np.zeros(0),
+            feature_log_prob=self.feature_log_prob.T,
+            class_log_prior=self.class_log_prior,
+            classes=self.classes,
+            meta=np.array(json.dumps(meta)),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'CompiledNBScorer':
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('format_version') != FORMAT_VERSION:
+                raise ValueError(f"Unsupported compiled scorer format: {meta.get('format_version')}")
+            terms = data['terms'].tolist()
+            return cls(
+                vocabulary={term: i for i, term in enumerate(terms)},
+                idf=data['idf'] if meta['has_idf'] else None,
+                feature_log_prob=data['feature_log_prob'],
+                class_log_prior=data['class_log_prior'],
+                classes=data['classes'],
+                ngram_range=tuple(meta['ngram_range']),
+                stop_words=meta['stop_words'],
+                token_pattern=meta['token_pattern'],
+                lowercase=meta['lowercase'],
+                norm=meta['norm'],
+                sublinear_tf=meta['sublinear_tf'],
+            )
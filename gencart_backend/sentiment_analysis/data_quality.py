@@ -1,10 +1,14 @@
 from __future__ import annotations
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Any
+from dataclasses import dataclass, asdict, field
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 from collections import Counter
 import re
+import zlib
 
-# Lightweight, no external deps beyond Django ORM
+import numpy as np
+from django.db.models import Count, Q
+
+# Lightweight, no external deps beyond Django ORM and NumPy
 from products.models import Review
 
 @dataclass
@@ -18,54 +22,202 @@ class DataQualityMetrics:
     duplicate_ratio: float
     avg_length_tokens: float | None
     short_text_ratio: float
+    near_duplicate_ratio: float = 0.0
+    near_duplicate_clusters: List[Dict[str, Any]] = field(default_factory=list)
+    product_duplicate_clusters: Dict[int, Dict[str, int]] = field(default_factory=dict)
 
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
 
 TOKEN_SPLIT_RE = re.compile(r"\s+")
 
+# Mersenne-style prime just above 2**32: (a * h + b) stays below 2**64 for 32-bit a, b, h
+_MINHASH_PRIME = np.uint64(4294967311)
+_MASK32 = (1 << 32) - 1
+
 
 def _tokenize(text: str) -> List[str]:
     return [t for t in TOKEN_SPLIT_RE.split(text.strip()) if t]
 
 
-def compute_data_quality(min_text_len: int = 1, short_threshold: int = 3) -> DataQualityMetrics:
-    qs = Review.objects.all().values('id', 'title', 'comment', 'sentiment')
-    total = qs.count()
+class NearDuplicateDetector:
+    """Streaming MinHash + LSH banding over word shingles.
+
+    Each document gets a num_perm MinHash signature, split into `bands` bands of
+    num_perm / bands rows. Documents sharing any band bucket are candidates and are
+    accepted when their estimated Jaccard similarity reaches `threshold`; accepted pairs
+    are merged into clusters with union-find. The banding's own cut-off is roughly
+    (1 / bands) ** (1 / rows): 8 bands of 8 rows suit the default 0.8 threshold, lower
+    thresholds need more bands.
+
+    Only the first document of each bucket is indexed (with its signature), and the
+    index stops growing at `max_index_entries` buckets, so memory is bounded no matter
+    how many reviews are streamed through; later documents are still matched against
+    everything indexed so far.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 8, threshold: float = 0.8, shingle_size: int = 3,
+                 min_tokens: int = 5, max_index_entries: int = 2_000_000, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError('num_perm must be divisible by bands')
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MASK32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MASK32, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.min_tokens = min_tokens
+        self.max_index_entries = max_index_entries
+        self._buckets: Dict[int, int] = {}
+        self._signatures: Dict[int, np.ndarray] = {}
+        self._products: Dict[int, int] = {}
+        self._parent: Dict[int, int] = {}
+        self.documents = 0
+        self.duplicates = 0
+
+    def signature(self, tokens: List[str]) -> np.ndarray:
+        k = self.shingle_size
+        shingles = {' '.join(tokens[i:i + k]) for i in range(max(1, len(tokens) - k + 1))}
+        # crc32 rather than hash(): str hashing is salted per process, and clusters should be reproducible
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+        values = ((np.outer(hashes, self._a) + self._b) % _MINHASH_PRIME).min(axis=0)
+        # Values in [2**32, prime) are rare; folding them keeps signatures at 4 bytes per slot
+        return (values & np.uint64(_MASK32)).astype(np.uint32)
+
+    def _find(self, doc_id: int) -> int:
+        root = doc_id
+        while self._parent.get(root, root) != root:
+            root = self._parent[root]
+        while doc_id != root:
+            next_id = self._parent[doc_id]
+            self._parent[doc_id] = root
+            doc_id = next_id
+        return root
+
+    def _union(self, a: int, b: int):
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a != root_b:
+            self._parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    def add(self, doc_id: int, product_id: int, tokens: List[str]) -> Optional[int]:
+        """Index one document; return the id of an earlier near-duplicate, if any."""
+        if len(tokens) < self.min_tokens:
+            return None
+        self.documents += 1
+        signature = self.signature(tokens)
+        keys = [hash((band, signature[band * self.rows:(band + 1) * self.rows].tobytes()))
+                for band in range(self.bands)]
+        match = None
+        checked = set()
+        for key in keys:
+            candidate = self._buckets.get(key)
+            if candidate is None or candidate in checked:
+                continue
+            checked.add(candidate)
+            if float(np.mean(self._signatures[candidate] == signature)) >= self.threshold:
+                match = candidate
+                break
+
+        if match is not None:
+            self.duplicates += 1
+            self._products[doc_id] = product_id
+            self._union(match, doc_id)
+            return match
+        if len(self._buckets) < self.max_index_entries:
+            indexed = False
+            for key in keys:
+                if key not in self._buckets:
+                    self._buckets[key] = doc_id
+                    indexed = True
+            if indexed:
+                self._signatures[doc_id] = signature
+                self._products[doc_id] = product_id
+        return None
+
+    def clusters(self) -> List[List[Tuple[int, int]]]:
+        """Clusters of (review id, product id), largest first; singletons omitted."""
+        grouped: Dict[int, List[Tuple[int, int]]] = {}
+        for doc_id in self._parent:
+            grouped.setdefault(self._find(doc_id), [])
+        for root in list(grouped):
+            grouped[root].append((root, self._products[root]))
+        for doc_id in self._parent:
+            root = self._find(doc_id)
+            if doc_id != root:
+                grouped[root].append((doc_id, self._products[doc_id]))
+        return sorted((sorted(members) for members in grouped.values()), key=len, reverse=True)
+
+
+def _sql_aggregates(base_qs) -> Tuple[int, int, Dict[str, int]]:
+    """Total rows, rows without any text and label counts, computed by the database."""
+    no_text = (Q(title__isnull=True) | Q(title='')) & (Q(comment__isnull=True) | Q(comment=''))
+    counts = base_qs.aggregate(total=Count('id'), null_text=Count('id', filter=no_text))
+    class_counts = {
+        row['sentiment']: row['n']
+        for row in base_qs.exclude(no_text).filter(sentiment__isnull=False).exclude(sentiment='')
+        .values('sentiment').annotate(n=Count('id')).order_by()
+    }
+    return counts['total'], counts['null_text'], class_counts
+
+
+def iter_review_texts(base_qs, chunk_size: int = 2000) -> Iterable[Tuple[int, int, str, Optional[str]]]:
+    """(id, product_id, lowercased text, sentiment); a server-side cursor on PostgreSQL."""
+    rows = base_qs.values_list('id', 'product_id', 'title', 'comment', 'sentiment').order_by('id').iterator(
+        chunk_size=chunk_size
+    )
+    for review_id, product_id, title, comment, sentiment in rows:
+        combined = f"{title or ''} {comment or ''}".strip()
+        if combined:
+            yield review_id, product_id, combined.lower(), sentiment
+
+
+def compute_data_quality(min_text_len: int = 1, short_threshold: int = 3, near_duplicates: bool = True,
+                         similarity_threshold: float = 0.8, num_perm: int = 64, bands: int = 8,
+                         chunk_size: int = 2000, max_index_entries: int = 2_000_000,
+                         top_clusters: int = 20, queryset=None) -> DataQualityMetrics:
+    base_qs = queryset if queryset is not None else Review.objects.all()
+    total, null_text, sql_class_counts = _sql_aggregates(base_qs)
+
     labeled = 0
     unlabeled = 0
-    null_text = 0
-    texts = []
-    sentiments = []
-    lengths = []
+    kept = 0
+    token_sum = 0
     short_count = 0
+    class_counts: Counter = Counter()
+    # Exact duplicates: one machine-word hash per distinct text instead of the text itself
+    seen_hashes = set()
+    dup_count = 0
+    detector = NearDuplicateDetector(
+        num_perm=num_perm, bands=bands, threshold=similarity_threshold, max_index_entries=max_index_entries
+    ) if near_duplicates else None
 
-    for r in qs:
-        combined = f"{r['title'] or ''} {r['comment'] or ''}".strip()
-        if not combined:
-            null_text += 1
-            continue
-        tokens = _tokenize(combined.lower())
+    for review_id, product_id, text, sentiment in iter_review_texts(base_qs, chunk_size):
+        tokens = _tokenize(text)
         if len(tokens) < min_text_len:
             continue
-        texts.append(combined.lower())
-        lengths.append(len(tokens))
+        kept += 1
+        token_sum += len(tokens)
         if len(tokens) < short_threshold:
             short_count += 1
-        if r['sentiment']:
+        if sentiment:
             labeled += 1
-            sentiments.append(r['sentiment'])
+            class_counts[sentiment] += 1
         else:
             unlabeled += 1
 
-    # Duplicate detection (exact text)
-    dup_count = 0
-    if texts:
-        counter = Counter(texts)
-        dup_count = sum(c - 1 for c in counter.values() if c > 1)
-    duplicate_ratio = dup_count / len(texts) if texts else 0.0
+        text_hash = hash(text)
+        if text_hash in seen_hashes:
+            dup_count += 1
+        else:
+            seen_hashes.add(text_hash)
+        if detector is not None:
+            detector.add(review_id, product_id, tokens)
 
-    class_counts = Counter(sentiments)
+    # Every non-empty text passes a 1-token minimum, so the SQL counts are exact then
+    if min_text_len <= 1:
+        class_counts = Counter(sql_class_counts)
     if class_counts:
         min_c = min(class_counts.values())
         max_c = max(class_counts.values())
@@ -73,7 +225,24 @@ def compute_data_quality(min_text_len: int = 1, short_threshold: int = 3) -> Dat
     else:
         ratio = None
 
-    avg_len = (sum(lengths) / len(lengths)) if lengths else None
+    clusters_out: List[Dict[str, Any]] = []
+    per_product: Dict[int, Dict[str, int]] = {}
+    near_ratio = 0.0
+    if detector is not None:
+        near_ratio = detector.duplicates / detector.documents if detector.documents else 0.0
+        for members in detector.clusters():
+            products = Counter(product_id for _, product_id in members)
+            for product_id, n in products.items():
+                if n > 1:
+                    stats = per_product.setdefault(product_id, {'clusters': 0, 'duplicate_reviews': 0})
+                    stats['clusters'] += 1
+                    stats['duplicate_reviews'] += n - 1
+            if len(clusters_out) < top_clusters:
+                clusters_out.append({
+                    'size': len(members),
+                    'product_ids': sorted(products),
+                    'review_ids': [review_id for review_id, _ in members[:10]],
+                })
 
     return DataQualityMetrics(
         total_reviews=total,
@@ -82,7 +251,10 @@ def compute_data_quality(min_text_len: int = 1, short_threshold: int = 3) -> Dat
         null_text_ratio=(null_text / total) if total else 0.0,
         class_distribution=dict(class_counts),
         class_ratio_max_min=ratio,
-        duplicate_ratio=duplicate_ratio,
-        avg_length_tokens=avg_len,
-        short_text_ratio=(short_count / len(lengths)) if lengths else 0.0,
+        duplicate_ratio=dup_count / kept if kept else 0.0,
+        avg_length_tokens=(token_sum / kept) if kept else None,
+        short_text_ratio=(short_count / kept) if kept else 0.0,
+        near_duplicate_ratio=near_ratio,
+        near_duplicate_clusters=clusters_out,
+        product_duplicate_clusters=per_product,
     )
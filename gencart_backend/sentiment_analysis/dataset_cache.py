@@ -0,0 +1,122 @@
+"""
+Columnar cache of normalized Kaggle training frames.
+
+The post-`to_binary` text/label frame of a loader is written once as an Arrow IPC file
+keyed by (dataset, loader version, sha256 of the source CSV). Later runs skip kagglehub,
+encoding sniffing, column detection and label normalization, and read the Arrow file
+without parsing, optionally memory-mapped. When pyarrow is not installed a pandas pickle
+is written instead (still parse-free, but not mappable).
+
+An index.json in the cache directory records the newest entry per (dataset, loader
+version) so offline runs can load without the source file being present at all.
+"""
+from pathlib import Path
+from typing import Dict, Optional
+import hashlib
+import json
+import logging
+import os
+import time
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'gencart', 'datasets')
+
+
+def default_cache_dir() -> Optional[str]:
+    """SENTIMENT_DATASET_CACHE_DIR overrides the location; set it to an empty string to disable."""
+    value = os.environ.get('SENTIMENT_DATASET_CACHE_DIR')
+    if value is None:
+        return DEFAULT_CACHE_DIR
+    return value or None
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DatasetCache:
+    """Directory of normalized text/label frames plus an index of the latest entries."""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.extension = '.arrow' if PYARROW_AVAILABLE else '.pkl'
+
+    @staticmethod
+    def _scope(dataset_id: str, loader_version: int) -> str:
+        return f"{dataset_id.replace('/', '__')}-v{loader_version}"
+
+    def key(self, dataset_id: str, loader_version: int, source_hash: str) -> str:
+        return f"{self._scope(dataset_id, loader_version)}-{source_hash[:16]}"
+
+    def path_for(self, key: str) -> Path:
+        return self.directory / f"{key}{self.extension}"
+
+    def _read_index(self) -> Dict:
+        try:
+            with open(self.directory / 'index.json', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index: Dict):
+        tmp = self.directory / f"index.json.tmp-{os.getpid()}"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp, self.directory / 'index.json')
+
+    def get(self, key: str, memory_map: bool = False) -> Optional[pd.DataFrame]:
+        path = self.path_for(key)
+        if not path.exists():
+            return None
+        try:
+            if PYARROW_AVAILABLE:
+                source = pa.memory_map(str(path), 'r') if memory_map else pa.OSFile(str(path), 'rb')
+                with source:
+                    table = pa.ipc.open_file(source).read_all()
+                return table.to_pandas()
+            return pd.read_pickle(path)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable dataset cache entry {path}: {e}")
+            return None
+
+    def put(self, key: str, df: pd.DataFrame, meta: Optional[Dict] = None) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path_for(key)
+        tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+        frame = df[['text', 'label']].reset_index(drop=True)
+        if PYARROW_AVAILABLE:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            with pa.OSFile(str(tmp), 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        else:
+            frame.to_pickle(tmp)
+        os.replace(tmp, path)
+
+        scope = key.rsplit('-', 1)[0]
+        index = self._read_index()
+        index[scope] = {'key': key, 'rows': int(len(frame)), 'written_at': time.time(), **(meta or {})}
+        self._write_index(index)
+        logger.info(f"Cached normalized dataset ({len(frame)} rows) to {path}")
+        return path
+
+    def latest(self, dataset_id: str, loader_version: int, memory_map: bool = False) -> Optional[pd.DataFrame]:
+        """Newest cached frame for a dataset, used by offline mode when no source file is available."""
+        entry = self._read_index().get(self._scope(dataset_id, loader_version))
+        if not entry:
+            return None
+        return self.get(entry['key'], memory_map=memory_map)
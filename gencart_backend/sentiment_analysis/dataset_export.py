@@ -0,0 +1,250 @@
+"""
+Streaming export of labeled reviews for `export_sentiment_dataset`.
+
+Rows are read in primary-key order with keyset pagination (WHERE id > last ORDER BY id
+LIMIT n), so memory stays at one batch regardless of table size. The dataset hash is
+updated row by row over the same `id|sentiment|text` lines the original exporter
+hashed, rows are written to a temporary file in the output directory, and the file is
+renamed to its hash-stamped name once complete, so a crashed export never leaves a
+file that looks finished.
+
+Delta exports (`since`) select rows whose `updated_at` is after a watermark; every
+complete export records the watermark the next delta should start from. Appending deltas
+to a full export and keeping the last row per id gives every labeled review's current
+text and label, but deletions are not represented: reviews deleted (or unlabeled) after
+an export stay in the combined dataset until the next full export. Exports truncated by
+`limit` record no watermark, since rows past the cut were never written.
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+import csv
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+
+from products.models import Review
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ['id', 'text', 'title', 'comment', 'sentiment', 'rating', 'created_at', 'updated_at']
+FORMATS = ['csv', 'json', 'jsonl', 'parquet']
+COMPRESSIONS = ['none', 'gzip', 'zstd']
+
+
+def iter_export_rows(min_length: int = 1, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                     limit: Optional[int] = None, batch_size: int = 5000) -> Iterator[Dict]:
+    """Labeled reviews as export dicts, in id order, one keyset page at a time."""
+    qs = Review.objects.filter(sentiment__isnull=False)
+    if since is not None:
+        qs = qs.filter(updated_at__gt=since)
+    if until is not None:
+        qs = qs.filter(updated_at__lte=until)
+    qs = qs.order_by('id').values('id', 'title', 'comment', 'sentiment', 'rating', 'created_at', 'updated_at')
+
+    last_id = 0
+    produced = 0
+    while True:
+        page = list(qs.filter(id__gt=last_id)[:batch_size])
+        if not page:
+            return
+        last_id = page[-1]['id']
+        for r in page:
+            text = f"{r['title'] or ''} {r['comment'] or ''}".strip()
+            if len(text) < min_length:
+                continue
+            yield {
+                'id': r['id'],
+                'text': text,
+                'title': r['title'] or '',
+                'comment': r['comment'] or '',
+                'sentiment': r['sentiment'],
+                'rating': r['rating'],
+                'created_at': r['created_at'].isoformat() if r['created_at'] else None,
+                'updated_at': r['updated_at'].isoformat() if r['updated_at'] else None,
+            }
+            produced += 1
+            if limit and produced >= limit:
+                return
+
+
+def file_extension(fmt: str, compression: str) -> str:
+    if fmt == 'parquet' or compression == 'none':
+        return fmt
+    return f"{fmt}.{'gz' if compression == 'gzip' else 'zst'}"
+
+
+def _open_text(path: Path, compression: str):
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=6)
+    if compression == 'zstd':
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError('zstd compression requires the zstandard package')
+        raw = open(path, 'wb')
+        stream = zstandard.ZstdCompressor(level=6).stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+class StreamingExportWriter:
+    """Write rows in one of FORMATS while hashing them; usable as a context manager."""
+
+    def __init__(self, path: Path, fmt: str, compression: str = 'none', parquet_batch: int = 10000):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format {fmt}")
+        if fmt == 'parquet' and not PYARROW_AVAILABLE:
+            raise RuntimeError('Parquet export requires pyarrow')
+        self.path = path
+        self.fmt = fmt
+        self.compression = compression
+        self.parquet_batch = parquet_batch
+        self.rows = 0
+        self.class_distribution: Dict[str, int] = {}
+        self._digest = hashlib.sha256()
+        self._pending: List[Dict] = []
+        self._file = None
+        self._writer = None
+
+    def __enter__(self):
+        if self.fmt == 'parquet':
+            compression = 'zstd' if self.compression == 'zstd' else ('gzip' if self.compression == 'gzip' else 'snappy')
+            schema = pa.schema([
+                ('id', pa.int64()), ('text', pa.string()), ('title', pa.string()), ('comment', pa.string()),
+                ('sentiment', pa.string()), ('rating', pa.int64()), ('created_at', pa.string()),
+                ('updated_at', pa.string()),
+            ])
+            self._writer = pq.ParquetWriter(str(self.path), schema, compression=compression)
+        else:
+            self._file = _open_text(self.path, self.compression)
+            if self.fmt == 'csv':
+                self._writer = csv.DictWriter(self._file, fieldnames=FIELDS)
+                self._writer.writeheader()
+            elif self.fmt == 'json':
+                self._file.write('[')
+        return self
+
+    def write(self, row: Dict):
+        # Same line format as the original in-memory exporter, so hashes stay comparable
+        line = f"{row['id']}|{row['sentiment']}|{row['text']}"
+        self._digest.update((('\n' if self.rows else '') + line).encode('utf-8'))
+        self.rows += 1
+        self.class_distribution[row['sentiment']] = self.class_distribution.get(row['sentiment'], 0) + 1
+
+        if self.fmt == 'csv':
+            self._writer.writerow(row)
+        elif self.fmt == 'jsonl':
+            self._file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        elif self.fmt == 'json':
+            self._file.write(('\n  ' if self.rows == 1 else ',\n  ') + json.dumps(row, ensure_ascii=False))
+        else:
+            self._pending.append(row)
+            if len(self._pending) >= self.parquet_batch:
+                self._flush_parquet()
+
+    def _flush_parquet(self):
+        if self._pending:
+            self._writer.write_table(pa.Table.from_pylist(self._pending, schema=self._writer.schema))
+            self._pending = []
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.fmt == 'parquet':
+            if exc_type is None:
+                self._flush_parquet()
+            self._writer.close()
+        else:
+            if self.fmt == 'json' and exc_type is None:
+                self._file.write('\n]\n' if self.rows else ']\n')
+            self._file.close()
+        return False
+
+    @property
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+def latest_export_meta(out_dir: Path) -> Optional[Dict]:
+    """Newest *.meta.json in an export directory (by its recorded watermark)."""
+    newest = None
+    for meta_path in out_dir.glob('reviews_sentiment_*.meta.json'):
+        try:
+            with meta_path.open(encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if meta.get('watermark') and (newest is None or meta['watermark'] > newest['watermark']):
+            newest = meta
+    return newest
+
+
+def export_dataset(out_dir: Path, fmt: str = 'csv', compression: str = 'none', min_length: int = 1,
+                   since: Optional[datetime] = None, until: Optional[datetime] = None,
+                   limit: Optional[int] = None, batch_size: int = 5000, parent: Optional[Dict] = None) -> Optional[Dict]:
+    """Stream the export to a temp file, rename it to the hash-stamped name and write metadata.
+
+    Returns the metadata dict, or None (and writes nothing) when no rows matched.
+    """
+    if limit and since is not None:
+        # Rows come in id order, so a truncated delta has no updated_at to resume from
+        raise ValueError('limit cannot be combined with a delta export')
+    out_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+    kind = 'delta' if since is not None else 'full'
+    stem = f"reviews_sentiment_{timestamp}" if kind == 'full' else f"reviews_sentiment_delta_{timestamp}"
+    extension = file_extension(fmt, compression)
+    tmp_path = out_dir / f".{stem}.{extension}.partial-{os.getpid()}"
+
+    try:
+        with StreamingExportWriter(tmp_path, fmt, compression) as writer:
+            for row in iter_export_rows(min_length, since=since, until=until, limit=limit, batch_size=batch_size):
+                writer.write(row)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    if not writer.rows:
+        tmp_path.unlink(missing_ok=True)
+        return None
+
+    truncated = bool(limit) and writer.rows >= limit
+    data_hash = writer.hexdigest[:16]
+    filename = f"{stem}_{data_hash}.{extension}"
+    os.replace(tmp_path, out_dir / filename)
+
+    meta = {
+        'rows': writer.rows,
+        'class_distribution': writer.class_distribution,
+        'export_utc': timestamp,
+        'hash_prefix': data_hash,
+        'sha256': writer.hexdigest,
+        'file': filename,
+        'min_length': min_length,
+        'format': fmt,
+        'compression': compression if fmt != 'parquet' else (compression if compression != 'none' else 'snappy'),
+        'kind': kind,
+        'since': since.isoformat() if since else None,
+        'truncated': truncated,
+        # Rows were capped at updated_at <= until, so the next delta starts exactly here
+        'watermark': until.isoformat() if until and not truncated else None,
+        'parent': parent.get('file') if parent else None,
+    }
+    meta_path = out_dir / f"{stem}_{data_hash}.meta.json"
+    with meta_path.open('w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    meta['meta_file'] = meta_path.name
+    return meta
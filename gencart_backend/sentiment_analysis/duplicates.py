@@ -0,0 +1,143 @@
+"""
+Write-time near-duplicate (copy-paste spam) detection for reviews.
+
+Every new review gets a MinHash signature over word shingles (the same scheme as
+data_quality.NearDuplicateDetector) stored in ReviewFingerprint, plus one LSH band
+bucket per band in ReviewBandBucket. A bucket id packs the band number and a crc32 of
+that band's signature slice into one BIGINT, so finding candidates for a new review is
+a single indexed `bucket IN (...)` lookup across all users and products, independent of
+corpus size. Candidates are accepted when the signatures agree on at least
+SENTIMENT_DUPLICATE_THRESHOLD of their slots; the new review is then linked to the
+earliest review of the cluster (ReviewFingerprint.duplicate_of).
+
+With SENTIMENT_DUPLICATE_SKIP_SCORING, flagged duplicates are not sent to the sentiment
+models (products/signals.py and the analyze_all_reviews backfills in services.py).
+
+Signature parameters are fixed here because stored buckets depend on them; changing
+them requires `manage.py fingerprint_reviews --rebuild`.
+"""
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+import logging
+import re
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .data_quality import NearDuplicateDetector
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64
+BANDS = 8
+SHINGLE_SIZE = 3
+# Shorter reviews ("Great product!") repeat legitimately
+MIN_TOKENS = 5
+# Candidates compared per lookup; a bucket shared by more reviews than this is one spam cluster anyway
+MAX_CANDIDATES = 50
+# Word characters only, so spam varied by punctuation or emoji still shingles the same
+WORD_RE = re.compile(r"\w+")
+
+
+class DuplicateMatch(NamedTuple):
+    review_id: int
+    similarity: float
+
+
+@lru_cache(maxsize=1)
+def _detector() -> NearDuplicateDetector:
+    # Only its seeded hash permutations are used
+    return NearDuplicateDetector(num_perm=NUM_PERM, bands=BANDS, shingle_size=SHINGLE_SIZE, min_tokens=MIN_TOKENS)
+
+
+def review_tokens(title: Optional[str], comment: Optional[str]) -> List[str]:
+    return WORD_RE.findall(f"{title or ''} {comment or ''}".lower())
+
+
+def signature(tokens: List[str]) -> Optional[np.ndarray]:
+    """MinHash signature, or None for texts too short to fingerprint."""
+    if len(tokens) < MIN_TOKENS:
+        return None
+    return _detector().signature(tokens)
+
+
+def band_buckets(signature: np.ndarray) -> List[int]:
+    rows = NUM_PERM // BANDS
+    return [(band << 32) | zlib.crc32(signature[band * rows:(band + 1) * rows].tobytes()) for band in range(BANDS)]
+
+
+def find_near_duplicate(signature: np.ndarray, buckets: List[int], exclude_review_id: Optional[int] = None,
+                        threshold: Optional[float] = None) -> Optional[DuplicateMatch]:
+    """Most similar fingerprinted review sharing a band bucket, if similar enough.
+
+    Returns the cluster's original (a match that is itself a duplicate resolves to its duplicate_of).
+    """
+    from .models import ReviewFingerprint
+    if threshold is None:
+        threshold = getattr(settings, 'SENTIMENT_DUPLICATE_THRESHOLD', 0.8)
+    candidates = ReviewFingerprint.objects.filter(buckets__bucket__in=buckets)
+    if exclude_review_id is not None:
+        candidates = candidates.exclude(review_id=exclude_review_id)
+    best = None
+    for review_id, stored, duplicate_of in candidates.distinct().values_list(
+            'review_id', 'signature', 'duplicate_of_id').order_by('review_id')[:MAX_CANDIDATES]:
+        similarity = float(np.mean(np.frombuffer(bytes(stored), dtype=np.uint32) == signature))
+        if similarity >= threshold and (best is None or similarity > best.similarity):
+            best = DuplicateMatch(duplicate_of or review_id, similarity)
+    return best
+
+
+def fingerprint_review(review, detect: bool = True) -> Optional[DuplicateMatch]:
+    """Store the review's fingerprint and band buckets; return the near-duplicate it matched."""
+    from .models import ReviewBandBucket, ReviewFingerprint
+    tokens = review_tokens(review.title, review.comment)
+    sig = signature(tokens)
+    with transaction.atomic():
+        ReviewFingerprint.objects.filter(review_id=review.pk).delete()
+        if sig is None:
+            return None
+        buckets = band_buckets(sig)
+        match = find_near_duplicate(sig, buckets, exclude_review_id=review.pk) if detect else None
+        fingerprint = ReviewFingerprint.objects.create(
+            review_id=review.pk,
+            signature=sig.tobytes(),
+            duplicate_of_id=match.review_id if match else None,
+            similarity=match.similarity if match else None,
+        )
+        ReviewBandBucket.objects.bulk_create([ReviewBandBucket(fingerprint=fingerprint, bucket=b) for b in buckets])
+    if match:
+        logger.info(f"Review {review.pk} near-duplicates review {match.review_id} ({match.similarity:.0%})")
+    return match
+
+
+def fingerprint_corpus(rebuild: bool = False, batch_size: int = 1000) -> Dict[str, int]:
+    """Fingerprint reviews without one (all of them with rebuild=True), oldest first.
+
+    Reviews are processed in id order so each duplicate points at the earliest copy.
+    """
+    from products.models import Review
+    from .models import ReviewFingerprint
+    if rebuild:
+        ReviewFingerprint.objects.all().delete()
+    stats = {'fingerprinted': 0, 'too_short': 0, 'duplicates': 0}
+    reviews = (Review.objects.filter(fingerprint__isnull=True)
+               .only('id', 'title', 'comment').order_by('id'))
+    last_id = 0
+    while True:
+        batch = list(reviews.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return stats
+        for review in batch:
+            if len(review_tokens(review.title, review.comment)) < MIN_TOKENS:
+                stats['too_short'] += 1
+                continue
+            stats['fingerprinted'] += 1
+            if fingerprint_review(review):
+                stats['duplicates'] += 1
+        last_id = batch[-1].id
+
+
+def duplicate_skips_scoring() -> bool:
+    return getattr(settings, 'SENTIMENT_DUPLICATE_SKIP_SCORING', True)
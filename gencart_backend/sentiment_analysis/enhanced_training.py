@@ -19,14 +19,17 @@ from .models import (
     BERTSentimentAnalyzer,
     NaiveBayesSentimentAnalyzer
 )
+from .feature_store import get_feature_store
 
 logger = logging.getLogger(__name__)
 
 class EnhancedModelTrainingService:
     """Enhanced training service with balancing and validation"""
     
-    def __init__(self, language='en'):
+    def __init__(self, language='en', feature_store=None):
         self.language = language
+        # Preprocessed texts / TF-IDF matrices are reused when only the classifier or split changes
+        self.feature_store = feature_store if feature_store is not None else get_feature_store()
     
     def prepare_training_data_enhanced(self, 
                                      use_validation: bool = True,
@@ -184,14 +187,11 @@ class EnhancedModelTrainingService:
         )
         
         if algorithm == 'naive_bayes':
-            analyzer = NaiveBayesSentimentAnalyzer(self.language)
+            analyzer = NaiveBayesSentimentAnalyzer(self.language, feature_store=self.feature_store)
             
-            # Train model
-            accuracy = analyzer.train(
-                data_splits['X_train'], 
-                data_splits['y_train'],
-                test_size=0.0  # Don't split again, use our validation set
-            )
+            # Train on the train split only; our validation set is evaluated below
+            train_results = analyzer.train_with_validation(data_splits['X_train'], data_splits['y_train'])
+            accuracy = train_results['train_accuracy']
             
             # Validate if validation set exists
             if 'X_val' in data_splits:
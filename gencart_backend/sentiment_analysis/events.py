@@ -0,0 +1,404 @@
+"""
+Pub/sub for live sentiment events, streamed to the admin dashboard over SSE.
+
+Publishers call publish_review_scored() (wired to review post_save in products/signals.py);
+the stream endpoint subscribes once per connection (see SentimentEventStream) instead of
+the dashboard re-polling /statistics/ and /trends/.
+
+Under ASGI a stream costs no thread while it waits. Under WSGI every open stream holds a
+worker thread for its whole lifetime, so WSGI streams are capped at
+SENTIMENT_STREAM_WSGI_MAX_SECONDS (default 30) instead of SENTIMENT_STREAM_MAX_SECONDS;
+EventSource clients reconnect with Last-Event-ID and miss nothing in between. Size the
+WSGI worker pool for the number of dashboards kept open.
+
+The broker is pluggable through SENTIMENT_EVENT_BROKER (dotted path to an EventBroker):
+
+    InProcessBroker   queues per subscriber in this process; the default. Under several
+                      worker processes a client only sees events published by the worker
+                      serving its stream (aggregate deltas are still correct everywhere,
+                      they are read from the shared database/cache)
+    CacheBroker       sequence-numbered event log in a shared Django cache (Redis, Memcached,
+                      database) that subscribers poll, so events cross processes
+
+Each channel numbers its events; subscribers pass the last id they saw (the SSE
+Last-Event-ID header) to replay what they missed from the retained history.
+"""
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_CHANNEL = 'sentiment'
+
+
+class Event(NamedTuple):
+    id: int
+    type: str
+    data: Dict[str, Any]
+
+
+class Subscription:
+    """A subscriber's view of one channel."""
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """Next event, or None if nothing arrived within `timeout` seconds."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class EventBroker:
+    """Interface implemented by SENTIMENT_EVENT_BROKER backends."""
+
+    def publish(self, channel: str, event_type: str, data: Dict[str, Any]) -> Event:
+        raise NotImplementedError
+
+    def subscribe(self, channel: str, last_event_id: Optional[int] = None) -> Subscription:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class _QueueSubscription(Subscription):
+    def __init__(self, broker: 'InProcessBroker', channel: str, maxsize: int):
+        self.broker = broker
+        self.channel = channel
+        self.queue: 'queue.Queue[Event]' = queue.Queue(maxsize)
+
+    def offer(self, event: Event) -> bool:
+        """Enqueue without blocking the publisher; a full queue drops its oldest event."""
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return True
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self.broker._count('dropped')
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker._unsubscribe(self)
+
+
+class InProcessBroker(EventBroker):
+    """Thread-safe fan-out to subscribers in this process, with a short replay history."""
+
+    def __init__(self, history: int = 100, queue_size: int = 256):
+        self.history_size = history
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._ids: Dict[str, itertools.count] = {}
+        self._history: Dict[str, Deque[Event]] = {}
+        self._subscribers: Dict[str, List[_QueueSubscription]] = {}
+        self._stats = {'published': 0, 'delivered': 0, 'dropped': 0}
+
+    def _count(self, stat: str, n: int = 1):
+        with self._lock:
+            self._stats[stat] += n
+
+    def publish(self, channel: str, event_type: str, data: Dict[str, Any]) -> Event:
+        with self._lock:
+            ids = self._ids.setdefault(channel, itertools.count(1))
+            event = Event(next(ids), event_type, data)
+            self._history.setdefault(channel, deque(maxlen=self.history_size)).append(event)
+            subscribers = list(self._subscribers.get(channel, ()))
+            self._stats['published'] += 1
+        for subscription in subscribers:
+            subscription.offer(event)
+        self._count('delivered', len(subscribers))
+        return event
+
+    def subscribe(self, channel: str, last_event_id: Optional[int] = None) -> Subscription:
+        subscription = _QueueSubscription(self, channel, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(subscription)
+            missed = [e for e in self._history.get(channel, ()) if last_event_id is not None and e.id > last_event_id]
+        for event in missed:
+            subscription.offer(event)
+        return subscription
+
+    def _unsubscribe(self, subscription: _QueueSubscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['subscribers'] = {channel: len(subs) for channel, subs in self._subscribers.items() if subs}
+        return stats
+
+
+class _CacheSubscription(Subscription):
+    def __init__(self, broker: 'CacheBroker', channel: str, last_event_id: Optional[int]):
+        self.broker = broker
+        self.channel = channel
+        self.cursor = last_event_id if last_event_id is not None else broker.last_id(channel)
+        self.pending: Deque[Event] = deque()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        deadline = time.monotonic() + (timeout or 0)
+        while True:
+            if not self.pending:
+                self.pending.extend(self.broker.read_after(self.channel, self.cursor))
+            if self.pending:
+                event = self.pending.popleft()
+                self.cursor = event.id
+                return event
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(self.broker.poll_interval, remaining))
+
+
+class CacheBroker(EventBroker):
+    """Event log in a shared Django cache; subscribers in any process poll it."""
+
+    def __init__(self, cache_alias: str = 'default', history: int = 100, ttl: int = 300,
+                 poll_interval: float = 0.5, prefix: str = 'sentiment_events'):
+        self.cache_alias = cache_alias
+        self.history = history
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.prefix = prefix
+
+    @property
+    def cache(self):
+        from django.core.cache import caches
+        return caches[self.cache_alias]
+
+    def _seq_key(self, channel: str) -> str:
+        return f"{self.prefix}:{channel}:seq"
+
+    def _event_key(self, channel: str, event_id: int) -> str:
+        return f"{self.prefix}:{channel}:{event_id}"
+
+    def last_id(self, channel: str) -> int:
+        return int(self.cache.get(self._seq_key(channel)) or 0)
+
+    def publish(self, channel: str, event_type: str, data: Dict[str, Any]) -> Event:
+        cache = self.cache
+        cache.add(self._seq_key(channel), 0, None)
+        try:
+            event_id = cache.incr(self._seq_key(channel))
+        except ValueError:
+            # The counter was evicted between add() and incr()
+            cache.add(self._seq_key(channel), 0, None)
+            event_id = cache.incr(self._seq_key(channel))
+        event = Event(event_id, event_type, data)
+        cache.set(self._event_key(channel, event_id), tuple(event), self.ttl)
+        return event
+
+    def read_after(self, channel: str, after: int) -> List[Event]:
+        last = self.last_id(channel)
+        if last <= after:
+            return []
+        first = max(after + 1, last - self.history + 1)
+        keys = [self._event_key(channel, i) for i in range(first, last + 1)]
+        found = self.cache.get_many(keys)
+        # Ids whose payload is not visible yet (publisher between incr and set) or already expired are skipped
+        return [Event(*found[key]) for key in keys if key in found]
+
+    def subscribe(self, channel: str, last_event_id: Optional[int] = None) -> Subscription:
+        return _CacheSubscription(self, channel, last_event_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'cache_alias': self.cache_alias}
+
+
+_broker: Optional[EventBroker] = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> EventBroker:
+    """Process-wide broker built from SENTIMENT_EVENT_BROKER / SENTIMENT_EVENT_BROKER_OPTIONS."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            path = getattr(settings, 'SENTIMENT_EVENT_BROKER', 'sentiment_analysis.events.InProcessBroker')
+            options = getattr(settings, 'SENTIMENT_EVENT_BROKER_OPTIONS', {}) or {}
+            _broker = import_string(path)(**options)
+        return _broker
+
+
+def reset_broker():
+    """Drop the process-wide broker (after settings changes, and in tests)."""
+    global _broker
+    with _broker_lock:
+        _broker = None
+
+
+def publish_review_scored(review) -> Optional[Event]:
+    """Announce a review's (new) analyzer label; failures are logged, never raised."""
+    try:
+        return get_broker().publish(SENTIMENT_CHANNEL, 'review.scored', {
+            'review_id': review.id,
+            'product_id': review.product_id,
+            'rating': review.rating,
+            'sentiment': review.sentiment,
+            'confidence': review.sentiment_confidence,
+            'probabilities': review.sentiment_scores,
+            'analyzed_at': (review.sentiment_analyzed_at or timezone.now()).isoformat(),
+        })
+    except Exception as e:
+        logger.error(f"Publishing sentiment event for review {review.id} failed: {e}")
+        return None
+
+
+def format_sse(event_type: Optional[str] = None, data: Any = None, event_id: Optional[int] = None,
+               retry_ms: Optional[int] = None, comment: Optional[str] = None) -> str:
+    """One text/event-stream message."""
+    lines = []
+    if comment is not None:
+        lines.append(f": {comment}")
+    if retry_ms is not None:
+        lines.append(f"retry: {int(retry_ms)}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event_type is not None:
+        lines.append(f"event: {event_type}")
+    if data is not None:
+        payload = data if isinstance(data, str) else json.dumps(data, default=str)
+        lines.extend(f"data: {line}" for line in payload.split('\n'))
+    return '\n'.join(lines) + '\n\n'
+
+
+DELTA_FIELDS = ('total_reviews', 'analyzed_reviews', 'unanalyzed_reviews')
+DELTA_COUNTS = ('sentiment_counts', 'effective_sentiment_counts')
+
+
+def aggregate_delta(previous: Optional[Dict], current: Dict) -> Dict:
+    """Count changes between two sentiment_aggregates() summaries (empty when nothing moved)."""
+    if previous is None:
+        return {}
+    delta = {}
+    for field in DELTA_FIELDS:
+        change = current[field] - previous[field]
+        if change:
+            delta[field] = change
+    for field in DELTA_COUNTS:
+        changes = {k: v - previous[field].get(k, 0) for k, v in current[field].items() if v != previous[field].get(k, 0)}
+        if changes:
+            delta[field] = changes
+    return delta
+
+
+class SentimentEventStream:
+    """One SSE connection: broker events, periodic aggregate deltas and keepalives.
+
+    The blocking wait (wait_for_event) and the database read (aggregates_message) are
+    separate steps so the ASGI path can run them in different executors. The broker
+    subscription is taken when iteration starts and released when it ends, so a client
+    that disconnects before the body is consumed leaves no subscriber behind.
+    """
+
+    def __init__(self, product_id: Optional[int] = None, last_event_id: Optional[int] = None,
+                 broker: Optional[EventBroker] = None, max_seconds: Optional[float] = None):
+        self.product_id = product_id
+        self.last_event_id = last_event_id
+        self.broker = broker
+        self.subscription: Optional[Subscription] = None
+        self.aggregate_interval = float(getattr(settings, 'SENTIMENT_STREAM_AGGREGATE_INTERVAL', 10))
+        self.keepalive_interval = float(getattr(settings, 'SENTIMENT_STREAM_KEEPALIVE', 15))
+        self.max_seconds = float(max_seconds if max_seconds is not None
+                                 else getattr(settings, 'SENTIMENT_STREAM_MAX_SECONDS', 300))
+        self.started = time.monotonic()
+        self.last_sent = self.started
+        self.next_aggregates = self.started
+        self.summary: Optional[Dict] = None
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() - self.started >= self.max_seconds
+
+    def opening(self) -> str:
+        return format_sse(retry_ms=getattr(settings, 'SENTIMENT_STREAM_RETRY_MS', 3000), comment='connected')
+
+    def aggregates_due(self) -> bool:
+        return time.monotonic() >= self.next_aggregates
+
+    def aggregates_message(self) -> Optional[str]:
+        """Full summary on the first call, then only when counts changed (with the delta)."""
+        from .aggregates import sentiment_aggregates
+        self.next_aggregates = time.monotonic() + self.aggregate_interval
+        summary = sentiment_aggregates(self.product_id)
+        delta = aggregate_delta(self.summary, summary)
+        if self.summary is not None and not delta:
+            return None
+        self.summary = summary
+        return format_sse('aggregates', {'product_id': self.product_id, 'summary': summary, 'delta': delta})
+
+    def wait_for_event(self) -> Optional[str]:
+        """Block until a broker event, the next aggregate refresh or a keepalive is due."""
+        now = time.monotonic()
+        timeout = max(0.0, min(self.next_aggregates, self.last_sent + self.keepalive_interval,
+                               self.started + self.max_seconds) - now)
+        event = self.subscribe().get(timeout)
+        if event is not None and (self.product_id is None or event.data.get('product_id') == self.product_id):
+            return format_sse(event.type, event.data, event_id=event.id)
+        if time.monotonic() - self.last_sent >= self.keepalive_interval:
+            return format_sse(comment='keepalive')
+        return None
+
+    def sent(self):
+        self.last_sent = time.monotonic()
+
+    def subscribe(self) -> Subscription:
+        if self.subscription is None:
+            self.subscription = (self.broker or get_broker()).subscribe(SENTIMENT_CHANNEL, self.last_event_id)
+        return self.subscription
+
+    def close(self):
+        if self.subscription is not None:
+            self.subscription.close()
+            self.subscription = None
+
+    def __iter__(self):
+        try:
+            self.subscribe()
+            yield self.opening()
+            while not self.expired:
+                message = self.aggregates_message() if self.aggregates_due() else self.wait_for_event()
+                if message:
+                    self.sent()
+                    yield message
+        finally:
+            self.close()
+
+    async def __aiter__(self):
+        from asgiref.sync import sync_to_async
+        try:
+            self.subscribe()
+            yield self.opening()
+            while not self.expired:
+                if self.aggregates_due():
+                    message = await sync_to_async(self.aggregates_message)()
+                else:
+                    # Waiting must not occupy the thread shared by sync ORM calls
+                    message = await sync_to_async(self.wait_for_event, thread_sensitive=False)()
+                if message:
+                    self.sent()
+                    yield message
+        finally:
+            self.close()
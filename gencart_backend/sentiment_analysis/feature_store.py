@@ -0,0 +1,172 @@
+"""
+Feature store for repeat Naive Bayes training runs.
+
+Preprocessing (Vietnamese word segmentation in particular) and TF-IDF fitting dominate
+training time, yet they only depend on the texts, the preprocessor and the vectorizer
+parameters. This store persists both stages so runs that only change the classifier or
+the split reuse them:
+
+    pre-<lang>-p<preprocessor version>-<texts hash>.txt.gz         preprocessed token streams
+    tfidf-<lang>-p<version>-<vectorizer params>-<texts hash>.npz    fitted TF-IDF CSR matrix
+    tfidf-...-<texts hash>.vectorizer.pkl                           the fitted vectorizer
+
+The texts hash covers the texts in order (labels are not part of the features), so any
+change to the dataset produces new keys and stale features are never served. Those old
+keys are what fills the disk, so every write prunes the directory: entries not used for
+max_age_seconds go first, then least recently used entries until it fits in max_bytes.
+
+The store is opt-in (SENTIMENT_FEATURE_STORE_DIR); training runs without it otherwise.
+"""
+from pathlib import Path
+from typing import List, Optional, Tuple
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+
+import joblib
+import scipy.sparse
+
+logger = logging.getLogger(__name__)
+
+def texts_hash(texts: List[str]) -> str:
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update((text or '').encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()[:20]
+
+
+def vectorizer_params_key(vectorizer) -> str:
+    params = {k: repr(v) for k, v in sorted(vectorizer.get_params().items())}
+    params['__class__'] = type(vectorizer).__name__
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+class FeatureStore:
+    """On-disk cache of preprocessed texts and fitted TF-IDF matrices."""
+
+    def __init__(self, directory: str, max_bytes: Optional[int] = None, max_age_seconds: Optional[float] = None):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+
+    def _preprocess_key(self, texts: List[str], preprocessor) -> str:
+        return f"pre-{preprocessor.language}-p{preprocessor.VERSION}-{texts_hash(texts)}"
+
+    def _atomic_path(self, path: Path) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return path.with_name(f"{path.name}.tmp-{os.getpid()}")
+
+    def preprocess(self, texts: List[str], preprocessor) -> List[str]:
+        path = self.directory / f"{self._preprocess_key(texts, preprocessor)}.txt.gz"
+        if path.exists():
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                processed = f.read().split('\n')
+            if len(processed) == len(texts):
+                self.hits += 1
+                self._touch(path)
+                return processed
+            logger.warning(f"Feature store entry {path.name} has the wrong length; rebuilding")
+
+        self.misses += 1
+        # One document per line; preprocess() already collapses whitespace, but be safe
+        processed = [' '.join(text.split()) for text in preprocessor.preprocess_many(texts)]
+        tmp = self._atomic_path(path)
+        with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=3) as f:
+            f.write('\n'.join(processed))
+        os.replace(tmp, path)
+        self.prune()
+        return processed
+
+    def fit_transform(self, texts: List[str], preprocessor, vectorizer) -> Tuple[scipy.sparse.csr_matrix, object]:
+        """Return (X, fitted vectorizer), loading both from disk when this exact fit was done before."""
+        key = (f"tfidf-{preprocessor.language}-p{preprocessor.VERSION}-"
+               f"{vectorizer_params_key(vectorizer)}-{texts_hash(texts)}")
+        matrix_path = self.directory / f"{key}.npz"
+        vectorizer_path = self.directory / f"{key}.vectorizer.pkl"
+        if matrix_path.exists() and vectorizer_path.exists():
+            try:
+                X = scipy.sparse.load_npz(matrix_path).tocsr()
+                fitted = joblib.load(vectorizer_path)
+                self.hits += 1
+                self._touch(matrix_path, vectorizer_path)
+                logger.info(f"Reusing TF-IDF features {key} ({X.shape[0]}x{X.shape[1]})")
+                return X, fitted
+            except Exception as e:
+                logger.warning(f"Unreadable feature store entry {key}: {e}; rebuilding")
+
+        processed = self.preprocess(texts, preprocessor)
+        self.misses += 1
+        X = vectorizer.fit_transform(processed)
+        tmp = self._atomic_path(matrix_path)
+        with open(tmp, 'wb') as f:
+            scipy.sparse.save_npz(f, X.tocsr())
+        os.replace(tmp, matrix_path)
+        tmp = self._atomic_path(vectorizer_path)
+        joblib.dump(vectorizer, tmp)
+        os.replace(tmp, vectorizer_path)
+        self.prune()
+        return X, vectorizer
+
+    def transform(self, texts: List[str], preprocessor, vectorizer) -> scipy.sparse.csr_matrix:
+        """Transform with an already fitted vectorizer, reusing the cached token streams."""
+        return vectorizer.transform(self.preprocess(texts, preprocessor))
+
+    @staticmethod
+    def _touch(*paths: Path):
+        # mtime doubles as last-use time (atime is often disabled)
+        for path in paths:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+    def prune(self) -> int:
+        """Evict expired, then least recently used entries; returns the number of files removed."""
+        if self.max_bytes is None and self.max_age_seconds is None:
+            return 0
+        entries = []
+        for path in self.directory.glob('*'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if path.is_file() and '.tmp-' not in path.name:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - self.max_age_seconds if self.max_age_seconds is not None else None
+        removed = 0
+        for mtime, size, path in entries:
+            expired = cutoff is not None and mtime < cutoff
+            if not expired and (self.max_bytes is None or total <= self.max_bytes):
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        if removed:
+            logger.info(f"Feature store evicted {removed} files ({total / 2**20:.1f} MB left)")
+        return removed
+
+
+def get_feature_store() -> Optional[FeatureStore]:
+    """Store at SENTIMENT_FEATURE_STORE_DIR, or None when it is not configured (the default)."""
+    from django.conf import settings
+    directory = getattr(settings, 'SENTIMENT_FEATURE_STORE_DIR', '')
+    if not directory:
+        return None
+    max_mb = getattr(settings, 'SENTIMENT_FEATURE_STORE_MAX_MB', 512)
+    max_age_days = getattr(settings, 'SENTIMENT_FEATURE_STORE_MAX_AGE_DAYS', 30)
+    return FeatureStore(
+        directory,
+        max_bytes=int(max_mb * 2**20) if max_mb else None,
+        max_age_seconds=max_age_days * 86400 if max_age_days else None,
+    )
@@ -0,0 +1,190 @@
+"""
+Per-product review highlights ("what people love / complain about") from Naive Bayes weights.
+
+The trained MultinomialNB already says how strongly each vocabulary n-gram leans positive
+or negative: its polarity is the log-likelihood ratio
+
+    polarity(t) = feature_log_prob_[positive, t] - feature_log_prob_[negative, t]
+
+A product's positive highlights are the n-grams with polarity > 0, scored by polarity times
+their summed TF-IDF weight over the product's positive reviews; negative highlights mirror
+that over negative reviews (Review.effective_sentiment, so unanalyzed reviews count by
+rating). Terms must occur in at least `min_reviews` reviews. Each review goes through the
+model of its language (services.detect_language).
+
+Vectorizing happens offline (`manage.py build_review_highlights`); the top terms are stored
+in ProductReviewHighlights, one row per product, which the product detail endpoint reads by
+primary key. A refresh only revisits products whose reviews changed (count or latest
+updated_at, which moves when a review is scored) or whose models were retrained.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional
+import heapq
+import logging
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max
+
+from .prediction_cache import file_fingerprint
+
+logger = logging.getLogger(__name__)
+
+LANGUAGES = ('en', 'vi')
+
+
+class PolarityTable(NamedTuple):
+    analyzer: object
+    terms: np.ndarray
+    polarity: np.ndarray
+
+
+class HighlightExtractor:
+    """Turn a product's reviews into its top positive and negative n-grams."""
+
+    def __init__(self, top_n: int = 5, min_reviews: int = 2, analyzers: Optional[Dict[str, object]] = None):
+        self.top_n = top_n
+        self.min_reviews = min_reviews
+        # language -> NaiveBayesSentimentAnalyzer; loaded from disk on first use when not given
+        self.analyzers = dict(analyzers or {})
+        self._tables: Dict[str, Optional[PolarityTable]] = {}
+
+    def _analyzer(self, language: str):
+        analyzer = self.analyzers.get(language)
+        if analyzer is None:
+            from .models import NaiveBayesSentimentAnalyzer
+            analyzer = self.analyzers[language] = NaiveBayesSentimentAnalyzer(language)
+            analyzer.load_model()
+        return analyzer if analyzer.is_trained else None
+
+    def table(self, language: str) -> Optional[PolarityTable]:
+        if language not in self._tables:
+            self._tables[language] = self._build_table(language)
+        return self._tables[language]
+
+    def _build_table(self, language: str) -> Optional[PolarityTable]:
+        from .incremental import label_encoding
+        analyzer = self._analyzer(language)
+        if analyzer is None:
+            logger.warning(f"No trained Naive Bayes model for '{language}'; its reviews get no highlights")
+            return None
+        model, vectorizer = analyzer.model, analyzer.vectorizer
+        if not hasattr(model, 'feature_log_prob_'):
+            logger.warning(f"'{language}' model is {type(model).__name__}, not Naive Bayes; skipping highlights")
+            return None
+        classes = [int(c) for c in model.classes_]
+        encoding = label_encoding(classes)
+        positive, negative = classes.index(encoding['positive']), classes.index(encoding['negative'])
+        # Lexicon features (if any) follow the vocabulary columns and are not n-grams
+        terms = np.asarray(vectorizer.get_feature_names_out())
+        flp = model.feature_log_prob_[:, :len(terms)]
+        return PolarityTable(analyzer, terms, flp[positive] - flp[negative])
+
+    def fingerprint(self, languages: Iterable[str] = LANGUAGES) -> str:
+        """Version of the models on disk, stored with each product's highlights."""
+        from .models import resolve_naive_bayes_model_files
+        parts = []
+        for language in languages:
+            analyzer = self.analyzers.get(language)
+            files = getattr(analyzer, '_loaded_files', None) or resolve_naive_bayes_model_files(language)
+            parts.append(f"{language}:{file_fingerprint(*files) if files else 'none'}")
+        return ';'.join(parts)
+
+    def extract(self, reviews: Iterable[Dict]) -> Dict[str, List[Dict]]:
+        """Highlights from review rows with title, comment and effective_sentiment."""
+        from .incremental import review_text
+        from .services import detect_language
+        by_language = defaultdict(lambda: ([], []))
+        for row in reviews:
+            text = review_text(row)
+            if text and row['effective_sentiment'] in ('positive', 'negative'):
+                texts, labels = by_language[detect_language(text)]
+                texts.append(text)
+                labels.append(row['effective_sentiment'])
+
+        scores = {'positive': {}, 'negative': {}}
+        for language, (texts, labels) in by_language.items():
+            table = self.table(language)
+            if table is None:
+                continue
+            processed = table.analyzer.preprocessor.preprocess_many(texts)
+            X = table.analyzer.vectorizer.transform(processed).tocsr()[:, :len(table.terms)]
+            labels = np.asarray(labels)
+            for sentiment, sign in (('positive', 1.0), ('negative', -1.0)):
+                rows = X[labels == sentiment]
+                if rows.shape[0] == 0:
+                    continue
+                weight = np.asarray(rows.sum(axis=0)).ravel()
+                support = np.diff(rows.tocsc().indptr)
+                polarity = sign * table.polarity
+                for column in np.flatnonzero((support >= self.min_reviews) & (polarity > 0)):
+                    term = str(table.terms[column])
+                    score, count = scores[sentiment].get(term, (0.0, 0))
+                    scores[sentiment][term] = (score + float(weight[column] * polarity[column]),
+                                               count + int(support[column]))
+
+        return {
+            sentiment: [
+                {'term': term, 'score': round(score, 4), 'reviews': count}
+                for term, (score, count) in heapq.nlargest(self.top_n, found.items(), key=lambda item: item[1][0])
+            ]
+            for sentiment, found in scores.items()
+        }
+
+
+def stale_product_ids(fingerprint: str, product_ids: Optional[Iterable[int]] = None, full: bool = False) -> Dict:
+    """Products whose highlights need (re)building, and highlight rows to drop (no reviews left)."""
+    from products.models import Product
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(id__in=list(product_ids))
+    rows = (
+        products.annotate(review_total=Count('reviews'), reviews_latest=Max('reviews__updated_at'))
+        .values('id', 'review_total', 'reviews_latest', 'review_highlights__review_count',
+                'review_highlights__reviews_updated_at', 'review_highlights__model_fingerprint')
+        .order_by('id')
+    )
+    stale, empty = [], []
+    for row in rows:
+        has_highlights = row['review_highlights__model_fingerprint'] is not None
+        if not row['review_total']:
+            if has_highlights:
+                empty.append(row['id'])
+        elif full or not has_highlights or (
+                row['review_highlights__model_fingerprint'] != fingerprint
+                or row['review_highlights__review_count'] != row['review_total']
+                or row['review_highlights__reviews_updated_at'] != row['reviews_latest']):
+            stale.append(row['id'])
+    return {'stale': stale, 'empty': empty}
+
+
+def refresh_highlights(product_ids: Optional[Iterable[int]] = None, full: bool = False, top_n: int = 5,
+                       min_reviews: int = 2, batch_size: int = 200,
+                       extractor: Optional[HighlightExtractor] = None) -> Dict:
+    """Rebuild highlights of products whose reviews or models changed (all of them with full=True)."""
+    from products.models import Review
+    from .models import ProductReviewHighlights
+    extractor = extractor or HighlightExtractor(top_n=top_n, min_reviews=min_reviews)
+    fingerprint = extractor.fingerprint()
+    todo = stale_product_ids(fingerprint, product_ids, full)
+    ProductReviewHighlights.objects.filter(product_id__in=todo['empty']).delete()
+
+    for start in range(0, len(todo['stale']), batch_size):
+        batch = todo['stale'][start:start + batch_size]
+        reviews = defaultdict(list)
+        for row in (Review.objects.filter(product_id__in=batch)
+                    .values('product_id', 'title', 'comment', 'effective_sentiment', 'updated_at')):
+            reviews[row['product_id']].append(row)
+        with transaction.atomic():
+            for product_id in batch:
+                rows = reviews.get(product_id, [])
+                highlights = extractor.extract(rows)
+                ProductReviewHighlights.objects.update_or_create(product_id=product_id, defaults={
+                    'positive': highlights['positive'],
+                    'negative': highlights['negative'],
+                    'review_count': len(rows),
+                    'reviews_updated_at': max((r['updated_at'] for r in rows), default=None),
+                    'model_fingerprint': fingerprint,
+                })
+    logger.info(f"Review highlights refreshed for {len(todo['stale'])} products, {len(todo['empty'])} cleared")
+    return {'refreshed': len(todo['stale']), 'cleared': len(todo['empty']), 'model_fingerprint': fingerprint}
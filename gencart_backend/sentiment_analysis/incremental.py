@@ -0,0 +1,300 @@
+"""
+Incremental Naive Bayes updates from newly labeled reviews.
+
+MultinomialNB is fully described by its class counts and per-class feature counts, so a
+saved model plus its fitted (frozen) TF-IDF vectorizer can absorb new labeled rows with
+partial_fit in O(new rows). SentimentTrainingWatermark records which reviews have been
+folded in: reviews are consumed once, in id order, so re-scoring or re-analysing a review
+later never feeds it to partial_fit again (its new label reaches the model at the next full
+rebuild). Each run folds in rows of the updater's language (services.detect_language),
+labels them in the model's own label scheme (binary Kaggle models skip neutral rows),
+writes the updated model files atomically and advances the watermark. Serving processes
+pick the new files up via NaiveBayesSentimentAnalyzer.reload_if_changed().
+
+The frozen vocabulary slowly goes stale. Drift is the share of consumed unigram tokens the
+vocabulary does not know; bigrams are left out because a max_features-capped vocabulary
+misses most of them even for in-domain text. Once drift crosses the threshold, a model is
+rebuilt from the labeled reviews. Rebuilding replaces the model's training corpus (Kaggle
+datasets for the shipped models) with our own reviews, so when a model is already deployed
+the rebuild is written as a candidate next to it and only replaces it through
+promote_candidate() (`manage.py update_sentiment_model --promote`). Meanwhile the deployed
+model keeps absorbing new rows.
+
+Runs of one language are serialized with training_lock(); concurrent callers are refused.
+"""
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+import json
+import logging
+import os
+
+import joblib
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from products.models import Review
+from .feature_store import get_feature_store
+from .models import NaiveBayesSentimentAnalyzer, SentimentTrainingWatermark
+from .prediction_cache import file_fingerprint
+from .single_flight import CacheLock
+
+logger = logging.getLogger(__name__)
+
+# Same encoding ModelTrainingService trains review models with
+THREE_CLASS_LABELS = {'negative': 0, 'neutral': 1, 'positive': 2}
+# Kaggle-trained models are binary; neutral rows have no class there
+BINARY_LABELS = {'negative': 0, 'positive': 1}
+
+CANDIDATE_SUFFIX = '.candidate'
+
+
+def label_encoding(classes) -> Dict[str, int]:
+    classes = [int(c) for c in classes]
+    return BINARY_LABELS if classes == [0, 1] else THREE_CLASS_LABELS
+
+
+def review_text(row: Dict) -> str:
+    return f"{row['title'] or ''} {row['comment'] or ''}".strip()
+
+
+def training_lock(language: str) -> CacheLock:
+    """Lock held while a language's Naive Bayes model is trained or updated."""
+    return CacheLock(f"sentiment:training:{language}",
+                     timeout=getattr(settings, 'SENTIMENT_TRAINING_LOCK_TIMEOUT', 3600))
+
+
+class IncrementalNaiveBayesUpdater:
+    """Fold labeled reviews newer than the watermark into the saved Naive Bayes model."""
+
+    def __init__(self, language: str = 'en', drift_threshold: Optional[float] = None,
+                 lag_seconds: Optional[int] = None, batch_size: int = 1000, min_rebuild_rows: int = 10):
+        self.language = language
+        self.drift_threshold = (drift_threshold if drift_threshold is not None
+                                else getattr(settings, 'SENTIMENT_INCREMENTAL_DRIFT_THRESHOLD', 0.35))
+        # Reviews created in the last few seconds may not be labeled (or committed) yet
+        self.lag_seconds = (lag_seconds if lag_seconds is not None
+                            else getattr(settings, 'SENTIMENT_INCREMENTAL_LAG_SECONDS', 30))
+        self.batch_size = batch_size
+        self.min_rebuild_rows = min_rebuild_rows
+
+    def _watermark(self) -> SentimentTrainingWatermark:
+        watermark, _ = SentimentTrainingWatermark.objects.get_or_create(language=self.language)
+        return watermark
+
+    def _cutoff(self):
+        return timezone.now() - timedelta(seconds=self.lag_seconds)
+
+    def _is_own_language(self, text: str) -> bool:
+        from .services import detect_language
+        return detect_language(text) == self.language
+
+    def _new_rows(self, watermark: SentimentTrainingWatermark) -> Iterator[Dict]:
+        return (
+            Review.objects.filter(id__gt=watermark.last_review_id, created_at__lte=self._cutoff())
+            .order_by('id')
+            .values('id', 'title', 'comment', 'sentiment')
+            .iterator(chunk_size=self.batch_size)
+        )
+
+    def _batches(self, rows: Iterator[Dict]) -> Iterator[List[Dict]]:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def run(self, force_rebuild: bool = False, promote: bool = False) -> Dict:
+        """Consume new rows; `promote` applies a forced rebuild to the deployed model directly."""
+        watermark = self._watermark()
+        analyzer = NaiveBayesSentimentAnalyzer(self.language)
+        analyzer.load_model()
+        if not analyzer.is_trained:
+            return self.rebuild(watermark, 'no model on disk')
+        if force_rebuild:
+            return self.rebuild(watermark, 'forced', promote=promote)
+        if not hasattr(analyzer.model, 'partial_fit'):
+            return self.rebuild(watermark, f"{type(analyzer.model).__name__} cannot be updated incrementally")
+
+        model, vectorizer = analyzer.model, analyzer.vectorizer
+        encoding = label_encoding(model.classes_)
+        known_classes = {int(c) for c in model.classes_}
+        vocabulary = vectorizer.vocabulary_
+        analyze = vectorizer.build_analyzer()
+
+        stats = {'consumed': 0, 'skipped': 0, 'other_language': 0, 'unknown_class': 0}
+        last_id = None
+        oov = total = 0
+        for batch in self._batches(self._new_rows(watermark)):
+            texts, labels = [], []
+            for row in batch:
+                last_id = row['id']
+                text = review_text(row)
+                label = encoding.get(row['sentiment'])
+                if label is None or not text:
+                    # Unlabeled, neutral for a binary model, or empty
+                    stats['skipped'] += 1
+                    continue
+                if not self._is_own_language(text):
+                    stats['other_language'] += 1
+                    continue
+                if label not in known_classes:
+                    # partial_fit cannot add classes after the first call
+                    stats['unknown_class'] += 1
+                    continue
+                processed = analyzer.preprocessor.preprocess(text)
+                unigrams = [term for term in analyze(processed) if ' ' not in term]
+                total += len(unigrams)
+                oov += sum(1 for term in unigrams if term not in vocabulary)
+                texts.append(processed)
+                labels.append(label)
+            if texts:
+                model.partial_fit(vectorizer.transform(texts), np.array(labels))
+                stats['consumed'] += len(texts)
+
+        result = {'mode': 'incremental', **stats}
+        if last_id is None:
+            result['oov_rate'] = watermark.oov_rate
+            return result
+
+        if stats['consumed']:
+            analyzer.model = model
+            analyzer._compile_scorer()
+            analyzer.save_model()
+        watermark.oov_terms += oov
+        watermark.total_terms += total
+        watermark.last_review_id = last_id
+        watermark.rows_consumed += stats['consumed']
+        watermark.model_fingerprint = file_fingerprint(analyzer.model_path, analyzer.vectorizer_path)
+        watermark.save()
+        result['oov_rate'] = watermark.oov_rate
+        logger.info(f"Incremental NB update ({self.language}): {stats}, OOV rate {watermark.oov_rate:.1%}")
+
+        reason = None
+        if watermark.oov_rate > self.drift_threshold:
+            reason = f"vocabulary drift {watermark.oov_rate:.1%} > {self.drift_threshold:.0%}"
+        elif stats['unknown_class']:
+            reason = f"{stats['unknown_class']} rows of a class the model was not trained on"
+        if reason:
+            pending = self.pending_candidate()
+            result['candidate'] = pending or self.rebuild(watermark, reason)
+        return result
+
+    def _candidate_paths(self, analyzer: NaiveBayesSentimentAnalyzer) -> Dict[str, str]:
+        return {
+            'model': f"{analyzer.model_path}{CANDIDATE_SUFFIX}",
+            'vectorizer': f"{analyzer.vectorizer_path}{CANDIDATE_SUFFIX}",
+            'meta': f"{analyzer.model_path}{CANDIDATE_SUFFIX}.json",
+        }
+
+    def rebuild(self, watermark: Optional[SentimentTrainingWatermark] = None, reason: str = 'requested',
+                promote: Optional[bool] = None) -> Dict:
+        """Retrain vocabulary and counts from the labeled reviews of this language.
+
+        The deployed model's label scheme is kept. With a model already deployed the result
+        is saved as a candidate (see promote_candidate) unless `promote` is True.
+        """
+        watermark = watermark or self._watermark()
+        deployed = NaiveBayesSentimentAnalyzer(self.language)
+        deployed.load_model()
+        if promote is None:
+            promote = not deployed.is_trained
+        encoding = label_encoding(deployed.model.classes_) if deployed.is_trained else THREE_CLASS_LABELS
+
+        rows = list(
+            Review.objects.filter(sentiment__isnull=False, created_at__lte=self._cutoff())
+            .order_by('id')
+            .values('id', 'title', 'comment', 'sentiment')
+        )
+        texts, labels = [], []
+        for row in rows:
+            text = review_text(row)
+            label = encoding.get(row['sentiment'])
+            if text and label is not None and self._is_own_language(text):
+                texts.append(text)
+                labels.append(label)
+        if len(texts) < self.min_rebuild_rows or len(set(labels)) < 2:
+            logger.warning(f"Full rebuild ({reason}) skipped: {len(texts)} usable labeled reviews")
+            return {'mode': 'rebuild', 'reason': reason, 'skipped': True, 'rows': len(texts)}
+
+        logger.info(f"Full Naive Bayes rebuild ({self.language}): {reason}")
+        analyzer = NaiveBayesSentimentAnalyzer(
+            self.language,
+            feature_store=get_feature_store(),
+            lexicon_features=getattr(settings, 'SENTIMENT_NB_LEXICON_FEATURES', False),
+        )
+        accuracy = analyzer.train(texts, labels)
+        last_review_id = rows[-1]['id']
+        result = {'mode': 'rebuild', 'reason': reason, 'rows': len(texts), 'accuracy': accuracy,
+                  'promoted': promote}
+        if promote:
+            analyzer.save_model()
+            self.record_rebuild(last_review_id, analyzer, watermark)
+            return result
+
+        paths = self._candidate_paths(analyzer)
+        for obj, path in ((analyzer.model, paths['model']), (analyzer.vectorizer, paths['vectorizer'])):
+            tmp_path = f"{path}.tmp-{os.getpid()}"
+            joblib.dump(obj, tmp_path)
+            os.replace(tmp_path, path)
+        meta = {'reason': reason, 'rows': len(texts), 'accuracy': accuracy, 'last_review_id': last_review_id,
+                'built_at': timezone.now().isoformat()}
+        Path(paths['meta']).write_text(json.dumps(meta), encoding='utf-8')
+        logger.warning(f"Rebuilt {self.language} model saved as a candidate ({paths['model']}); "
+                       f"the deployed model is unchanged until promote_candidate()")
+        result['candidate'] = paths['model']
+        return result
+
+    def pending_candidate(self) -> Optional[Dict]:
+        """Metadata of a rebuilt model waiting for promotion, if any."""
+        paths = self._candidate_paths(NaiveBayesSentimentAnalyzer(self.language))
+        if not all(os.path.exists(path) for path in paths.values()):
+            return None
+        try:
+            meta = json.loads(Path(paths['meta']).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        return {'mode': 'rebuild', 'pending': True, 'candidate': paths['model'], **meta}
+
+    def promote_candidate(self) -> Optional[Dict]:
+        """Deploy the pending candidate; rows newer than those it was trained on are consumed next run."""
+        candidate = self.pending_candidate()
+        if candidate is None:
+            return None
+        analyzer = NaiveBayesSentimentAnalyzer(self.language)
+        paths = self._candidate_paths(analyzer)
+        analyzer.model = joblib.load(paths['model'])
+        analyzer.vectorizer = joblib.load(paths['vectorizer'])
+        analyzer.is_trained = True
+        analyzer._compile_scorer()
+        analyzer.save_model()
+        self.record_rebuild(candidate['last_review_id'], analyzer)
+        self.discard_candidate()
+        logger.info(f"Promoted rebuilt {self.language} model ({candidate['reason']})")
+        return candidate
+
+    def discard_candidate(self) -> bool:
+        removed = False
+        for path in self._candidate_paths(NaiveBayesSentimentAnalyzer(self.language)).values():
+            try:
+                os.remove(path)
+                removed = True
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def record_rebuild(self, last_review_id: Optional[int], analyzer: NaiveBayesSentimentAnalyzer,
+                       watermark: Optional[SentimentTrainingWatermark] = None):
+        """Point the watermark at the newest review a full training run consumed."""
+        watermark = watermark or self._watermark()
+        if last_review_id is not None:
+            watermark.last_review_id = last_review_id
+        watermark.rows_consumed = 0
+        watermark.oov_terms = watermark.total_terms = 0
+        watermark.last_full_rebuild_at = timezone.now()
+        watermark.model_fingerprint = file_fingerprint(analyzer.model_path, analyzer.vectorizer_path)
+        watermark.save()
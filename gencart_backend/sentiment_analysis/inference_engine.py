@@ -0,0 +1,237 @@
+"""
+Dynamic micro-batching for BERT sentiment inference.
+
+Concurrent callers submit single texts; a worker thread collects requests for up to
+max_wait_ms or max_batch_size items, runs one BERTSentimentAnalyzer.predict_batch call
+(which sorts by length so padding stays small) and fans the results back out through
+futures. The same engine backs the in-process analyzer and the standalone worker started
+by `manage.py run_sentiment_worker`, reached through RemoteBERTAnalyzer.
+"""
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError, wait
+from typing import Callable, Dict, List, Optional, Tuple
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class _PendingRequest:
+    __slots__ = ('text', 'future', 'deadline')
+
+    def __init__(self, text: str, deadline: float):
+        self.text = text
+        self.future = Future()
+        self.deadline = deadline
+
+
+class MicroBatchEngine:
+    """Collects single-text requests into batches for a predict_batch callable."""
+
+    def __init__(self, predict_batch: Callable[[List[str]], List[Dict]], max_batch_size: int = 32,
+                 max_wait_ms: float = 10.0, default_timeout: float = 5.0, name: str = 'bert'):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.default_timeout = default_timeout
+        self.name = name
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'batches': 0, 'batched_items': 0, 'max_batch': 0,
+                       'timeouts': 0, 'errors': 0}
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"{self.name}-microbatch", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        self._thread = None
+
+    def submit(self, text: str, timeout: Optional[float] = None) -> Future:
+        self.start()
+        timeout = self.default_timeout if timeout is None else timeout
+        request = _PendingRequest(text, time.monotonic() + timeout)
+        with self._stats_lock:
+            self._stats['requests'] += 1
+        self._queue.put(request)
+        return request.future
+
+    def predict(self, text: str, timeout: Optional[float] = None) -> Dict:
+        """Block until this text's batch has been scored; raises TimeoutError past the deadline."""
+        timeout = self.default_timeout if timeout is None else timeout
+        future = self.submit(text, timeout)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._stats_lock:
+                self._stats['timeouts'] += 1
+            raise TimeoutError(f"{self.name} inference timed out after {timeout:.2f}s")
+
+    def predict_many(self, texts: List[str], timeout: Optional[float] = None) -> List[Dict]:
+        """Score several texts under one overall deadline; raises TimeoutError like predict()."""
+        timeout = self.default_timeout if timeout is None else timeout
+        futures = [self.submit(text, timeout) for text in texts]
+        _, pending = wait(futures, timeout)
+        if pending:
+            # Queued ones are skipped by the worker; ones already in a batch finish unobserved
+            for future in pending:
+                future.cancel()
+            with self._stats_lock:
+                self._stats['timeouts'] += len(pending)
+            raise TimeoutError(f"{self.name} inference timed out after {timeout:.2f}s "
+                               f"({len(pending)} of {len(futures)} texts unscored)")
+        return [future.result() for future in futures]
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['avg_batch'] = (stats['batched_items'] / stats['batches']) if stats['batches'] else 0.0
+        stats['queue_depth'] = self._queue.qsize()
+        stats['max_batch_size'] = self.max_batch_size
+        stats['max_wait_ms'] = self.max_wait * 1000.0
+        return stats
+
+    def _collect(self, first) -> List[_PendingRequest]:
+        batch = [first]
+        window_end = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = window_end - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            self._run_batch(self._collect(first))
+
+    def _run_batch(self, batch: List[_PendingRequest]):
+        now = time.monotonic()
+        live = []
+        for request in batch:
+            # Skip callers that already gave up; don't spend a forward pass on them
+            if request.deadline < now:
+                if request.future.set_running_or_notify_cancel():
+                    request.future.set_exception(TimeoutError('request expired in queue'))
+                continue
+            if request.future.set_running_or_notify_cancel():
+                live.append(request)
+        if not live:
+            return
+
+        try:
+            results = self.predict_batch([request.text for request in live])
+        except Exception as e:
+            logger.error(f"Micro-batch of {len(live)} failed: {e}")
+            with self._stats_lock:
+                self._stats['errors'] += 1
+            for request in live:
+                request.future.set_exception(e)
+            return
+
+        for request, result in zip(live, results):
+            request.future.set_result(result)
+        with self._stats_lock:
+            self._stats['batches'] += 1
+            self._stats['batched_items'] += len(live)
+            self._stats['max_batch'] = max(self._stats['max_batch'], len(live))
+
+
+class BatchedBERTAnalyzer:
+    """Drop-in analyzer whose predict() goes through a shared MicroBatchEngine."""
+
+    def __init__(self, engine: MicroBatchEngine, timeout: Optional[float] = None):
+        self.engine = engine
+        self.timeout = timeout
+
+    def predict(self, text: str) -> Dict[str, float]:
+        return self.engine.predict(text, self.timeout)
+
+    def predict_batch(self, texts: List[str]) -> List[Dict[str, float]]:
+        return self.engine.predict_many(texts, self.timeout)
+
+
+class RemoteBERTAnalyzer:
+    """Client for the local worker started with `manage.py run_sentiment_worker`."""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def predict(self, text: str) -> Dict[str, float]:
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts: List[str]) -> List[Dict[str, float]]:
+        body = json.dumps({'texts': list(texts)}).encode('utf-8')
+        request = urllib.request.Request(
+            f"{self.url}/predict", data=body, headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))['results']
+
+
+def build_bert_engine(language: str = 'en', model_dir: Optional[str] = None, max_batch_size: int = 32,
+                      max_wait_ms: float = 10.0, timeout: float = 5.0, num_threads: Optional[int] = None,
+                      quantize: bool = False) -> MicroBatchEngine:
+    from .models import BERTSentimentAnalyzer
+
+    bert = BERTSentimentAnalyzer(language, model_dir=model_dir, batch_size=max_batch_size,
+                                 num_threads=num_threads, quantize=quantize)
+    bert.load_model()
+    return MicroBatchEngine(bert.predict_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms,
+                            default_timeout=timeout, name=f"bert-{language}")
+
+
+_engines: Dict[str, Tuple[str, MicroBatchEngine]] = {}
+_engines_lock = threading.Lock()
+
+
+def get_bert_engine(language: str = 'en') -> MicroBatchEngine:
+    """Process-wide engine per language configured from SENTIMENT_BERT_* settings.
+
+    Rebuilt when the model in SENTIMENT_BERT_MODEL_DIR is replaced (see model_versions.py).
+    """
+    from .model_versions import bert_model_version
+    version = bert_model_version()
+    replaced = None
+    with _engines_lock:
+        entry = _engines.get(language)
+        if entry is None or entry[0] != version:
+            replaced = entry[1] if entry is not None else None
+            from django.conf import settings
+            engine = build_bert_engine(
+                language,
+                model_dir=getattr(settings, 'SENTIMENT_BERT_MODEL_DIR', None),
+                max_batch_size=getattr(settings, 'SENTIMENT_BERT_MAX_BATCH', 32),
+                max_wait_ms=getattr(settings, 'SENTIMENT_BERT_MAX_WAIT_MS', 10.0),
+                timeout=getattr(settings, 'SENTIMENT_BERT_REQUEST_TIMEOUT', 5.0),
+                num_threads=getattr(settings, 'SENTIMENT_BERT_NUM_THREADS', None),
+                quantize=getattr(settings, 'SENTIMENT_BERT_QUANTIZE', False),
+            )
+            entry = _engines[language] = (version, engine)
+    if replaced is not None:
+        # Requests already queued on the old engine are scored before its worker exits
+        replaced.stop()
+    return entry[1]
@@ -1,22 +1,40 @@
 """
 Kaggle dataset loaders for English and Vietnamese sentiment datasets with robust CSV handling.
 """
-from typing import Optional, List
+from typing import Dict, Iterator, Optional, List, Tuple
 import os
 import logging
 import pandas as pd
 
+from .dataset_cache import DatasetCache, default_cache_dir, file_sha256
+from .streaming import ENCODING_CANDIDATES, detect_csv_encoding, iter_csv_chunks
+
 logger = logging.getLogger(__name__)
 
 
 class BaseKaggleLoader:
     dataset_id: str = ""
+    # Bump when column detection or label normalization changes so cached frames are rebuilt
+    loader_version: int = 1
 
-    def __init__(self):
-        self.dataset_path: Optional[str] = None
+    def __init__(self, data_dir: Optional[str] = None, offline: Optional[bool] = None,
+                 use_cache: bool = True, cache_dir: Optional[str] = None, memory_map: bool = False):
+        # data_dir: local directory with the dataset CSVs (skips kagglehub entirely)
+        self.dataset_path: Optional[str] = data_dir
         self.df: Optional[pd.DataFrame] = None
+        # Columns and label encoding detected on the first frame of a load()/iter_chunks() pass;
+        # later chunks of the same file reuse it so every chunk is normalized the same way
+        self.scheme: Optional[Dict] = None
+        if offline is None:
+            offline = os.environ.get('SENTIMENT_DATASET_OFFLINE', 'False') == 'True'
+        self.offline = offline
+        cache_dir = cache_dir or default_cache_dir()
+        self.cache: Optional[DatasetCache] = DatasetCache(cache_dir) if use_cache and cache_dir else None
+        self.memory_map = memory_map
 
     def download(self) -> str:
+        if self.offline:
+            raise ValueError(f"Offline mode: no local data directory for {self.dataset_id}")
         import kagglehub
         logger.info(f"Downloading Kaggle dataset: {self.dataset_id}")
         self.dataset_path = kagglehub.dataset_download(self.dataset_id)
@@ -25,7 +43,9 @@ class BaseKaggleLoader:
 
     def _try_read_csv(self, filepath: str) -> pd.DataFrame:
         errors = []
-        for enc in ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252', 'iso-8859-1']:
+        # Sniff the encoding from a sample first so large files are normally parsed once
+        detected = detect_csv_encoding(filepath)
+        for enc in [detected] + [e for e in ENCODING_CANDIDATES if e != detected]:
             try:
                 return pd.read_csv(filepath, encoding=enc)
             except Exception as e:
@@ -33,24 +53,60 @@ class BaseKaggleLoader:
         raise ValueError(f"Failed to read CSV {filepath}. Tried encodings: {errors}")
 
     def load(self) -> pd.DataFrame:
+        if self.offline and not self.dataset_path:
+            cached = self.cache.latest(self.dataset_id, self.loader_version, self.memory_map) if self.cache else None
+            if cached is None:
+                raise ValueError(f"Offline mode: no cached dataset for {self.dataset_id} and no data_dir given")
+            logger.info(f"Loaded {self.dataset_id} from dataset cache (offline)")
+            return cached
+
+        name, fp = self._select_file()
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(self.dataset_id, self.loader_version, file_sha256(fp))
+            cached = self.cache.get(key, memory_map=self.memory_map)
+            if cached is not None:
+                logger.info(f"Loaded {self.dataset_id} from dataset cache ({len(cached)} rows)")
+                return cached
+
+        self.df = self._try_read_csv(fp)
+        self.scheme = None
+        out = self.process_dataframe(name)
+        if key is not None:
+            try:
+                self.cache.put(key, out, {'dataset_id': self.dataset_id, 'source_file': name})
+            except OSError as e:
+                logger.warning(f"Could not write dataset cache: {e}")
+        return out
+
+    def _select_file(self) -> Tuple[str, str]:
         if not self.dataset_path:
             self.download()
         files = os.listdir(self.dataset_path)
         priority: List[str] = self.get_priority_files(files)
         for name in priority:
             if name in files:
-                fp = os.path.join(self.dataset_path, name)
-                df = self._try_read_csv(fp)
-                self.df = df
-                return self.process_dataframe(name)
+                return name, os.path.join(self.dataset_path, name)
         # Fallback: first CSV
         csvs = [f for f in files if f.lower().endswith('.csv')]
         if not csvs:
             raise ValueError("No CSV files found in Kaggle dataset")
-        fp = os.path.join(self.dataset_path, csvs[0])
-        df = self._try_read_csv(fp)
-        self.df = df
-        return self.process_dataframe(csvs[0])
+        return csvs[0], os.path.join(self.dataset_path, csvs[0])
+
+    def iter_chunks(self, chunksize: int = 10000) -> Iterator[Tuple[List[str], List[int]]]:
+        """Stream (texts, labels) chunks without loading the whole CSV into memory."""
+        name, fp = self._select_file()
+        self.scheme = None
+        for chunk in iter_csv_chunks(fp, chunksize=chunksize):
+            self.df = chunk
+            try:
+                out = self.process_dataframe(name)
+            except (ValueError, KeyError) as e:
+                logger.warning(f"Skipping chunk of {name}: {e}")
+                continue
+            if not out.empty:
+                yield out['text'].astype(str).tolist(), out['label'].astype(int).tolist()
+        self.df = None
 
     def get_priority_files(self, files: List[str]) -> List[str]:
         return []
@@ -100,6 +156,42 @@ class EnglishSentimentLoader(BaseKaggleLoader):
 
     def process_dataframe(self, filename: str) -> pd.DataFrame:
         df = self.df
+        if self.scheme is None:
+            text_col, label_col = self._detect_columns(df, filename)
+            self.scheme = {
+                'text_col': text_col,
+                'label_col': label_col,
+                'labels': self._label_scheme(df[[text_col, label_col]].dropna()[label_col]),
+            }
+        text_col, label_col = self.scheme['text_col'], self.scheme['label_col']
+        df = df[[text_col, label_col]].rename(columns={text_col: 'text', label_col: 'sentiment'})
+        df = df.dropna()
+        # Normalize sentiments (support both numeric ratings and 0/1 labels)
+        labels = self.scheme['labels']
+        if labels == 'binary':
+            df['sentiment'] = pd.to_numeric(df['sentiment'], errors='coerce').map({0.0: 'negative', 1.0: 'positive'})
+        elif labels == 'stars':
+            # Star ratings: >=4 positive, <=2 negative, 3 neutral
+            stars = pd.to_numeric(df['sentiment'], errors='coerce')
+            df['sentiment'] = stars.map(lambda x: 'positive' if x >= 4 else ('negative' if x <= 2 else 'neutral'))
+        elif labels == 'coded':
+            df['sentiment'] = df['sentiment'].map({0: 'negative', 1: 'positive', 2: 'neutral'}).fillna('neutral')
+        else:
+            df['sentiment'] = df['sentiment'].astype(str).str.lower()
+        return self.to_binary(df)
+
+    @staticmethod
+    def _label_scheme(labels: pd.Series) -> str:
+        """'binary' (0/1), 'stars' (ratings), 'coded' (non-float numerics) or 'text'."""
+        if labels.dtype == object:
+            return 'text'
+        try:
+            values = labels.astype(float)
+        except (TypeError, ValueError):
+            return 'coded'
+        return 'binary' if values.isin([0.0, 1.0]).all() else 'stars'
+
+    def _detect_columns(self, df: pd.DataFrame, filename: str) -> Tuple[str, str]:
         # Generic robust detection of text/label columns
         import re
         text_col = None
@@ -180,22 +272,7 @@ class EnglishSentimentLoader(BaseKaggleLoader):
             label_col = num_cols[0] if num_cols else df.columns[-1]
 
         logger.info(f"English loader (Flipkart) selected text column: '{text_col}' and label column: '{label_col}' from file '{filename}'")
-        df = df[[text_col, label_col]].rename(columns={text_col: 'text', label_col: 'sentiment'})
-        df = df.dropna()
-        # Normalize sentiments (support both numeric ratings and 0/1 labels)
-        if df['sentiment'].dtype != object:
-            # If values are 0/1 → map directly; if star ratings → map >=4 to positive, <=2 to negative, 3 neutral
-            try:
-                df['sentiment'] = df['sentiment'].astype(float)
-                if df['sentiment'].isin([0.0, 1.0]).all():
-                    df['sentiment'] = df['sentiment'].map({0.0: 'negative', 1.0: 'positive'})
-                else:
-                    df['sentiment'] = df['sentiment'].map(lambda x: 'positive' if x >= 4 else ('negative' if x <= 2 else 'neutral'))
-            except Exception:
-                df['sentiment'] = df['sentiment'].map({0: 'negative', 1: 'positive', 2: 'neutral'}).fillna('neutral')
-        else:
-            df['sentiment'] = df['sentiment'].astype(str).str.lower()
-        return self.to_binary(df)
+        return text_col, label_col
 
 
 class VietnameseSentimentLoader(BaseKaggleLoader):
@@ -209,19 +286,22 @@ class VietnameseSentimentLoader(BaseKaggleLoader):
 
     def process_dataframe(self, filename: str) -> pd.DataFrame:
         df = self.df
-        # Try to identify text and label columns
-        text_col = None
-        label_col = None
-        for c in df.columns:
-            lc = str(c).lower().strip()
-            if text_col is None and any(k in lc for k in ['text', 'review', 'comment', 'content']):
-                text_col = c
-            if label_col is None and any(k in lc for k in ['label', 'sentiment', 'polarity', 'target', 'rating']):
-                label_col = c
-        if text_col is None:
-            text_col = df.select_dtypes(include=['object']).columns[0]
-        if label_col is None:
-            label_col = df.columns[-1]
+        if self.scheme is None:
+            # Try to identify text and label columns
+            text_col = None
+            label_col = None
+            for c in df.columns:
+                lc = str(c).lower().strip()
+                if text_col is None and any(k in lc for k in ['text', 'review', 'comment', 'content']):
+                    text_col = c
+                if label_col is None and any(k in lc for k in ['label', 'sentiment', 'polarity', 'target', 'rating']):
+                    label_col = c
+            if text_col is None:
+                text_col = df.select_dtypes(include=['object']).columns[0]
+            if label_col is None:
+                label_col = df.columns[-1]
+            self.scheme = {'text_col': text_col, 'label_col': label_col}
+        text_col, label_col = self.scheme['text_col'], self.scheme['label_col']
         df = df[[text_col, label_col]].rename(columns={text_col: 'text', label_col: 'sentiment'})
         df = df.dropna()
         # Normalize label to pos/neg
@@ -0,0 +1,191 @@
+"""
+Multi-pattern lexicon matching for emotion / aspect keyword features.
+
+LexiconMatcher compiles any number of phrase lists into one Aho–Corasick automaton over
+word tokens, so a text is scanned once no matter how many phrases the lexicons hold.
+Matching on tokens rather than characters gives word boundaries for free: 'hư' no longer
+fires inside 'như', and multi-syllable Vietnamese terms ('không hài lòng') only match as
+whole syllable sequences. Underscores produced by word segmenters ('hài_lòng') are treated
+as syllable boundaries, and text is NFC-normalized so decomposed diacritics still match.
+
+LexiconFeatureVectorizer appends per-lexicon match counts to a fitted TF-IDF vectorizer's
+output, giving the Naive Bayes model a few extra non-negative features.
+"""
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+import re
+import unicodedata
+
+import numpy as np
+import scipy.sparse
+
+WORD_RE = re.compile(r'[^\W_]+')
+
+ENGLISH_EMOTIONS = {
+    'positive': {
+        'excellent', 'great', 'amazing', 'perfect', 'love', 'love it', 'highly recommend', 'recommend',
+        'fast delivery', 'good quality', 'worth the money', 'happy', 'satisfied', 'works great',
+    },
+    'negative': {
+        'terrible', 'awful', 'horrible', 'broken', 'broke', 'defective', 'waste of money', 'refund',
+        'disappointed', 'poor quality', 'not worth', 'slow delivery', 'never again', 'do not buy',
+    },
+}
+
+
+def tokenize_for_matching(text: str) -> List[str]:
+    return WORD_RE.findall(unicodedata.normalize('NFC', text or '').lower())
+
+
+class LexiconMatcher:
+    """Aho–Corasick automaton over word tokens for several named lexicons."""
+
+    def __init__(self, lexicons: Dict[str, Iterable[str]]):
+        self.categories: List[str] = sorted(lexicons)
+        self.phrases: List[Tuple[int, str]] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        for category_index, category in enumerate(self.categories):
+            for phrase in sorted(set(lexicons[category])):
+                tokens = tokenize_for_matching(phrase)
+                if tokens:
+                    self._insert(tokens, len(self.phrases))
+                    self.phrases.append((category_index, ' '.join(tokens)))
+        self._build_failure_links()
+
+    def _insert(self, tokens: List[str], phrase_id: int):
+        state = 0
+        for token in tokens:
+            nxt = self._goto[state].get(token)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][token] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(phrase_id)
+
+    def _build_failure_links(self):
+        # Depth-1 states fail to the root (their default 0); deeper ones are resolved breadth-first
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(token, 0)
+                # Phrases ending at the failure state also end here (suffix matches)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str):
+        """Yield (token end index, phrase id) for every occurrence, overlapping ones included."""
+        state = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for position, token in enumerate(tokenize_for_matching(text)):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for phrase_id in out[state]:
+                yield position, phrase_id
+
+    def find(self, text: str) -> List[Tuple[str, str]]:
+        """Distinct (category, phrase) pairs present in the text."""
+        seen = sorted({phrase_id for _, phrase_id in self.iter_matches(text)})
+        return [(self.categories[self.phrases[p][0]], self.phrases[p][1]) for p in seen]
+
+    def count(self, text: str, distinct: bool = True) -> Dict[str, int]:
+        """Matches per category; distinct=True counts each phrase once (like the old `in` checks)."""
+        counts = dict.fromkeys(self.categories, 0)
+        matches = {p for _, p in self.iter_matches(text)} if distinct else [p for _, p in self.iter_matches(text)]
+        for phrase_id in matches:
+            counts[self.categories[self.phrases[phrase_id][0]]] += 1
+        return counts
+
+    def count_many(self, texts: Iterable[str], distinct: bool = True) -> np.ndarray:
+        """(n_texts, n_categories) count matrix, columns in self.categories order."""
+        rows = []
+        for text in texts:
+            counts = self.count(text, distinct=distinct)
+            rows.append([counts[c] for c in self.categories])
+        return np.asarray(rows, dtype=np.float64).reshape(-1, len(self.categories))
+
+
+def default_emotion_lexicons(language: str = 'vi') -> Dict[str, Iterable[str]]:
+    if language == 'vi':
+        from .vietnamese_utils import NEGATIVE_EMOTIONS, POSITIVE_EMOTIONS
+        return {'positive': POSITIVE_EMOTIONS, 'negative': NEGATIVE_EMOTIONS}
+    return ENGLISH_EMOTIONS
+
+
+_matchers: Dict[str, LexiconMatcher] = {}
+
+
+def get_emotion_matcher(language: str = 'vi') -> LexiconMatcher:
+    """Shared automaton per language, built on first use."""
+    matcher = _matchers.get(language)
+    if matcher is None:
+        matcher = _matchers[language] = LexiconMatcher(default_emotion_lexicons(language))
+    return matcher
+
+
+class LexiconFeatureVectorizer:
+    """Wrap a text vectorizer and append lexicon match counts as extra columns.
+
+    Everything not overridden is delegated to the wrapped vectorizer, so code reading
+    vocabulary_, build_analyzer() etc. keeps working. The automaton is rebuilt from the
+    stored lexicons after unpickling rather than being pickled itself.
+    """
+
+    def __init__(self, vectorizer, lexicons: Dict[str, Iterable[str]], weight: float = 1.0):
+        self.vectorizer = vectorizer
+        self.lexicons = {category: sorted(set(phrases)) for category, phrases in lexicons.items()}
+        self.weight = weight
+        self._matcher: Optional[LexiconMatcher] = None
+
+    @property
+    def matcher(self) -> LexiconMatcher:
+        if self._matcher is None:
+            self._matcher = LexiconMatcher(self.lexicons)
+        return self._matcher
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_matcher'] = None
+        return state
+
+    def __getattr__(self, name):
+        # Only called for attributes not found normally; guard against recursion while unpickling
+        if name in ('vectorizer', '__setstate__'):
+            raise AttributeError(name)
+        return getattr(self.vectorizer, name)
+
+    def get_params(self, deep: bool = True) -> Dict:
+        params = dict(self.vectorizer.get_params(deep))
+        params['lexicon_categories'] = sorted(self.lexicons)
+        params['lexicon_size'] = sum(len(p) for p in self.lexicons.values())
+        params['lexicon_weight'] = self.weight
+        return params
+
+    @property
+    def n_lexicon_features(self) -> int:
+        return len(self.lexicons)
+
+    def _lexicon_matrix(self, texts: List[str]) -> scipy.sparse.csr_matrix:
+        return scipy.sparse.csr_matrix(self.matcher.count_many(texts) * self.weight)
+
+    def fit_transform(self, texts, y=None):
+        texts = list(texts)
+        X = self.vectorizer.fit_transform(texts)
+        return scipy.sparse.hstack([X, self._lexicon_matrix(texts)], format='csr')
+
+    def fit(self, texts, y=None):
+        self.fit_transform(texts)
+        return self
+
+    def transform(self, texts):
+        texts = list(texts)
+        return scipy.sparse.hstack([self.vectorizer.transform(texts), self._lexicon_matrix(texts)], format='csr')
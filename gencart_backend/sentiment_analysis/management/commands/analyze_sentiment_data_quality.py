@@ -1,7 +1,8 @@
 import json
+import time
 from datetime import datetime
 from pathlib import Path
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
 from sentiment_analysis.data_quality import compute_data_quality
 
@@ -12,18 +13,47 @@ class Command(BaseCommand):
         parser.add_argument('--output', type=str, default=None, help='Optional path (relative) to save metrics JSON')
         parser.add_argument('--min-text-len', type=int, default=1, help='Minimum token length to consider')
         parser.add_argument('--short-threshold', type=int, default=3, help='Threshold (tokens) for short text ratio')
+        parser.add_argument('--no-near-duplicates', action='store_true', help='Skip MinHash/LSH near-duplicate detection')
+        parser.add_argument('--similarity-threshold', type=float, default=0.8,
+                            help='Estimated Jaccard similarity (word 3-grams) for near-duplicates')
+        parser.add_argument('--num-perm', type=int, default=64, help='MinHash permutations per review')
+        parser.add_argument('--bands', type=int, default=8,
+                            help='LSH bands (must divide --num-perm); more bands catch lower similarities')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per database round trip')
+        parser.add_argument('--max-index-entries', type=int, default=2_000_000,
+                            help='Cap on LSH buckets held in memory')
+        parser.add_argument('--top-clusters', type=int, default=20, help='Largest near-duplicate clusters to report')
 
     def handle(self, *args, **options):
+        if options['num_perm'] % options['bands']:
+            raise CommandError('--bands must divide --num-perm')
+        started = time.perf_counter()
         metrics = compute_data_quality(
             min_text_len=options['min_text_len'],
-            short_threshold=options['short_threshold']
+            short_threshold=options['short_threshold'],
+            near_duplicates=not options['no_near_duplicates'],
+            similarity_threshold=options['similarity_threshold'],
+            num_perm=options['num_perm'],
+            bands=options['bands'],
+            chunk_size=options['chunk_size'],
+            max_index_entries=options['max_index_entries'],
+            top_clusters=options['top_clusters'],
         )
         data = metrics.to_dict()
 
         # Pretty console output
         self.stdout.write(self.style.HTTP_INFO('Sentiment Data Quality Metrics'))
         for k, v in data.items():
-            self.stdout.write(f" - {k}: {v}")
+            if k == 'near_duplicate_clusters':
+                self.stdout.write(f" - {k}: {len(v)} reported")
+                for cluster in v[:5]:
+                    self.stdout.write(f"     size={cluster['size']} products={cluster['product_ids'][:5]} "
+                                      f"reviews={cluster['review_ids'][:5]}")
+            elif k == 'product_duplicate_clusters':
+                self.stdout.write(f" - {k}: {len(v)} products with near-duplicate reviews")
+            else:
+                self.stdout.write(f" - {k}: {v}")
+        self.stdout.write(f"Analyzed in {time.perf_counter() - started:.1f}s")
 
         out = options['output']
         if out:
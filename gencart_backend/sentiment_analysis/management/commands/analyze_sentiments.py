@@ -1,6 +1,8 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from sentiment_analysis.services import SentimentAnalysisService, ModelTrainingService
+from sentiment_analysis.services import (
+    BilingualSentimentService, ModelTrainingService, SentimentAnalysisService, detect_language, review_scoring_text,
+)
 from products.models import Review
 import logging
 
@@ -29,15 +31,15 @@ class Command(BaseCommand):
             '--model',
             type=str,
             default='naive_bayes',
-            choices=['naive_bayes', 'bert', 'system'],
+            choices=['naive_bayes', 'bert', 'system', 'cascade'],
             help='Model to use for sentiment analysis',
         )
         parser.add_argument(
             '--language',
             type=str,
-            default='en',
-            choices=['en', 'vi'],
-            help='Language for sentiment analysis',
+            default='auto',
+            choices=['auto', 'en', 'vi'],
+            help='Language for sentiment analysis (auto: per review; naive_bayes only, others use en)',
         )
         parser.add_argument(
             '--batch-size',
@@ -63,18 +65,23 @@ class Command(BaseCommand):
         )
 
         # Initialize the sentiment analysis service
+        language = 'en' if options['language'] == 'auto' else options['language']
         service = SentimentAnalysisService(
-            language=options['language'],
+            language=language,
             model_type=options['model']
         )
+        # Mixed EN/VI reviews are batched per language model
+        bilingual = None
+        if options['language'] == 'auto' and options['model'] == 'naive_bayes':
+            bilingual = BilingualSentimentService()
 
         try:
             # Train models if requested
             if options['train']:
                 self.stdout.write('Training custom models...')
-                training_service = ModelTrainingService(options['language'])
+                training_service = ModelTrainingService(language)
                 
-                if options['model'] in ['naive_bayes', 'system']:
+                if options['model'] in ['naive_bayes', 'system', 'cascade']:
                     accuracy = training_service.train_naive_bayes_model()
                     self.stdout.write(
                         self.style.SUCCESS(f'Naive Bayes model trained with accuracy: {accuracy:.4f}')
@@ -83,6 +90,12 @@ class Command(BaseCommand):
             # Analyze specific review
             if options['review_id']:
                 self.stdout.write(f'Analyzing review {options["review_id"]}...')
+                review = Review.objects.filter(id=options['review_id']).first()
+                if bilingual and review:
+                    service = SentimentAnalysisService(
+                        language=detect_language(review_scoring_text(review.title, review.comment)),
+                        model_type=options['model'],
+                    )
                 result = service.update_review_sentiment(options['review_id'])
                 if result:
                     self.stdout.write(
@@ -116,18 +129,22 @@ class Command(BaseCommand):
                 processed = 0
                 errors = 0
                 
-                for review in reviews:
-                    try:
-                        result = service.update_review_sentiment(review.id)
-                        if result:
-                            processed += 1
-                            if processed % 10 == 0:
-                                self.stdout.write(f'Processed {processed}/{total_reviews} reviews')
-                        else:
+                if bilingual:
+                    stats = bilingual.analyze_reviews(reviews, batch_size=options['batch_size'])
+                    processed, errors = stats['processed'], stats['errors']
+                else:
+                    for review in reviews:
+                        try:
+                            result = service.update_review_sentiment(review.id)
+                            if result:
+                                processed += 1
+                                if processed % 10 == 0:
+                                    self.stdout.write(f'Processed {processed}/{total_reviews} reviews')
+                            else:
+                                errors += 1
+                        except Exception as e:
+                            logger.error(f'Error processing review {review.id}: {e}')
                             errors += 1
-                    except Exception as e:
-                        logger.error(f'Error processing review {review.id}: {e}')
-                        errors += 1
 
                 self.stdout.write(
                     self.style.SUCCESS(
@@ -156,7 +173,7 @@ class Command(BaseCommand):
                 self.stdout.write(f'Found {total_reviews} reviews to analyze')
                 
                 # Run batch analysis
-                stats = service.analyze_all_reviews(batch_size=options['batch_size'])
+                stats = (bilingual or service).analyze_all_reviews(batch_size=options['batch_size'])
                 
                 self.stdout.write(
                     self.style.SUCCESS(
@@ -186,6 +203,10 @@ class Command(BaseCommand):
                 )
             )
 
+            # Cascade escalation counters (only populated on cache misses)
+            if options['model'] == 'cascade' and service._analyzer is not None:
+                self.stdout.write(f'Cascade stats: {service.analyzer.get_cascade_stats()}')
+
             # Show overall statistics
             self.show_statistics()
 
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from sentiment_analysis.rollups import backfill_effective_sentiment, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = ("Recompute Review.effective_sentiment in bulk (after writes that bypassed Review.save()) "
+            "and optionally rebuild the sentiment rollups.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help='Primary-key range per UPDATE')
+        parser.add_argument('--all', action='store_true', help='Rewrite every row, not just stale ones')
+        parser.add_argument('--rebuild-rollups', action='store_true', help='Rebuild the trend rollups afterwards')
+
+    def handle(self, *args, **options):
+        updated = backfill_effective_sentiment(batch_size=options['batch_size'], only_stale=not options['all'])
+        self.stdout.write(self.style.SUCCESS(f"Updated effective_sentiment on {updated} reviews"))
+        if options['rebuild_rollups']:
+            rows = rebuild_rollups()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} rollup rows"))
@@ -0,0 +1,64 @@
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+
+from sentiment_analysis.benchmarks import (
+    ANALYZERS, compare_reports, load_report, report_path, run_benchmarks, write_report,
+)
+
+
+class Command(BaseCommand):
+    help = ("Benchmark sentiment analyzers on fixed corpora (cold start, p50/p95/p99 latency, batch throughput, "
+            "RSS) and write the JSON report served by get_algorithm_info. Fails on regressions vs the baseline.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyzers', nargs='+', choices=sorted(ANALYZERS), default=None,
+                            help='Analyzers to run (default: all; unavailable ones are reported as skipped)')
+        parser.add_argument('--rounds', type=int, default=5, help='Passes over the corpus for latency percentiles')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Texts in the throughput batch')
+        parser.add_argument('--output', type=str, default=None, help='Report path (default: SENTIMENT_BENCHMARK_REPORT)')
+        parser.add_argument('--baseline', type=str, default=None,
+                            help='Report to compare against (default: the existing report at --output)')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Relative slowdown / memory growth that counts as a regression, on top of '
+                                 'per-metric absolute floors (default: 0.25)')
+        parser.add_argument('--allow-regression', action='store_true',
+                            help='Write the report even when regressions are found')
+        parser.add_argument('--in-process', action='store_true',
+                            help='Do not fork per analyzer (memory figures then include earlier analyzers)')
+
+    def handle(self, *args, **options):
+        output = Path(options['output']) if options['output'] else report_path()
+        baseline_path = Path(options['baseline']) if options['baseline'] else output
+        baseline = load_report(baseline_path)
+        if options['baseline'] and baseline is None:
+            raise CommandError(f"Cannot read baseline report {baseline_path}")
+
+        report = run_benchmarks(
+            options['analyzers'],
+            isolated=not options['in_process'],
+            rounds=options['rounds'],
+            batch_size=options['batch_size'],
+        )
+        for name, result in report['analyzers'].items():
+            if result['status'] != 'ok':
+                self.stdout.write(self.style.WARNING(f"  {name:<18} {result['status']}: {result.get('reason')}"))
+                continue
+            accuracy = f"{result['accuracy']:.0%}" if result['accuracy'] is not None else '-'
+            self.stdout.write(
+                f"  {name:<18} cold {result['cold_start_ms']:8.1f}ms  "
+                f"p50 {result['latency_p50_ms']:7.2f}ms  p95 {result['latency_p95_ms']:7.2f}ms  "
+                f"p99 {result['latency_p99_ms']:7.2f}ms  {result['throughput_per_sec']:>9,.0f}/s  "
+                f"+{result['rss_delta_mb']:.0f}MB  acc {accuracy}"
+            )
+
+        regressions = compare_reports(report, baseline, options['threshold']) if baseline else []
+        if regressions and not options['allow_regression']:
+            for line in regressions:
+                self.stderr.write(f"  {line}")
+            raise CommandError(f"{len(regressions)} regression(s) beyond {options['threshold']:.0%}; "
+                               f"report not written (use --allow-regression to accept)")
+        for line in regressions:
+            self.stdout.write(self.style.WARNING(f"  accepted regression: {line}"))
+
+        write_report(report, output)
+        self.stdout.write(self.style.SUCCESS(f"Benchmark report written to {output}"))
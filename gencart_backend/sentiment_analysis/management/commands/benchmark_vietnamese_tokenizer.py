@@ -0,0 +1,68 @@
+import os
+import random
+import tempfile
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+from sentiment_analysis.models import SentimentPreprocessor
+from sentiment_analysis.streaming import iter_file_chunks, labeled_chunks
+from sentiment_analysis.tokenization import VietnameseTokenizer, tokenizer_backend
+
+SYLLABLES = [
+    'sản', 'phẩm', 'rất', 'tốt', 'giao', 'hàng', 'nhanh', 'chất', 'lượng', 'kém', 'đóng', 'gói', 'cẩn',
+    'thận', 'giá', 'hợp', 'lý', 'thất', 'vọng', 'hài', 'lòng', 'shop', 'tư', 'vấn', 'nhiệt', 'tình',
+]
+
+
+class Command(BaseCommand):
+    help = "Measure Vietnamese segmentation throughput (tokens/sec) with and without the token cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--input', type=str, help='CSV/JSONL with a text column (default: synthetic reviews)')
+        parser.add_argument('--rows', type=int, default=20000, help='Rows to use')
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        texts = self._load(options)
+        preprocessor = SentimentPreprocessor('vi')
+        cleaned = [preprocessor.clean_text(t) for t in texts]
+        self.stdout.write(f"{len(cleaned)} texts, backend {tokenizer_backend()}, {options['processes']} processes")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_path = os.path.join(tmp, 'tokens.sqlite3')
+            runs = [
+                ('uncached, 1 process', VietnameseTokenizer(cache_path=None, lru_size=0, processes=1)),
+                (f"uncached, {options['processes']} processes",
+                 VietnameseTokenizer(cache_path=None, lru_size=0, processes=options['processes'],
+                                     parallel_threshold=1)),
+                ('cold disk cache (fills it)', VietnameseTokenizer(cache_path=cache_path, lru_size=0,
+                                                                    processes=options['processes'],
+                                                                    parallel_threshold=1)),
+                ('warm disk cache', VietnameseTokenizer(cache_path=cache_path, lru_size=0)),
+            ]
+            lru = VietnameseTokenizer(cache_path=None, lru_size=len(cleaned), processes=1)
+            lru.tokenize_many(cleaned)
+            runs.append(('warm in-memory LRU', lru))
+
+            baseline = None
+            for label, tokenizer in runs:
+                started = time.perf_counter()
+                tokens = tokenizer.tokenize_many(cleaned)
+                elapsed = time.perf_counter() - started
+                rate = sum(len(t) for t in tokens) / elapsed if elapsed else float('inf')
+                baseline = baseline or rate
+                self.stdout.write(f"  {label:<32} {rate:>12,.0f} tokens/s  ({elapsed:.2f}s, x{rate / baseline:.1f})")
+                tokenizer.close()
+
+    def _load(self, options):
+        if options['input']:
+            if not os.path.exists(options['input']):
+                raise CommandError(f"No such file: {options['input']}")
+            texts = []
+            for chunk_texts, _ in labeled_chunks(iter_file_chunks(options['input'])):
+                texts.extend(chunk_texts)
+                if len(texts) >= options['rows']:
+                    break
+            return texts[:options['rows']]
+        rng = random.Random(0)
+        return [' '.join(rng.choice(SYLLABLES) for _ in range(rng.randint(6, 40))) for _ in range(options['rows'])]
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sentiment_analysis.highlights import refresh_highlights
+
+
+class Command(BaseCommand):
+    help = ("Extract each product's top positive/negative review n-grams from the Naive Bayes weights. "
+            "Only products whose reviews or models changed are rebuilt unless --full is given.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every product')
+        parser.add_argument('--product', type=int, action='append', default=None,
+                            help='Only consider this product id (repeatable)')
+        parser.add_argument('--top', type=int, default=5, help='Terms kept per polarity')
+        parser.add_argument('--min-reviews', type=int, default=2, help='Reviews a term must occur in')
+        parser.add_argument('--batch-size', type=int, default=200, help='Products per review query')
+
+    def handle(self, *args, **options):
+        if options['top'] < 1 or options['min_reviews'] < 1:
+            raise CommandError('--top and --min-reviews must be at least 1')
+        result = refresh_highlights(
+            product_ids=options['product'],
+            full=options['full'],
+            top_n=options['top'],
+            min_reviews=options['min_reviews'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed highlights for {result['refreshed']} products "
+            f"({result['cleared']} without reviews cleared, models {result['model_fingerprint']})"
+        ))
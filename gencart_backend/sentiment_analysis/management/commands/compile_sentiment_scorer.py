@@ -0,0 +1,64 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+import numpy as np
+
+from sentiment_analysis.models import NaiveBayesSentimentAnalyzer
+from products.management.commands.seed_reviews import SAMPLE_COMMENTS
+
+BENCHMARK_TEXTS = [comment for _, comment in SAMPLE_COMMENTS] + [
+    "This product is amazing! Great quality.",
+    "Terrible quality, waste of money.",
+    "It's okay, nothing special but works fine.",
+    "Sản phẩm rất tốt, giao hàng nhanh",
+]
+
+
+class Command(BaseCommand):
+    help = "Compile the trained TF-IDF + Naive Bayes model into a NumPy scoring table and benchmark it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--language', type=str, default='en', choices=['en', 'vi'])
+        parser.add_argument('--output', type=str, default=None, help='Output .npz path (default: next to the model files)')
+        parser.add_argument('--benchmark', type=int, default=0, help='Rounds over the sample texts to time sklearn vs compiled (0 = skip)')
+
+    def handle(self, *args, **options):
+        analyzer = NaiveBayesSentimentAnalyzer(language=options['language'])
+        analyzer.load_model()
+        if not analyzer.is_trained:
+            raise CommandError('No trained Naive Bayes model found. Train one first.')
+
+        try:
+            path = analyzer.export_compiled_scorer(options['output'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Compiled scorer written to {path}"))
+        self.stdout.write(f"Vocabulary: {len(analyzer.scorer.vocabulary)} n-grams, classes: {analyzer.scorer.classes.tolist()}")
+
+        rounds = options['benchmark']
+        if rounds > 0:
+            self._benchmark(analyzer, rounds)
+
+    def _benchmark(self, analyzer, rounds):
+        texts = [analyzer.preprocessor.preprocess(t) for t in BENCHMARK_TEXTS]
+        vectorizer, model, scorer = analyzer.vectorizer, analyzer.model, analyzer.scorer
+
+        sk_times, fast_times, max_diff = [], [], 0.0
+        for _ in range(rounds):
+            for text in texts:
+                t0 = time.perf_counter()
+                expected = model.predict_proba(vectorizer.transform([text]))[0]
+                t1 = time.perf_counter()
+                actual = scorer.predict_proba(text)
+                t2 = time.perf_counter()
+                sk_times.append(t1 - t0)
+                fast_times.append(t2 - t1)
+                max_diff = max(max_diff, float(np.max(np.abs(expected - actual))))
+
+        def pct(values, q):
+            return float(np.percentile(values, q)) * 1e6
+
+        self.stdout.write(self.style.HTTP_INFO(f"Latency over {len(sk_times)} single-text predictions (µs)"))
+        self.stdout.write(f"  sklearn : p50={pct(sk_times, 50):.1f} p95={pct(sk_times, 95):.1f}")
+        self.stdout.write(f"  compiled: p50={pct(fast_times, 50):.1f} p95={pct(fast_times, 95):.1f}")
+        self.stdout.write(f"  speedup (p50): {pct(sk_times, 50) / max(pct(fast_times, 50), 1e-9):.1f}x")
+        self.stdout.write(f"  max |Δprob|: {max_diff:.2e}")
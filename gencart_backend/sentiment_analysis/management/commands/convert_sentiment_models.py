@@ -0,0 +1,55 @@
+import time
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+import joblib
+
+from sentiment_analysis.models import resolve_naive_bayes_model_files
+from sentiment_analysis.model_artifacts import artifact_dir_for, convert_pickles, load_artifact
+
+# repo root = four levels up: gencart_backend/sentiment_analysis/management/commands/
+KAGGLE_MODELS_DIR = Path(__file__).resolve().parents[4] / 'kaggle_sentiment_models'
+
+
+class Command(BaseCommand):
+    help = "Convert joblib sentiment pickles into the versioned memory-mapped artifact format."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--language', nargs='+', default=['en', 'vi'], choices=['en', 'vi'],
+                            help='Naive Bayes models to convert (default: en vi)')
+        parser.add_argument('--kaggle', action='store_true',
+                            help='Also convert kaggle_sentiment_models/ (logistic regression + TF-IDF)')
+
+    def handle(self, *args, **options):
+        jobs = []
+        for lang in options['language']:
+            files = resolve_naive_bayes_model_files(lang)
+            if files is None:
+                self.stdout.write(self.style.WARNING(f"No Naive Bayes pickles found for '{lang}', skipping"))
+                continue
+            jobs.append((files[0], files[1], 'multinomial_nb'))
+        if options['kaggle']:
+            model_path = KAGGLE_MODELS_DIR / 'logistic_regression_model.pkl'
+            vec_path = KAGGLE_MODELS_DIR / 'tfidf_vectorizer.pkl'
+            if model_path.exists() and vec_path.exists():
+                jobs.append((str(model_path), str(vec_path), 'logistic_regression'))
+            else:
+                self.stdout.write(self.style.WARNING(f"Kaggle pickles not found in {KAGGLE_MODELS_DIR}, skipping"))
+        if not jobs:
+            raise CommandError('Nothing to convert.')
+
+        for model_path, vec_path, kind in jobs:
+            target = artifact_dir_for(model_path)
+            try:
+                convert_pickles(model_path, vec_path, target, kind)
+            except ValueError as e:
+                raise CommandError(f"Cannot convert {model_path}: {e}")
+
+            t0 = time.perf_counter()
+            joblib.load(model_path)
+            joblib.load(vec_path)
+            t1 = time.perf_counter()
+            load_artifact(target, source_files=(model_path, vec_path))
+            t2 = time.perf_counter()
+            size_kb = sum(p.stat().st_size for p in target.iterdir()) / 1024
+            self.stdout.write(self.style.SUCCESS(f"{kind}: {target} ({size_kb:.0f} KB)"))
+            self.stdout.write(f"  cold load: pickles {(t1 - t0) * 1000:.1f} ms, mmap artifact {(t2 - t1) * 1000:.1f} ms")
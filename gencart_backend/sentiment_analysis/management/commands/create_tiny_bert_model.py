@@ -0,0 +1,59 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+
+from sentiment_analysis.models import TRANSFORMERS_AVAILABLE
+
+# Small word-level vocabulary so tokenization of the demo reviews is meaningful
+TINY_VOCAB_WORDS = [
+    'good', 'great', 'excellent', 'amazing', 'love', 'fast', 'quality', 'value', 'money',
+    'bad', 'poor', 'terrible', 'late', 'broken', 'waste', 'disappointed', 'not', 'as',
+    'described', 'average', 'nothing', 'special', 'delivery', 'product', 'build', 'and',
+    'for', 'a', 'bit', 'it', 'is', 'okay', 'works', 'fine', 'but',
+]
+
+
+def build_tiny_bert_model(output_dir: str, seed: int = 0) -> str:
+    """Write a randomly initialised ~100k parameter BERT classifier in save_pretrained layout.
+
+    Predictions are meaningless; it exists so the BERT/cascade code paths can be exercised
+    and benchmarked offline without downloading a hub model.
+    """
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    os.makedirs(output_dir, exist_ok=True)
+    vocab = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + TINY_VOCAB_WORDS
+    vocab_path = os.path.join(output_dir, 'vocab.txt')
+    with open(vocab_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(vocab) + '\n')
+
+    torch.manual_seed(seed)
+    config = BertConfig(
+        vocab_size=len(vocab),
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        max_position_embeddings=128,
+        num_labels=3,
+        id2label={0: 'negative', 1: 'neutral', 2: 'positive'},
+        label2id={'negative': 0, 'neutral': 1, 'positive': 2},
+    )
+    BertForSequenceClassification(config).save_pretrained(output_dir)
+    BertTokenizerFast(vocab_file=vocab_path, do_lower_case=True).save_pretrained(output_dir)
+    return output_dir
+
+
+class Command(BaseCommand):
+    help = "Create a tiny local BERT sentiment model for offline tests and cascade benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=str, default='sentiment_models/tiny_bert', help='Output directory')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not TRANSFORMERS_AVAILABLE:
+            raise CommandError('transformers/torch are required to build the tiny BERT model.')
+        path = build_tiny_bert_model(options['output'], seed=options['seed'])
+        self.stdout.write(self.style.SUCCESS(f"Tiny BERT model written to {path}"))
+        self.stdout.write(f"Use it with SENTIMENT_BERT_MODEL_DIR={os.path.abspath(path)}")
@@ -1,90 +1,87 @@
-import csv
 import json
-import hashlib
 from datetime import datetime
 from pathlib import Path
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
-from products.models import Review
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from sentiment_analysis.dataset_export import COMPRESSIONS, FORMATS, export_dataset, latest_export_meta
 
 class Command(BaseCommand):
-    help = "Export labeled sentiment dataset with hash + simple metadata (manual versioning)."
+    help = "Export labeled sentiment dataset with hash + simple metadata (streaming; full or delta since a watermark)."
 
     def add_arguments(self, parser):
         parser.add_argument('--min-length', type=int, default=1, help='Minimum combined text length to include (default: 1)')
-        parser.add_argument('--format', type=str, choices=['csv', 'json'], default='csv', help='Export format (default: csv)')
-        parser.add_argument('--limit', type=int, default=None, help='Limit number of rows (debug)')
+        parser.add_argument('--format', type=str, choices=FORMATS, default='csv', help='Export format (default: csv)')
+        parser.add_argument('--compress', type=str, choices=COMPRESSIONS, default='none',
+                            help='Compression for csv/json/jsonl; parquet uses it as the column codec')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Limit number of rows (debug; a truncated export records no watermark)')
         parser.add_argument('--output-dir', type=str, default='data_exports', help='Relative output directory')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per keyset page')
+        parser.add_argument('--since', type=str, default=None,
+                            help="Delta export of rows updated after an ISO timestamp, a previous .meta.json, "
+                                 "or 'latest' (watermark of the newest export in --output-dir)")
 
     def handle(self, *args, **options):
-        min_length = options['min_length']
-        fmt = options['format']
-        limit = options['limit']
-        rel_dir = options['output_dir']
+        if options['limit'] and options['since']:
+            raise CommandError('--limit cannot be combined with --since')
+        out_dir = Path(settings.BASE_DIR) / options['output_dir']
+        since, parent = self._resolve_since(options['since'], out_dir)
+        # Fixed upper bound: the next delta starts exactly where this export stops
+        until = timezone.now()
 
-        base_dir = Path(settings.BASE_DIR)
-        out_dir = base_dir / rel_dir
-        out_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            meta = export_dataset(
+                out_dir,
+                fmt=options['format'],
+                compression=options['compress'],
+                min_length=options['min_length'],
+                since=since,
+                until=until,
+                limit=options['limit'],
+                batch_size=options['batch_size'],
+                parent=parent,
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
 
-        # Query labeled reviews
-        qs = Review.objects.filter(sentiment__isnull=False).values('id', 'title', 'comment', 'sentiment', 'rating', 'created_at')
-        if limit:
-            qs = qs[:limit]
-
-        rows = []
-        for r in qs:
-            text = f"{r['title'] or ''} {r['comment'] or ''}".strip()
-            if len(text) < min_length:
-                continue
-            rows.append({
-                'id': r['id'],
-                'text': text,
-                'title': r['title'] or '',
-                'comment': r['comment'] or '',
-                'sentiment': r['sentiment'],
-                'rating': r['rating'],
-                'created_at': r['created_at'].isoformat() if r['created_at'] else None
-            })
-
-        if not rows:
+        if meta is None:
             self.stdout.write(self.style.WARNING('No data to export.'))
             return
 
-        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-        stem = f"reviews_sentiment_{timestamp}"
-
-        # Compute hash over concatenated lines (stable order by id)
-        concat_source = '\n'.join(f"{r['id']}|{r['sentiment']}|{r['text']}" for r in rows)
-        data_hash = hashlib.sha256(concat_source.encode('utf-8')).hexdigest()[:16]
-        filename = f"{stem}_{data_hash}.{fmt}"
-        path = out_dir / filename
-
-        if fmt == 'csv':
-            with path.open('w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
-                writer.writeheader()
-                writer.writerows(rows)
-        else:
-            with path.open('w', encoding='utf-8') as f:
-                json.dump(rows, f, ensure_ascii=False, indent=2)
-
-        # Metadata
-        sentiments = {}
-        for r in rows:
-            sentiments[r['sentiment']] = sentiments.get(r['sentiment'], 0) + 1
-        meta = {
-            'rows': len(rows),
-            'class_distribution': sentiments,
-            'export_utc': timestamp,
-            'hash_prefix': data_hash,
-            'file': filename,
-            'min_length': min_length,
-            'format': fmt
-        }
-        meta_path = out_dir / f"{stem}_{data_hash}.meta.json"
-        with meta_path.open('w', encoding='utf-8') as f:
-            json.dump(meta, f, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Exported {meta['rows']} rows → {meta['file']}"))
+        if since is not None:
+            self.stdout.write(f"Delta since {meta['since']} (parent: {meta['parent'] or '-'})")
+        if meta['truncated']:
+            self.stdout.write(self.style.WARNING('Truncated by --limit: no watermark recorded for --since'))
+        self.stdout.write(f"Metadata: {meta['meta_file']}")
+        self.stdout.write(f"Class distribution: {meta['class_distribution']}")
 
-        self.stdout.write(self.style.SUCCESS(f"Exported {len(rows)} rows → {path.name}"))
-        self.stdout.write(f"Metadata: {meta_path.name}")
-        self.stdout.write(f"Class distribution: {sentiments}")
+    def _resolve_since(self, value, out_dir):
+        if not value:
+            return None, None
+        if value == 'latest':
+            parent = latest_export_meta(out_dir)
+            if parent is None:
+                raise CommandError(f'No previous export with a watermark in {out_dir}')
+            return parse_datetime(parent['watermark']), parent
+        if value.endswith('.json'):
+            path = Path(value) if Path(value).is_absolute() else out_dir / value
+            try:
+                with path.open(encoding='utf-8') as f:
+                    parent = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read export metadata {path}: {e}')
+            if not parent.get('watermark'):
+                raise CommandError(f'{path} has no watermark (exported before delta support)')
+            return parse_datetime(parent['watermark']), parent
+        since = parse_datetime(value)
+        if since is None:
+            try:
+                since = datetime.fromisoformat(value)
+            except ValueError:
+                raise CommandError(f'Invalid --since value: {value}')
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since, timezone.utc)
+        return since, None
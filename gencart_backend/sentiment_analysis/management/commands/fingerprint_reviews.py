@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sentiment_analysis.duplicates import fingerprint_corpus
+
+
+class Command(BaseCommand):
+    help = ("Store MinHash fingerprints and LSH band buckets for existing reviews and flag near-duplicates. "
+            "New reviews are fingerprinted when they are created.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Drop all fingerprints first (needed after changing signature parameters)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Reviews loaded per query')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        stats = fingerprint_corpus(rebuild=options['rebuild'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Fingerprinted {stats['fingerprinted']} reviews: {stats['duplicates']} near-duplicates flagged, "
+            f"{stats['too_short']} too short to fingerprint"
+        ))
@@ -2,7 +2,7 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 from products.models import Review, Product
 from users.models import User
-from sentiment_analysis.services import SentimentAnalysisService
+from sentiment_analysis.services import BilingualSentimentService, SentimentAnalysisService
 import logging
 from django.utils import timezone
 
@@ -72,8 +72,7 @@ class Command(BaseCommand):
         if unlabeled_count > 0:
             self.stdout.write(f'🔄 Processing {unlabeled_count} unlabeled reviews...')
             
-            service = SentimentAnalysisService()
-            stats = service.analyze_all_reviews()
+            stats = BilingualSentimentService().analyze_all_reviews()
             
             self.stdout.write(f'✅ Processed: {stats["processed"]} reviews')
             self.stdout.write(f'😊 Positive: {stats["positive"]}')
@@ -0,0 +1,32 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from sentiment_analysis.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the hourly sentiment rollup table that backs the trends endpoints from the reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=str, default=None, help='Only rebuild hours from this ISO timestamp on')
+        parser.add_argument('--days', type=int, default=None, help='Only rebuild the last N days')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since'] and options['days'] is not None:
+            raise CommandError('Use either --since or --days')
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f"Invalid --since value: {options['since']}")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        elif options['days'] is not None:
+            since = timezone.now() - timedelta(days=options['days'])
+
+        rows = rebuild_rollups(since=since, batch_size=options['batch_size'])
+        scope = f"since {since.isoformat()}" if since else 'for all reviews'
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} rollup rows {scope}"))
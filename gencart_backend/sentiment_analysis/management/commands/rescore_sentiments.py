@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sentiment_analysis.rescoring import RescoringJob, deployed_versions, stale_reviews
+
+
+class Command(BaseCommand):
+    help = ("Re-score reviews labeled by an older sentiment model, most-viewed products first, "
+            "throttled to a rows/second budget (SENTIMENT_RESCORE_ROWS_PER_SEC).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rate', type=float, default=None,
+                            help='Rows per second (default SENTIMENT_RESCORE_ROWS_PER_SEC; 0 = unthrottled)')
+        parser.add_argument('--max-rows', type=int, default=None, help='Stop after this many reviews')
+        parser.add_argument('--max-seconds', type=float, default=None, help='Stop after this long')
+        parser.add_argument('--product-id', type=int, default=None, help='Only re-score this product')
+        parser.add_argument('--batch-size', type=int, default=50, help='Stale reviews fetched per query')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many reviews are stale')
+
+    def handle(self, *args, **options):
+        deployed = deployed_versions()
+        if not deployed.naive_bayes:
+            raise CommandError('No trained Naive Bayes model on disk; train one first')
+        if options['dry_run']:
+            stale = stale_reviews(deployed, options['product_id']).count()
+            self.stdout.write(f"{stale} stale reviews (deployed versions: "
+                              f"{', '.join(deployed.naive_bayes + deployed.cascade + deployed.bert)})")
+            return
+        if options['rate'] is not None and options['rate'] < 0:
+            raise CommandError('--rate must not be negative')
+
+        job = RescoringJob(rows_per_second=options['rate'], batch_size=options['batch_size'])
+        stats = job.run(max_rows=options['max_rows'], product_id=options['product_id'],
+                        max_seconds=options['max_seconds'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-scored {stats['rescored']} reviews ({stats['changed']} changed sentiment, "
+            f"{stats['failed']} failed) in {stats['elapsed_seconds']}s; {stats['remaining']} still stale"
+        ))
@@ -0,0 +1,95 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from sentiment_analysis.inference_engine import build_bert_engine
+
+
+def make_handler(engine, max_texts):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send(200, {'status': 'ok', 'engine': engine.stats()})
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self._send(404, {'error': 'not found'})
+                return
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                texts = json.loads(self.rfile.read(length) or b'{}').get('texts')
+            except (ValueError, AttributeError):
+                self._send(400, {'error': 'invalid JSON body'})
+                return
+            if not isinstance(texts, list) or not texts or len(texts) > max_texts:
+                self._send(400, {'error': f'texts must be a list of 1..{max_texts} strings'})
+                return
+            try:
+                results = engine.predict_many([str(t) for t in texts])
+            except TimeoutError as e:
+                self._send(504, {'error': str(e)})
+                return
+            except Exception as e:
+                self._send(500, {'error': str(e)})
+                return
+            self._send(200, {'results': results})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = "Run a local BERT sentiment worker with dynamic micro-batching (POST /predict, GET /health)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--language', type=str, default='en', choices=['en', 'vi'])
+        parser.add_argument('--host', type=str, default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--max-batch', type=int, default=settings.SENTIMENT_BERT_MAX_BATCH)
+        parser.add_argument('--max-wait-ms', type=float, default=settings.SENTIMENT_BERT_MAX_WAIT_MS)
+        parser.add_argument('--timeout', type=float, default=settings.SENTIMENT_BERT_REQUEST_TIMEOUT,
+                            help='Per-request timeout in seconds')
+        parser.add_argument('--threads', type=int, default=settings.SENTIMENT_BERT_NUM_THREADS,
+                            help='torch intra-op threads (default: torch default)')
+        parser.add_argument('--quantize', action='store_true', default=settings.SENTIMENT_BERT_QUANTIZE,
+                            help='Dynamic int8 quantization of Linear layers (CPU only)')
+        parser.add_argument('--model-dir', type=str, default=settings.SENTIMENT_BERT_MODEL_DIR)
+
+    def handle(self, *args, **options):
+        engine = build_bert_engine(
+            options['language'],
+            model_dir=options['model_dir'],
+            max_batch_size=options['max_batch'],
+            max_wait_ms=options['max_wait_ms'],
+            timeout=options['timeout'],
+            num_threads=options['threads'],
+            quantize=options['quantize'],
+        )
+        engine.start()
+        server = ThreadingHTTPServer((options['host'], options['port']),
+                                     make_handler(engine, max_texts=options['max_batch'] * 8))
+        self.stdout.write(self.style.SUCCESS(
+            f"Sentiment worker listening on http://{options['host']}:{options['port']} "
+            f"(batch<={options['max_batch']}, wait<={options['max_wait_ms']}ms)"
+        ))
+        self.stdout.write("Point SENTIMENT_BERT_WORKER_URL at it to route model_type='bert' here.")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            engine.stop(timeout=5)
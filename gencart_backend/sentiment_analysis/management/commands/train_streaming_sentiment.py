@@ -0,0 +1,117 @@
+import csv
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from django.core.management.base import BaseCommand, CommandError
+import pandas as pd
+
+from sentiment_analysis.models import NaiveBayesSentimentAnalyzer
+from sentiment_analysis.streaming import iter_file_chunks, labeled_chunks
+
+POSITIVE_WORDS = ['great', 'excellent', 'love', 'fast', 'perfect', 'amazing', 'recommend', 'sturdy', 'beautiful']
+NEGATIVE_WORDS = ['terrible', 'broken', 'late', 'refund', 'poor', 'awful', 'cheap', 'disappointed', 'waste']
+FILLER_WORDS = ['product', 'delivery', 'quality', 'price', 'seller', 'package', 'color', 'size', 'battery',
+                'screen', 'shoes', 'shirt', 'phone', 'box', 'item', 'order', 'week', 'day', 'really', 'very']
+
+
+def write_synthetic_corpus(path: str, rows: int, seed: int = 0):
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['text', 'label'])
+        for _ in range(rows):
+            label = rng.randint(0, 1)
+            cue = POSITIVE_WORDS if label else NEGATIVE_WORDS
+            words = rng.choices(FILLER_WORDS, k=rng.randint(6, 30)) + rng.choices(cue, k=rng.randint(1, 3))
+            rng.shuffle(words)
+            writer.writerow([' '.join(words) + f' sku{rng.randint(0, rows)}', label])
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = "Train the Naive Bayes model out-of-core from a CSV/JSONL file, or benchmark streaming vs in-memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--input', type=str, help='CSV or JSONL file with text and label columns')
+        parser.add_argument('--language', type=str, default='en', choices=['en', 'vi'])
+        parser.add_argument('--text-col', type=str, default='text')
+        parser.add_argument('--label-col', type=str, default='label')
+        parser.add_argument('--chunk-size', type=int, default=10000)
+        parser.add_argument('--mode', choices=['stream', 'memory'], default='stream',
+                            help="'memory' runs the existing read-everything path for comparison")
+        parser.add_argument('--no-save', action='store_true', help='Do not overwrite the saved model')
+        parser.add_argument('--json', action='store_true', help='Print a single JSON line with the run stats')
+        parser.add_argument('--benchmark', type=int, default=0, metavar='ROWS',
+                            help='Generate a synthetic corpus of ROWS rows (unless --input) and compare both modes')
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            self._benchmark(options)
+            return
+        if not options['input']:
+            raise CommandError('--input is required')
+        if not os.path.exists(options['input']):
+            raise CommandError(f"Input file not found: {options['input']}")
+
+        analyzer = NaiveBayesSentimentAnalyzer(language=options['language'])
+        started = time.perf_counter()
+        if options['mode'] == 'stream':
+            stats = analyzer.train_streaming(
+                lambda: labeled_chunks(iter_file_chunks(options['input'], options['chunk_size']),
+                                       options['text_col'], options['label_col'])
+            )
+        else:
+            if options['input'].lower().endswith(('.jsonl', '.ndjson')):
+                frame = pd.read_json(options['input'], lines=True)
+            else:
+                frame = pd.read_csv(options['input'])
+            texts, labels = next(labeled_chunks([frame], options['text_col'], options['label_col']), ([], []))
+            stats = {'rows': len(texts), 'accuracy': analyzer.train(texts, labels)}
+        elapsed = time.perf_counter() - started
+        stats.update({'mode': options['mode'], 'seconds': elapsed,
+                      'rows_per_sec': stats['rows'] / elapsed if elapsed else 0.0, 'peak_rss_mb': peak_rss_mb()})
+
+        if not options['no_save']:
+            analyzer.save_model()
+        if options['json']:
+            self.stdout.write(json.dumps(stats))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained on {stats['rows']} rows in {elapsed:.1f}s ({stats['rows_per_sec']:.0f} rows/s), "
+            f"peak RSS {stats['peak_rss_mb']:.0f} MB"
+        ))
+        if 'accuracy' in stats:
+            self.stdout.write(f"Validation accuracy: {stats['accuracy']:.4f}")
+
+    def _benchmark(self, options):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = options['input']
+            if not path:
+                path = os.path.join(tmp, 'corpus.csv')
+                write_synthetic_corpus(path, options['benchmark'])
+                self.stdout.write(f"Synthetic corpus: {options['benchmark']} rows, "
+                                  f"{os.path.getsize(path) / 1e6:.1f} MB")
+            # Each mode runs in a fresh interpreter so peak RSS is not shared
+            for mode in ('memory', 'stream'):
+                cmd = [sys.executable, sys.argv[0], 'train_streaming_sentiment', '--input', path, '--mode', mode,
+                       '--language', options['language'], '--text-col', options['text_col'],
+                       '--label-col', options['label_col'], '--chunk-size', str(options['chunk_size']),
+                       '--no-save', '--json']
+                proc = subprocess.run(cmd, capture_output=True, text=True)
+                lines = [l for l in proc.stdout.splitlines() if l.startswith('{')]
+                if proc.returncode != 0 or not lines:
+                    raise CommandError(f"{mode} run failed: {proc.stderr.strip()[-500:]}")
+                stats = json.loads(lines[-1])
+                self.stdout.write(
+                    f"  {mode:6s}: {stats['rows_per_sec']:>9.0f} rows/s, peak RSS {stats['peak_rss_mb']:>7.1f} MB, "
+                    f"accuracy {stats.get('accuracy', float('nan')):.4f}"
+                )
@@ -0,0 +1,135 @@
+import csv
+import json
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+from products.models import Review
+from sentiment_analysis.feature_store import get_feature_store
+from sentiment_analysis.models import SentimentPreprocessor
+from sentiment_analysis.streaming import iter_file_chunks, labeled_chunks
+from sentiment_analysis.tuning import (
+    DEFAULT_CLASSIFIERS,
+    DEFAULT_VECTORIZER_GRID,
+    build_candidates,
+    successive_halving_search,
+)
+
+LEADERBOARD_COLUMNS = [
+    'rank', 'classifier', 'classifier_params', 'vectorizer_params', 'rung', 'samples',
+    'accuracy', 'accuracy_std', 'f1_macro', 'fit_seconds',
+    'latency_p50_ms', 'latency_p95_ms', 'model_size_kb', 'n_features',
+]
+
+
+class Command(BaseCommand):
+    help = "Stratified k-fold hyperparameter search (with successive halving) over TF-IDF + classifier grids."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=['db', 'kaggle', 'file'], default='db',
+                            help="Labeled reviews in the DB, the Kaggle dataset for --language, or --input")
+        parser.add_argument('--input', type=str, help='CSV/JSONL with text,label columns (for --source file)')
+        parser.add_argument('--language', choices=['en', 'vi'], default='en')
+        parser.add_argument('--limit', type=int, default=0, help='Use at most this many samples (0 = all)')
+        parser.add_argument('--folds', type=int, default=5)
+        parser.add_argument('--jobs', type=int, default=-1, help='joblib workers (-1 = all cores)')
+        parser.add_argument('--eta', type=int, default=3, help='Keep the best 1/eta candidates per halving rung')
+        parser.add_argument('--min-samples', type=int, default=None, help='Samples in the first halving rung')
+        parser.add_argument('--no-halving', action='store_true', help='Evaluate every candidate on the full data')
+        parser.add_argument('--classifiers', nargs='+', choices=sorted(DEFAULT_CLASSIFIERS),
+                            default=sorted(DEFAULT_CLASSIFIERS))
+        parser.add_argument('--vectorizer-grid', type=str, default=None,
+                            help='JSON object of TfidfVectorizer param lists, e.g. \'{"min_df": [1, 2]}\'')
+        parser.add_argument('--measure-top', type=int, default=10,
+                            help='Refit this many top candidates to measure latency and model size')
+        parser.add_argument('--output', type=str, default=None,
+                            help='Leaderboard CSV path (default: assets/reports/sentiment_tuning_<language>.csv)')
+
+    def handle(self, *args, **options):
+        texts, labels = self._load(options)
+        if options['limit']:
+            texts, labels = texts[:options['limit']], labels[:options['limit']]
+        if len(set(labels)) < 2:
+            raise CommandError('Need at least two label classes to tune a classifier.')
+        self.stdout.write(f"Dataset: {len(texts)} samples, classes {sorted(set(labels))}")
+
+        preprocessor = SentimentPreprocessor(options['language'])
+        store = get_feature_store()
+        started = time.perf_counter()
+        if store is not None:
+            processed = store.preprocess(texts, preprocessor)
+        else:
+            processed = preprocessor.preprocess_many(texts)
+        self.stdout.write(f"Preprocessed in {time.perf_counter() - started:.1f}s")
+
+        grid = DEFAULT_VECTORIZER_GRID
+        if options['vectorizer_grid']:
+            try:
+                grid = json.loads(options['vectorizer_grid'])
+            except ValueError as e:
+                raise CommandError(f'Invalid --vectorizer-grid JSON: {e}')
+        if 'ngram_range' in grid:
+            grid = {**grid, 'ngram_range': [tuple(v) for v in grid['ngram_range']]}
+        classifiers = {name: DEFAULT_CLASSIFIERS[name] for name in options['classifiers']}
+        candidates = build_candidates(grid, classifiers, base_vectorizer_params={
+            'stop_words': 'english' if options['language'] == 'en' else None,
+            'max_df': 0.95,
+        })
+        strategy = 'exhaustive' if options['no_halving'] else f"successive halving, eta={options['eta']}"
+        self.stdout.write(self.style.HTTP_INFO(
+            f"Searching {len(candidates)} candidates with {options['folds']}-fold CV ({strategy})"
+        ))
+
+        started = time.perf_counter()
+        try:
+            leaderboard = successive_halving_search(
+                processed, labels, candidates,
+                folds=options['folds'], eta=options['eta'], min_samples=options['min_samples'],
+                halving=not options['no_halving'], n_jobs=options['jobs'], measure_top=options['measure_top'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Search finished in {time.perf_counter() - started:.1f}s")
+
+        output = options['output'] or os.path.join('assets', 'reports', f"sentiment_tuning_{options['language']}.csv")
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=LEADERBOARD_COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(leaderboard)
+        with open(os.path.splitext(output)[0] + '.json', 'w', encoding='utf-8') as f:
+            json.dump(leaderboard, f, indent=2, default=str)
+
+        self.stdout.write(self.style.SUCCESS(f"Leaderboard written to {output}"))
+        for row in leaderboard[:10]:
+            latency = f"{row['latency_p50_ms']:.2f}ms" if 'latency_p50_ms' in row else '-'
+            size = f"{row['model_size_kb']:.0f}KB" if 'model_size_kb' in row else '-'
+            self.stdout.write(
+                f"  #{row['rank']:<3} acc={row['accuracy']:.4f}±{row['accuracy_std']:.3f} "
+                f"f1={row['f1_macro']:.4f} p50={latency} size={size}  "
+                f"{row['classifier']}({row['classifier_params']}) [{row['vectorizer_params']}]"
+            )
+
+    def _load(self, options):
+        if options['source'] == 'file':
+            if not options['input'] or not os.path.exists(options['input']):
+                raise CommandError('--source file requires an existing --input path')
+            texts, labels = [], []
+            for chunk_texts, chunk_labels in labeled_chunks(iter_file_chunks(options['input'])):
+                texts.extend(chunk_texts)
+                labels.extend(chunk_labels)
+            return texts, labels
+        if options['source'] == 'kaggle':
+            from sentiment_analysis.kaggle_loaders import EnglishSentimentLoader, VietnameseSentimentLoader
+            loader = EnglishSentimentLoader() if options['language'] == 'en' else VietnameseSentimentLoader()
+            df = loader.load()
+            return df['text'].astype(str).tolist(), df['label'].astype(int).tolist()
+
+        mapping = {'negative': 0, 'neutral': 1, 'positive': 2}
+        texts, labels = [], []
+        for r in Review.objects.filter(sentiment__isnull=False).values('title', 'comment', 'sentiment').order_by('id'):
+            text = f"{r['title'] or ''} {r['comment'] or ''}".strip()
+            if text:
+                texts.append(text)
+                labels.append(mapping.get(r['sentiment'], 1))
+        return texts, labels
@@ -0,0 +1,107 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+from sentiment_analysis.incremental import IncrementalNaiveBayesUpdater, training_lock
+
+
+class Command(BaseCommand):
+    help = "Fold reviews added since the last run into the saved Naive Bayes models (partial_fit)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--language', nargs='+', choices=['en', 'vi'], default=['en'])
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Force a full retrain from all labeled reviews (saved as a candidate)')
+        parser.add_argument('--promote', action='store_true',
+                            help='Deploy the pending rebuilt candidate (with --rebuild: deploy the new rebuild)')
+        parser.add_argument('--discard', action='store_true', help='Delete the pending rebuilt candidate')
+        parser.add_argument('--drift-threshold', type=float, default=None,
+                            help='OOV unigram rate that triggers a candidate rebuild (default: settings)')
+        parser.add_argument('--lag-seconds', type=int, default=None,
+                            help='Skip reviews created within this many seconds (default: settings)')
+        parser.add_argument('--loop', action='store_true', help='Keep running every --interval seconds')
+        parser.add_argument('--interval', type=int, default=300)
+
+    def handle(self, *args, **options):
+        if options['drift_threshold'] is not None and not 0 < options['drift_threshold'] <= 1:
+            raise CommandError('--drift-threshold must be in (0, 1]')
+        if options['discard'] and (options['promote'] or options['rebuild']):
+            raise CommandError('--discard cannot be combined with --promote or --rebuild')
+        updaters = [
+            IncrementalNaiveBayesUpdater(language, drift_threshold=options['drift_threshold'],
+                                         lag_seconds=options['lag_seconds'])
+            for language in options['language']
+        ]
+        if options['discard']:
+            for updater in updaters:
+                removed = updater.discard_candidate()
+                self.stdout.write(f"[{updater.language}] {'discarded candidate' if removed else 'no candidate'}")
+            return
+        if options['promote'] and not options['rebuild']:
+            for updater in updaters:
+                self._locked(updater, self._promote)
+            return
+
+        force_rebuild = options['rebuild']
+        while True:
+            for updater in updaters:
+                self._locked(updater, self._run, force_rebuild, options['promote'])
+            # --rebuild applies to the first pass only
+            force_rebuild = False
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def _locked(self, updater, fn, *args):
+        lock = training_lock(updater.language)
+        if not lock.acquire():
+            self.stdout.write(self.style.WARNING(f"[{updater.language}] training already running; skipped"))
+            return
+        try:
+            fn(updater, *args)
+        finally:
+            lock.release()
+
+    def _promote(self, updater):
+        candidate = updater.promote_candidate()
+        if candidate is None:
+            self.stdout.write(f"[{updater.language}] no candidate to promote")
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"[{updater.language}] promoted candidate ({candidate['reason']}, {candidate['rows']} reviews, "
+                f"accuracy {candidate['accuracy']:.4f})"
+            ))
+
+    def _report_rebuild(self, language, result, elapsed):
+        if result.get('pending'):
+            self.stdout.write(self.style.WARNING(
+                f"[{language}] candidate from {result['built_at']} ({result['reason']}) is waiting; "
+                f"run with --promote to deploy it"
+            ))
+        elif result.get('skipped'):
+            self.stdout.write(self.style.WARNING(
+                f"[{language}] rebuild ({result['reason']}) skipped: only {result['rows']} labeled reviews"
+            ))
+        else:
+            where = 'deployed' if result['promoted'] else 'saved as candidate; run with --promote to deploy it'
+            self.stdout.write(self.style.SUCCESS(
+                f"[{language}] full rebuild ({result['reason']}) on {result['rows']} reviews, "
+                f"accuracy {result['accuracy']:.4f} in {elapsed:.1f}s, {where}"
+            ))
+
+    def _run(self, updater, force_rebuild, promote):
+        started = time.perf_counter()
+        result = updater.run(force_rebuild=force_rebuild, promote=promote)
+        elapsed = time.perf_counter() - started
+        if result['mode'] == 'rebuild':
+            self._report_rebuild(updater.language, result, elapsed)
+            return
+        if result['consumed'] or result['skipped'] or result['other_language']:
+            self.stdout.write(self.style.SUCCESS(
+                f"[{updater.language}] consumed {result['consumed']} new reviews "
+                f"({result['skipped']} skipped, {result['other_language']} in another language), "
+                f"OOV rate {result['oov_rate']:.1%} in {elapsed:.2f}s"
+            ))
+        else:
+            self.stdout.write(f"[{updater.language}] no new reviews")
+        if 'candidate' in result:
+            self._report_rebuild(updater.language, result['candidate'], elapsed)
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SentimentTrainingWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(max_length=5, unique=True)),
+                ('last_analyzed_at', models.DateTimeField(blank=True, null=True)),
+                ('last_review_id', models.IntegerField(default=0)),
+                ('rows_consumed', models.IntegerField(default=0, help_text='Rows folded in since the last full rebuild')),
+                ('oov_terms', models.BigIntegerField(default=0)),
+                ('total_terms', models.BigIntegerField(default=0)),
+                ('last_full_rebuild_at', models.DateTimeField(blank=True, null=True)),
+                ('model_fingerprint', models.CharField(blank=True, max_length=32)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_rollups(apps, schema_editor):
+    # Same aggregation as rollups.rebuild_rollups(), against the historical models
+    from datetime import timezone
+    from django.db.models import Count, FloatField, Q, Sum
+    from django.db.models.functions import Coalesce, TruncHour
+    from sentiment_analysis.rollups import effective_sentiment_expression
+
+    Review = apps.get_model('products', 'Review')
+    SentimentRollup = apps.get_model('sentiment_analysis', 'SentimentRollup')
+    rows = (
+        Review.objects
+        .annotate(bucket=TruncHour('created_at', tzinfo=timezone.utc), effective=effective_sentiment_expression())
+        .values('bucket', 'product_id', 'effective')
+        .annotate(
+            effective_count=Count('id'),
+            analyzed_count=Count('id', filter=Q(sentiment__isnull=False)),
+            confidence_sum=Coalesce(Sum('sentiment_confidence', filter=Q(sentiment__isnull=False)), 0.0,
+                                    output_field=FloatField()),
+        )
+        .order_by()
+    )
+    SentimentRollup.objects.bulk_create(
+        (SentimentRollup(bucket=row['bucket'], product_id=row['product_id'], sentiment=row['effective'],
+                         effective_count=row['effective_count'], analyzed_count=row['analyzed_count'],
+                         confidence_sum=row['confidence_sum'])
+         for row in rows.iterator()),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_primary_image'),
+        ('sentiment_analysis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SentimentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the UTC hour')),
+                ('sentiment', models.CharField(max_length=10)),
+                ('effective_count', models.IntegerField(default=0)),
+                ('analyzed_count', models.IntegerField(default=0)),
+                ('confidence_sum', models.FloatField(default=0.0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sentiment_rollups', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'bucket'], name='sa_rollup_product_bucket_idx')],
+                'unique_together': {('bucket', 'product', 'sentiment')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_review_probability_columns'),
+        ('sentiment_analysis', '0002_sentiment_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductReviewHighlights',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='review_highlights', serialize=False, to='products.product')),
+                ('positive', models.JSONField(default=list)),
+                ('negative', models.JSONField(default=list)),
+                ('review_count', models.IntegerField(default=0)),
+                ('reviews_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('model_fingerprint', models.CharField(blank=True, max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Product review highlights',
+            },
+        ),
+    ]
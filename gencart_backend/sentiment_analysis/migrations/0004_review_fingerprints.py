@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_review_probability_columns'),
+        ('sentiment_analysis', '0003_product_review_highlights'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewFingerprint',
+            fields=[
+                ('review', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='products.review')),
+                ('signature', models.BinaryField()),
+                ('similarity', models.FloatField(blank=True, help_text='Estimated Jaccard similarity to duplicate_of', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('duplicate_of', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='near_duplicates', to='products.review')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReviewBandBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField(help_text="(band << 32) | crc32 of the band's signature slice")),
+                ('fingerprint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='sentiment_analysis.reviewfingerprint')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='sa_band_bucket_idx')],
+            },
+        ),
+    ]
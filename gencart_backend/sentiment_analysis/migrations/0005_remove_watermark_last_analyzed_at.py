@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:32
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sentiment_analysis', '0004_review_fingerprints'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='sentimenttrainingwatermark',
+            name='last_analyzed_at',
+        ),
+    ]
@@ -0,0 +1,187 @@
+"""
+Versioned, memory-mapped on-disk format for compiled sentiment models.
+
+Layout of an artifact directory (e.g. sentiment_models/naive_bayes_sentiment_en.mmap/):
+
+    manifest.json           format/version, tokenizer settings, source pickle fingerprint
+    vocab_terms.bin         UTF-8 n-grams concatenated in byte-sorted order
+    vocab_offsets.npy       int64[n + 1] start offsets into vocab_terms.bin
+    vocab_columns.npy       int32[n] feature column of each sorted term
+    idf.npy                 float64[n_features] (absent when the vectorizer has no idf)
+    feature_log_prob.npy    float64[n_features, n_classes] (feature-major)
+    class_log_prior.npy     float64[n_classes]
+    classes.npy             class labels
+
+Everything is opened with mmap_mode='r', so gunicorn workers share the pages through
+the OS page cache instead of each unpickling a vocabulary dict and arrays.
+"""
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+import json
+import logging
+import mmap
+import os
+import shutil
+
+import numpy as np
+
+from .compiled_scorer import CompiledNBScorer
+from .prediction_cache import file_fingerprint
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT = 'gencart-sentiment-mmap'
+ARTIFACT_VERSION = 1
+
+
+class SortedVocabulary:
+    """Read-only n-gram -> column mapping backed by a byte-sorted, memory-mapped term file."""
+
+    def __init__(self, terms_path: str, offsets: np.ndarray, columns: np.ndarray):
+        self._offsets = offsets
+        self._columns = columns
+        self._size = len(columns)
+        if self._size:
+            with open(terms_path, 'rb') as f:
+                self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._blob = b''
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _term(self, i: int) -> bytes:
+        return self._blob[int(self._offsets[i]):int(self._offsets[i + 1])]
+
+    def get(self, term: str, default=None) -> Optional[int]:
+        key = term.encode('utf-8')
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            probe = self._term(mid)
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return int(self._columns[mid])
+        return default
+
+    def __contains__(self, term: str) -> bool:
+        return self.get(term) is not None
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        for i in range(self._size):
+            yield self._term(i).decode('utf-8'), int(self._columns[i])
+
+
+def artifact_dir_for(model_path: str) -> Path:
+    """Artifact directory that sits next to a pickle: foo.pkl -> foo.mmap/"""
+    return Path(model_path).with_suffix('.mmap')
+
+
+def write_artifact(scorer: CompiledNBScorer, directory, kind: str, source_files: Tuple[str, ...] = ()) -> Path:
+    """Write scorer as an artifact directory, replacing any previous version atomically."""
+    directory = Path(directory)
+    tmp_dir = directory.with_name(f"{directory.name}.tmp-{os.getpid()}")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    encoded = sorted((term.encode('utf-8'), col) for term, col in scorer.vocabulary.items())
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    with open(tmp_dir / 'vocab_terms.bin', 'wb') as f:
+        pos = 0
+        for i, (term, _) in enumerate(encoded):
+            f.write(term)
+            pos += len(term)
+            offsets[i + 1] = pos
+    np.save(tmp_dir / 'vocab_offsets.npy', offsets)
+    np.save(tmp_dir / 'vocab_columns.npy', np.array([col for _, col in encoded], dtype=np.int32))
+    if scorer.idf is not None:
+        np.save(tmp_dir / 'idf.npy', np.ascontiguousarray(scorer.idf))
+    np.save(tmp_dir / 'feature_log_prob.npy', np.ascontiguousarray(scorer.feature_log_prob))
+    np.save(tmp_dir / 'class_log_prior.npy', scorer.class_log_prior)
+    np.save(tmp_dir / 'classes.npy', np.asarray(scorer.classes))
+
+    manifest = {
+        'format': ARTIFACT_FORMAT,
+        'artifact_version': ARTIFACT_VERSION,
+        'kind': kind,
+        'n_features': int(scorer.feature_log_prob.shape[0]),
+        'n_classes': int(scorer.feature_log_prob.shape[1]),
+        'scorer': scorer.meta(),
+        'source_files': [os.path.basename(p) for p in source_files],
+        'source_fingerprint': file_fingerprint(*source_files) if source_files else None,
+    }
+    with open(tmp_dir / 'manifest.json', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    # Swap directories; workers that still map the old files keep valid (unlinked) pages
+    old_dir = directory.with_name(f"{directory.name}.old-{os.getpid()}")
+    if directory.exists():
+        os.replace(directory, old_dir)
+    os.replace(tmp_dir, directory)
+    if old_dir.exists():
+        shutil.rmtree(old_dir, ignore_errors=True)
+    logger.info(f"Wrote {kind} model artifact to {directory}")
+    return directory
+
+
+def read_manifest(directory) -> Optional[Dict]:
+    path = Path(directory) / 'manifest.json'
+    if not path.exists():
+        return None
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != ARTIFACT_FORMAT or manifest.get('artifact_version') != ARTIFACT_VERSION:
+        logger.warning(f"Ignoring model artifact {directory}: unsupported format {manifest.get('artifact_version')}")
+        return None
+    return manifest
+
+
+def load_artifact(directory, source_files: Tuple[str, ...] = ()) -> Optional[CompiledNBScorer]:
+    """Open an artifact with memory-mapped arrays.
+
+    When source_files are given, the artifact is only used if it was converted from
+    exactly those files (same size/mtime); otherwise None is returned so callers fall
+    back to the pickles instead of serving a stale model.
+    """
+    directory = Path(directory)
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return None
+    if source_files and manifest.get('source_fingerprint') != file_fingerprint(*source_files):
+        logger.info(f"Model artifact {directory} is stale relative to {source_files[0]}; ignoring")
+        return None
+
+    meta = manifest['scorer']
+    vocabulary = SortedVocabulary(
+        str(directory / 'vocab_terms.bin'),
+        np.load(directory / 'vocab_offsets.npy', mmap_mode='r'),
+        np.load(directory / 'vocab_columns.npy', mmap_mode='r'),
+    )
+    return CompiledNBScorer(
+        vocabulary=vocabulary,
+        idf=np.load(directory / 'idf.npy', mmap_mode='r') if meta['has_idf'] else None,
+        feature_log_prob=np.load(directory / 'feature_log_prob.npy', mmap_mode='r'),
+        class_log_prior=np.load(directory / 'class_log_prior.npy'),
+        classes=np.load(directory / 'classes.npy'),
+        ngram_range=tuple(meta['ngram_range']),
+        stop_words=meta['stop_words'],
+        token_pattern=meta['token_pattern'],
+        lowercase=meta['lowercase'],
+        norm=meta['norm'],
+        sublinear_tf=meta['sublinear_tf'],
+        feature_major=True,
+    )
+
+
+def convert_pickles(model_path: str, vectorizer_path: str, directory, kind: str) -> Path:
+    """Converter from the existing joblib pickles."""
+    import joblib
+
+    model = joblib.load(model_path)
+    vectorizer = joblib.load(vectorizer_path)
+    scorer = CompiledNBScorer.from_sklearn(vectorizer, model)
+    return write_artifact(scorer, directory, kind, source_files=(model_path, vectorizer_path))
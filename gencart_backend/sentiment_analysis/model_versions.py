@@ -0,0 +1,163 @@
+"""
+Version ids for the sentiment models reviews are scored with.
+
+NaiveBayesSentimentAnalyzer.save_model() records `<model file>.version.json` next to the
+pickles (train_models, train_bilingual_sentiment, incremental updates, ...). The id is
+the language plus a content hash of the model and vectorizer files, e.g. 'en-3f2a9c1b7d0e',
+so the same files carry the same id on every host. Files without a matching sidecar
+(copied in by hand, trained before versioning) get the identical hash computed once per
+file fingerprint.
+
+BERT ids hash the config, tokenizer and weight files in SENTIMENT_BERT_MODEL_DIR the same
+way ('bert-9c1b7d0e1234'); without a local model directory the hub model has no files to
+hash and the id is plain 'bert'. Cascade labels append the BERT threshold and, for a local
+model, its hash ('en-3f2a9c1b7d0e+bert0.75' or 'en-3f2a9c1b7d0e+bert0.75-9c1b7d0e1234').
+
+Reviews store the id they were labeled with in Review.sentiment_model_version. A label is
+stale when it differs from the id its own model family would write now (see rescoring.py).
+"""
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from .prediction_cache import file_fingerprint
+
+logger = logging.getLogger(__name__)
+
+LANGUAGES = ('en', 'vi')
+
+_resolved: Dict[Tuple[str, str], Tuple[str, str]] = {}
+_resolved_lock = threading.Lock()
+
+
+def version_path(model_path: str) -> str:
+    return f"{model_path}.version.json"
+
+
+def content_version(language: str, *paths: str) -> str:
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return f"{language}-{digest.hexdigest()[:12]}"
+
+
+def record_model_version(language: str, model_path: str, vectorizer_path: str) -> str:
+    """Write the version sidecar for freshly saved model files and return the id."""
+    version = content_version(language, model_path, vectorizer_path)
+    fingerprint = file_fingerprint(model_path, vectorizer_path)
+    payload = {
+        'version': version,
+        'language': language,
+        'fingerprint': fingerprint,
+        'saved_at': datetime.now(dt_timezone.utc).isoformat(),
+    }
+    path = version_path(model_path)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+    with _resolved_lock:
+        _resolved[(model_path, vectorizer_path)] = (fingerprint, version)
+    return version
+
+
+def read_model_version(language: str, model_path: str, vectorizer_path: str) -> str:
+    """Version id of model files on disk, from the sidecar when it describes these exact files."""
+    fingerprint = file_fingerprint(model_path, vectorizer_path)
+    key = (model_path, vectorizer_path)
+    with _resolved_lock:
+        cached = _resolved.get(key)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+    version = None
+    try:
+        with open(version_path(model_path), encoding='utf-8') as f:
+            payload = json.load(f)
+        if payload.get('fingerprint') == fingerprint:
+            version = payload['version']
+    except (OSError, ValueError, KeyError):
+        pass
+    if version is None:
+        version = content_version(language, model_path, vectorizer_path)
+    with _resolved_lock:
+        _resolved[key] = (fingerprint, version)
+    return version
+
+
+def current_model_version(language: str = 'en') -> Optional[str]:
+    """Version of the Naive Bayes model load_model() would use for `language`, None if untrained."""
+    from .models import resolve_naive_bayes_model_files
+    files = resolve_naive_bayes_model_files(language)
+    return read_model_version(language, *files) if files else None
+
+
+# Files in a save_pretrained directory that change BERT predictions
+BERT_MODEL_SUFFIXES = ('.json', '.safetensors', '.bin', '.h5', '.txt', '.model')
+
+
+def bert_model_files(model_dir: str) -> List[str]:
+    try:
+        names = sorted(os.listdir(model_dir))
+    except OSError:
+        return []
+    return [os.path.join(model_dir, name) for name in names
+            if name.endswith(BERT_MODEL_SUFFIXES) and os.path.isfile(os.path.join(model_dir, name))]
+
+
+def bert_model_version() -> str:
+    """Version of the BERT model SENTIMENT_BERT_MODEL_DIR holds, 'bert' for the hub model."""
+    from django.conf import settings
+    model_dir = getattr(settings, 'SENTIMENT_BERT_MODEL_DIR', None)
+    files = bert_model_files(model_dir) if model_dir else []
+    if not files:
+        return 'bert'
+    fingerprint = file_fingerprint(*files)
+    key = tuple(files)
+    with _resolved_lock:
+        cached = _resolved.get(key)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+    version = content_version('bert', *files)
+    with _resolved_lock:
+        _resolved[key] = (fingerprint, version)
+    return version
+
+
+def scoring_version(model_type: str, language: str) -> str:
+    """Id stored on reviews labeled by SentimentAnalysisService(language, model_type)."""
+    if model_type == 'bert':
+        return bert_model_version()
+    version = current_model_version(language) or f"{language}-untrained"
+    if model_type == 'cascade':
+        # Escalated texts also depend on the BERT model and threshold
+        from django.conf import settings
+        version += f"+bert{getattr(settings, 'SENTIMENT_CASCADE_THRESHOLD', 0.75)}"
+        bert = bert_model_version()
+        if bert != 'bert':
+            version += bert[len('bert'):]
+    return version
+
+
+def current_versions(languages=LANGUAGES) -> List[str]:
+    """Deployed Naive Bayes versions; reviews labeled with anything else are stale."""
+    return [v for v in (current_model_version(language) for language in languages) if v]
+
+
+def current_cascade_versions(languages=LANGUAGES) -> List[str]:
+    """Ids cascade scoring writes now, for languages with a deployed Naive Bayes model."""
+    return [scoring_version('cascade', language) for language in languages if current_model_version(language)]
+
+
+def model_family(version: Optional[str]) -> str:
+    """'bert', 'cascade' or 'naive_bayes' (including unversioned labels) for a stored id."""
+    if version == 'bert' or (version or '').startswith('bert-'):
+        return 'bert'
+    if version and '+bert' in version:
+        return 'cascade'
+    return 'naive_bayes'
@@ -1,5 +1,7 @@
+import copy
 import os
 import pickle
+import time
 import numpy as np
 import pandas as pd
 from typing import Dict, List, Tuple, Optional
@@ -14,6 +16,8 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
 
+from .prediction_cache import file_fingerprint
+
 # (Removed TensorFlow/LSTM placeholder; current system does not implement LSTM)
 
 # Optional Transformer Libraries
@@ -40,6 +44,9 @@ logger = logging.getLogger(__name__)
 class SentimentPreprocessor:
     """Text preprocessing for sentiment analysis"""
     
+    # Bump whenever preprocess() output changes; cached features are keyed on it
+    VERSION = 1
+    
     def __init__(self, language='en'):
         self.language = language
         self._download_nltk_data()
@@ -116,17 +123,9 @@ class SentimentPreprocessor:
         if not VIETNAMESE_SUPPORT:
             return text.split()
         
-        try:
-            # Use underthesea for word segmentation
-            tokens = word_tokenize(text)
-            return tokens
-        except:
-            # Fallback to pyvi
-            try:
-                tokens = ViTokenizer.tokenize(text).split()
-                return tokens
-            except:
-                return text.split()
+        # underthesea -> pyvi fallback, behind the shared LRU + on-disk token cache
+        from .tokenization import get_vietnamese_tokenizer
+        return get_vietnamese_tokenizer().tokenize(text)
     
     def preprocess(self, text: str) -> str:
         """Main preprocessing function"""
@@ -137,51 +136,136 @@ class SentimentPreprocessor:
             return ' '.join(tokens)
         
         return text
+    
+    def preprocess_many(self, texts: List[str]) -> List[str]:
+        """preprocess() for a corpus; Vietnamese segmentation runs as one cached, parallel batch"""
+        if self.language != 'vi' or not VIETNAMESE_SUPPORT:
+            return [self.preprocess(text) for text in texts]
+        from .tokenization import get_vietnamese_tokenizer
+        cleaned = [self.clean_text(text) for text in texts]
+        return [' '.join(tokens) for tokens in get_vietnamese_tokenizer().tokenize_many(cleaned)]
+
+
+def naive_bayes_model_paths(language='en') -> Dict[str, 'Path']:
+    """Candidate Naive Bayes model/vectorizer paths for a language, in lookup order.
+
+    Canonical model directory: top-level /sentiment_models (repo root)
+    Fallbacks: app-local gencart_backend/sentiment_models and legacy non-suffixed files
+    """
+    from pathlib import Path
+    suffix = 'en' if language == 'en' else 'vi'
+    # repo root = three levels up from this file: gencart_backend/sentiment_analysis/models.py
+    repo_root = Path(__file__).resolve().parents[2]
+    root_models_dir = repo_root / 'sentiment_models'
+    app_models_dir = Path(__file__).resolve().parents[1] / 'sentiment_models'
+    return {
+        'canonical_model': root_models_dir / f"naive_bayes_sentiment_{suffix}.pkl",
+        'canonical_vec': root_models_dir / f"vectorizer_sentiment_{suffix}.pkl",
+        'app_model': app_models_dir / f"naive_bayes_sentiment_{suffix}.pkl",
+        'app_vec': app_models_dir / f"vectorizer_sentiment_{suffix}.pkl",
+        'legacy_model': root_models_dir / 'naive_bayes_sentiment.pkl',
+        'legacy_vec': root_models_dir / 'vectorizer_sentiment.pkl',
+        'legacy_app_model': app_models_dir / 'naive_bayes_sentiment.pkl',
+        'legacy_app_vec': app_models_dir / 'vectorizer_sentiment.pkl',
+    }
+
+
+def resolve_naive_bayes_model_files(language='en', paths: Optional[Dict] = None) -> Optional[Tuple[str, str]]:
+    """Return the (model, vectorizer) pair load_model would pick, or None if nothing is on disk."""
+    paths = paths or naive_bayes_model_paths(language)
+    for m_key, v_key in (
+        ('canonical_model', 'canonical_vec'),
+        ('app_model', 'app_vec'),
+        ('legacy_model', 'legacy_vec'),
+        ('legacy_app_model', 'legacy_app_vec'),
+    ):
+        m_path, v_path = str(paths[m_key]), str(paths[v_key])
+        if os.path.exists(m_path) and os.path.exists(v_path):
+            return m_path, v_path
+    return None
 
 
 class NaiveBayesSentimentAnalyzer:
     """Naive Bayes sentiment analysis model"""
     
-    def __init__(self, language='en'):
+    # Seconds between checks for model files replaced by a background update
+    RELOAD_CHECK_INTERVAL = 5.0
+    
+    def __init__(self, language='en', feature_store=None, lexicon_features=False):
         self.language = language
         self.preprocessor = SentimentPreprocessor(language)
+        # Optional FeatureStore: reuse preprocessed texts / fitted TF-IDF across training runs
+        self.feature_store = feature_store
+        # Append emotion lexicon match counts to the TF-IDF features (see lexicon.py)
+        self.lexicon_features = lexicon_features
+        self.vectorizer = self._build_vectorizer()
+        self.model = MultinomialNB()
+        self.is_trained = False
+        # NumPy scoring table compiled from vectorizer + model (see compiled_scorer.py)
+        self.scorer = None
+        # Pickles not yet unpickled because predict is served from a memory-mapped artifact
+        self._deferred_files = None
+        self._paths = naive_bayes_model_paths(language)
+        # Files load_model read from, and their fingerprint, for reload_if_changed()
+        self._loaded_files = None
+        self._loaded_fingerprint = None
+        self._last_reload_check = 0.0
+        # ensure canonical dir exists for saves
+        self._paths['canonical_model'].parent.mkdir(parents=True, exist_ok=True)
+        self.model_path = str(self._paths['canonical_model'])
+        self.vectorizer_path = str(self._paths['canonical_vec'])
+
+    def _build_vectorizer(self):
         # Configure TF-IDF per documented defaults
-        self.vectorizer = TfidfVectorizer(
+        vectorizer = TfidfVectorizer(
             max_features=5000,
-            stop_words='english' if language == 'en' else None,
+            stop_words='english' if self.language == 'en' else None,
             ngram_range=(1, 2),
             min_df=2,
             max_df=0.95,
         )
-        self.model = MultinomialNB()
-        self.is_trained = False
-        # Canonical model directory: top-level /sentiment_models (repo root)
-        # Fallbacks: app-local gencart_backend/sentiment_models and legacy non-suffixed files
-        from pathlib import Path
-        suffix = 'en' if language == 'en' else 'vi'
-        # repo root = three levels up from this file: gencart_backend/sentiment_analysis/models.py
-        repo_root = Path(__file__).resolve().parents[2]
-        root_models_dir = repo_root / 'sentiment_models'
-        app_models_dir = Path(__file__).resolve().parents[1] / 'sentiment_models'
-        # ensure canonical dir exists for saves
-        root_models_dir.mkdir(parents=True, exist_ok=True)
-        self._paths = {
-            'canonical_model': root_models_dir / f"naive_bayes_sentiment_{suffix}.pkl",
-            'canonical_vec': root_models_dir / f"vectorizer_sentiment_{suffix}.pkl",
-            'app_model': app_models_dir / f"naive_bayes_sentiment_{suffix}.pkl",
-            'app_vec': app_models_dir / f"vectorizer_sentiment_{suffix}.pkl",
-            'legacy_model': root_models_dir / 'naive_bayes_sentiment.pkl',
-            'legacy_vec': root_models_dir / 'vectorizer_sentiment.pkl',
-            'legacy_app_model': app_models_dir / 'naive_bayes_sentiment.pkl',
-            'legacy_app_vec': app_models_dir / 'vectorizer_sentiment.pkl',
-        }
-        self.model_path = str(self._paths['canonical_model'])
-        self.vectorizer_path = str(self._paths['canonical_vec'])
+        if self.lexicon_features:
+            # Saved with the vectorizer pickle, so load_model restores the extra columns
+            from .lexicon import LexiconFeatureVectorizer, default_emotion_lexicons
+            vectorizer = LexiconFeatureVectorizer(vectorizer, default_emotion_lexicons(self.language))
+        return vectorizer
+
+    # model/vectorizer are unpickled on first access when load_model used the mmap artifact
+    @property
+    def model(self):
+        self._load_deferred()
+        return self._model
+
+    @model.setter
+    def model(self, value):
+        self._deferred_files = None
+        self._model = value
+
+    @property
+    def vectorizer(self):
+        self._load_deferred()
+        return self._vectorizer
+
+    @vectorizer.setter
+    def vectorizer(self, value):
+        self._deferred_files = None
+        self._vectorizer = value
+
+    def _load_deferred(self):
+        files = self.__dict__.get('_deferred_files')
+        if files:
+            self._deferred_files = None
+            self._model = joblib.load(files[0])
+            self._vectorizer = joblib.load(files[1])
     
     def prepare_data(self, texts: List[str], labels: List[int]) -> Tuple[np.ndarray, np.ndarray]:
         """Prepare data for training"""
+        if self.feature_store is not None:
+            X, self.vectorizer = self.feature_store.fit_transform(texts, self.preprocessor, self.vectorizer)
+            return X, np.array(labels)
+        
         # Preprocess texts
-        processed_texts = [self.preprocessor.preprocess(text) for text in texts]
+        processed_texts = self.preprocessor.preprocess_many(texts)
         
         # Vectorize
         X = self.vectorizer.fit_transform(processed_texts)
@@ -210,6 +294,7 @@ class NaiveBayesSentimentAnalyzer:
         logger.info(f"Classification Report:\n{classification_report(y_test, y_pred)}")
         
         self.is_trained = True
+        self._compile_scorer()
         return accuracy
     
     def train_with_validation(self, X_train, y_train, X_val=None, y_val=None):
@@ -219,18 +304,16 @@ class NaiveBayesSentimentAnalyzer:
         logger.info("Training Naive Bayes with validation...")
         
         # Configure vectorizer for better performance
-        self.vectorizer = TfidfVectorizer(
-            max_features=5000,
-            stop_words='english' if self.language == 'en' else None,
-            ngram_range=(1, 2),
-            min_df=2,
-            max_df=0.95
-        )
+        self.vectorizer = self._build_vectorizer()
         
         # Handle text preprocessing if needed
-        if isinstance(X_train[0], str):
+        if isinstance(X_train[0], str) and self.feature_store is not None:
+            X_train_vec, self.vectorizer = self.feature_store.fit_transform(
+                list(X_train), self.preprocessor, self.vectorizer
+            )
+        elif isinstance(X_train[0], str):
             # Preprocess texts
-            X_train_processed = [self.preprocessor.preprocess(text) for text in X_train]
+            X_train_processed = self.preprocessor.preprocess_many(X_train)
             X_train_vec = self.vectorizer.fit_transform(X_train_processed)
         else:
             # Already vectorized
@@ -241,12 +324,14 @@ class NaiveBayesSentimentAnalyzer:
         self.model.fit(X_train_vec, y_train)
         
         # Validation evaluation
-        results = {'training_completed': True}
+        results = {'training_completed': True, 'train_accuracy': self.model.score(X_train_vec, y_train)}
         
         if X_val is not None and y_val is not None:
             # Preprocess validation texts if needed
-            if isinstance(X_val[0], str):
-                X_val_processed = [self.preprocessor.preprocess(text) for text in X_val]
+            if isinstance(X_val[0], str) and self.feature_store is not None:
+                X_val_vec = self.feature_store.transform(list(X_val), self.preprocessor, self.vectorizer)
+            elif isinstance(X_val[0], str):
+                X_val_processed = self.preprocessor.preprocess_many(X_val)
                 X_val_vec = self.vectorizer.transform(X_val_processed)
             else:
                 X_val_vec = X_val
@@ -270,27 +355,77 @@ class NaiveBayesSentimentAnalyzer:
             logger.info(f"Validation F1-Score: {f1:.4f}")
         
         self.is_trained = True
+        self._compile_scorer()
         return results
     
-    def predict(self, text: str) -> Dict[str, float]:
-        """Predict sentiment for a single text"""
+    def train_streaming(self, chunk_source, chunk_classes=(0, 1), **trainer_options) -> Dict:
+        """Out-of-core training; chunk_source() must return a fresh iterator of (texts, labels) chunks"""
+        from .streaming import StreamingNaiveBayesTrainer
+        
+        logger.info("Training Naive Bayes model from stream...")
+        trainer = StreamingNaiveBayesTrainer(
+            language=self.language, preprocess=self.preprocessor.preprocess, **trainer_options
+        )
+        self.vectorizer, self.model = trainer.fit(chunk_source, classes=chunk_classes)
+        if 'accuracy' in trainer.stats:
+            logger.info(f"Streaming Naive Bayes validation accuracy: {trainer.stats['accuracy']:.4f}")
+        
+        self.is_trained = True
+        self._compile_scorer()
+        return trainer.stats
+    
+    UNTRAINED_RESULT = {'sentiment': 'neutral', 'confidence': 0.0,
+                        'probabilities': {'negative': 0.33, 'neutral': 0.34, 'positive': 0.33}}
+    
+    def _ensure_loaded(self) -> bool:
         if not self.is_trained:
             self.load_model()
-        
+        else:
+            self.reload_if_changed()
         if not self.is_trained:
             logger.error("Model not loaded. Cannot make predictions.")
-            return {'sentiment': 'neutral', 'confidence': 0.0, 'probabilities': {'negative': 0.33, 'neutral': 0.34, 'positive': 0.33}}
+        return self.is_trained
+    
+    def predict(self, text: str) -> Dict[str, float]:
+        """Predict sentiment for a single text"""
+        if not self._ensure_loaded():
+            return copy.deepcopy(self.UNTRAINED_RESULT)
         
         processed_text = self.preprocessor.preprocess(text)
-        X = self.vectorizer.transform([processed_text])
         
-        # Get prediction probabilities
-        probabilities = self.model.predict_proba(X)[0]
-        raw_prediction = self.model.predict(X)[0]
+        # Get prediction probabilities (compiled scorer skips sklearn's per-call overhead)
+        if self.scorer is not None:
+            classes = self.scorer.classes.tolist()
+            probabilities = self.scorer.predict_proba(processed_text)
+            raw_prediction = classes[int(np.argmax(probabilities))]
+        else:
+            # Get class names from the model
+            classes = list(self.model.classes_)
+            X = self.vectorizer.transform([processed_text])
+            probabilities = self.model.predict_proba(X)[0]
+            raw_prediction = self.model.predict(X)[0]
         
-        # Get class names from the model
-        classes = list(self.model.classes_)
+        return self._result(classes, probabilities, raw_prediction)
+    
+    def predict_batch(self, texts: List[str]) -> List[Dict[str, float]]:
+        """predict() for several texts: one preprocess_many pass and one sparse predict_proba"""
+        if not texts:
+            return []
+        if not self._ensure_loaded():
+            return [copy.deepcopy(self.UNTRAINED_RESULT) for _ in texts]
         
+        processed = self.preprocessor.preprocess_many(list(texts))
+        if self._deferred_files:
+            # Served from the memory-mapped artifact; a batch does not justify unpickling the model
+            classes = self.scorer.classes.tolist()
+            rows = [self.scorer.predict_proba(text) for text in processed]
+        else:
+            classes = list(self.model.classes_)
+            rows = self.model.predict_proba(self.vectorizer.transform(processed))
+        return [self._result(classes, row, classes[int(np.argmax(row))]) for row in rows]
+    
+    @staticmethod
+    def _result(classes, probabilities, raw_prediction) -> Dict[str, float]:
         # Helper to map class label to sentiment string
         def to_sentiment(cls_val):
             # Numeric binary {0,1}
@@ -327,60 +462,107 @@ class NaiveBayesSentimentAnalyzer:
     def save_model(self):
         """Save the trained model"""
         os.makedirs('sentiment_models', exist_ok=True)
-        joblib.dump(self.model, self.model_path)
-        joblib.dump(self.vectorizer, self.vectorizer_path)
-        logger.info(f"Model saved to {self.model_path}")
+        # Write-then-rename so processes reloading the model never see a half-written pickle
+        for obj, path in ((self.model, self.model_path), (self.vectorizer, self.vectorizer_path)):
+            tmp_path = f"{path}.tmp-{os.getpid()}"
+            joblib.dump(obj, tmp_path)
+            os.replace(tmp_path, path)
+        self._loaded_fingerprint = file_fingerprint(self.model_path, self.vectorizer_path)
+        from .model_versions import record_model_version
+        version = record_model_version(self.language, self.model_path, self.vectorizer_path)
+        logger.info(f"Model saved to {self.model_path} (version {version})")
+        # Keep an existing memory-mapped artifact in sync with the new pickles
+        from .model_artifacts import artifact_dir_for, write_artifact
+        artifact_dir = artifact_dir_for(self.model_path)
+        if artifact_dir.exists() and self.scorer is not None:
+            write_artifact(self.scorer, artifact_dir, 'multinomial_nb',
+                           source_files=(self.model_path, self.vectorizer_path))
     
     def load_model(self):
         """Load a pre-trained model"""
         try:
-            # Try canonical language-specific files first
-            if os.path.exists(self.model_path) and os.path.exists(self.vectorizer_path):
-                self.model = joblib.load(self.model_path)
-                self.vectorizer = joblib.load(self.vectorizer_path)
-                self.is_trained = True
-                logger.info(f"Model loaded from {self.model_path}")
+            files = resolve_naive_bayes_model_files(self.language, self._paths)
+            if files is None:
+                logger.warning("No saved sentiment model found in known locations")
                 return
-
-            # Fallbacks: app-local language-specific
-            app_model = str(self._paths['app_model'])
-            app_vec = str(self._paths['app_vec'])
-            if os.path.exists(app_model) and os.path.exists(app_vec):
-                self.model = joblib.load(app_model)
-                self.vectorizer = joblib.load(app_vec)
+            m_path, v_path = files
+            self._loaded_files = (m_path, v_path)
+            self._loaded_fingerprint = file_fingerprint(m_path, v_path)
+            self._last_reload_check = time.monotonic()
+            # Prefer the shared, memory-mapped artifact converted from these exact pickles
+            from .model_artifacts import artifact_dir_for, load_artifact
+            scorer = load_artifact(artifact_dir_for(m_path), source_files=(m_path, v_path))
+            if scorer is not None:
+                self.scorer = scorer
+                self._deferred_files = (m_path, v_path)
                 self.is_trained = True
-                logger.info(f"Model loaded from {app_model}")
+                logger.info(f"Model loaded from {artifact_dir_for(m_path)} (memory-mapped)")
                 return
-
-            # Legacy non-language-specific (root then app)
-            for m_key, v_key in (
-                ('legacy_model', 'legacy_vec'),
-                ('legacy_app_model', 'legacy_app_vec'),
-            ):
-                m_path = str(self._paths[m_key])
-                v_path = str(self._paths[v_key])
-                if os.path.exists(m_path) and os.path.exists(v_path):
-                    self.model = joblib.load(m_path)
-                    self.vectorizer = joblib.load(v_path)
-                    self.is_trained = True
-                    logger.info(f"Loaded legacy sentiment model files: {m_path}")
-                    return
-
-            logger.warning("No saved sentiment model found in known locations")
+            self.model = joblib.load(m_path)
+            self.vectorizer = joblib.load(v_path)
+            self.is_trained = True
+            self._compile_scorer()
+            logger.info(f"Model loaded from {m_path}")
         except Exception as e:
             logger.error(f"Error loading model: {e}")
 
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """Reload when the model files were replaced (e.g. by update_sentiment_model); rate-limited unless forced."""
+        if self._loaded_files is None:
+            return False
+        now = time.monotonic()
+        if not force and now - self._last_reload_check < self.RELOAD_CHECK_INTERVAL:
+            return False
+        self._last_reload_check = now
+        if file_fingerprint(*self._loaded_files) == self._loaded_fingerprint:
+            return False
+        logger.info(f"Model files changed on disk, reloading {self._loaded_files[0]}")
+        self.load_model()
+        return True
+
+    def _compile_scorer(self):
+        """Build the NumPy scoring table; predict falls back to sklearn if unsupported."""
+        from .compiled_scorer import CompiledNBScorer
+        try:
+            self.scorer = CompiledNBScorer.from_sklearn(self.vectorizer, self.model)
+        except ValueError as e:
+            logger.info(f"Compiled scorer unavailable, using sklearn predict: {e}")
+            self.scorer = None
+
+    def export_compiled_scorer(self, path: Optional[str] = None) -> str:
+        """Write the compiled scoring table next to the model files."""
+        if not self.is_trained:
+            self.load_model()
+        if self.scorer is None:
+            raise ValueError("No compiled scorer available for the current model")
+        if path is None:
+            path = str(self._paths['canonical_model'].with_name(
+                f"compiled_scorer_{'en' if self.language == 'en' else 'vi'}.npz"
+            ))
+        self.scorer.save(path)
+        logger.info(f"Compiled scorer saved to {path}")
+        return path
+
 
 class BERTSentimentAnalyzer:
     """BERT sentiment analysis model"""
     
-    def __init__(self, language='en'):
+    def __init__(self, language='en', model_dir: Optional[str] = None, batch_size: int = 16,
+                 num_threads: Optional[int] = None, quantize: bool = False):
         self.language = language
         self.preprocessor = SentimentPreprocessor(language)
+        # Local model directory (save_pretrained layout); loaded offline, no hub fallback
+        self.model_dir = model_dir
+        self.batch_size = batch_size
+        # CPU tuning: torch intra-op threads and dynamic int8 quantization of Linear layers
+        self.num_threads = num_threads
+        self.quantize = quantize
         
         if TRANSFORMERS_AVAILABLE:
             # Choose appropriate BERT model based on language
-            if language == 'vi':
+            if model_dir:
+                self.model_name = model_dir
+            elif language == 'vi':
                 self.model_name = "vinai/phobert-base"
             else:
                 self.model_name = "cardiffnlp/twitter-roberta-base-sentiment-latest"
@@ -396,6 +578,24 @@ class BERTSentimentAnalyzer:
         if not TRANSFORMERS_AVAILABLE:
             logger.warning("Transformers library not available")
             return
+
+        if self.model_dir:
+            try:
+                logger.info(f"Loading local BERT model from {self.model_dir}")
+                tokenizer = AutoTokenizer.from_pretrained(self.model_dir, local_files_only=True)
+                model = AutoModelForSequenceClassification.from_pretrained(self.model_dir, local_files_only=True)
+                self.pipeline = pipeline(
+                    "sentiment-analysis",
+                    model=model,
+                    tokenizer=tokenizer,
+                    return_all_scores=True
+                )
+                self.is_loaded = True
+                logger.info("Local BERT model loaded successfully")
+                self._tune_runtime()
+            except Exception as e:
+                logger.error(f"Error loading local BERT model: {e}")
+            return
             
         try:
             logger.info(f"Loading BERT model: {self.model_name}")
@@ -415,6 +615,23 @@ class BERTSentimentAnalyzer:
                 logger.info("Fallback BERT model loaded")
             except Exception as e2:
                 logger.error(f"Error loading fallback model: {e2}")
+        if self.is_loaded:
+            self._tune_runtime()
+    
+    def _tune_runtime(self):
+        """Apply CPU thread count and optional dynamic int8 quantization to the loaded model"""
+        import torch
+        
+        if self.num_threads:
+            torch.set_num_threads(int(self.num_threads))
+        if self.quantize:
+            try:
+                self.pipeline.model = torch.quantization.quantize_dynamic(
+                    self.pipeline.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+                logger.info("BERT model dynamically quantized to int8")
+            except Exception as e:
+                logger.warning(f"Dynamic quantization failed, using float model: {e}")
     
     def predict(self, text: str) -> Dict[str, float]:
         """Predict sentiment using BERT"""
@@ -431,40 +648,63 @@ class BERTSentimentAnalyzer:
         try:
             # Get BERT predictions
             results = self.pipeline(processed_text)
-            
-            # Process results
-            sentiment_scores = {}
-            for item in results[0]:
-                label = item['label'].lower()
-                score = item['score']
-                
-                # Map different label formats
-                if 'pos' in label or label == 'positive':
-                    sentiment_scores['positive'] = score
-                elif 'neg' in label or label == 'negative':
-                    sentiment_scores['negative'] = score
-                elif 'neu' in label or label == 'neutral':
-                    sentiment_scores['neutral'] = score
-            
-            # Ensure all sentiments are present
-            for sentiment in ['positive', 'negative', 'neutral']:
-                if sentiment not in sentiment_scores:
-                    sentiment_scores[sentiment] = 0.0
-            
-            # Determine primary sentiment
-            primary_sentiment = max(sentiment_scores, key=sentiment_scores.get)
-            confidence = sentiment_scores[primary_sentiment]
-            
-            return {
-                'sentiment': primary_sentiment,
-                'confidence': float(confidence),
-                'probabilities': sentiment_scores
-            }
+            return self._scores_to_result(results[0])
             
         except Exception as e:
             logger.error(f"Error in BERT prediction: {e}")
             return self._textblob_fallback(text)
     
+    def predict_batch(self, texts: List[str]) -> List[Dict[str, float]]:
+        """Predict sentiment for several texts with one padded forward pass per batch"""
+        if not self.is_loaded:
+            self.load_model()
+        if not self.is_loaded:
+            return [self._textblob_fallback(text) for text in texts]
+        
+        processed = self.preprocessor.preprocess_many(texts)
+        # Sorted-length bucketing: neighbouring texts share a padded batch of similar length
+        order = sorted(range(len(processed)), key=lambda i: len(processed[i]))
+        try:
+            scored = self.pipeline([processed[i] for i in order], batch_size=self.batch_size, truncation=True)
+            results = [None] * len(processed)
+            for i, items in zip(order, scored):
+                results[i] = self._scores_to_result(items)
+            return results
+        except Exception as e:
+            logger.error(f"Error in BERT batch prediction: {e}")
+            return [self._textblob_fallback(text) for text in texts]
+    
+    @staticmethod
+    def _scores_to_result(items) -> Dict[str, float]:
+        """Map pipeline label scores to the standard result shape"""
+        sentiment_scores = {}
+        for item in items:
+            label = item['label'].lower()
+            score = item['score']
+            
+            # Map different label formats
+            if 'pos' in label or label == 'positive':
+                sentiment_scores['positive'] = score
+            elif 'neg' in label or label == 'negative':
+                sentiment_scores['negative'] = score
+            elif 'neu' in label or label == 'neutral':
+                sentiment_scores['neutral'] = score
+        
+        # Ensure all sentiments are present
+        for sentiment in ['positive', 'negative', 'neutral']:
+            if sentiment not in sentiment_scores:
+                sentiment_scores[sentiment] = 0.0
+        
+        # Determine primary sentiment
+        primary_sentiment = max(sentiment_scores, key=sentiment_scores.get)
+        confidence = sentiment_scores[primary_sentiment]
+        
+        return {
+            'sentiment': primary_sentiment,
+            'confidence': float(confidence),
+            'probabilities': sentiment_scores
+        }
+    
     def _textblob_fallback(self, text: str) -> Dict[str, float]:
         """Fallback to TextBlob for sentiment analysis"""
         blob = TextBlob(text)
@@ -496,14 +736,64 @@ class BERTSentimentAnalyzer:
         }
 
 
+CASCADE_COUNTERS = ('naive_bayes', 'escalated', 'bert_unavailable')
+
+
+def _cascade_key(language: str, counter: str) -> str:
+    return f"sentiment:cascade:{language}:{counter}"
+
+
+def record_cascade_counts(language: str, **counts: int):
+    """Add to the cascade counters shared by every SentimentAnalysisSystem using the Django cache.
+
+    Views build a new service (and system) per request, so per-instance counters never
+    accumulate; with a shared cache backend the totals also span worker processes.
+    """
+    from django.core.cache import cache
+    try:
+        for counter, n in counts.items():
+            if not n:
+                continue
+            key = _cascade_key(language, counter)
+            cache.add(key, 0, timeout=None)
+            try:
+                cache.incr(key, n)
+            except ValueError:
+                # Evicted between add() and incr()
+                cache.set(key, n, timeout=None)
+    except Exception as e:
+        logger.warning(f"Could not record cascade counters: {e}")
+
+
+def shared_cascade_stats(languages=('en', 'vi')) -> Dict[str, Dict[str, float]]:
+    """Cascade counters and escalation rate per language, summed over all requests."""
+    from django.core.cache import cache
+    stats = {}
+    for language in languages:
+        values = cache.get_many([_cascade_key(language, c) for c in CASCADE_COUNTERS])
+        counters = {c: int(values.get(_cascade_key(language, c), 0)) for c in CASCADE_COUNTERS}
+        scored = counters['naive_bayes']
+        counters['escalation_rate'] = (counters['escalated'] / scored) if scored else 0.0
+        stats[language] = counters
+    return stats
+
+
+def reset_cascade_stats(languages=('en', 'vi')):
+    from django.core.cache import cache
+    cache.delete_many([_cascade_key(language, c) for language in languages for c in CASCADE_COUNTERS])
+
+
 class SentimentAnalysisSystem:
     """Main sentiment analysis system with Naive Bayes and BERT"""
     
-    def __init__(self, language='en', default_algorithm='naive_bayes'):
+    def __init__(self, language='en', default_algorithm='naive_bayes', cascade_threshold=0.75, bert_model_dir=None):
         self.language = language
         self.default_algorithm = default_algorithm
+        # Cascade: texts whose NB confidence is below this go to BERT
+        self.cascade_threshold = cascade_threshold
         self.naive_bayes = NaiveBayesSentimentAnalyzer(language)
-        self.bert = BERTSentimentAnalyzer(language)
+        self.bert = BERTSentimentAnalyzer(language, model_dir=bert_model_dir)
+        self.cascade_stats = {'naive_bayes': 0, 'escalated': 0, 'bert_unavailable': 0}
     
     def predict(self, text: str, algorithm='auto') -> Dict[str, float]:
         """Predict sentiment using specified algorithm or auto-selection"""
@@ -519,6 +809,8 @@ class SentimentAnalysisSystem:
                 result = self.bert.predict(text)
                 result['algorithm'] = 'bert'
                 return result
+            elif algorithm == 'cascade':
+                return self._predict_cascade([text])[0]
             else:
                 logger.warning(f"Unknown algorithm: {algorithm}. Using default.")
                 result = self.naive_bayes.predict(text)
@@ -531,23 +823,214 @@ class SentimentAnalysisSystem:
     
     def analyze_batch(self, texts: List[str], algorithm='auto') -> List[Dict[str, float]]:
         """Analyze sentiment for multiple texts"""
+        if algorithm == 'auto':
+            algorithm = self.default_algorithm
+        if algorithm == 'cascade':
+            return self._predict_cascade(texts)
         return [self.predict(text, algorithm) for text in texts]
     
+    def _predict_cascade(self, texts: List[str]) -> List[Dict[str, float]]:
+        """Score with Naive Bayes; escalate low-confidence texts to BERT in one batch"""
+        results = []
+        for text in texts:
+            result = self.naive_bayes.predict(text)
+            result['algorithm'] = 'naive_bayes'
+            results.append(result)
+        self.cascade_stats['naive_bayes'] += len(texts)
+        record_cascade_counts(self.language, naive_bayes=len(texts))
+        
+        uncertain = [i for i, r in enumerate(results) if r['confidence'] < self.cascade_threshold]
+        if not uncertain:
+            return results
+        
+        if not self.bert.is_loaded:
+            self.bert.load_model()
+        if not self.bert.is_loaded:
+            # Escalating to the TextBlob fallback would not be more accurate than NB
+            self.cascade_stats['bert_unavailable'] += len(uncertain)
+            record_cascade_counts(self.language, bert_unavailable=len(uncertain))
+            return results
+        
+        bert_results = self.bert.predict_batch([texts[i] for i in uncertain])
+        for i, bert_result in zip(uncertain, bert_results):
+            bert_result['algorithm'] = 'bert'
+            bert_result['escalated_from'] = {
+                'algorithm': 'naive_bayes',
+                'sentiment': results[i]['sentiment'],
+                'confidence': results[i]['confidence'],
+            }
+            results[i] = bert_result
+        self.cascade_stats['escalated'] += len(uncertain)
+        record_cascade_counts(self.language, escalated=len(uncertain))
+        return results
+    
+    def get_cascade_stats(self) -> Dict[str, float]:
+        """Per-stage counters and escalation rate of this instance (see shared_cascade_stats for totals)"""
+        scored = self.cascade_stats['naive_bayes']
+        return {
+            **self.cascade_stats,
+            'threshold': self.cascade_threshold,
+            'escalation_rate': (self.cascade_stats['escalated'] / scored) if scored else 0.0,
+        }
+    
     def get_algorithm_info(self) -> Dict[str, dict]:
-        """Get information about available algorithms"""
+        """Get information about available algorithms.
+
+        Speed, memory and accuracy come from the latest `benchmark_sentiment_analyzers` report
+        (see benchmarks.py); algorithms that were never benchmarked say so instead of guessing.
+        """
+        from .benchmarks import algorithm_measurements
+
+        def measured(algorithm: str) -> Dict:
+            numbers = algorithm_measurements(algorithm, self.language)
+            if numbers is None:
+                return {
+                    'speed': 'Not benchmarked yet',
+                    'accuracy': 'Not benchmarked yet',
+                    'memory': 'Not benchmarked yet',
+                    'benchmark': None,
+                }
+            accuracy = numbers.get('accuracy')
+            return {
+                'speed': f"p50 {numbers['latency_p50_ms']:.1f}ms, p95 {numbers['latency_p95_ms']:.1f}ms, "
+                         f"{numbers['throughput_per_sec']:,.0f} texts/s batched",
+                'accuracy': (f"{accuracy:.0%} on the {numbers['language']} benchmark corpus (positive/negative)"
+                             if accuracy is not None else 'Not measured'),
+                'memory': f"~{numbers['rss_delta_mb']:.0f}MB loaded (process RSS {numbers['rss_mb']:.0f}MB)",
+                'benchmark': numbers,
+            }
+
         return {
             'naive_bayes': {
                 'name': 'Naive Bayes',
                 'description': 'Fast, lightweight algorithm for production use',
-                'speed': 'Fast (~50ms)',
-                'accuracy': 'Good (~60%)',
-                'memory': 'Low (~10MB)'
+                **measured('naive_bayes'),
             },
             'bert': {
                 'name': 'BERT',
                 'description': 'Advanced transformer model for high accuracy',
-                'speed': 'Slower (~500ms)',
-                'accuracy': 'High (~85%)',
-                'memory': 'High (~1000MB)'
+                **measured('bert'),
+            },
+            'cascade': {
+                'name': 'Naive Bayes → BERT cascade',
+                'description': f'Naive Bayes for all texts, BERT only below {self.cascade_threshold:.2f} NB confidence',
+                'speed': 'Near Naive Bayes; depends on escalation rate',
+                'accuracy': 'Between Naive Bayes and BERT',
+                'memory': 'High when BERT is loaded',
+                'stats': {**shared_cascade_stats((self.language,))[self.language], 'threshold': self.cascade_threshold}
             }
-        } 
\ No newline at end of file
+        }
+
+
+# ---------------------------------------------------------------------------
+# Database models
+# ---------------------------------------------------------------------------
+from django.db import models as db_models
+
+
+class SentimentTrainingWatermark(db_models.Model):
+    """How far incremental Naive Bayes updates have consumed labeled reviews, per language.
+
+    Reviews are consumed once, in id order; last_review_id is the newest review looked at
+    (folded into the model's class/feature counts, or skipped).
+    """
+    language = db_models.CharField(max_length=5, unique=True)
+    last_review_id = db_models.IntegerField(default=0)
+    rows_consumed = db_models.IntegerField(default=0, help_text="Rows folded in since the last full rebuild")
+    # Out-of-vocabulary unigrams seen in consumed rows; their share drives full rebuilds
+    oov_terms = db_models.BigIntegerField(default=0)
+    total_terms = db_models.BigIntegerField(default=0)
+    last_full_rebuild_at = db_models.DateTimeField(null=True, blank=True)
+    model_fingerprint = db_models.CharField(max_length=32, blank=True)
+    updated_at = db_models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'sentiment_analysis'
+
+    def __str__(self):
+        return f"{self.language}: review {self.last_review_id}"
+
+    @property
+    def oov_rate(self) -> float:
+        return (self.oov_terms / self.total_terms) if self.total_terms else 0.0
+
+
+class SentimentRollup(db_models.Model):
+    """Review counts per UTC hour, product and effective sentiment (see rollups.py).
+
+    effective_count counts every review whose effective sentiment is `sentiment` (the
+    analyzer label, else the rating's); analyzed_count only those labeled by the analyzer,
+    whose confidences add up to confidence_sum.
+    """
+    bucket = db_models.DateTimeField(help_text="Start of the UTC hour")
+    product = db_models.ForeignKey('products.Product', on_delete=db_models.CASCADE, related_name='sentiment_rollups')
+    sentiment = db_models.CharField(max_length=10)
+    effective_count = db_models.IntegerField(default=0)
+    analyzed_count = db_models.IntegerField(default=0)
+    confidence_sum = db_models.FloatField(default=0.0)
+
+    class Meta:
+        app_label = 'sentiment_analysis'
+        # The unique index also serves global (bucket range) trend queries
+        unique_together = ('bucket', 'product', 'sentiment')
+        indexes = [db_models.Index(fields=['product', 'bucket'], name='sa_rollup_product_bucket_idx')]
+
+    def __str__(self):
+        return f"{self.bucket:%Y-%m-%d %H:00} product {self.product_id} {self.sentiment}: {self.effective_count}"
+
+
+class ProductReviewHighlights(db_models.Model):
+    """Top positive and negative review n-grams of one product (see highlights.py).
+
+    positive/negative hold up to N {'term', 'score', 'reviews'} entries, best first.
+    review_count, reviews_updated_at and model_fingerprint describe what they were built
+    from, so refreshes only revisit products whose reviews or models changed.
+    """
+    product = db_models.OneToOneField('products.Product', on_delete=db_models.CASCADE, primary_key=True,
+                                      related_name='review_highlights')
+    positive = db_models.JSONField(default=list)
+    negative = db_models.JSONField(default=list)
+    review_count = db_models.IntegerField(default=0)
+    reviews_updated_at = db_models.DateTimeField(null=True, blank=True)
+    model_fingerprint = db_models.CharField(max_length=64, blank=True)
+    updated_at = db_models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'sentiment_analysis'
+        verbose_name_plural = 'Product review highlights'
+
+    def __str__(self):
+        return f"Highlights for product {self.product_id}"
+
+    def as_dict(self):
+        return {'positive': self.positive, 'negative': self.negative, 'updated_at': self.updated_at}
+
+
+class ReviewFingerprint(db_models.Model):
+    """MinHash signature of a review's text, and the earlier review it near-duplicates (see duplicates.py)."""
+    review = db_models.OneToOneField('products.Review', on_delete=db_models.CASCADE, primary_key=True,
+                                     related_name='fingerprint')
+    signature = db_models.BinaryField()
+    duplicate_of = db_models.ForeignKey('products.Review', on_delete=db_models.SET_NULL, null=True, blank=True,
+                                        related_name='near_duplicates')
+    similarity = db_models.FloatField(null=True, blank=True, help_text="Estimated Jaccard similarity to duplicate_of")
+    created_at = db_models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'sentiment_analysis'
+
+    def __str__(self):
+        return f"Fingerprint of review {self.review_id}"
+
+
+class ReviewBandBucket(db_models.Model):
+    """One LSH band bucket of a fingerprint; reviews sharing a bucket are duplicate candidates."""
+    fingerprint = db_models.ForeignKey(ReviewFingerprint, on_delete=db_models.CASCADE, related_name='buckets')
+    bucket = db_models.BigIntegerField(help_text="(band << 32) | crc32 of the band's signature slice")
+
+    class Meta:
+        app_label = 'sentiment_analysis'
+        indexes = [db_models.Index(fields=['bucket'], name='sa_band_bucket_idx')]
+
+    def __str__(self):
+        return f"{self.bucket:x} -> review {self.fingerprint_id}"
@@ -0,0 +1,235 @@
+"""
+Content-hash prediction cache sitting in front of the sentiment analyzers.
+
+Keys are (model type, language, model version, sha256 of normalized text). The model
+version is a fingerprint of the model files on disk, so retraining or replacing the
+pickles changes every key and stale predictions are dropped automatically.
+"""
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+import copy
+import hashlib
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Normalization used for cache keys (case and whitespace insensitive)."""
+    return ' '.join((text or '').lower().split())
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def file_fingerprint(*paths: str) -> str:
+    """Cheap version id for a set of files based on size and mtime."""
+    parts = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            parts.append(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            parts.append(f"{os.path.basename(path)}:missing")
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:12]
+
+
+def model_version(model_type: str, language: str) -> str:
+    """Resolve the on-disk model version used by SentimentAnalysisService for a model type."""
+    from .model_versions import scoring_version
+    return scoring_version(model_type, language)
+
+
+class PredictionCache:
+    """Thread-safe LRU of prediction dicts with an optional shared (Django cache) tier."""
+
+    def __init__(self, max_entries: int = 4096, shared_alias: Optional[str] = None, shared_timeout: int = 3600):
+        self.max_entries = max(0, int(max_entries))
+        self.shared_alias = shared_alias or None
+        self.shared_timeout = shared_timeout
+        self._entries: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._versions: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(model_type: str, language: str, version: str, text: str) -> str:
+        return f"sentiment:{model_type}:{language}:{version}:{text_hash(text)}"
+
+    def _shared(self):
+        if not self.shared_alias:
+            return None
+        try:
+            from django.core.cache import caches
+            return caches[self.shared_alias]
+        except Exception as e:
+            logger.warning(f"Shared prediction cache '{self.shared_alias}' unavailable: {e}")
+            return None
+
+    def _check_version(self, model_type: str, language: str, version: str):
+        """Drop local entries for a (model type, language) whose model files changed."""
+        scope = (model_type, language)
+        previous = self._versions.get(scope)
+        if previous == version:
+            return
+        self._versions[scope] = version
+        if previous is None:
+            return
+        prefix = f"sentiment:{model_type}:{language}:"
+        stale = [k for k in self._entries if k.startswith(prefix)]
+        for k in stale:
+            del self._entries[k]
+        self.invalidations += 1
+        logger.info(f"Prediction cache invalidated {len(stale)} entries for {model_type}/{language} (model changed)")
+
+    def get_or_compute(self, model_type: str, language: str, text: str, compute: Callable[[], Dict],
+                       version: Optional[str] = None) -> Dict:
+        """Cached prediction for text; pass `version` when the caller already resolved it."""
+        if self.max_entries == 0 and not self.shared_alias:
+            return compute()
+
+        version = version or model_version(model_type, language)
+        key = self.make_key(model_type, language, version, text)
+
+        with self._lock:
+            self._check_version(model_type, language, version)
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(cached)
+
+        shared = self._shared()
+        if shared is not None:
+            cached = shared.get(key)
+            if cached is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                    self._store(key, cached)
+                return copy.deepcopy(cached)
+
+        with self._lock:
+            self.misses += 1
+        result = compute()
+        # Never cache error fallbacks; the next call should retry the model
+        if result and 'error' not in result:
+            with self._lock:
+                self._store(key, copy.deepcopy(result))
+            if shared is not None:
+                try:
+                    shared.set(key, result, self.shared_timeout)
+                except Exception as e:
+                    logger.warning(f"Could not write shared prediction cache: {e}")
+        return result
+
+    def get_many_or_compute(self, model_type: str, language: str, texts: List[str],
+                            compute_many: Callable[[List[str]], List[Dict]],
+                            version: Optional[str] = None) -> List[Dict]:
+        """Batch form of get_or_compute: one compute_many call for the misses, results in input order."""
+        if self.max_entries == 0 and not self.shared_alias:
+            return compute_many(list(texts))
+
+        version = version or model_version(model_type, language)
+        keys = [self.make_key(model_type, language, version, text) for text in texts]
+        results: List[Optional[Dict]] = [None] * len(texts)
+
+        with self._lock:
+            self._check_version(model_type, language, version)
+            for i, key in enumerate(keys):
+                cached = self._entries.get(key)
+                if cached is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    results[i] = copy.deepcopy(cached)
+
+        shared = self._shared()
+        if shared is not None:
+            wanted = {keys[i] for i, r in enumerate(results) if r is None}
+            try:
+                found = shared.get_many(list(wanted)) if wanted else {}
+            except Exception as e:
+                logger.warning(f"Could not read shared prediction cache: {e}")
+                found = {}
+            if found:
+                with self._lock:
+                    for i, key in enumerate(keys):
+                        if results[i] is None and key in found:
+                            self.shared_hits += 1
+                            self._store(key, found[key])
+                            results[i] = copy.deepcopy(found[key])
+
+        missing = [i for i, r in enumerate(results) if r is None]
+        if not missing:
+            return results
+        with self._lock:
+            self.misses += len(missing)
+        computed = compute_many([texts[i] for i in missing])
+        to_share = {}
+        with self._lock:
+            for i, result in zip(missing, computed):
+                results[i] = result
+                # Never cache error fallbacks; the next call should retry the model
+                if result and 'error' not in result:
+                    self._store(keys[i], copy.deepcopy(result))
+                    to_share[keys[i]] = result
+        if shared is not None and to_share:
+            try:
+                shared.set_many(to_share, self.shared_timeout)
+            except Exception as e:
+                logger.warning(f"Could not write shared prediction cache: {e}")
+        return results
+
+    def _store(self, key: str, value: Dict):
+        if self.max_entries == 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': ((self.hits + self.shared_hits) / lookups) if lookups else 0.0,
+                'shared_alias': self.shared_alias,
+            }
+
+
+_cache: Optional[PredictionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_prediction_cache() -> PredictionCache:
+    """Process-wide cache configured from SENTIMENT_PREDICTION_CACHE_* settings."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from django.conf import settings
+                _cache = PredictionCache(
+                    max_entries=getattr(settings, 'SENTIMENT_PREDICTION_CACHE_SIZE', 4096),
+                    shared_alias=getattr(settings, 'SENTIMENT_PREDICTION_SHARED_CACHE', None),
+                    shared_timeout=getattr(settings, 'SENTIMENT_PREDICTION_CACHE_TIMEOUT', 3600),
+                )
+    return _cache
@@ -0,0 +1,102 @@
+"""
+SQL analytics over the stored class probabilities (Review.p_positive / p_neutral / p_negative).
+
+Everything here is a single aggregate query; nothing deserializes per-review JSON:
+
+    product_probability_means   mean probabilities and confidence per product
+    probability_histogram       counts per bin of confidence or a class probability, with the
+                                observed rate of 4-5 star reviews per bin (a calibration curve
+                                when binning p_positive)
+    borderline_reviews          analyzed reviews whose positive and negative probabilities are close
+"""
+from typing import Dict, List, Optional
+
+from django.db.models import Avg, Case, Count, F, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import Abs, Cast, Floor, Least
+
+HISTOGRAM_FIELDS = ('sentiment_confidence', 'p_positive', 'p_neutral', 'p_negative')
+PROBABILITY_FIELDS = ('p_positive', 'p_neutral', 'p_negative')
+
+
+def _reviews(product_id: Optional[int] = None):
+    from products.models import Review
+    reviews = Review.objects.all()
+    if product_id is not None:
+        reviews = reviews.filter(product_id=product_id)
+    return reviews
+
+
+def product_probability_means(min_reviews: int = 1, order_by: str = 'p_negative', limit: int = 50,
+                              product_id: Optional[int] = None) -> List[Dict]:
+    """Per-product mean probabilities over analyzed reviews, highest `order_by` first."""
+    if order_by not in PROBABILITY_FIELDS + ('sentiment_confidence',):
+        raise ValueError(f"order_by must be one of {', '.join(PROBABILITY_FIELDS + ('sentiment_confidence',))}")
+    rows = (
+        _reviews(product_id).filter(p_positive__isnull=False)
+        .values('product_id')
+        .annotate(
+            reviews=Count('id'),
+            mean_p_positive=Avg('p_positive'),
+            mean_p_neutral=Avg('p_neutral'),
+            mean_p_negative=Avg('p_negative'),
+            mean_sentiment_confidence=Avg('sentiment_confidence'),
+        )
+        .filter(reviews__gte=min_reviews)
+        .order_by(F(f'mean_{order_by}').desc(nulls_last=True), 'product_id')
+    )
+    return list(rows[:limit])
+
+
+def probability_histogram(field: str = 'sentiment_confidence', bins: int = 10,
+                          product_id: Optional[int] = None, sentiment: Optional[str] = None) -> Dict:
+    """Equal-width histogram of `field` over [0, 1], zero-filled, with per-bin means."""
+    if field not in HISTOGRAM_FIELDS:
+        raise ValueError(f"field must be one of {', '.join(HISTOGRAM_FIELDS)}")
+    bins = int(bins)
+    if not 1 <= bins <= 100:
+        raise ValueError('bins must be between 1 and 100')
+    reviews = _reviews(product_id).filter(**{f'{field}__isnull': False})
+    if sentiment:
+        reviews = reviews.filter(sentiment=sentiment)
+    rows = (
+        reviews
+        # 1.0 belongs to the last bin
+        .annotate(bin=Cast(Least(Floor(F(field) * bins), Value(bins - 1)), IntegerField()))
+        .values('bin')
+        .annotate(
+            count=Count('id'),
+            mean=Avg(field),
+            observed_positive_rate=Avg(Case(When(rating__gte=4, then=Value(1.0)), default=Value(0.0),
+                                            output_field=FloatField())),
+        )
+        .order_by('bin')
+    )
+    by_bin = {row['bin']: row for row in rows}
+    return {
+        'field': field,
+        'bins': [
+            {
+                'lower': i / bins,
+                'upper': (i + 1) / bins,
+                'count': by_bin[i]['count'] if i in by_bin else 0,
+                'mean': by_bin[i]['mean'] if i in by_bin else None,
+                'observed_positive_rate': by_bin[i]['observed_positive_rate'] if i in by_bin else None,
+            }
+            for i in range(bins)
+        ],
+        'total': sum(row['count'] for row in by_bin.values()),
+    }
+
+
+def borderline_reviews(margin: float = 0.1, limit: int = 50, product_id: Optional[int] = None) -> List[Dict]:
+    """Reviews with |p_positive - p_negative| < margin, closest calls first."""
+    rows = (
+        _reviews(product_id)
+        .filter(Q(p_positive__isnull=False) & Q(p_negative__isnull=False))
+        .annotate(margin=Abs(F('p_positive') - F('p_negative')))
+        .filter(margin__lt=margin)
+        .order_by('margin', 'id')
+        .values('id', 'product_id', 'rating', 'sentiment', 'sentiment_confidence',
+                'p_positive', 'p_neutral', 'p_negative', 'margin')
+    )
+    return list(rows[:limit])
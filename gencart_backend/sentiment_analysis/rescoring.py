@@ -0,0 +1,210 @@
+"""
+Background re-scoring of reviews labeled by an older sentiment model.
+
+A review is stale when it has an analyzer label whose sentiment_model_version is not the
+id its model family would write now: Naive Bayes labels are compared with the deployed
+Naive Bayes versions (model_versions.current_versions()), cascade labels with the
+current cascade ids (model_versions.current_cascade_versions()) and BERT labels with the
+id of the BERT model in SENTIMENT_BERT_MODEL_DIR (model_versions.bert_model_version()).
+Labels written before versioning have an empty version and count as stale Naive Bayes
+labels. After a retrain or a replaced BERT model, RescoringJob relabels stale reviews with
+the family that produced them:
+
+    - most-viewed products first (Product.view_count, see products/view_counts.py), then
+      by product, walking each product's stale reviews with an id cursor
+    - within a rows-per-second budget (SENTIMENT_RESCORE_ROWS_PER_SEC) so the job can run
+      next to the site without competing with request-time scoring
+    - each review routed to its language's model; saves go through Review.save(), so
+      rollups, cached aggregates and the live event stream follow the new labels
+
+Near-duplicates flagged by duplicates.py are never scored, so they are never stale.
+"""
+from typing import Callable, Dict, List, NamedTuple, Optional
+import logging
+import time
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .model_versions import bert_model_version, current_cascade_versions, current_versions, model_family
+
+logger = logging.getLogger(__name__)
+
+
+class DeployedVersions(NamedTuple):
+    naive_bayes: List[str]
+    cascade: List[str]
+    bert: List[str]
+
+
+def deployed_versions() -> DeployedVersions:
+    return DeployedVersions(current_versions(), current_cascade_versions(), [bert_model_version()])
+
+
+def is_current(version: Optional[str], deployed: DeployedVersions) -> bool:
+    """Whether a stored label id matches what its model family would write now."""
+    return version in getattr(deployed, model_family(version))
+
+
+def stale_filter(deployed: DeployedVersions) -> Q:
+    cascade = Q(sentiment_model_version__contains='+bert')
+    bert = Q(sentiment_model_version='bert') | Q(sentiment_model_version__startswith='bert-')
+    naive_bayes = ~cascade & ~bert
+    return (
+        (naive_bayes & ~Q(sentiment_model_version__in=deployed.naive_bayes))
+        | (cascade & ~Q(sentiment_model_version__in=deployed.cascade))
+        | (bert & ~Q(sentiment_model_version__in=deployed.bert))
+    )
+
+
+def stale_reviews(deployed: Optional[DeployedVersions] = None, product_id: Optional[int] = None):
+    """Analyzed reviews whose label is not current for its model family, in re-scoring priority order."""
+    from products.models import Review
+    deployed = deployed_versions() if deployed is None else deployed
+    reviews = Review.objects.filter(sentiment__isnull=False).filter(stale_filter(deployed))
+    if product_id is not None:
+        reviews = reviews.filter(product_id=product_id)
+    return reviews.order_by('-product__view_count', 'product_id', 'id')
+
+
+def version_breakdown(product_id: Optional[int] = None) -> Dict:
+    """Analyzed review counts per model version and sentiment, with the deployed versions."""
+    from products.models import Review
+    reviews = Review.objects.filter(sentiment__isnull=False)
+    if product_id is not None:
+        reviews = reviews.filter(product_id=product_id)
+    rows = (
+        reviews.values('sentiment_model_version')
+        .annotate(
+            reviews=Count('id'),
+            positive=Count('id', filter=Q(sentiment='positive')),
+            neutral=Count('id', filter=Q(sentiment='neutral')),
+            negative=Count('id', filter=Q(sentiment='negative')),
+        )
+        .order_by('-reviews')
+    )
+    deployed = deployed_versions()
+    breakdown = [
+        {
+            'model_version': row['sentiment_model_version'] or None,
+            'family': model_family(row['sentiment_model_version']),
+            'current': is_current(row['sentiment_model_version'], deployed),
+            'reviews': row['reviews'],
+            'sentiment_counts': {s: row[s] for s in ('positive', 'neutral', 'negative')},
+        }
+        for row in rows
+    ]
+    return {
+        'current_versions': deployed.naive_bayes,
+        'current_cascade_versions': deployed.cascade,
+        'current_bert_versions': deployed.bert,
+        'stale_reviews': sum(row['reviews'] for row in breakdown if not row['current']),
+        'versions': breakdown,
+    }
+
+
+class RescoringJob:
+    """Relabel stale reviews in priority order within a rows/second budget."""
+
+    def __init__(self, rows_per_second: Optional[float] = None, batch_size: int = 50,
+                 model_type: str = 'naive_bayes', sleep: Callable[[float], None] = time.sleep,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rows_per_second = float(rows_per_second if rows_per_second is not None
+                                     else getattr(settings, 'SENTIMENT_RESCORE_ROWS_PER_SEC', 20))
+        self.batch_size = batch_size
+        # Model type for Naive Bayes (and unversioned) labels; cascade and BERT labels keep their family
+        self.model_type = model_type
+        self.sleep = sleep
+        self.clock = clock
+        self._services = {}
+
+    def _service(self, language: str, model_type: str):
+        from .services import SentimentAnalysisService
+        key = (language, model_type)
+        if key not in self._services:
+            self._services[key] = SentimentAnalysisService(language, model_type)
+        return self._services[key]
+
+    def _throttle(self, started: float, rows: int):
+        if self.rows_per_second > 0:
+            ahead = rows / self.rows_per_second - (self.clock() - started)
+            if ahead > 0:
+                self.sleep(ahead)
+
+    def rescore(self, review) -> Optional[bool]:
+        """Relabel one review; True if its sentiment changed, None if scoring failed."""
+        from .services import detect_language
+        family = model_family(review.sentiment_model_version)
+        model_type = family if family in ('cascade', 'bert') else self.model_type
+        service = self._service(detect_language(f"{review.title} {review.comment}"), model_type)
+        result = service.analyze_review_with_title(review.title or '', review.comment or '')
+        if 'error' in result:
+            logger.error(f"Re-scoring review {review.id} failed: {result['error']}")
+            return None
+        changed = result['sentiment'] != review.sentiment
+        review.apply_sentiment_result(result)
+        review.sentiment_analyzed_at = timezone.now()
+        review.save(update_fields=['sentiment', 'sentiment_confidence', 'sentiment_scores',
+                                   'sentiment_model_version', 'sentiment_analyzed_at', 'updated_at'])
+        return changed
+
+    def _products(self, deployed: DeployedVersions, product_id: Optional[int]) -> List[int]:
+        """Products with stale reviews, most viewed first (a snapshot taken when the run starts)."""
+        if product_id is not None:
+            return [product_id]
+        from products.view_counts import flush_product_views
+        try:
+            flush_product_views()
+        except Exception as e:
+            logger.warning(f"Could not flush buffered product views before re-scoring: {e}")
+        return list(
+            stale_reviews(deployed).order_by('-product__view_count', 'product_id')
+            .values_list('product_id', flat=True).distinct()
+        )
+
+    def run(self, max_rows: Optional[int] = None, product_id: Optional[int] = None,
+            max_seconds: Optional[float] = None) -> Dict:
+        started = self.clock()
+        stats = {'rescored': 0, 'changed': 0, 'failed': 0}
+
+        def exhausted():
+            done = stats['rescored'] + stats['failed']
+            return ((max_rows is not None and done >= max_rows)
+                    or (max_seconds is not None and self.clock() - started >= max_seconds))
+
+        deployed = deployed_versions()
+        if not deployed.naive_bayes:
+            logger.warning("No trained sentiment model on disk; nothing to re-score against")
+        for product in (self._products(deployed, product_id) if deployed.naive_bayes else []):
+            # Rows that stay stale after an attempt (errors, or a model replaced mid-run) are
+            # behind the cursor and wait for the next run
+            last_id = 0
+            while not exhausted():
+                deployed = deployed_versions()
+                if not deployed.naive_bayes:
+                    break
+                done = stats['rescored'] + stats['failed']
+                limit = self.batch_size if max_rows is None else min(self.batch_size, max_rows - done)
+                batch = list(stale_reviews(deployed, product).filter(id__gt=last_id).order_by('id')[:limit])
+                if not batch:
+                    break
+                for review in batch:
+                    last_id = review.id
+                    try:
+                        changed = self.rescore(review)
+                    except Exception as e:
+                        logger.error(f"Re-scoring review {review.id} failed: {e}")
+                        changed = None
+                    if changed is None or not is_current(review.sentiment_model_version, deployed):
+                        stats['failed'] += 1
+                    else:
+                        stats['rescored'] += 1
+                        stats['changed'] += int(changed)
+                    self._throttle(started, stats['rescored'] + stats['failed'])
+            if exhausted() or not deployed.naive_bayes:
+                break
+        stats['remaining'] = stale_reviews(product_id=product_id).count()
+        stats['elapsed_seconds'] = round(self.clock() - started, 2)
+        logger.info(f"Sentiment re-scoring: {stats}")
+        return stats
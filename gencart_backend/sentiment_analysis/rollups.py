@@ -0,0 +1,251 @@
+"""
+Sentiment rollups backing every trends endpoint.
+
+SentimentRollup holds one row per (UTC hour, product, Review.effective_sentiment) with the
+number of reviews whose effective sentiment is that label, how many of them carry an
+analyzer label (analyzed) and the sum of those labels' confidences. Trends then group a
+few hundred to a few thousand rollup rows in SQL instead of scanning the review table:
+
+    hour / day / week / month   Trunc() of the hourly bucket in the requested timezone
+
+Storing hours rather than days keeps bucket boundaries correct in every whole-hour
+timezone, not just the server's, and serves hourly trends from the same table.
+
+Rows are maintained incrementally by review post_save/post_delete (see products/signals.py)
+and can be rebuilt from the reviews with `manage.py rebuild_sentiment_rollups`.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, NamedTuple, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, CharField, Count, F, FloatField, Max, Min, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Trunc, TruncHour
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+
+
+def effective_sentiment_expression():
+    """SQL equivalent of Review.compute_effective_sentiment(), for backfills and migrations."""
+    return Case(
+        When(sentiment__isnull=False, then=F('sentiment')),
+        When(rating__gte=4, then=Value('positive')),
+        When(rating=3, then=Value('neutral')),
+        When(rating__lte=2, then=Value('negative')),
+        default=Value('neutral'),
+        output_field=CharField(),
+    )
+
+
+def hour_bucket(moment: datetime) -> datetime:
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+class Contribution(NamedTuple):
+    """What one review adds to the rollup table."""
+    bucket: datetime
+    product_id: int
+    sentiment: str
+    analyzed: bool
+    confidence: float
+
+
+def review_contribution(review) -> Optional[Contribution]:
+    if review.pk is None or review.created_at is None or review.product_id is None:
+        return None
+    analyzed = review.sentiment is not None
+    return Contribution(
+        bucket=hour_bucket(review.created_at),
+        product_id=review.product_id,
+        sentiment=review.compute_effective_sentiment(),
+        analyzed=analyzed,
+        confidence=float(review.sentiment_confidence or 0.0) if analyzed else 0.0,
+    )
+
+
+def _apply(contribution: Contribution, sign: int):
+    from .models import SentimentRollup
+    key = {
+        'bucket': contribution.bucket,
+        'product_id': contribution.product_id,
+        'sentiment': contribution.sentiment,
+    }
+    deltas = {
+        'effective_count': sign,
+        'analyzed_count': sign if contribution.analyzed else 0,
+        'confidence_sum': sign * contribution.confidence,
+    }
+    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if SentimentRollup.objects.filter(**key).update(**updates) or sign < 0:
+        # Nothing to subtract from means the row went away with its product (cascade delete)
+        return
+    try:
+        with transaction.atomic():
+            SentimentRollup.objects.create(**key, **deltas)
+    except IntegrityError:
+        # A concurrent writer created the row first
+        SentimentRollup.objects.filter(**key).update(**updates)
+
+
+def apply_review_change(old: Optional[Contribution], new: Optional[Contribution]):
+    """Move one review's contribution from `old` to `new` (either may be None)."""
+    if old == new:
+        return
+    with transaction.atomic():
+        if old is not None:
+            _apply(old, -1)
+        if new is not None:
+            _apply(new, +1)
+
+
+def rebuild_rollups(since: Optional[datetime] = None, until: Optional[datetime] = None,
+                    batch_size: int = 2000) -> int:
+    """Recompute rollup rows from the reviews (all of them, or hours within [since, until))."""
+    from products.models import Review
+    from .models import SentimentRollup
+
+    reviews = Review.objects.all()
+    rollups = SentimentRollup.objects.all()
+    if since is not None:
+        since = hour_bucket(since)
+        reviews = reviews.filter(created_at__gte=since)
+        rollups = rollups.filter(bucket__gte=since)
+    if until is not None:
+        until = hour_bucket(until)
+        reviews = reviews.filter(created_at__lt=until)
+        rollups = rollups.filter(bucket__lt=until)
+
+    rows = (
+        reviews
+        .annotate(bucket=TruncHour('created_at', tzinfo=dt_timezone.utc))
+        .values('bucket', 'product_id', 'effective_sentiment')
+        .annotate(
+            effective_count=Count('id'),
+            analyzed_count=Count('id', filter=Q(sentiment__isnull=False)),
+            confidence_sum=Coalesce(Sum('sentiment_confidence', filter=Q(sentiment__isnull=False)), 0.0,
+                                    output_field=FloatField()),
+        )
+        .order_by()
+    )
+    created = 0
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(SentimentRollup(
+                bucket=row['bucket'],
+                product_id=row['product_id'],
+                sentiment=row['effective_sentiment'],
+                effective_count=row['effective_count'],
+                analyzed_count=row['analyzed_count'],
+                confidence_sum=row['confidence_sum'],
+            ))
+            if len(batch) >= batch_size:
+                SentimentRollup.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            SentimentRollup.objects.bulk_create(batch)
+            created += len(batch)
+    logger.info(f"Rebuilt {created} sentiment rollup rows")
+    return created
+
+
+def backfill_effective_sentiment(batch_size: int = 10000, review_model=None, only_stale: bool = True) -> int:
+    """Recompute Review.effective_sentiment in SQL, one primary-key range per UPDATE.
+
+    Needed after writes that bypass Review.save() (queryset.update(), raw SQL). With
+    only_stale, rows already holding the right value are not rewritten.
+    """
+    if review_model is None:
+        from products.models import Review as review_model
+    expression = effective_sentiment_expression()
+    reviews = review_model.objects.all()
+    if only_stale:
+        reviews = reviews.annotate(expected=effective_sentiment_expression()).exclude(
+            effective_sentiment=F('expected'))
+    bounds = review_model.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return 0
+    updated = 0
+    for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+        batch = reviews.filter(id__gte=start, id__lt=start + batch_size)
+        if only_stale:
+            batch = review_model.objects.filter(id__in=batch.values('id'))
+        updated += batch.update(effective_sentiment=expression)
+    logger.info(f"Backfilled effective_sentiment on {updated} reviews")
+    return updated
+
+
+def resolve_timezone(name: Optional[str]):
+    if not name:
+        return timezone.get_default_timezone()
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+
+
+def _label(period: datetime, granularity: str) -> str:
+    if granularity == 'hour':
+        return period.isoformat()
+    return period.date().isoformat()
+
+
+def sentiment_trends(days: Optional[int] = None, product_id: Optional[int] = None, mode: str = 'analyzed',
+                     granularity: str = 'day', tz: Optional[str] = None) -> Dict[str, List]:
+    """Counts per period and sentiment for the last `days` days, read from the rollup table.
+
+    mode='analyzed' counts analyzer labels only; mode='effective' falls back to the rating
+    for unlabeled reviews. Periods without reviews are omitted, like the old GROUP BY.
+    """
+    from .models import SentimentRollup
+
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    if mode not in ('analyzed', 'effective'):
+        raise ValueError("mode must be 'analyzed' or 'effective'")
+    zone = resolve_timezone(tz)
+    days = settings.SENTIMENT_TREND_DAYS_DEFAULT if days is None else int(days)
+
+    count_field = 'effective_count' if mode == 'effective' else 'analyzed_count'
+    qs = SentimentRollup.objects.filter(
+        bucket__gte=hour_bucket(timezone.now() - timedelta(days=days)),
+        **{f'{count_field}__gt': 0},
+    )
+    if product_id is not None:
+        qs = qs.filter(product_id=product_id)
+    rows = (
+        qs.annotate(period=Trunc('bucket', granularity, tzinfo=zone))
+        .values('period', 'sentiment')
+        .annotate(count=Sum(count_field), confidence=Sum('confidence_sum'), analyzed=Sum('analyzed_count'))
+        .order_by('period')
+    )
+
+    periods: Dict[str, Dict] = {}
+    for row in rows:
+        label = _label(row['period'], granularity)
+        entry = periods.setdefault(label, {'positive': 0, 'negative': 0, 'neutral': 0,
+                                           'confidence': 0.0, 'analyzed': 0})
+        entry[row['sentiment']] = entry.get(row['sentiment'], 0) + row['count']
+        entry['confidence'] += row['confidence'] or 0.0
+        entry['analyzed'] += row['analyzed'] or 0
+
+    # Rows arrive ordered by period; labels are not always sortable as strings (DST offsets)
+    dates = list(periods)
+    return {
+        'dates': dates,
+        'positive': [periods[d]['positive'] for d in dates],
+        'negative': [periods[d]['negative'] for d in dates],
+        'neutral': [periods[d]['neutral'] for d in dates],
+        'average_confidence': [
+            periods[d]['confidence'] / periods[d]['analyzed'] if periods[d]['analyzed'] else None for d in dates
+        ],
+        'granularity': granularity,
+        'timezone': str(zone),
+    }
@@ -1,8 +1,11 @@
 from django.conf import settings
 from django.db import transaction
 from django.db import models
-from typing import Dict, List, Optional
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
 import logging
+import re
+import threading
 
 from products.models import Review
 from .models import (
@@ -10,9 +13,75 @@ from .models import (
     BERTSentimentAnalyzer,
     NaiveBayesSentimentAnalyzer
 )
+from .duplicates import duplicate_skips_scoring
+from .feature_store import get_feature_store
+from .incremental import IncrementalNaiveBayesUpdater
+from .model_versions import bert_model_version, scoring_version
+from .prediction_cache import get_prediction_cache
+from .inference_engine import BatchedBERTAnalyzer, RemoteBERTAnalyzer, get_bert_engine
 
 logger = logging.getLogger(__name__)
 
+# (language, model type) -> [scoring version seen last, BERT version built with, analyzer]
+_analyzers: Dict[Tuple[str, str], list] = {}
+_analyzers_lock = threading.Lock()
+
+
+def get_analyzer(language: str = 'en', model_type: str = 'naive_bayes', version: Optional[str] = None):
+    """Process-wide analyzer per (language, model type).
+
+    Building one unpickles the model, probes NLTK data and, for BERT and the cascade, loads
+    the transformers model, all of which cost far more than a prediction, so request-time
+    scoring reuses it. Replaced Naive Bayes files are picked up with reload_if_changed(),
+    right away when the scoring version moved on; a replaced BERT model rebuilds the analyzer.
+    """
+    version = version or scoring_version(model_type, language)
+    bert_version = bert_model_version() if model_type in ('bert', 'cascade') else None
+    key = (language, model_type)
+    with _analyzers_lock:
+        entry = _analyzers.get(key)
+        if entry is None or entry[1] != bert_version:
+            entry = _analyzers[key] = [version, bert_version, build_analyzer(language, model_type)]
+        changed = entry[0] != version
+        entry[0] = version
+        analyzer = entry[2]
+    naive_bayes = getattr(analyzer, 'naive_bayes', analyzer)
+    if isinstance(naive_bayes, NaiveBayesSentimentAnalyzer):
+        naive_bayes.reload_if_changed(force=changed)
+    return analyzer
+
+
+def build_analyzer(language: str = 'en', model_type: str = 'naive_bayes'):
+    """New analyzer for a model type configured from SENTIMENT_* settings."""
+    if model_type == 'system':
+        return SentimentAnalysisSystem(language)
+    elif model_type == 'cascade':
+        return SentimentAnalysisSystem(
+            language,
+            default_algorithm='cascade',
+            cascade_threshold=getattr(settings, 'SENTIMENT_CASCADE_THRESHOLD', 0.75),
+            bert_model_dir=getattr(settings, 'SENTIMENT_BERT_MODEL_DIR', None),
+        )
+    elif model_type == 'bert':
+        worker_url = getattr(settings, 'SENTIMENT_BERT_WORKER_URL', None)
+        if worker_url:
+            return RemoteBERTAnalyzer(worker_url, timeout=getattr(settings, 'SENTIMENT_BERT_REQUEST_TIMEOUT', 5.0))
+        if getattr(settings, 'SENTIMENT_BERT_MICROBATCH', False):
+            # Concurrent requests share padded forward passes
+            return BatchedBERTAnalyzer(get_bert_engine(language))
+        return BERTSentimentAnalyzer(
+            language,
+            model_dir=getattr(settings, 'SENTIMENT_BERT_MODEL_DIR', None),
+            num_threads=getattr(settings, 'SENTIMENT_BERT_NUM_THREADS', None),
+            quantize=getattr(settings, 'SENTIMENT_BERT_QUANTIZE', False),
+        )
+    elif model_type == 'naive_bayes':
+        return NaiveBayesSentimentAnalyzer(language)
+    else:
+        logger.warning(f"Unknown model type: {model_type}. Using system.")
+        return SentimentAnalysisSystem(language)
+
+
 class SentimentAnalysisService:
     """Service for analyzing sentiment of customer reviews"""
     
@@ -30,15 +99,7 @@ class SentimentAnalysisService:
     
     def _get_analyzer(self):
         """Get the appropriate sentiment analyzer based on configuration"""
-        if self.model_type == 'system':
-            return SentimentAnalysisSystem(self.language)
-        elif self.model_type == 'bert':
-            return BERTSentimentAnalyzer(self.language)
-        elif self.model_type == 'naive_bayes':
-            return NaiveBayesSentimentAnalyzer(self.language)
-        else:
-            logger.warning(f"Unknown model type: {self.model_type}. Using system.")
-            return SentimentAnalysisSystem(self.language)
+        return get_analyzer(self.language, self.model_type)
     
     def analyze_review(self, review_text: str) -> Dict[str, float]:
         """Analyze sentiment of a single review"""
@@ -50,7 +111,14 @@ class SentimentAnalysisService:
             }
         
         try:
-            result = self.analyzer.predict(review_text)
+            version = scoring_version(self.model_type, self.language)
+            self._analyzer = analyzer = get_analyzer(self.language, self.model_type, version)
+            # Repeated texts (canned reviews, retyped drafts) are served from the prediction cache
+            result = get_prediction_cache().get_or_compute(
+                self.model_type, self.language, review_text,
+                lambda: analyzer.predict(review_text), version=version,
+            )
+            result['model_version'] = version
             logger.info(f"Analyzed review sentiment: {result['sentiment']} (confidence: {result['confidence']:.3f})")
             return result
         except Exception as e:
@@ -64,8 +132,7 @@ class SentimentAnalysisService:
     
     def analyze_review_with_title(self, title: str, comment: str) -> Dict[str, float]:
         """Analyze sentiment combining review title and comment"""
-        combined_text = f"{title} {comment}".strip()
-        return self.analyze_review(combined_text)
+        return self.analyze_review(review_scoring_text(title, comment))
     
     def analyze_multiple_reviews(self, review_texts: List[str]) -> List[Dict[str, float]]:
         """Analyze sentiment for multiple reviews"""
@@ -85,9 +152,7 @@ class SentimentAnalysisService:
             )
             
             # Update review with sentiment data
-            review.sentiment = sentiment_result['sentiment']
-            review.sentiment_confidence = sentiment_result['confidence']
-            review.sentiment_scores = sentiment_result['probabilities']
+            review.apply_sentiment_result(sentiment_result)
             review.save()
             
             logger.info(f"Updated sentiment for review {review_id}: {sentiment_result['sentiment']}")
@@ -106,6 +171,8 @@ class SentimentAnalysisService:
         
         try:
             reviews = Review.objects.filter(sentiment__isnull=True)
+            if duplicate_skips_scoring():
+                reviews = reviews.exclude(fingerprint__duplicate_of__isnull=False)
             total_reviews = reviews.count()
             
             logger.info(f"Starting sentiment analysis for {total_reviews} reviews")
@@ -121,17 +188,17 @@ class SentimentAnalysisService:
                                 review.comment or ""
                             )
                             
-                            review.sentiment = sentiment_result['sentiment']
-                            review.sentiment_confidence = sentiment_result['confidence']
-                            review.sentiment_scores = sentiment_result['probabilities']
+                            review.apply_sentiment_result(sentiment_result)
                             review.save()
                             
-                            stats['processed'] += 1
-                            stats[sentiment_result['sentiment']] += 1
-                            
                         except Exception as e:
                             logger.error(f"Error processing review {review.id}: {e}")
                             stats['errors'] += 1
+                            continue
+                        
+                        stats['processed'] += 1
+                        label = sentiment_result['sentiment']
+                        stats[label] = stats.get(label, 0) + 1
                 
                 logger.info(f"Processed {min(i+batch_size, total_reviews)}/{total_reviews} reviews")
             
@@ -144,75 +211,10 @@ class SentimentAnalysisService:
             return stats
     
     def get_product_sentiment_summary(self, product_id: int) -> Dict[str, float]:
-        """Get sentiment summary for a specific product"""
+        """Get sentiment summary for a specific product (one aggregate query, cached)"""
         try:
-            from django.db.models import Count, Avg, Case, When, Value, F, CharField
-            base_qs = Review.objects.filter(product_id=product_id)
-            analyzed_qs = base_qs.filter(sentiment__isnull=False)
-
-            total_all = base_qs.count()
-            analyzed = analyzed_qs.count()
-            unanalyzed = total_all - analyzed
-            coverage = (analyzed / total_all * 100) if total_all > 0 else 0
-
-            # Analyzed-only counts
-            sentiment_counts = {
-                'positive': analyzed_qs.filter(sentiment='positive').count(),
-                'negative': analyzed_qs.filter(sentiment='negative').count(),
-                'neutral': analyzed_qs.filter(sentiment='neutral').count(),
-            }
-            analyzed_total = max(1, analyzed)  # avoid div-by-zero; if 0, keep 0% below
-            sentiment_distribution_percent = {
-                k: ((v / analyzed_total) * 100 if analyzed > 0 else 0.0)
-                for k, v in sentiment_counts.items()
-            }
-
-            # Effective sentiment (fallback to rating)
-            eff_sent = Case(
-                When(sentiment__isnull=False, then=F('sentiment')),
-                When(sentiment__isnull=True, rating__gte=4, then=Value('positive')),
-                When(sentiment__isnull=True, rating=3, then=Value('neutral')),
-                When(sentiment__isnull=True, rating__lte=2, then=Value('negative')),
-                default=Value('neutral'),
-                output_field=CharField(),
-            )
-            eff_counts_qs = base_qs.annotate(eff_sentiment=eff_sent).values('eff_sentiment').annotate(
-                count=Count('id')
-            )
-            effective_counts = {'positive': 0, 'neutral': 0, 'negative': 0}
-            for row in eff_counts_qs:
-                s = row['eff_sentiment']
-                if s in effective_counts:
-                    effective_counts[s] = row['count']
-            eff_total = max(1, total_all)
-            effective_distribution_percent = {
-                k: (v / eff_total) * 100 if total_all > 0 else 0.0 for k, v in effective_counts.items()
-            }
-
-            # Average confidence from analyzed only
-            avg_confidence = analyzed_qs.aggregate(
-                avg_conf=Avg('sentiment_confidence')
-            )['avg_conf'] or 0.0
-
-            # Overall sentiment decision: use analyzed if coverage >= 50%, else effective
-            source_counts = sentiment_counts if coverage >= 50 else effective_counts
-            if sum(source_counts.values()) > 0:
-                overall_sentiment = max(source_counts, key=source_counts.get)
-            else:
-                overall_sentiment = 'neutral'
-
-            return {
-                'total_reviews': total_all,
-                'analyzed_reviews': analyzed,
-                'unanalyzed_reviews': unanalyzed,
-                'analysis_coverage': coverage,
-                'sentiment_counts': sentiment_counts,
-                'sentiment_distribution_percent': sentiment_distribution_percent,
-                'effective_sentiment_counts': effective_counts,
-                'effective_sentiment_distribution_percent': effective_distribution_percent,
-                'average_confidence': float(avg_confidence),
-                'overall_sentiment': overall_sentiment,
-            }
+            from .aggregates import sentiment_aggregates
+            return sentiment_aggregates(int(product_id))
             
         except Exception as e:
             logger.error(f"Error getting product sentiment summary: {e}")
@@ -225,6 +227,26 @@ class SentimentAnalysisService:
             }
 
 
+VI_CHARS = frozenset("àáạảãâầấậẩẫăằắặẳẵèéẹẻẽêềếệểễìíịỉĩòóọỏõôồốộổỗơờớợởỡùúụủũưừứựửữỳýỵỷỹđ")
+# One C-level scan per text; IGNORECASE covers the capitalized forms without lower() copies
+VI_CHARS_RE = re.compile(f"[{''.join(sorted(VI_CHARS))}]", re.IGNORECASE)
+
+
+def detect_language(text: str) -> str:
+    """Very lightweight language heuristic for vi vs en.
+    - If Vietnamese diacritics are present, choose 'vi'.
+    - Else default to 'en'.
+    """
+    if text and VI_CHARS_RE.search(text):
+        return 'vi'
+    return 'en'
+
+
+def review_scoring_text(title: Optional[str], comment: Optional[str]) -> str:
+    """Text a review is scored on (see SentimentAnalysisService.analyze_review_with_title)."""
+    return f"{title or ''} {comment or ''}".strip()
+
+
 class BilingualSentimentService:
     """Detect language and route to the appropriate analyzer (EN/VI)."""
 
@@ -237,16 +259,7 @@ class BilingualSentimentService:
         }
 
     def _detect_language(self, text: str) -> str:
-        """Very lightweight language heuristic for vi vs en.
-        - If Vietnamese diacritics are present, choose 'vi'.
-        - Else default to 'en'.
-        """
-        if not text:
-            return 'en'
-        vi_chars = set("àáạảãâầấậẩẫăằắặẳẵèéẹẻẽêềếệểễìíịỉĩòóọỏõôồốộổỗơờớợởỡùúụủũưừứựửữỳýỵỷỹđ")
-        if any(ch in vi_chars for ch in text.lower()):
-            return 'vi'
-        return 'en'
+        return detect_language(text)
 
     def _get_analyzer(self, lang: str):
         if self._analyzers.get(lang) is None:
@@ -254,12 +267,80 @@ class BilingualSentimentService:
         return self._analyzers[lang]
 
     def predict(self, text: str) -> Dict[str, float]:
-        lang = self._detect_language(text)
-        analyzer = self._get_analyzer(lang)
-        result = analyzer.predict(text)
-        result['language'] = lang
-        result['algorithm'] = 'naive_bayes'
-        return result
+        return self.predict_many([text])[0]
+
+    def predict_many(self, texts: List[str]) -> List[Dict[str, float]]:
+        """Score a mixed EN/VI batch: one predict_batch call per language, results in input order.
+
+        Blank texts get the neutral placeholder SentimentAnalysisService.analyze_review returns.
+        """
+        results: List[Optional[Dict[str, float]]] = [None] * len(texts)
+        by_language = defaultdict(list)
+        for i, text in enumerate(texts):
+            if text and text.strip():
+                by_language[detect_language(text)].append(i)
+            else:
+                results[i] = {
+                    'sentiment': 'neutral',
+                    'confidence': 0.0,
+                    'probabilities': {'positive': 0.33, 'negative': 0.33, 'neutral': 0.34},
+                    'language': 'en',
+                    'algorithm': 'naive_bayes',
+                    'model_version': scoring_version('naive_bayes', 'en'),
+                }
+        for lang, indices in by_language.items():
+            version = scoring_version('naive_bayes', lang)
+            # Shares SentimentAnalysisService's cache entries; only the misses reach predict_batch
+            batch = get_prediction_cache().get_many_or_compute(
+                'naive_bayes', lang, [texts[i] for i in indices],
+                self._get_analyzer(lang).predict_batch, version=version,
+            )
+            for i, result in zip(indices, batch):
+                result['language'] = lang
+                result['algorithm'] = 'naive_bayes'
+                result['model_version'] = version
+                results[i] = result
+        return results
+
+    def analyze_reviews(self, reviews, batch_size: int = 500) -> Dict[str, int]:
+        """Score and save every review in the queryset, batch by batch in id order."""
+        stats = {'processed': 0, 'positive': 0, 'negative': 0, 'neutral': 0, 'errors': 0}
+        reviews = reviews.order_by('id')
+        last_id = 0
+        while True:
+            # Keyset pages: scored rows may drop out of `reviews` as we go
+            batch = list(reviews.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            try:
+                results = self.predict_many([review_scoring_text(r.title, r.comment) for r in batch])
+            except Exception as e:
+                logger.error(f"Error scoring reviews {batch[0].id}..{last_id}: {e}")
+                stats['errors'] += len(batch)
+                continue
+            with transaction.atomic():
+                for review, result in zip(batch, results):
+                    try:
+                        review.apply_sentiment_result(result)
+                        review.save()
+                    except Exception as e:
+                        logger.error(f"Error processing review {review.id}: {e}")
+                        stats['errors'] += 1
+                        continue
+                    stats['processed'] += 1
+                    stats[result['sentiment']] = stats.get(result['sentiment'], 0) + 1
+            logger.info(f"Processed reviews up to id {last_id}: {stats}")
+        return stats
+
+    def analyze_all_reviews(self, batch_size: int = 500) -> Dict[str, int]:
+        """Backfill: score unanalyzed reviews, each with the model of its language."""
+        reviews = Review.objects.filter(sentiment__isnull=True)
+        if duplicate_skips_scoring():
+            reviews = reviews.exclude(fingerprint__duplicate_of__isnull=False)
+        stats = self.analyze_reviews(reviews, batch_size=batch_size)
+        logger.info(f"Bilingual sentiment analysis completed. Stats: {stats}")
+        return stats
 
     def train_both_languages(self, en_texts: List[str], en_labels: List[int], vi_texts: List[str], vi_labels: List[int]) -> Dict[str, float]:
         """Train and save models for both EN and VI."""
@@ -274,46 +355,12 @@ class BilingualSentimentService:
             stats[lang] = acc
         return stats
     
-    def get_sentiment_trends(self, days: int = 30) -> Dict[str, List]:
-        """Get sentiment trends over time"""
-        from django.utils import timezone
-        from datetime import timedelta
-        from django.db import models
-        
+    def get_sentiment_trends(self, days: int = 30, granularity: str = 'day', tz: Optional[str] = None) -> Dict[str, List]:
+        """Get sentiment trends over time (read from the rollup table)"""
+        from .rollups import sentiment_trends
+
         try:
-            end_date = timezone.now()
-            start_date = end_date - timedelta(days=days)
-            
-            reviews = Review.objects.filter(
-                created_at__gte=start_date,
-                sentiment__isnull=False
-            ).extra({
-                'date': "DATE(created_at)"
-            }).values('date', 'sentiment').annotate(
-                count=models.Count('id')
-            ).order_by('date')
-            
-            # Organize data by date
-            trends = {}
-            for review in reviews:
-                date_str = str(review['date'])
-                if date_str not in trends:
-                    trends[date_str] = {'positive': 0, 'negative': 0, 'neutral': 0}
-                trends[date_str][review['sentiment']] = review['count']
-            
-            # Convert to lists for charting
-            dates = sorted(trends.keys())
-            positive_counts = [trends[date]['positive'] for date in dates]
-            negative_counts = [trends[date]['negative'] for date in dates]
-            neutral_counts = [trends[date]['neutral'] for date in dates]
-            
-            return {
-                'dates': dates,
-                'positive': positive_counts,
-                'negative': negative_counts,
-                'neutral': neutral_counts
-            }
-            
+            return sentiment_trends(days=days, granularity=granularity, tz=tz)
         except Exception as e:
             logger.error(f"Error getting sentiment trends: {e}")
             return {
@@ -423,12 +470,9 @@ class ModelTrainingService:
     def __init__(self, language='en'):
         self.language = language
     
-    def prepare_training_data(self) -> tuple:
+    def prepare_training_data(self, rows: list = None) -> tuple:
         """Prepare training data from existing reviews"""
-        reviews = Review.objects.filter(
-            sentiment__isnull=False,
-            rating__isnull=False
-        ).values('title', 'comment', 'rating', 'sentiment')
+        reviews = rows if rows is not None else self._labeled_reviews()
         
         texts = []
         labels = []
@@ -445,20 +489,40 @@ class ModelTrainingService:
         
         return texts, labels
     
+    def _labeled_reviews(self) -> list:
+        return list(Review.objects.filter(
+            sentiment__isnull=False,
+            rating__isnull=False
+        ).values('id', 'title', 'comment', 'rating', 'sentiment'))
+    
     def train_naive_bayes_model(self) -> float:
         """Train a Naive Bayes model on existing review data"""
-        texts, labels = self.prepare_training_data()
+        rows = self._labeled_reviews()
+        texts, labels = self.prepare_training_data(rows)
         
         if len(texts) < 10:
             logger.warning("Not enough training data. Need at least 10 reviews.")
             return 0.0
         
-        analyzer = NaiveBayesSentimentAnalyzer(self.language)
+        analyzer = NaiveBayesSentimentAnalyzer(
+            self.language,
+            feature_store=get_feature_store(),
+            lexicon_features=getattr(settings, 'SENTIMENT_NB_LEXICON_FEATURES', False),
+        )
         accuracy = analyzer.train(texts, labels)
         analyzer.save_model()
+        # Later incremental updates only need reviews newer than this run's; an older
+        # rebuilt candidate waiting for promotion is superseded
+        updater = IncrementalNaiveBayesUpdater(self.language)
+        updater.record_rebuild(max(row['id'] for row in rows), analyzer)
+        updater.discard_candidate()
         
         logger.info(f"Naive Bayes model trained with accuracy: {accuracy:.4f}")
         return accuracy
+    
+    def update_naive_bayes_incremental(self, force_rebuild: bool = False) -> Dict:
+        """Fold reviews added since the last run into the saved model (candidate rebuild on vocabulary drift)"""
+        return IncrementalNaiveBayesUpdater(self.language).run(force_rebuild=force_rebuild)
 
 
 # Utility functions for easy access
@@ -467,9 +531,11 @@ def analyze_review_sentiment(review_text: str, language='en', model_type='naive_
     service = SentimentAnalysisService(language, model_type)
     return service.analyze_review(review_text)
 
-def update_all_review_sentiments(language='en', model_type='naive_bayes') -> Dict[str, int]:
-    """Quick function to update all review sentiments"""
-    service = SentimentAnalysisService(language, model_type)
+def update_all_review_sentiments(language='auto', model_type='naive_bayes') -> Dict[str, int]:
+    """Quick function to update all review sentiments ('auto' routes each review by language)"""
+    if language == 'auto' and model_type == 'naive_bayes':
+        return BilingualSentimentService().analyze_all_reviews()
+    service = SentimentAnalysisService('en' if language == 'auto' else language, model_type)
     return service.analyze_all_reviews()
 
 def get_product_sentiment(product_id: int) -> Dict[str, float]:
@@ -0,0 +1,207 @@
+"""
+Request coalescing (single-flight) for expensive read endpoints.
+
+SingleFlight makes concurrent callers asking for the same key within one process share
+a single computation: the first caller (the leader) runs it, the others wait on its
+future and receive the same result or exception. Nothing is kept after the call ends.
+
+CacheSingleFlight extends this across processes through the Django cache. A result is
+read from the cache first. On a miss, one process takes a short lock with cache.add()
+and computes; the others poll the cache until the value appears (or the wait times out
+and they compute themselves). cache.add() is only atomic across processes on shared
+backends (Redis, Memcached, database); with LocMem it degrades to per-process coalescing.
+
+CacheLock is the same cache.add() lock for work whose result is not a cached value (model
+training): a second caller is turned away instead of running the work again.
+
+Flights are registered by name so their counters can be reported (see flight_stats()).
+"""
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution (per process)."""
+
+    def __init__(self, name: str = 'default'):
+        self.name = name
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'executions': 0, 'coalesced': 0, 'errors': 0, 'max_waiters': 0}
+        self._waiters: Dict[str, int] = {}
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        with self._lock:
+            self._stats['calls'] += 1
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self._waiters[key] = 0
+                self._stats['executions'] += 1
+            else:
+                self._stats['coalesced'] += 1
+                self._waiters[key] += 1
+                self._stats['max_waiters'] = max(self._stats['max_waiters'], self._waiters[key])
+        if not leader:
+            return future.result(timeout)
+
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+                self._waiters.pop(key, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+
+class CacheSingleFlight:
+    """Cache-backed get-or-compute with one computation per key across processes."""
+
+    def __init__(self, name: str, cache_alias: str = 'default', lock_timeout: float = 30.0,
+                 wait_timeout: float = 10.0, poll_interval: float = 0.05):
+        self.name = name
+        self.cache_alias = cache_alias
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.local = SingleFlight(name)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'remote_waits': 0, 'remote_hits': 0, 'lock_timeouts': 0}
+
+    def _cache(self):
+        try:
+            from django.core.cache import caches
+            return caches[self.cache_alias]
+        except Exception as e:
+            logger.warning(f"Single-flight cache '{self.cache_alias}' unavailable: {e}")
+            return None
+
+    def _count(self, stat: str):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def get_or_compute(self, key: str, fn: Callable[[], Any], ttl: Optional[float] = 300) -> Any:
+        cache = self._cache()
+        if cache is None:
+            return self.local.do(key, fn)
+        # Values are wrapped so a cached None is distinguishable from a miss
+        cached = cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            self._count('hits')
+            return cached[0]
+        return self.local.do(key, lambda: self._fill(cache, key, fn, ttl))
+
+    def _fill(self, cache, key: str, fn: Callable[[], Any], ttl: Optional[float]) -> Any:
+        self._count('misses')
+        lock_key = f"{key}:lock"
+        token = uuid.uuid4().hex
+        if not cache.add(lock_key, token, self.lock_timeout):
+            self._count('remote_waits')
+            deadline = time.monotonic() + self.wait_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                cached = cache.get(key, _MISSING)
+                if cached is not _MISSING:
+                    self._count('remote_hits')
+                    return cached[0]
+                if cache.get(lock_key) is None:
+                    # Holder finished without storing (error) or its lock expired: try to take over
+                    if cache.add(lock_key, token, self.lock_timeout):
+                        break
+            else:
+                self._count('lock_timeouts')
+                logger.warning(f"{self.name}: gave up waiting for {key}; computing locally")
+                return fn()
+        try:
+            value = fn()
+            cache.set(key, (value,), ttl)
+            return value
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({f'local_{k}': v for k, v in self.local.stats().items()})
+        return stats
+
+
+class CacheLock:
+    """Non-blocking lock held in the Django cache; expires after `timeout` if the holder dies."""
+
+    def __init__(self, key: str, timeout: float = 3600.0, cache_alias: str = 'default'):
+        self.key = key
+        self.timeout = timeout
+        self.cache_alias = cache_alias
+        self._token: Optional[str] = None
+
+    def _cache(self):
+        from django.core.cache import caches
+        return caches[self.cache_alias]
+
+    def acquire(self) -> bool:
+        token = uuid.uuid4().hex
+        if not self._cache().add(self.key, token, self.timeout):
+            return False
+        self._token = token
+        return True
+
+    def release(self):
+        cache = self._cache()
+        if self._token is not None and cache.get(self.key) == self._token:
+            cache.delete(self.key)
+        self._token = None
+
+    def locked(self) -> bool:
+        return self._cache().get(self.key) is not None
+
+
+_flights: Dict[str, Any] = {}
+_flights_lock = threading.Lock()
+
+
+def get_flight(name: str) -> SingleFlight:
+    """Process-wide in-process flight registered under `name`."""
+    with _flights_lock:
+        flight = _flights.get(name)
+        if flight is None:
+            flight = _flights[name] = SingleFlight(name)
+        return flight
+
+
+def get_cache_flight(name: str, **options) -> CacheSingleFlight:
+    """Process-wide cache-backed flight registered under `name` (options apply on first use)."""
+    with _flights_lock:
+        flight = _flights.get(name)
+        if flight is None:
+            flight = _flights[name] = CacheSingleFlight(name, **options)
+        return flight
+
+
+def flight_stats() -> Dict[str, Dict]:
+    with _flights_lock:
+        flights = dict(_flights)
+    return {name: flight.stats() for name, flight in flights.items()}
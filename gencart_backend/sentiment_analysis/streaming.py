@@ -0,0 +1,205 @@
+"""
+Out-of-core training for the TF-IDF + Naive Bayes sentiment model.
+
+Corpora are read in chunks (CSV via pandas chunksize, JSONL line by line) and the model is
+built in two passes instead of materialising every text:
+
+1. Vocabulary pass: stream the chunks once, counting term and document frequencies of the
+   n-grams the vectorizer would produce. min_df/max_df/max_features are then applied the
+   same way TfidfVectorizer.fit does, and idf is computed from the document frequencies.
+2. Training pass: transform each chunk with the resulting (regular, picklable)
+   TfidfVectorizer and feed it to MultinomialNB.partial_fit. NB sufficient statistics are
+   additive, so this gives the same model as fit() on the full matrix.
+
+Memory is bounded by chunk_size, the candidate term table (pruned above
+max_candidate_terms) and a fixed-size validation reservoir, not by dataset size.
+"""
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import logging
+import random
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+
+logger = logging.getLogger(__name__)
+
+ENCODING_CANDIDATES = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252', 'iso-8859-1']
+
+Chunk = Tuple[List[str], List[int]]
+
+
+def detect_csv_encoding(filepath: str, sample_bytes: int = 1 << 20) -> str:
+    """Pick an encoding from a leading sample instead of re-reading the whole file per attempt."""
+    with open(filepath, 'rb') as f:
+        sample = f.read(sample_bytes)
+    for enc in ENCODING_CANDIDATES:
+        try:
+            sample.decode(enc)
+            return enc
+        except UnicodeDecodeError as e:
+            # A multi-byte character cut at the sample boundary is not a real failure
+            if e.start >= len(sample) - 4 and len(sample) == sample_bytes:
+                return enc
+    return 'latin-1'
+
+
+def iter_csv_chunks(filepath: str, chunksize: int = 10000, encoding: Optional[str] = None,
+                    usecols=None) -> Iterator[pd.DataFrame]:
+    encoding = encoding or detect_csv_encoding(filepath)
+    reader = pd.read_csv(filepath, encoding=encoding, encoding_errors='replace',
+                         chunksize=chunksize, usecols=usecols)
+    with reader:
+        for chunk in reader:
+            yield chunk
+
+
+def iter_jsonl_chunks(filepath: str, chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+    rows = []
+    with open(filepath, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                logger.warning(f"Skipping malformed JSONL line in {filepath}")
+                continue
+            if len(rows) >= chunksize:
+                yield pd.DataFrame(rows)
+                rows = []
+    if rows:
+        yield pd.DataFrame(rows)
+
+
+def iter_file_chunks(filepath: str, chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+    if filepath.lower().endswith(('.jsonl', '.ndjson')):
+        return iter_jsonl_chunks(filepath, chunksize)
+    return iter_csv_chunks(filepath, chunksize)
+
+
+def labeled_chunks(frames: Iterable[pd.DataFrame], text_col: str = 'text', label_col: str = 'label') -> Iterator[Chunk]:
+    """Turn DataFrame chunks into (texts, labels) lists, keeping only binary 0/1 labels."""
+    label_map = {'negative': 0, 'neg': 0, '0': 0, 'positive': 1, 'pos': 1, '1': 1}
+    for frame in frames:
+        frame = frame[[text_col, label_col]].dropna()
+        labels = frame[label_col].map(lambda v: label_map.get(str(v).strip().lower(), v))
+        keep = labels.isin([0, 1])
+        if keep.any():
+            yield frame.loc[keep, text_col].astype(str).tolist(), labels[keep].astype(int).tolist()
+
+
+class StreamingNaiveBayesTrainer:
+    """Two-pass TF-IDF vocabulary build followed by MultinomialNB.partial_fit over chunks."""
+
+    def __init__(self, language: str = 'en', max_features: Optional[int] = 5000, ngram_range=(1, 2),
+                 min_df=2, max_df=0.95, max_candidate_terms: int = 2_000_000,
+                 validation_fraction: float = 0.1, validation_reservoir: int = 20000,
+                 preprocess: Optional[Callable[[str], str]] = None, seed: int = 42):
+        self.vectorizer = TfidfVectorizer(
+            max_features=max_features,
+            stop_words='english' if language == 'en' else None,
+            ngram_range=ngram_range,
+            min_df=min_df,
+            max_df=max_df,
+        )
+        self.max_candidate_terms = max_candidate_terms
+        self.validation_fraction = validation_fraction
+        self.validation_reservoir = validation_reservoir
+        self.preprocess = preprocess or (lambda text: text)
+        self.seed = seed
+        self.stats: Dict = {}
+
+    def _is_validation(self, row_index: int) -> bool:
+        # Deterministic split that is identical in both passes
+        if not self.validation_fraction:
+            return False
+        return (row_index * 2654435761 % 2 ** 32) / 2 ** 32 < self.validation_fraction
+
+    def build_vocabulary(self, chunks: Iterable[Chunk]) -> TfidfVectorizer:
+        analyze = self.vectorizer.build_analyzer()
+        term_freq: Counter = Counter()
+        doc_freq: Counter = Counter()
+        n_docs = 0
+        row = 0
+        pruned = 0
+        for texts, _ in chunks:
+            for text in texts:
+                row += 1
+                if self._is_validation(row - 1):
+                    continue
+                terms = analyze(self.preprocess(text))
+                term_freq.update(terms)
+                doc_freq.update(set(terms))
+                n_docs += 1
+            if len(doc_freq) > self.max_candidate_terms:
+                # Bound memory: drop singletons (approximate once the table overflows)
+                singletons = [t for t, df in doc_freq.items() if df <= 1]
+                for t in singletons:
+                    del doc_freq[t]
+                    del term_freq[t]
+                pruned += len(singletons)
+        if n_docs == 0:
+            raise ValueError('No training documents found in stream')
+
+        min_count = self.vectorizer.min_df if isinstance(self.vectorizer.min_df, int) else self.vectorizer.min_df * n_docs
+        max_count = self.vectorizer.max_df if isinstance(self.vectorizer.max_df, int) else self.vectorizer.max_df * n_docs
+        kept = sorted(t for t, df in doc_freq.items() if min_count <= df <= max_count)
+        if self.vectorizer.max_features is not None and len(kept) > self.vectorizer.max_features:
+            # Same rule as TfidfVectorizer: most frequent terms over the corpus
+            kept = sorted(sorted(kept, key=lambda t: -term_freq[t])[:self.vectorizer.max_features])
+        if not kept:
+            raise ValueError('After pruning, no terms remain. Try a lower min_df or a higher max_df.')
+
+        self.vectorizer.vocabulary_ = {term: i for i, term in enumerate(kept)}
+        df = np.array([doc_freq[t] for t in kept], dtype=np.float64)
+        self.vectorizer.idf_ = np.log((1 + n_docs) / (1 + df)) + 1
+        self.stats.update({'vocabulary_docs': n_docs, 'vocabulary_size': len(kept), 'pruned_terms': pruned})
+        return self.vectorizer
+
+    def fit(self, chunk_source: Callable[[], Iterable[Chunk]], classes=(0, 1)) -> Tuple[TfidfVectorizer, MultinomialNB]:
+        """chunk_source is called once per pass and must return a fresh chunk iterator."""
+        started = time.perf_counter()
+        self.build_vocabulary(chunk_source())
+
+        model = MultinomialNB()
+        rng = random.Random(self.seed)
+        val_texts: List[str] = []
+        val_labels: List[int] = []
+        seen_val = 0
+        row = 0
+        trained = 0
+        for texts, labels in chunk_source():
+            train_texts, train_labels = [], []
+            for text, label in zip(texts, labels):
+                row += 1
+                if self._is_validation(row - 1):
+                    # Reservoir sampling keeps the held-out set at a fixed size
+                    seen_val += 1
+                    if len(val_texts) < self.validation_reservoir:
+                        val_texts.append(text)
+                        val_labels.append(label)
+                    else:
+                        j = rng.randrange(seen_val)
+                        if j < self.validation_reservoir:
+                            val_texts[j], val_labels[j] = text, label
+                    continue
+                train_texts.append(self.preprocess(text))
+                train_labels.append(label)
+            if train_texts:
+                model.partial_fit(self.vectorizer.transform(train_texts), train_labels, classes=list(classes))
+                trained += len(train_texts)
+
+        elapsed = time.perf_counter() - started
+        self.stats.update({'rows': row, 'trained_rows': trained, 'validation_rows': len(val_texts),
+                           'seconds': elapsed, 'rows_per_sec': row / elapsed if elapsed else 0.0})
+        if val_texts:
+            X_val = self.vectorizer.transform([self.preprocess(t) for t in val_texts])
+            self.stats['accuracy'] = float(model.score(X_val, val_labels))
+        logger.info(f"Streaming Naive Bayes trained on {trained} rows ({self.stats['rows_per_sec']:.0f} rows/s)")
+        return self.vectorizer, model
@@ -1,11 +1,69 @@
-from django.test import TestCase
+from django.conf import settings
+from django.test import TestCase, SimpleTestCase, override_settings
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
-from products.models import Review, Product
+from rest_framework.test import APIClient
+from products.models import Category, Review, Product
+from products.management.commands.seed_reviews import SAMPLE_COMMENTS
+from products.view_counts import flush_product_views
 from users.models import User
-from sentiment_analysis.data_quality import compute_data_quality
+from sentiment_analysis import benchmarks
+from sentiment_analysis.aggregates import product_sentiment_aggregates, sentiment_aggregates
+from sentiment_analysis.data_quality import NearDuplicateDetector, compute_data_quality
+from sentiment_analysis.prediction_cache import PredictionCache
+from sentiment_analysis.single_flight import CacheSingleFlight, SingleFlight
+from sentiment_analysis.duplicates import band_buckets, fingerprint_corpus, review_tokens, signature
+from sentiment_analysis.services import BilingualSentimentService, SentimentAnalysisService, detect_language, get_analyzer
+from sentiment_analysis.model_versions import current_model_version, scoring_version, version_path
+from sentiment_analysis.rescoring import RescoringJob, stale_reviews, version_breakdown
+from sentiment_analysis.highlights import HighlightExtractor, refresh_highlights
+from sentiment_analysis.events import (
+    CacheBroker, InProcessBroker, SentimentEventStream, aggregate_delta, get_broker, reset_broker
+)
+from sentiment_analysis.probabilities import borderline_reviews, probability_histogram, product_probability_means
+from sentiment_analysis.compiled_scorer import CompiledNBScorer
+from sentiment_analysis.model_artifacts import write_artifact, load_artifact
+from sentiment_analysis.dataset_export import export_dataset, latest_export_meta
+from sentiment_analysis.feature_store import FeatureStore, get_feature_store, texts_hash
+from sentiment_analysis.kaggle_loaders import EnglishSentimentLoader, VietnameseSentimentLoader
+from sentiment_analysis.incremental import IncrementalNaiveBayesUpdater, training_lock
+from sentiment_analysis.tokenization import (
+    TokenCache, VietnameseTokenizer, get_vietnamese_tokenizer, tokenize_text, tokenizer_backend
+)
+from sentiment_analysis.lexicon import LexiconMatcher
+from sentiment_analysis.rollups import backfill_effective_sentiment, rebuild_rollups, sentiment_trends
+from sentiment_analysis.vietnamese_utils import extract_emotion_features
+from sentiment_analysis.inference_engine import MicroBatchEngine, RemoteBERTAnalyzer
+from sentiment_analysis.streaming import (
+    StreamingNaiveBayesTrainer, detect_csv_encoding, iter_file_chunks, labeled_chunks
+)
+from sentiment_analysis.models import (
+    BERTSentimentAnalyzer, NaiveBayesSentimentAnalyzer, ProductReviewHighlights, ReviewFingerprint,
+    SentimentAnalysisSystem, SentimentRollup, SentimentTrainingWatermark, TRANSFORMERS_AVAILABLE,
+    reset_cascade_stats, shared_cascade_stats,
+)
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta, timezone as dt_timezone
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+import gzip
+import hashlib
+import json
 import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
 from io import StringIO
+from unittest import mock, skipUnless
+import numpy as np
+
+SHIPPED_MODELS = Path(__file__).resolve().parents[2] / 'sentiment_models'
 
 class SentimentExportCommandTests(TestCase):
     def setUp(self):
@@ -23,6 +81,57 @@ class SentimentExportCommandTests(TestCase):
         # Not asserting exact path due to timestamp; just ensure directory exists
         self.assertTrue(os.path.exists(os.path.join(os.path.dirname(__file__), '..')))
 
+class StreamingExportTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Export', slug='export')
+        self.product = Product.objects.create(name='Exp', description='Desc', price=5, category=category)
+        for i, (comment, sentiment) in enumerate([('Love it', 'positive'), ('Broke fast', 'negative'),
+                                                  ('It is fine', 'neutral')]):
+            user = User.objects.create(username=f'exp{i}', email=f'exp{i}@example.com')
+            Review.objects.create(user=user, product=self.product, comment=comment, rating=3, sentiment=sentiment)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_hash_matches_whole_dataset_hash_and_file_is_renamed(self):
+        meta = export_dataset(Path(self.tmp.name), fmt='jsonl', compression='gzip', batch_size=2)
+        rows = Review.objects.order_by('id')
+        expected = hashlib.sha256('\n'.join(
+            f"{r.id}|{r.sentiment}|{(r.title + ' ' + r.comment).strip()}" for r in rows
+        ).encode('utf-8')).hexdigest()
+        self.assertEqual(meta['sha256'], expected)
+        self.assertEqual(os.listdir(self.tmp.name).count(meta['file']), 1)
+        self.assertFalse([name for name in os.listdir(self.tmp.name) if 'partial' in name])
+        with gzip.open(os.path.join(self.tmp.name, meta['file']), 'rt', encoding='utf-8') as f:
+            self.assertEqual([json.loads(line)['id'] for line in f], [r.id for r in rows])
+
+    def test_delta_export_since_latest_watermark(self):
+        out = StringIO()
+        call_command('export_sentiment_dataset', '--format', 'json', '--output-dir', self.tmp.name, stdout=out)
+        self.assertIn('Exported 3 rows', out.getvalue())
+        review = Review.objects.get(comment='It is fine')
+        review.sentiment = 'positive'
+        review.save()
+
+        out = StringIO()
+        call_command('export_sentiment_dataset', '--format', 'csv', '--since', 'latest',
+                     '--output-dir', self.tmp.name, stdout=out)
+        self.assertIn('Exported 1 rows', out.getvalue())
+        delta = latest_export_meta(Path(self.tmp.name))
+        self.assertEqual((delta['kind'], delta['rows']), ('delta', 1))
+        self.assertIsNotNone(delta['parent'])
+
+    def test_truncated_export_records_no_watermark(self):
+        call_command('export_sentiment_dataset', '--format', 'jsonl', '--limit', '2',
+                     '--output-dir', self.tmp.name, stdout=StringIO())
+        self.assertIsNone(latest_export_meta(Path(self.tmp.name)))
+        with self.assertRaisesMessage(CommandError, 'No previous export with a watermark'):
+            call_command('export_sentiment_dataset', '--since', 'latest', '--output-dir', self.tmp.name,
+                         stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('export_sentiment_dataset', '--since', '2020-01-01T00:00:00', '--limit', '1',
+                         '--output-dir', self.tmp.name, stdout=StringIO())
+
+
 class SentimentDataQualityTests(TestCase):
     def setUp(self):
         user = User.objects.create(username='tester2')
@@ -40,3 +149,1442 @@ class SentimentDataQualityTests(TestCase):
         out = StringIO()
         call_command('analyze_sentiment_data_quality', '--min-text-len', '1', stdout=out)
         self.assertIn('Sentiment Data Quality Metrics', out.getvalue())
+
+
+class StreamingDataQualityTests(TestCase):
+    TEMPLATE = 'this product changed my life buy it now from the official store today'
+
+    def setUp(self):
+        category = Category.objects.create(name='Quality', slug='quality')
+        self.products = [
+            Product.objects.create(name=f'Q{i}', description='Desc', price=5, category=category) for i in range(2)
+        ]
+        texts = [
+            (0, self.TEMPLATE, 'positive'),
+            (0, self.TEMPLATE.replace('today', 'right now'), 'positive'),
+            (0, self.TEMPLATE + ' thanks', 'positive'),
+            (1, self.TEMPLATE, 'neutral'),
+            (1, 'the zipper broke after two weeks and support never answered my emails', 'negative'),
+            (1, 'Great product', 'positive'),
+            (0, '', None),
+        ]
+        for i, (product, comment, sentiment) in enumerate(texts):
+            user = User.objects.create(username=f'dq{i}', email=f'dq{i}@example.com')
+            Review.objects.create(user=user, product=self.products[product], comment=comment,
+                                  rating=3, sentiment=sentiment)
+
+    def test_sql_counts_and_near_duplicate_clusters(self):
+        metrics = compute_data_quality(similarity_threshold=0.5, bands=16)
+        self.assertEqual(metrics.total_reviews, 7)
+        self.assertAlmostEqual(metrics.null_text_ratio, 1 / 7)
+        self.assertEqual(metrics.class_distribution, {'positive': 4, 'neutral': 1, 'negative': 1})
+        self.assertAlmostEqual(metrics.duplicate_ratio, 1 / 6)
+        self.assertEqual(metrics.near_duplicate_clusters[0]['size'], 4)
+        self.assertEqual(metrics.near_duplicate_clusters[0]['product_ids'], [p.id for p in self.products])
+        self.assertEqual(metrics.product_duplicate_clusters[self.products[0].id]['duplicate_reviews'], 2)
+
+    def test_minhash_estimate_tracks_jaccard(self):
+        detector = NearDuplicateDetector(num_perm=128, bands=32)
+        tokens = self.TEMPLATE.split()
+        same = detector.signature(tokens)
+        self.assertTrue(np.array_equal(same, detector.signature(list(tokens))))
+        unrelated = detector.signature('the zipper broke after two weeks and support never answered'.split())
+        self.assertLess(float(np.mean(same == unrelated)), 0.2)
+
+
+class PredictionCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = 0
+        patcher = mock.patch('sentiment_analysis.prediction_cache.model_version', return_value='v1')
+        self.version = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _predict(self, sentiment='positive'):
+        self.calls += 1
+        return {'sentiment': sentiment, 'confidence': 0.9, 'probabilities': {'positive': 0.9, 'negative': 0.1, 'neutral': 0.0}}
+
+    def test_normalized_text_hits_cache(self):
+        cache = PredictionCache(max_entries=8)
+        cache.get_or_compute('naive_bayes', 'en', 'Good value for money.', self._predict)
+        result = cache.get_or_compute('naive_bayes', 'en', '  good VALUE for   money. ', self._predict)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(result['sentiment'], 'positive')
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_lru_is_bounded(self):
+        cache = PredictionCache(max_entries=2)
+        for text in ('a', 'b', 'c'):
+            cache.get_or_compute('naive_bayes', 'en', text, self._predict)
+        self.assertEqual(cache.stats()['size'], 2)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_model_change_invalidates(self):
+        cache = PredictionCache(max_entries=8)
+        cache.get_or_compute('naive_bayes', 'en', 'Great', self._predict)
+        self.version.return_value = 'v2'
+        cache.get_or_compute('naive_bayes', 'en', 'Great', self._predict)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(cache.stats()['invalidations'], 1)
+
+    def test_errors_are_not_cached(self):
+        cache = PredictionCache(max_entries=8)
+        failing = lambda: {'sentiment': 'neutral', 'confidence': 0.0, 'probabilities': {}, 'error': 'boom'}
+        cache.get_or_compute('naive_bayes', 'en', 'Great', failing)
+        self.assertEqual(cache.stats()['size'], 0)
+
+
+class CompiledScorerParityTests(SimpleTestCase):
+    TRAIN = [
+        ('Excellent quality and fast delivery', 1),
+        ('Good value for money, great product', 1),
+        ('Great product, works perfectly and arrived fast', 1),
+        ('I love it, excellent value', 1),
+        ('Poor build quality and late delivery', 0),
+        ('Not as described, a bit disappointed', 0),
+        ('Terrible quality, waste of money', 0),
+        ('Broke after a week, very disappointed', 0),
+    ]
+    PROBES = [
+        'Excellent value, fast delivery!',
+        'terrible, poor and late',
+        'Good good good money money',
+        'completely unseen vocabulary here',
+        '',
+        'a',
+    ]
+
+    def _fit(self, **vec_params):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.naive_bayes import MultinomialNB
+        params = {'ngram_range': (1, 2), 'stop_words': 'english'}
+        params.update(vec_params)
+        vectorizer = TfidfVectorizer(**params)
+        X = vectorizer.fit_transform([t for t, _ in self.TRAIN])
+        model = MultinomialNB().fit(X, [y for _, y in self.TRAIN])
+        return vectorizer, model
+
+    def assertParity(self, vectorizer, model, scorer):
+        for text in self.PROBES:
+            X = vectorizer.transform([text])
+            np.testing.assert_allclose(scorer.predict_proba(text), model.predict_proba(X)[0], rtol=1e-12, atol=1e-15)
+            self.assertEqual(scorer.predict(text), model.predict(X)[0])
+
+    def test_matches_sklearn_predict(self):
+        vectorizer, model = self._fit()
+        self.assertParity(vectorizer, model, CompiledNBScorer.from_sklearn(vectorizer, model))
+
+    def test_matches_sklearn_variants(self):
+        for params in ({'sublinear_tf': True}, {'norm': 'l1'}, {'use_idf': False}, {'ngram_range': (1, 3), 'stop_words': None}):
+            vectorizer, model = self._fit(**params)
+            self.assertParity(vectorizer, model, CompiledNBScorer.from_sklearn(vectorizer, model))
+
+    def test_export_roundtrip(self):
+        vectorizer, model = self._fit()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'scorer.npz')
+            CompiledNBScorer.from_sklearn(vectorizer, model).save(path)
+            self.assertParity(vectorizer, model, CompiledNBScorer.load(path))
+
+    def test_mmap_artifact_roundtrip(self):
+        vectorizer, model = self._fit(ngram_range=(1, 2), stop_words=None)
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'model.pkl')
+            with open(source, 'w') as f:
+                f.write('v1')
+            directory = os.path.join(tmp, 'model.mmap')
+            write_artifact(CompiledNBScorer.from_sklearn(vectorizer, model), directory, 'multinomial_nb', (source,))
+            scorer = load_artifact(directory, (source,))
+            self.assertIsInstance(scorer.feature_log_prob, np.ndarray)
+            self.assertEqual(len(scorer.vocabulary), len(vectorizer.vocabulary_))
+            self.assertParity(vectorizer, model, scorer)
+
+            # Re-written source pickle makes the artifact stale
+            with open(source, 'w') as f:
+                f.write('v2, retrained')
+            self.assertIsNone(load_artifact(directory, (source,)))
+
+    def test_matches_logistic_regression(self):
+        from sklearn.linear_model import LogisticRegression
+        vectorizer, _ = self._fit()
+        X = vectorizer.transform([t for t, _ in self.TRAIN])
+        lr = LogisticRegression().fit(X, [y for _, y in self.TRAIN])
+        self.assertParity(vectorizer, lr, CompiledNBScorer.from_sklearn(vectorizer, lr))
+
+    def test_rejects_models_without_probabilities(self):
+        from sklearn.svm import LinearSVC
+        vectorizer, _ = self._fit()
+        X = vectorizer.transform([t for t, _ in self.TRAIN])
+        svm = LinearSVC().fit(X, [y for _, y in self.TRAIN])
+        with self.assertRaises(ValueError):
+            CompiledNBScorer.from_sklearn(vectorizer, svm)
+
+
+class SentimentCascadeTests(SimpleTestCase):
+    def _system(self, nb_confidences, bert_loaded=True):
+        system = SentimentAnalysisSystem(language='en', default_algorithm='cascade', cascade_threshold=0.75)
+        confidences = iter(nb_confidences)
+        system.naive_bayes.predict = lambda text: {
+            'sentiment': 'positive', 'confidence': next(confidences), 'probabilities': {}
+        }
+        system.bert.load_model = lambda: None
+        system.bert.is_loaded = bert_loaded
+        system.bert.predict_batch = mock.Mock(side_effect=lambda texts: [
+            {'sentiment': 'negative', 'confidence': 0.9, 'probabilities': {}} for _ in texts
+        ])
+        return system
+
+    def test_escalates_only_low_confidence_texts_in_one_batch(self):
+        system = self._system([0.95, 0.6, 0.8, 0.5])
+        results = system.analyze_batch(['a', 'b', 'c', 'd'])
+        system.bert.predict_batch.assert_called_once_with(['b', 'd'])
+        self.assertEqual([r['algorithm'] for r in results], ['naive_bayes', 'bert', 'naive_bayes', 'bert'])
+        self.assertEqual(results[1]['escalated_from']['confidence'], 0.6)
+        stats = system.get_cascade_stats()
+        self.assertEqual((stats['naive_bayes'], stats['escalated']), (4, 2))
+        self.assertEqual(stats['escalation_rate'], 0.5)
+
+    def test_counters_are_shared_across_instances_and_exposed(self):
+        reset_cascade_stats()
+        self._system([0.95, 0.6]).analyze_batch(['a', 'b'])
+        self._system([0.5, 0.9]).analyze_batch(['c', 'd'])
+        self.assertEqual(shared_cascade_stats()['en'], {
+            'naive_bayes': 4, 'escalated': 2, 'bert_unavailable': 0, 'escalation_rate': 0.5})
+        client = APIClient()
+        client.force_authenticate(User(username='cascade-admin', is_staff=True))
+        data = client.get('/api/sentiment/cascade/stats/').data['data']
+        self.assertEqual(data['languages']['en']['escalated'], 2)
+
+    def test_keeps_naive_bayes_result_when_bert_unavailable(self):
+        system = self._system([0.6], bert_loaded=False)
+        result = system.predict('meh')
+        self.assertEqual(result['algorithm'], 'naive_bayes')
+        system.bert.predict_batch.assert_not_called()
+        self.assertEqual(system.get_cascade_stats()['bert_unavailable'], 1)
+
+    @skipUnless(TRANSFORMERS_AVAILABLE, 'transformers/torch not installed')
+    def test_local_tiny_bert_batch(self):
+        from sentiment_analysis.management.commands.create_tiny_bert_model import build_tiny_bert_model
+        with tempfile.TemporaryDirectory() as tmp:
+            bert = BERTSentimentAnalyzer(model_dir=build_tiny_bert_model(tmp), batch_size=4)
+            results = bert.predict_batch(['great product', 'bad delivery', 'okay'])
+            self.assertTrue(bert.is_loaded)
+            self.assertEqual(len(results), 3)
+            for result in results:
+                self.assertAlmostEqual(sum(result['probabilities'].values()), 1.0, places=5)
+
+
+class MicroBatchEngineTests(SimpleTestCase):
+    def _engine(self, **kwargs):
+        calls = []
+
+        def predict_batch(texts):
+            calls.append(list(texts))
+            return [{'sentiment': 'positive', 'confidence': 1.0, 'text': t} for t in texts]
+
+        engine = MicroBatchEngine(predict_batch, **kwargs)
+        self.addCleanup(engine.stop, 2)
+        return engine, calls
+
+    def test_concurrent_requests_share_batches(self):
+        engine, calls = self._engine(max_batch_size=8, max_wait_ms=50)
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(lambda i: engine.predict(f'text {i}'), range(16)))
+        self.assertEqual([r['text'] for r in results], [f'text {i}' for i in range(16)])
+        self.assertLess(len(calls), 16)
+        self.assertTrue(all(len(batch) <= 8 for batch in calls))
+        self.assertEqual(engine.stats()['batched_items'], 16)
+
+    def test_timeout_and_errors_reach_callers(self):
+        engine = MicroBatchEngine(lambda texts: time.sleep(0.3) or [{} for _ in texts], max_wait_ms=0)
+        self.addCleanup(engine.stop, 2)
+        with self.assertRaises(TimeoutError):
+            engine.predict('slow', timeout=0.05)
+        self.assertEqual(engine.stats()['timeouts'], 1)
+
+        failing = MicroBatchEngine(mock.Mock(side_effect=RuntimeError('boom')), max_wait_ms=0)
+        self.addCleanup(failing.stop, 2)
+        with self.assertRaisesMessage(RuntimeError, 'boom'):
+            failing.predict('x')
+
+    def test_predict_many_has_one_deadline_and_cancels_the_rest(self):
+        calls = []
+        engine = MicroBatchEngine(lambda texts: calls.append(list(texts)) or time.sleep(0.3) or [{} for _ in texts],
+                                  max_batch_size=1, max_wait_ms=0)
+        started = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            engine.predict_many(['a', 'b', 'c'], timeout=0.1)
+        self.assertLess(time.monotonic() - started, 0.25)
+        self.assertEqual(engine.stats()['timeouts'], 3)
+        engine.stop(2)
+        self.assertEqual(calls, [['a']])
+
+    def test_worker_roundtrip(self):
+        from sentiment_analysis.management.commands.run_sentiment_worker import make_handler
+        engine, _ = self._engine(max_batch_size=4, max_wait_ms=5)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(engine, max_texts=16))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        client = RemoteBERTAnalyzer(f'http://127.0.0.1:{server.server_address[1]}')
+        self.assertEqual(client.predict('great')['text'], 'great')
+        self.assertEqual([r['text'] for r in client.predict_batch(['a', 'bb', 'c'])], ['a', 'bb', 'c'])
+
+
+class StreamingTrainerTests(SimpleTestCase):
+    ROWS = CompiledScorerParityTests.TRAIN * 3 + [('Great delivery but poor packaging', 1), ('Late and broken', 0)]
+
+    def _chunks(self, size=4):
+        return [([t for t, _ in self.ROWS[i:i + size]], [y for _, y in self.ROWS[i:i + size]])
+                for i in range(0, len(self.ROWS), size)]
+
+    def test_matches_in_memory_fit(self):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.naive_bayes import MultinomialNB
+        trainer = StreamingNaiveBayesTrainer(max_features=None, validation_fraction=0)
+        vectorizer, model = trainer.fit(self._chunks)
+
+        expected_vec = TfidfVectorizer(stop_words='english', ngram_range=(1, 2), min_df=2, max_df=0.95)
+        X = expected_vec.fit_transform([t for t, _ in self.ROWS])
+        expected = MultinomialNB().fit(X, [y for _, y in self.ROWS])
+        self.assertEqual(vectorizer.vocabulary_, expected_vec.vocabulary_)
+        np.testing.assert_allclose(vectorizer.idf_, expected_vec.idf_)
+        np.testing.assert_allclose(model.feature_log_prob_, expected.feature_log_prob_)
+        # The result is a plain fitted vectorizer, so the compiled scorer still applies
+        CompiledNBScorer.from_sklearn(vectorizer, model)
+
+    def test_chunked_readers(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, 'data.csv')
+            with open(csv_path, 'w', encoding='latin-1') as f:
+                f.write('text,label\n"Café très bon",positive\nbad,0\nmeh,neutral\n')
+            self.assertEqual(detect_csv_encoding(csv_path), 'latin-1')
+            chunks = list(labeled_chunks(iter_file_chunks(csv_path, chunksize=2)))
+            self.assertEqual(chunks, [(['Café très bon', 'bad'], [1, 0])])
+
+            jsonl_path = os.path.join(tmp, 'data.jsonl')
+            with open(jsonl_path, 'w', encoding='utf-8') as f:
+                f.write('{"text": "good", "label": 1}\n\nnot json\n{"text": "awful", "label": "negative"}\n')
+            self.assertEqual(list(labeled_chunks(iter_file_chunks(jsonl_path, chunksize=1))),
+                             [(['good'], [1]), (['awful'], [0])])
+
+
+    def test_loader_chunks_share_the_first_chunks_label_scheme(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, 'reviews.csv'), 'w', encoding='utf-8') as f:
+                f.write('review,rating\n"Loved every bit of it",5\n"Stopped working after a week",1\n'
+                        '"Does the job well enough",4\n"Broke on the first day",1\n"Never arrived at all",1\n')
+            loader = EnglishSentimentLoader(data_dir=tmp, use_cache=False)
+            # The second chunk holds only 1-star ratings, which alone would look like 0/1 labels
+            self.assertEqual([labels for _, labels in loader.iter_chunks(chunksize=3)], [[1, 0, 1], [0, 0]])
+
+
+class DatasetCacheTests(SimpleTestCase):
+    def test_normalized_frame_is_cached_and_available_offline(self):
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as cache_dir:
+            csv_path = os.path.join(data_dir, 'train.csv')
+            with open(csv_path, 'w', encoding='utf-8') as f:
+                f.write('comment,label\nSản phẩm rất tốt,positive\nQuá tệ,negative\nBình thường,neutral\n')
+
+            first = VietnameseSentimentLoader(data_dir=data_dir, cache_dir=cache_dir).load()
+            self.assertEqual(first['label'].tolist(), [1, 0])
+
+            with mock.patch.object(VietnameseSentimentLoader, '_try_read_csv') as read_csv:
+                cached = VietnameseSentimentLoader(data_dir=data_dir, cache_dir=cache_dir).load()
+                offline = VietnameseSentimentLoader(offline=True, cache_dir=cache_dir).load()
+            read_csv.assert_not_called()
+            self.assertEqual(cached['text'].tolist(), first['text'].tolist())
+            self.assertEqual(offline['label'].tolist(), [1, 0])
+
+            # A changed source file is a cache miss
+            with open(csv_path, 'a', encoding='utf-8') as f:
+                f.write('Tuyệt vời,positive\n')
+            self.assertEqual(len(VietnameseSentimentLoader(data_dir=data_dir, cache_dir=cache_dir).load()), 3)
+
+    def test_offline_without_cache_fails_fast(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with self.assertRaises(ValueError):
+                EnglishSentimentLoader(offline=True, cache_dir=cache_dir).load()
+
+
+class FeatureStoreTests(SimpleTestCase):
+    TEXTS = [t for t, _ in CompiledScorerParityTests.TRAIN] * 2
+    LABELS = [y for _, y in CompiledScorerParityTests.TRAIN] * 2
+
+    def test_repeat_training_reuses_features(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FeatureStore(tmp)
+            first = NaiveBayesSentimentAnalyzer('en', feature_store=store)
+            first.train(self.TEXTS, self.LABELS, test_size=0.25)
+
+            second = NaiveBayesSentimentAnalyzer('en', feature_store=store)
+            with mock.patch.object(second.preprocessor, 'preprocess', side_effect=AssertionError('re-preprocessed')):
+                second.train(self.TEXTS, self.LABELS, test_size=0.5)
+            self.assertEqual(second.vectorizer.vocabulary_, first.vectorizer.vocabulary_)
+            self.assertEqual(store.hits, 1)
+
+            # Different vectorizer params refit TF-IDF but still reuse the token streams
+            third = NaiveBayesSentimentAnalyzer('en', feature_store=store)
+            third.vectorizer.set_params(ngram_range=(1, 1))
+            with mock.patch.object(third.preprocessor, 'preprocess', side_effect=AssertionError('re-preprocessed')):
+                third.train(self.TEXTS, self.LABELS)
+            self.assertLess(len(third.vectorizer.vocabulary_), len(first.vectorizer.vocabulary_))
+
+    def test_store_is_opt_in_and_evicts_old_and_least_recently_used_entries(self):
+        with override_settings(SENTIMENT_FEATURE_STORE_DIR=''):
+            self.assertIsNone(get_feature_store())
+        with tempfile.TemporaryDirectory() as tmp:
+            with override_settings(SENTIMENT_FEATURE_STORE_DIR=tmp, SENTIMENT_FEATURE_STORE_MAX_MB=1,
+                                   SENTIMENT_FEATURE_STORE_MAX_AGE_DAYS=1):
+                store = get_feature_store()
+            self.assertEqual((store.max_bytes, store.max_age_seconds), (2**20, 86400))
+            now = time.time()
+            for name, size, age in (('expired', 10, 2 * 86400), ('old', 600_000, 300), ('recent', 600_000, 60)):
+                path = Path(tmp) / name
+                path.write_bytes(b'x' * size)
+                os.utime(path, (now - age, now - age))
+            self.assertEqual(store.prune(), 2)
+            self.assertEqual(sorted(os.listdir(tmp)), ['recent'])
+
+    def test_changed_texts_change_keys(self):
+        self.assertNotEqual(texts_hash(['a b', 'c']), texts_hash(['a', 'b c']))
+
+
+class TuningSearchTests(SimpleTestCase):
+    def _data(self):
+        texts = [t for t, _ in CompiledScorerParityTests.TRAIN] * 5
+        labels = [y for _, y in CompiledScorerParityTests.TRAIN] * 5
+        return texts, labels
+
+    def test_vectorizer_shared_across_classifiers_per_fold(self):
+        from sentiment_analysis import tuning
+        texts, labels = self._data()
+        candidates = tuning.build_candidates(
+            {'ngram_range': [(1, 1), (1, 2)]},
+            {name: tuning.DEFAULT_CLASSIFIERS[name] for name in ('naive_bayes', 'linear_svm')},
+        )
+        fits = []
+        original = tuning.TfidfVectorizer.fit_transform
+
+        def counting_fit_transform(vectorizer, raw, *args, **kwargs):
+            fits.append(vectorizer.ngram_range)
+            return original(vectorizer, raw, *args, **kwargs)
+
+        with mock.patch.object(tuning.TfidfVectorizer, 'fit_transform', counting_fit_transform):
+            leaderboard = tuning.successive_halving_search(
+                texts, labels, candidates, folds=3, halving=False, n_jobs=1, measure_top=0
+            )
+        # 2 vectorizer configs x 3 folds, not 12 candidates x 3 folds
+        self.assertEqual(len(fits), 6)
+        self.assertEqual(len(leaderboard), 12)
+        self.assertEqual([row['rank'] for row in leaderboard], list(range(1, 13)))
+
+    def test_successive_halving_eliminates_and_measures_survivors(self):
+        from sentiment_analysis import tuning
+        texts, labels = self._data()
+        candidates = tuning.build_candidates({'min_df': [1, 2]}, tuning.DEFAULT_CLASSIFIERS)
+        leaderboard = tuning.successive_halving_search(
+            texts, labels, candidates, folds=2, eta=3, min_samples=12, n_jobs=1, measure_top=2
+        )
+        final_rung = leaderboard[0]['rung']
+        self.assertGreater(final_rung, 0)
+        self.assertLess(sum(row['rung'] == final_rung for row in leaderboard), len(candidates))
+        self.assertIn('latency_p50_ms', leaderboard[0])
+        self.assertGreater(leaderboard[0]['model_size_kb'], 0)
+
+
+@override_settings(SENTIMENT_FEATURE_STORE_DIR='')
+class IncrementalTrainingTests(TestCase):
+    POSITIVE = ['great quality love it', 'excellent fast delivery', 'love this great product', 'works great happy']
+    NEGATIVE = ['terrible broke after a day', 'awful quality refund', 'bad product broke', 'terrible waste of money']
+
+    def setUp(self):
+        category = Category.objects.create(name='Incremental', slug='incremental')
+        self.product = Product.objects.create(name='Inc', description='Desc', price=10, category=category)
+        self.tmp = tempfile.TemporaryDirectory()
+        paths = {key: Path(self.tmp.name) / f'{key}.pkl' for key in (
+            'canonical_model', 'canonical_vec', 'app_model', 'app_vec',
+            'legacy_model', 'legacy_vec', 'legacy_app_model', 'legacy_app_vec',
+        )}
+        patcher = mock.patch('sentiment_analysis.models.naive_bayes_model_paths', return_value=paths)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def add_reviews(self, texts, sentiment):
+        for text in texts:
+            n = User.objects.count()
+            user = User.objects.create(username=f'inc{n}', email=f'inc{n}@example.com')
+            Review.objects.create(user=user, product=self.product, comment=text, rating=3, sentiment=sentiment)
+
+    def test_incremental_run_consumes_only_new_rows(self):
+        self.add_reviews(self.POSITIVE * 2, 'positive')
+        self.add_reviews(self.NEGATIVE * 2, 'negative')
+        updater = IncrementalNaiveBayesUpdater('en', drift_threshold=1.0, lag_seconds=0, min_rebuild_rows=4)
+        first = updater.run()
+        self.assertEqual((first['mode'], first['promoted']), ('rebuild', True))
+        watermark = SentimentTrainingWatermark.objects.get(language='en')
+        self.assertEqual(watermark.last_review_id, Review.objects.order_by('-id')[0].id)
+
+        self.add_reviews(['great delivery love', 'broke awful'], 'positive')
+        self.add_reviews(['Sản phẩm rất tốt'], 'positive')
+        counts_before = NaiveBayesSentimentAnalyzer('en')
+        counts_before.load_model()
+        seen_before = counts_before.model.class_count_.sum()
+        result = updater.run()
+        self.assertEqual((result['mode'], result['consumed'], result['other_language']), ('incremental', 2, 1))
+        updated = NaiveBayesSentimentAnalyzer('en')
+        updated.load_model()
+        self.assertEqual(updated.model.class_count_.sum(), seen_before + 2)
+
+        # Re-analysed reviews are not folded in a second time
+        Review.objects.update(sentiment_analyzed_at=timezone.now())
+        self.assertEqual(updater.run()['consumed'], 0)
+        self.assertEqual(SentimentTrainingWatermark.objects.get(language='en').rows_consumed, 2)
+
+    def test_vocabulary_drift_builds_a_candidate_in_the_deployed_label_scheme(self):
+        texts = self.POSITIVE + self.NEGATIVE
+        deployed = NaiveBayesSentimentAnalyzer('en')
+        deployed.train(texts * 2, [1] * 4 + [0] * 4 + [1] * 4 + [0] * 4)
+        deployed.save_model()
+        self.add_reviews(self.POSITIVE * 2, 'positive')
+        self.add_reviews(self.NEGATIVE * 2, 'negative')
+        self.add_reviews(['okay nothing special', 'fine average'], 'neutral')
+        updater = IncrementalNaiveBayesUpdater('en', drift_threshold=0.1, lag_seconds=0, min_rebuild_rows=4)
+        self.assertEqual(updater.run()['mode'], 'incremental')
+
+        self.add_reviews(['zyxw qwerty plokij', 'mnbvc lkjhg poiuy'] * 2, 'positive')
+        result = updater.run()
+        self.assertEqual(result['mode'], 'incremental')
+        self.assertIn('drift', result['candidate']['reason'])
+        self.assertFalse(result['candidate']['promoted'])
+        live = NaiveBayesSentimentAnalyzer('en')
+        live.load_model()
+        self.assertNotIn('zyxw', live.vectorizer.vocabulary_)
+        # A pending candidate is not rebuilt again on the next drifting run
+        self.add_reviews(['qazwsx edcrfv'], 'positive')
+        self.assertTrue(updater.run()['candidate']['pending'])
+
+        self.assertIsNotNone(updater.promote_candidate())
+        promoted = NaiveBayesSentimentAnalyzer('en')
+        promoted.load_model()
+        self.assertIn('zyxw', promoted.vectorizer.vocabulary_)
+        self.assertEqual([int(c) for c in promoted.model.classes_], [0, 1])
+        self.assertIsNone(updater.pending_candidate())
+        self.assertEqual(SentimentTrainingWatermark.objects.get(language='en').oov_terms, 0)
+
+    @skipUnless((SHIPPED_MODELS / 'naive_bayes_sentiment_en.pkl').exists(), 'shipped models not available')
+    def test_seed_reviews_stay_under_the_default_drift_threshold(self):
+        shutil.copy(SHIPPED_MODELS / 'naive_bayes_sentiment_en.pkl', Path(self.tmp.name) / 'canonical_model.pkl')
+        shutil.copy(SHIPPED_MODELS / 'vectorizer_sentiment_en.pkl', Path(self.tmp.name) / 'canonical_vec.pkl')
+        for rating, comment in SAMPLE_COMMENTS:
+            sentiment = 'positive' if rating >= 4 else 'negative' if rating <= 2 else 'neutral'
+            n = User.objects.count()
+            user = User.objects.create(username=f'seed{n}', email=f'seed{n}@example.com')
+            Review.objects.create(user=user, product=self.product, rating=rating, sentiment=sentiment,
+                                  title=comment.split('.')[0][:40], comment=comment)
+        result = IncrementalNaiveBayesUpdater('en', lag_seconds=0).run()
+        # Vietnamese reviews are left to the Vietnamese model; neutral ones have no binary class
+        self.assertEqual((result['consumed'], result['other_language'], result['skipped']), (4, 4, 2))
+        self.assertLess(result['oov_rate'], settings.SENTIMENT_INCREMENTAL_DRIFT_THRESHOLD)
+        self.assertNotIn('candidate', result)
+
+    def test_training_is_refused_while_another_run_holds_the_lock(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='trainadmin', email='ta@example.com', is_staff=True))
+        lock = training_lock('en')
+        self.assertTrue(lock.acquire())
+        self.addCleanup(lock.release)
+        self.assertFalse(training_lock('en').acquire())
+        response = client.post('/api/sentiment/train/', {'mode': 'incremental'}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+    def test_serving_analyzer_reloads_replaced_model(self):
+        self.add_reviews(self.POSITIVE * 2, 'positive')
+        self.add_reviews(self.NEGATIVE * 2, 'negative')
+        updater = IncrementalNaiveBayesUpdater('en', drift_threshold=1.0, lag_seconds=0, min_rebuild_rows=4)
+        updater.run()
+        serving = NaiveBayesSentimentAnalyzer('en')
+        serving.load_model()
+        fingerprint = serving._loaded_fingerprint
+        self.add_reviews(['great love'] * 3, 'positive')
+        updater.run()
+        serving._last_reload_check = float('-inf')
+        self.assertTrue(serving.reload_if_changed())
+        self.assertNotEqual(serving._loaded_fingerprint, fingerprint)
+
+
+class VietnameseTokenizerTests(SimpleTestCase):
+    TEXTS = ['sản phẩm rất tốt', 'giao hàng nhanh', 'sản phẩm rất tốt', 'chất lượng kém']
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'tokens.sqlite3')
+
+    def test_disk_cache_is_shared_between_instances(self):
+        first = VietnameseTokenizer(cache_path=self.path, processes=1)
+        tokens = first.tokenize_many(self.TEXTS)
+        self.assertEqual(tokens[0], tokenize_text(self.TEXTS[0]))
+        self.assertEqual(first.stats()['misses'], 3)
+        first.close()
+
+        second = VietnameseTokenizer(cache_path=self.path, processes=1)
+        self.assertEqual(second.tokenize_many(self.TEXTS), tokens)
+        self.assertEqual((second.disk_hits, second.misses), (3, 0))
+        second.tokenize(self.TEXTS[1])
+        self.assertEqual(second.lru_hits, 1)
+        second.close()
+
+    def test_disk_writes_are_batched_and_the_cache_is_bounded(self):
+        tokenizer = VietnameseTokenizer(cache_path=self.path, processes=1, write_batch=3, cache_max_entries=10)
+        tokenizer.tokenize_many(['một', 'hai'])
+        self.assertEqual((len(tokenizer.disk), tokenizer.stats()['unsaved']), (0, 2))
+        tokenizer.tokenize('ba')
+        self.assertEqual((len(tokenizer.disk), tokenizer.stats()['unsaved']), (3, 0))
+        tokenizer.tokenize_many([f'từ {i}' for i in range(20)])
+        self.assertLessEqual(len(tokenizer.disk), 11)
+        self.assertEqual(tokenizer.disk.get_many([tokenizer.key('một')]), {})
+        tokenizer.close()
+
+    def test_process_tokenizer_has_no_disk_cache_by_default(self):
+        with mock.patch('sentiment_analysis.tokenization._tokenizer', None):
+            self.assertIsNone(get_vietnamese_tokenizer().disk)
+
+    def test_falls_back_to_pyvi_before_whitespace(self):
+        def broken(text):
+            raise ValueError('model not downloaded')
+        chain = [('underthesea-x', broken), ('pyvi', lambda text: ['sản_phẩm', 'tốt']), ('whitespace', str.split)]
+        with mock.patch('sentiment_analysis.tokenization._segmenters', chain):
+            self.assertEqual(tokenize_text('sản phẩm tốt'), ['sản_phẩm', 'tốt'])
+            self.assertEqual(tokenizer_backend(), 'underthesea-x')
+
+    def test_multi_syllable_tokens_round_trip(self):
+        cache = TokenCache(self.path)
+        cache.put_many({'k': ['sản_phẩm', 'rất tốt'], 'empty': []})
+        self.assertEqual(cache.get_many(['k', 'empty', 'missing']), {'k': ['sản_phẩm', 'rất tốt'], 'empty': []})
+        cache.close()
+
+    def test_process_pool_matches_serial(self):
+        texts = [f'đánh giá số {i} rất hài lòng' for i in range(300)]
+        parallel = VietnameseTokenizer(cache_path=None, processes=2, parallel_threshold=1)
+        self.assertEqual(parallel.tokenize_many(texts), [tokenize_text(t) for t in texts])
+
+
+class LexiconMatcherTests(SimpleTestCase):
+    def test_word_boundaries_and_multi_syllable_phrases(self):
+        matcher = LexiconMatcher({'positive': ['hài lòng', 'tốt'], 'negative': ['hư', 'không hài lòng']})
+        self.assertEqual(matcher.count('như mới, rất tốt'), {'positive': 1, 'negative': 0})
+        found = matcher.find('Tôi KHÔNG hài_lòng, hàng hư')
+        self.assertEqual(found, [('negative', 'hư'), ('negative', 'không hài lòng'), ('positive', 'hài lòng')])
+        self.assertEqual(matcher.count_many(['tốt tốt', 'hư']).tolist(), [[0.0, 1.0], [1.0, 0.0]])
+        self.assertEqual(matcher.count('tốt tốt', distinct=False)['positive'], 2)
+
+    def test_matches_brute_force_on_overlapping_patterns(self):
+        phrases = ['a b', 'b c', 'a b c d', 'c', 'b c d e']
+        matcher = LexiconMatcher({'x': phrases})
+        text = 'a b c d e a b'
+        tokens = text.split()
+        expected = sum(
+            1 for p in phrases for i in range(len(tokens)) if tokens[i:i + len(p.split())] == p.split()
+        )
+        self.assertEqual(matcher.count(text, distinct=False)['x'], expected)
+
+    def test_emotion_features_and_lexicon_vectorizer(self):
+        features = extract_emotion_features('Sản phẩm tuyệt vời, giao hàng nhanh')
+        self.assertEqual((features['positive_emotions'], features['negative_emotions']), (2, 0))
+
+        analyzer = NaiveBayesSentimentAnalyzer('en', lexicon_features=True)
+        texts = ['excellent great product', 'love it works great', 'terrible broken refund', 'awful waste of money'] * 3
+        analyzer.train_with_validation(texts, [2, 2, 0, 0] * 3)
+        self.assertIsNone(analyzer.scorer)
+        self.assertEqual(analyzer.model.feature_count_.shape[1], len(analyzer.vectorizer.vocabulary_) + 2)
+        restored = pickle.loads(pickle.dumps(analyzer.vectorizer))
+        self.assertEqual(restored.transform(['great']).shape[1], analyzer.model.feature_count_.shape[1])
+        self.assertEqual(analyzer.predict('terrible refund')['sentiment'], 'negative')
+
+
+class BenchmarkSuiteTests(SimpleTestCase):
+    def _report(self, p95=1.0, throughput=1000.0, rss_delta=5.0):
+        return {
+            'generated_at': '2026-01-01T00:00:00+00:00',
+            'corpus': {},
+            'analyzers': {'naive_bayes_en': {
+                'status': 'ok', 'algorithm': 'naive_bayes', 'language': 'en', 'cold_start_ms': 10.0,
+                'latency_p50_ms': 0.5, 'latency_p95_ms': p95, 'latency_p99_ms': p95, 'throughput_per_sec': throughput,
+                'rss_mb': 100.0, 'rss_delta_mb': rss_delta, 'accuracy': 0.9, 'samples': 10,
+            }},
+        }
+
+    def test_isolated_run_feeds_algorithm_info(self):
+        analyzer = NaiveBayesSentimentAnalyzer('en')
+        texts = ['excellent great product', 'love it works great', 'terrible broken refund', 'awful waste of money'] * 3
+        analyzer.train_with_validation(texts, [2, 2, 0, 0] * 3)
+        with mock.patch.dict(benchmarks.ANALYZERS, {'nb_test': ('naive_bayes', 'en', lambda: analyzer)}):
+            report = benchmarks.run_benchmarks(['nb_test', 'bert_en'], rounds=2, batch_size=50)
+        result = report['analyzers']['nb_test']
+        self.assertEqual(result['status'], 'ok', result)
+        self.assertEqual(result['samples'], 2 * len(benchmarks.BENCHMARK_CORPUS['en']))
+        self.assertLessEqual(result['latency_p50_ms'], result['latency_p99_ms'])
+        self.assertGreater(result['throughput_per_sec'], 0)
+        if not TRANSFORMERS_AVAILABLE:
+            self.assertEqual(report['analyzers']['bert_en']['status'], 'skipped')
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = benchmarks.write_report(report, Path(tmp) / 'bench.json')
+            with self.settings(SENTIMENT_BENCHMARK_REPORT=str(path)):
+                info = SentimentAnalysisSystem('en').get_algorithm_info()
+                self.assertEqual(info['naive_bayes']['benchmark']['analyzer'], 'nb_test')
+                self.assertIn('p95', info['naive_bayes']['speed'])
+            with self.settings(SENTIMENT_BENCHMARK_REPORT=str(Path(tmp) / 'missing.json')):
+                self.assertEqual(SentimentAnalysisSystem('en').get_algorithm_info()['bert']['speed'],
+                                 'Not benchmarked yet')
+
+    def test_regressions_fail_the_run_without_overwriting(self):
+        baseline = self._report()
+        self.assertEqual(benchmarks.compare_reports(self._report(p95=1.2), baseline, 0.25), [])
+        # Large relative changes below the absolute floors are noise
+        self.assertEqual(benchmarks.compare_reports(self._report(p95=1.4, rss_delta=12.0), baseline, 0.25), [])
+        regressions = benchmarks.compare_reports(self._report(p95=2.5, throughput=500.0), baseline, 0.25)
+        self.assertEqual([r.split(':')[0] for r in regressions],
+                         ['naive_bayes_en.latency_p95_ms', 'naive_bayes_en.latency_p99_ms',
+                          'naive_bayes_en.throughput_per_sec'])
+
+        command = 'sentiment_analysis.management.commands.benchmark_sentiment_analyzers.run_benchmarks'
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / 'bench.json'
+            benchmarks.write_report(baseline, output)
+            with mock.patch(command, return_value=self._report(p95=3.0)):
+                with self.assertRaises(CommandError):
+                    call_command('benchmark_sentiment_analyzers', output=str(output), stdout=StringIO(),
+                                 stderr=StringIO())
+                self.assertEqual(json.loads(output.read_text())['analyzers']['naive_bayes_en']['latency_p95_ms'], 1.0)
+                call_command('benchmark_sentiment_analyzers', output=str(output), allow_regression=True,
+                             stdout=StringIO())
+            self.assertEqual(json.loads(output.read_text())['analyzers']['naive_bayes_en']['latency_p95_ms'], 3.0)
+
+
+class SentimentRollupTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Rollups', slug='rollups')
+        self.product = Product.objects.create(name='Rolled', description='Desc', price=10, category=category)
+        patcher = mock.patch('products.signals.SentimentAnalysisService')
+        self.service = patcher.start().return_value
+        self.service.analyze_review_with_title.side_effect = RuntimeError('analyzer offline')
+        self.addCleanup(patcher.stop)
+
+    def review(self, rating, sentiment=None, confidence=None):
+        n = User.objects.count()
+        user = User.objects.create(username=f'roll{n}', email=f'roll{n}@example.com')
+        return Review.objects.create(user=user, product=self.product, comment='text', rating=rating,
+                                     sentiment=sentiment, sentiment_confidence=confidence)
+
+    def snapshot(self):
+        return sorted(SentimentRollup.objects.filter(effective_count__gt=0).values_list(
+            'bucket', 'product_id', 'sentiment', 'effective_count', 'analyzed_count', 'confidence_sum'))
+
+    def test_incremental_maintenance_matches_rebuild(self):
+        self.review(5, 'positive', 0.9)
+        unlabeled = self.review(1)
+        changed = self.review(4, 'positive', 0.6)
+        deleted = self.review(3, 'neutral', 0.5)
+        self.service.analyze_review_with_title.side_effect = None
+        self.service.analyze_review_with_title.return_value = {'sentiment': 'negative', 'confidence': 0.8}
+        self.review(5)  # labeled by the post_save analysis against its rating
+
+        changed.sentiment, changed.sentiment_confidence = 'negative', 0.7
+        changed.save()
+        Review.objects.get(pk=unlabeled.pk).save()
+        deleted.delete()
+
+        incremental = self.snapshot()
+        rebuild_rollups()
+        self.assertEqual(self.snapshot(), incremental)
+
+        analyzed = sentiment_trends(days=1)
+        self.assertEqual((analyzed['positive'], analyzed['negative'], analyzed['neutral']), ([1], [2], [0]))
+        effective = sentiment_trends(days=1, mode='effective', product_id=self.product.id)
+        self.assertEqual((effective['positive'], effective['negative'], effective['neutral']), ([1], [3], [0]))
+        self.assertAlmostEqual(effective['average_confidence'][0], (0.9 + 0.7 + 0.8) / 3)
+
+    def test_buckets_follow_requested_timezone(self):
+        review = self.review(5, 'positive', 0.9)
+        moment = (timezone.now() - timedelta(days=2)).astimezone(dt_timezone.utc).replace(
+            hour=20, minute=30, second=0, microsecond=0)
+        Review.objects.filter(pk=review.pk).update(created_at=moment)
+        rebuild_rollups()
+
+        self.assertEqual(sentiment_trends(days=7)['dates'], [moment.date().isoformat()])
+        local = sentiment_trends(days=7, tz='Asia/Ho_Chi_Minh')
+        self.assertEqual(local['dates'], [(moment + timedelta(hours=7)).date().isoformat()])
+        hourly = sentiment_trends(days=7, granularity='hour', tz='Asia/Ho_Chi_Minh')
+        self.assertEqual(hourly['dates'], [(moment + timedelta(hours=7)).strftime('%Y-%m-%dT%H:00:00+07:00')])
+        self.assertEqual(len(sentiment_trends(days=7, granularity='month')['dates']), 1)
+
+        response = self.client.get('/api/products/sentiment_trends/', {'granularity': 'fortnight'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/products/sentiment_trends/', {'days': 7, 'product': self.product.id})
+        self.assertEqual((response.data['scope'], response.data['positive']), ('product', [1]))
+
+
+class SentimentAggregateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Aggregates', slug='aggregates')
+        self.first = Product.objects.create(name='First', description='Desc', price=10, category=category)
+        self.second = Product.objects.create(name='Second', description='Desc', price=10, category=category)
+        patcher = mock.patch('products.signals.SentimentAnalysisService')
+        patcher.start().return_value.analyze_review_with_title.side_effect = RuntimeError('analyzer offline')
+        self.addCleanup(patcher.stop)
+        for n, (product, rating, sentiment, confidence) in enumerate([
+            (self.first, 5, 'positive', 0.8),
+            (self.first, 1, 'negative', 0.6),
+            (self.first, 2, None, None),
+            (self.second, 4, None, None),
+        ]):
+            user = User.objects.create(username=f'agg{n}', email=f'agg{n}@example.com')
+            Review.objects.create(user=user, product=product, comment='text', rating=rating,
+                                  sentiment=sentiment, sentiment_confidence=confidence)
+
+    def test_single_query_summary_matches_counts_and_is_cached(self):
+        with CaptureQueriesContext(connection) as queries:
+            summary = sentiment_aggregates(self.first.id)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual((summary['total_reviews'], summary['analyzed_reviews']), (3, 2))
+        self.assertEqual(summary['sentiment_counts'], {'positive': 1, 'negative': 1, 'neutral': 0})
+        self.assertEqual(summary['effective_sentiment_counts'], {'positive': 1, 'neutral': 0, 'negative': 2})
+        self.assertAlmostEqual(summary['average_confidence'], 0.7)
+        self.assertEqual(summary['overall_sentiment'], 'positive')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(sentiment_aggregates(self.first.id), summary)
+        self.assertEqual(len(queries), 0)
+
+        review = Review.objects.get(product=self.first, sentiment__isnull=True)
+        review.sentiment, review.sentiment_confidence = 'negative', 0.9
+        review.save()
+        self.assertEqual(sentiment_aggregates(self.first.id)['sentiment_counts']['negative'], 2)
+
+        grouped = product_sentiment_aggregates([self.first.id, self.second.id, 0])
+        self.assertEqual(grouped[self.first.id], sentiment_aggregates(self.first.id))
+        self.assertEqual(grouped[self.second.id]['effective_sentiment_counts']['positive'], 1)
+        self.assertEqual(grouped[0]['total_reviews'], 0)
+
+        overview = self.client.get('/api/products/sentiment_overview/').data
+        self.assertEqual((overview['total_reviews'], overview['sentiment_counts']['negative']), (3, 2))
+
+    def test_effective_sentiment_column_and_backfill(self):
+        review = Review.objects.get(product=self.second)
+        self.assertEqual(review.effective_sentiment, 'positive')
+        review.sentiment = 'negative'
+        review.save(update_fields=['sentiment'])
+        self.assertEqual(Review.objects.get(pk=review.pk).effective_sentiment, 'negative')
+
+        # Writes that bypass save() leave the column stale until the backfill
+        Review.objects.filter(product=self.first).update(sentiment=None, rating=3)
+        self.assertEqual(backfill_effective_sentiment(batch_size=2), 3)
+        self.assertEqual(backfill_effective_sentiment(batch_size=2), 0)
+        self.assertEqual(set(Review.objects.filter(product=self.first).values_list('effective_sentiment', flat=True)),
+                         {'neutral'})
+
+
+class ProbabilityAnalyticsTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Probabilities', slug='probabilities')
+        self.first = Product.objects.create(name='First', description='Desc', price=10, category=category)
+        self.second = Product.objects.create(name='Second', description='Desc', price=10, category=category)
+        patcher = mock.patch('products.signals.SentimentAnalysisService')
+        patcher.start().return_value.analyze_review_with_title.side_effect = RuntimeError('analyzer offline')
+        self.addCleanup(patcher.stop)
+        self.reviews = []
+        for n, (product, rating, scores) in enumerate([
+            (self.first, 5, {'positive': 0.9, 'neutral': 0.05, 'negative': 0.05}),
+            (self.first, 2, {'positive': 0.45, 'neutral': 0.1, 'negative': 0.45}),
+            (self.second, 1, {'positive': 0.1, 'negative': 0.9}),
+        ]):
+            user = User.objects.create(username=f'prob{n}', email=f'prob{n}@example.com')
+            sentiment = max(scores, key=scores.get)
+            self.reviews.append(Review.objects.create(
+                user=user, product=product, comment='text', rating=rating, sentiment=sentiment,
+                sentiment_confidence=max(scores.values()), sentiment_scores=scores))
+
+    def test_columns_back_the_json_shape(self):
+        review = Review.objects.get(pk=self.reviews[2].pk)
+        self.assertEqual((review.p_positive, review.p_neutral, review.p_negative), (0.1, None, 0.9))
+        self.assertEqual(review.sentiment_scores, {'positive': 0.1, 'negative': 0.9})
+        review.sentiment_scores = {'positive': 0.2, 'neutral': 0.2, 'negative': 0.6}
+        review.save(update_fields=['sentiment_scores'])
+        self.assertEqual(Review.objects.get(pk=review.pk).p_neutral, 0.2)
+
+    def test_sql_aggregates(self):
+        means = product_probability_means()
+        self.assertEqual([row['product_id'] for row in means], [self.second.id, self.first.id])
+        self.assertAlmostEqual(means[1]['mean_p_positive'], (0.9 + 0.45) / 2)
+
+        histogram = probability_histogram('p_positive', bins=10)
+        self.assertEqual([b['count'] for b in histogram['bins']], [0, 1, 0, 0, 1, 0, 0, 0, 0, 1])
+        self.assertEqual(histogram['bins'][9]['observed_positive_rate'], 1.0)
+        self.assertEqual(probability_histogram(bins=2, product_id=self.first.id)['total'], 2)
+
+        self.assertEqual([r['id'] for r in borderline_reviews(margin=0.1)], [self.reviews[1].id])
+
+        admin = User.objects.create(username='probadmin', email='probadmin@example.com', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.get('/api/sentiment/probabilities/histogram/', {'field': 'rating'})
+        self.assertEqual(response.status_code, 400)
+        response = client.get('/api/sentiment/probabilities/products/', {'min_reviews': 2})
+        self.assertEqual([row['product_id'] for row in response.data['data']], [self.first.id])
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_callers_share_one_execution(self):
+        flight = SingleFlight('test')
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return {'value': 42}
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(flight.do, 'summary:1', compute) for _ in range(8)]
+            deadline = time.monotonic() + 5
+            while flight.stats()['coalesced'] < 7 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            release.set()
+            results = [f.result(5) for f in futures]
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+        self.assertEqual((flight.stats()['executions'], flight.stats()['coalesced']), (1, 7))
+        self.assertEqual(flight.stats()['in_flight'], 0)
+
+        with self.assertRaises(ZeroDivisionError):
+            flight.do('boom', lambda: 1 / 0)
+        self.assertEqual(flight.do('boom', lambda: 'recovered'), 'recovered')
+
+    def test_cache_variant_waits_for_lock_holder(self):
+        cache.clear()
+        flight = CacheSingleFlight('test-cache', wait_timeout=5, poll_interval=0.01)
+        self.assertIsNone(flight.get_or_compute('sf:none', lambda: None))
+        self.assertIsNone(flight.get_or_compute('sf:none', lambda: 'recomputed'))
+
+        # Another process holds the lock and publishes the value shortly after
+        cache.add('sf:key:lock', 'other-process', 30)
+        threading.Timer(0.1, lambda: cache.set('sf:key', ('from other process',), 60)).start()
+        self.assertEqual(flight.get_or_compute('sf:key', lambda: 'local'), 'from other process')
+
+        # A lock holder that died without storing a value is taken over
+        cache.add('sf:dead:lock', 'other-process', 30)
+        threading.Timer(0.1, lambda: cache.delete('sf:dead:lock')).start()
+        self.assertEqual(flight.get_or_compute('sf:dead', lambda: 'taken over'), 'taken over')
+        stats = flight.stats()
+        self.assertEqual((stats['hits'], stats['remote_hits'], stats['remote_waits']), (1, 1, 2))
+        self.assertIsNone(cache.get('sf:dead:lock'))
+
+
+class SentimentEventStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_broker()
+        self.addCleanup(reset_broker)
+        category = Category.objects.create(name='Stream', slug='stream')
+        self.product = Product.objects.create(name='Streamed', description='Desc', price=10, category=category)
+        patcher = mock.patch('products.signals.SentimentAnalysisService')
+        patcher.start().return_value.analyze_review_with_title.return_value = {
+            'sentiment': 'negative', 'confidence': 0.8,
+            'probabilities': {'positive': 0.1, 'neutral': 0.1, 'negative': 0.8}}
+        self.addCleanup(patcher.stop)
+
+    def test_brokers_fan_out_and_replay(self):
+        broker = InProcessBroker(history=10, queue_size=2)
+        live = broker.subscribe('c')
+        first = broker.publish('c', 'a', {'n': 1})
+        broker.publish('c', 'a', {'n': 2})
+        broker.publish('c', 'a', {'n': 3})
+        # The full queue dropped its oldest event instead of blocking the publisher
+        self.assertEqual([live.get(0).data['n'], live.get(0).data['n'], live.get(0)], [2, 3, None])
+        replay = broker.subscribe('c', last_event_id=first.id)
+        self.assertEqual([replay.get(0).id, replay.get(0).id], [2, 3])
+        live.close()
+        self.assertEqual((broker.stats()['dropped'], broker.stats()['subscribers']), (1, {'c': 1}))
+
+        shared = CacheBroker(poll_interval=0.01)
+        subscription = shared.subscribe('c')
+        shared.publish('c', 'a', {'n': 1})
+        self.assertEqual(subscription.get(0.5).data, {'n': 1})
+        self.assertIsNone(subscription.get(0.05))
+        self.assertEqual(shared.subscribe('c', last_event_id=0).get(0).type, 'a')
+
+    def test_scored_reviews_are_published_after_commit(self):
+        subscription = get_broker().subscribe('sentiment')
+        user = User.objects.create(username='streamer', email='streamer@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            review = Review.objects.create(user=user, product=self.product, comment='broke', rating=4)
+        event = subscription.get(0)
+        self.assertEqual((event.type, event.data['review_id'], event.data['sentiment']),
+                         ('review.scored', review.id, 'negative'))
+        self.assertEqual(event.data['probabilities']['negative'], 0.8)
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.get(pk=review.pk).save()
+        self.assertIsNone(subscription.get(0))
+
+    def test_aggregate_delta(self):
+        before = {'total_reviews': 2, 'analyzed_reviews': 1, 'unanalyzed_reviews': 1,
+                  'sentiment_counts': {'positive': 1, 'negative': 0},
+                  'effective_sentiment_counts': {'positive': 2, 'negative': 0}}
+        after = {'total_reviews': 3, 'analyzed_reviews': 2, 'unanalyzed_reviews': 1,
+                 'sentiment_counts': {'positive': 1, 'negative': 1},
+                 'effective_sentiment_counts': {'positive': 2, 'negative': 1}}
+        self.assertEqual(aggregate_delta(before, after), {
+            'total_reviews': 1, 'analyzed_reviews': 1,
+            'sentiment_counts': {'negative': 1}, 'effective_sentiment_counts': {'negative': 1}})
+        self.assertEqual(aggregate_delta(after, after), {})
+        self.assertEqual(aggregate_delta(None, after), {})
+
+    @override_settings(SENTIMENT_STREAM_MAX_SECONDS=0.3, SENTIMENT_STREAM_AGGREGATE_INTERVAL=0.1,
+                       SENTIMENT_STREAM_KEEPALIVE=0.05)
+    def test_stream_endpoint(self):
+        get_broker().publish('sentiment', 'review.scored', {'review_id': 1, 'product_id': self.product.id})
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='streamadmin', email='sa@example.com', is_staff=True))
+        response = client.get('/api/sentiment/stream/',
+                              HTTP_ACCEPT='text/event-stream', HTTP_LAST_EVENT_ID='0')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith(': connected\nretry: 3000\n'))
+        self.assertIn('id: 1\nevent: review.scored\n', body)
+        self.assertEqual(body.count('event: aggregates'), 1)
+        self.assertIn(': keepalive', body)
+
+        client.force_authenticate(User.objects.create(username='streamuser', email='su@example.com'))
+        response = client.get('/api/sentiment/stream/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(response.content.startswith(b'event: error\n'))
+
+    def test_stream_subscribes_only_while_iterated(self):
+        broker = InProcessBroker()
+        stream = SentimentEventStream(broker=broker)
+        self.assertEqual(broker.stats()['subscribers'], {})
+        body = iter(stream)
+        next(body)
+        self.assertEqual(broker.stats()['subscribers'], {'sentiment': 1})
+        body.close()
+        self.assertEqual(broker.stats()['subscribers'], {})
+        # A response closed before its body was read never subscribed
+        iter(SentimentEventStream(broker=broker)).close()
+        self.assertEqual(broker.stats()['subscribers'], {})
+
+    @override_settings(SENTIMENT_STREAM_MAX_SECONDS=300, SENTIMENT_STREAM_WSGI_MAX_SECONDS=0.2,
+                       SENTIMENT_STREAM_KEEPALIVE=0.05)
+    def test_wsgi_streams_are_capped(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='wsgiadmin', email='wa@example.com', is_staff=True))
+        started = time.monotonic()
+        response = client.get('/api/sentiment/stream/', HTTP_ACCEPT='text/event-stream')
+        b''.join(response.streaming_content)
+        self.assertLess(time.monotonic() - started, 10)
+
+
+class ReviewHighlightTests(TestCase):
+    TRAIN = [
+        ('excellent battery life love it', 2), ('love the excellent battery', 2), ('great sound love it', 2),
+        ('screen cracked terrible quality', 0), ('cracked screen awful refund', 0), ('terrible awful broke', 0),
+    ] * 2
+
+    def setUp(self):
+        category = Category.objects.create(name='Highlights', slug='highlights')
+        self.product = Product.objects.create(name='Phone', description='Desc', price=10, category=category)
+        self.other = Product.objects.create(name='Case', description='Desc', price=5, category=category)
+        patcher = mock.patch('products.signals.SentimentAnalysisService')
+        patcher.start().return_value.analyze_review_with_title.side_effect = RuntimeError('analyzer offline')
+        self.addCleanup(patcher.stop)
+        analyzer = NaiveBayesSentimentAnalyzer('en')
+        analyzer.train_with_validation([t for t, _ in self.TRAIN], [y for _, y in self.TRAIN])
+        self.extractor = HighlightExtractor(top_n=3, min_reviews=2, analyzers={'en': analyzer})
+        for comment, rating in [('Excellent battery, I love it', 5), ('Battery is excellent', 5),
+                                ('Love the battery life', 4), ('Screen cracked in a week', 1),
+                                ('Cracked screen, terrible', 2)]:
+            self.add_review(self.product, comment, rating)
+
+    def add_review(self, product, comment, rating):
+        n = User.objects.count()
+        user = User.objects.create(username=f'hl{n}', email=f'hl{n}@example.com')
+        return Review.objects.create(user=user, product=product, comment=comment, rating=rating)
+
+    def test_extracts_polar_terms_and_refreshes_only_changed_products(self):
+        self.add_review(self.other, 'Love it', 5)
+        self.assertEqual(refresh_highlights(extractor=self.extractor)['refreshed'], 2)
+        highlights = ProductReviewHighlights.objects.get(product=self.product)
+        positive = [h['term'] for h in highlights.positive]
+        negative = [h['term'] for h in highlights.negative]
+        self.assertIn('excellent', positive)
+        self.assertIn('cracked', negative)
+        self.assertFalse(set(positive) & set(negative))
+        self.assertTrue(all(h['reviews'] >= 2 for h in highlights.positive + highlights.negative))
+        # A single review cannot produce highlights
+        self.assertEqual(ProductReviewHighlights.objects.get(product=self.other).positive, [])
+
+        self.assertEqual(refresh_highlights(extractor=self.extractor)['refreshed'], 0)
+        self.add_review(self.other, 'Love this, excellent', 5)
+        self.assertEqual(refresh_highlights(extractor=self.extractor)['refreshed'], 1)
+        Review.objects.filter(product=self.other).delete()
+        self.assertEqual(refresh_highlights(extractor=self.extractor)['cleared'], 1)
+        self.assertFalse(ProductReviewHighlights.objects.filter(product=self.other).exists())
+
+    def test_product_detail_serves_stored_highlights(self):
+        url = f'/api/products/{self.product.id}/'
+        self.assertIsNone(self.client.get(url).data['review_highlights'])
+        refresh_highlights(extractor=self.extractor)
+        data = self.client.get(url).data['review_highlights']
+        self.assertEqual(data['positive'], ProductReviewHighlights.objects.get(product=self.product).positive)
+
+
+class NearDuplicateReviewTests(TestCase):
+    SPAM = 'Amazing product best purchase ever, buy it now from our store link'
+
+    def setUp(self):
+        category = Category.objects.create(name='Spam', slug='spam')
+        self.products = [Product.objects.create(name=f'P{i}', description='Desc', price=10, category=category)
+                         for i in range(3)]
+        patcher = mock.patch('products.signals.SentimentAnalysisService')
+        self.analyzer = patcher.start().return_value.analyze_review_with_title
+        self.analyzer.return_value = {'sentiment': 'positive', 'confidence': 0.9, 'probabilities': {'positive': 0.9}}
+        self.addCleanup(patcher.stop)
+
+    def add_review(self, product, comment):
+        n = User.objects.count()
+        user = User.objects.create(username=f'dup{n}', email=f'dup{n}@example.com')
+        return Review.objects.create(user=user, product=product, comment=comment, rating=5)
+
+    def test_copies_across_users_are_flagged_and_not_scored(self):
+        original = self.add_review(self.products[0], self.SPAM)
+        copy = self.add_review(self.products[1], self.SPAM.replace('ever,', 'ever!!'))
+        again = self.add_review(self.products[2], self.SPAM)
+        unrelated = self.add_review(self.products[1], 'The zipper broke after two days of light use')
+        short = self.add_review(self.products[2], 'Great product')
+
+        fingerprints = {f.review_id: f for f in ReviewFingerprint.objects.all()}
+        self.assertIsNone(fingerprints[original.id].duplicate_of_id)
+        self.assertEqual(fingerprints[copy.id].duplicate_of_id, original.id)
+        self.assertGreaterEqual(fingerprints[copy.id].similarity, 0.8)
+        self.assertEqual(fingerprints[again.id].duplicate_of_id, original.id)
+        self.assertIsNone(fingerprints[unrelated.id].duplicate_of_id)
+        self.assertNotIn(short.id, fingerprints)
+        self.assertEqual(fingerprints[original.id].buckets.count(), 8)
+
+        scored = set(Review.objects.filter(sentiment__isnull=False).values_list('id', flat=True))
+        self.assertEqual(scored, {original.id, unrelated.id, short.id})
+        self.assertEqual(self.analyzer.call_count, 3)
+
+    def test_edited_reviews_are_fingerprinted_again(self):
+        original = self.add_review(self.products[0], self.SPAM)
+        edited = self.add_review(self.products[1], 'The zipper broke after two days of light use')
+        self.assertIsNone(ReviewFingerprint.objects.get(review_id=edited.id).duplicate_of_id)
+
+        edited = Review.objects.get(pk=edited.pk)
+        edited.comment = self.SPAM
+        edited.save()
+        self.assertEqual(ReviewFingerprint.objects.get(review_id=edited.id).duplicate_of_id, original.id)
+
+        # Saves that leave the text alone do not touch the fingerprint
+        edited = Review.objects.get(pk=edited.pk)
+        edited.rating = 1
+        with mock.patch('products.signals.fingerprint_review') as fingerprint:
+            edited.save()
+        fingerprint.assert_not_called()
+
+    def test_band_buckets_are_stable_and_corpus_command_backfills(self):
+        tokens = review_tokens('', self.SPAM)
+        self.assertEqual(band_buckets(signature(tokens)), band_buckets(signature(list(tokens))))
+        first = self.add_review(self.products[0], self.SPAM)
+        second = self.add_review(self.products[1], self.SPAM)
+        ReviewFingerprint.objects.all().delete()
+
+        out = StringIO()
+        call_command('fingerprint_reviews', stdout=out)
+        self.assertIn('1 near-duplicates flagged', out.getvalue())
+        self.assertEqual(ReviewFingerprint.objects.get(review=second).duplicate_of_id, first.id)
+        self.assertEqual(fingerprint_corpus()['fingerprinted'], 0)
+
+
+class ModelVersionRescoringTests(TestCase):
+    TRAIN = ['great quality love it', 'excellent love great', 'terrible broke refund', 'awful broke terrible'] * 3
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        keys = ('canonical_model', 'canonical_vec', 'app_model', 'app_vec',
+                'legacy_model', 'legacy_vec', 'legacy_app_model', 'legacy_app_vec')
+        patcher = mock.patch('sentiment_analysis.models.naive_bayes_model_paths', side_effect=lambda language='en': {
+            key: Path(self.tmp.name) / f'{language}_{key}.pkl' for key in keys})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('products.signals.SentimentAnalysisService')
+        patcher.start().return_value.analyze_review_with_title.side_effect = RuntimeError('analyzer offline')
+        self.addCleanup(patcher.stop)
+        # Shared analyzers keep the model paths they were built with
+        patcher = mock.patch('sentiment_analysis.services._analyzers', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        category = Category.objects.create(name='Versions', slug='versions')
+        self.quiet = Product.objects.create(name='Quiet', description='Desc', price=10, category=category)
+        self.popular = Product.objects.create(name='Popular', description='Desc', price=10, category=category)
+        Product.objects.filter(pk=self.popular.pk).update(view_count=5)
+
+    def train(self):
+        analyzer = NaiveBayesSentimentAnalyzer('en')
+        analyzer.train_with_validation(self.TRAIN, [2, 2, 0, 0] * 3)
+        analyzer.save_model()
+        return analyzer
+
+    def add_review(self, product, comment, sentiment, version=''):
+        n = User.objects.count()
+        user = User.objects.create(username=f'ver{n}', email=f'ver{n}@example.com')
+        return Review.objects.create(user=user, product=product, comment=comment, rating=3, sentiment=sentiment,
+                                     sentiment_model_version=version)
+
+    def test_saved_models_carry_a_content_version(self):
+        self.assertIsNone(current_model_version('en'))
+        analyzer = self.train()
+        version = current_model_version('en')
+        self.assertTrue(version.startswith('en-'))
+        with open(version_path(analyzer.model_path)) as f:
+            self.assertEqual(json.load(f)['version'], version)
+        # Files without a sidecar resolve to the same content hash
+        os.remove(version_path(analyzer.model_path))
+        with mock.patch('sentiment_analysis.model_versions._resolved', {}):
+            self.assertEqual(current_model_version('en'), version)
+        self.assertIsNone(current_model_version('vi'))
+
+    def test_services_share_one_analyzer_that_follows_retrains(self):
+        self.train()
+        first = SentimentAnalysisService('en')
+        before = first.analyze_review('love it great')['sentiment']
+        analyzer = first.analyzer
+        with mock.patch('sentiment_analysis.services.build_analyzer') as build:
+            self.assertNotIn('error', SentimentAnalysisService('en').analyze_review('terrible broke'))
+        build.assert_not_called()
+
+        retrained = NaiveBayesSentimentAnalyzer('en')
+        retrained.train_with_validation(self.TRAIN, [0, 0, 2, 2] * 3)
+        retrained.save_model()
+        with mock.patch.object(analyzer, 'load_model', wraps=analyzer.load_model) as load:
+            result = SentimentAnalysisService('en').analyze_review('love it great')
+        load.assert_called_once()
+        self.assertEqual(result['model_version'], current_model_version('en'))
+        self.assertNotEqual(result['sentiment'], before)
+
+    def test_rescoring_is_prioritized_throttled_and_versioned(self):
+        self.train()
+        version = current_model_version('en')
+        self.add_review(self.quiet, 'terrible broke', 'positive')
+        self.add_review(self.quiet, 'awful refund', 'negative', version='en-000000000000')
+        first = self.add_review(self.popular, 'love it great', 'negative')
+        second = self.add_review(self.popular, 'excellent quality', 'positive')
+        fresh = self.add_review(self.popular, 'great', 'positive', version=version)
+        self.assertEqual([r.product_id for r in stale_reviews()][:2], [self.popular.id] * 2)
+        self.assertNotIn(fresh.id, [r.id for r in stale_reviews()])
+
+        # Scoring takes no time on this clock, so the throttle sleeps the whole budget
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        job = RescoringJob(rows_per_second=10, batch_size=2, sleep=sleep, clock=lambda: now[0])
+        stats = job.run(max_rows=3)
+        self.assertEqual((stats['rescored'], stats['failed'], stats['remaining']), (3, 0, 1))
+        self.assertAlmostEqual(sum(sleeps), 0.3)
+        first.refresh_from_db()
+        self.assertEqual(first.sentiment_model_version, version)
+        self.assertIsNotNone(first.sentiment_analyzed_at)
+        self.assertEqual(Review.objects.get(pk=second.pk).sentiment_model_version, version)
+
+        breakdown = version_breakdown()
+        self.assertEqual(breakdown['current_versions'], [version])
+        self.assertEqual(breakdown['stale_reviews'], 1)
+        self.assertEqual(breakdown['versions'][0]['model_version'], version)
+        self.assertEqual((breakdown['versions'][0]['current'], breakdown['versions'][0]['reviews']), (True, 4))
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='veradmin', email='va@example.com', is_staff=True))
+        response = client.get('/api/sentiment/statistics/', {'model_version': version})
+        self.assertEqual(response.data['analyzed_reviews'], 4)
+        self.assertEqual(client.get('/api/sentiment/model-versions/').data['data']['stale_reviews'], 1)
+
+    def test_bert_and_cascade_labels_are_compared_with_their_own_family(self):
+        self.train()
+        version = current_model_version('en')
+        cascade = scoring_version('cascade', 'en')
+        self.add_review(self.quiet, 'love it great', 'positive', version='bert')
+        self.add_review(self.quiet, 'love it great', 'positive', version=cascade)
+        old_cascade = self.add_review(self.quiet, 'terrible broke', 'positive', version='en-000000000000+bert0.75')
+        self.add_review(self.quiet, 'excellent quality', 'positive', version=version)
+        self.assertEqual([r.id for r in stale_reviews()], [old_cascade.id])
+
+        cascade_service = mock.Mock()
+        cascade_service.analyze_review_with_title.return_value = {
+            'sentiment': 'negative', 'confidence': 0.9, 'probabilities': {'negative': 0.9}, 'model_version': cascade}
+        with mock.patch('sentiment_analysis.services.SentimentAnalysisService', return_value=cascade_service) as cls:
+            stats = RescoringJob(rows_per_second=0).run()
+        cls.assert_called_once_with('en', 'cascade')
+        self.assertEqual((stats['rescored'], stats['remaining']), (1, 0))
+        self.assertEqual(version_breakdown()['stale_reviews'], 0)
+
+    def test_bert_versions_follow_the_model_directory(self):
+        self.train()
+        bert_dir = Path(self.tmp.name) / 'bert'
+        bert_dir.mkdir()
+        (bert_dir / 'config.json').write_text('{"num_labels": 3}')
+        (bert_dir / 'model.safetensors').write_bytes(b'weights-v1')
+        with override_settings(SENTIMENT_BERT_MODEL_DIR=str(bert_dir)):
+            bert = scoring_version('bert', 'en')
+            self.assertTrue(bert.startswith('bert-'))
+            self.assertTrue(scoring_version('cascade', 'en').endswith(bert[len('bert'):]))
+            current = self.add_review(self.quiet, 'love it great', 'positive', version=bert)
+            old = self.add_review(self.quiet, 'terrible broke', 'positive', version='bert')
+            self.assertEqual([r.id for r in stale_reviews()], [old.id])
+
+            (bert_dir / 'model.safetensors').write_bytes(b'weights-version-2')
+            self.assertNotEqual(scoring_version('bert', 'en'), bert)
+            self.assertEqual({r.id for r in stale_reviews()}, {current.id, old.id})
+
+            bert_service = mock.Mock()
+            bert_service.analyze_review_with_title.return_value = {
+                'sentiment': 'negative', 'confidence': 0.9, 'probabilities': {'negative': 0.9},
+                'model_version': scoring_version('bert', 'en')}
+            with mock.patch('sentiment_analysis.services.SentimentAnalysisService', return_value=bert_service) as cls:
+                stats = RescoringJob(rows_per_second=0).run()
+            cls.assert_called_once_with('en', 'bert')
+            self.assertEqual((stats['rescored'], stats['remaining']), (2, 0))
+
+    def test_cascade_analyzer_is_shared_until_the_bert_model_changes(self):
+        self.train()
+        bert_dir = Path(self.tmp.name) / 'bert'
+        bert_dir.mkdir()
+        (bert_dir / 'config.json').write_text('{"num_labels": 3}')
+        with override_settings(SENTIMENT_BERT_MODEL_DIR=str(bert_dir)), \
+                mock.patch('sentiment_analysis.services.build_analyzer') as build:
+            first = get_analyzer('en', 'cascade')
+            self.assertIs(get_analyzer('en', 'cascade'), first)
+            self.assertEqual(build.call_count, 1)
+            (bert_dir / 'pytorch_model.bin').write_bytes(b'weights')
+            get_analyzer('en', 'cascade')
+            self.assertEqual(build.call_count, 2)
+
+    def test_failed_rows_are_passed_by_the_cursor(self):
+        self.train()
+        reviews = [self.add_review(self.popular, f'great {i}', 'positive') for i in range(5)]
+        failing = mock.Mock()
+        failing.analyze_review_with_title.return_value = {'error': 'model offline'}
+        with mock.patch('sentiment_analysis.services.SentimentAnalysisService', return_value=failing), \
+                CaptureQueriesContext(connection) as queries:
+            stats = RescoringJob(rows_per_second=0, batch_size=2).run()
+        self.assertEqual((stats['failed'], stats['remaining']), (5, 5))
+        cursor_queries = [q['sql'] for q in queries.captured_queries if '"products_review"."id" >' in q['sql']]
+        self.assertTrue(cursor_queries)
+        self.assertFalse([q for q in cursor_queries if 'NOT ("products_review"."id" IN' in q])
+        self.assertEqual(failing.analyze_review_with_title.call_count, len(reviews))
+
+    @override_settings(PRODUCT_VIEW_FLUSH_SIZE=1000, PRODUCT_VIEW_FLUSH_SECONDS=3600)
+    def test_product_views_are_buffered_and_flushed_in_batches(self):
+        flush_product_views()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f'/api/products/{self.quiet.id}/')
+            self.client.get(f'/api/products/{self.quiet.id}/')
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('UPDATE')])
+        self.assertEqual(Product.objects.get(pk=self.quiet.pk).view_count, 0)
+        self.assertEqual(flush_product_views(), 2)
+        self.assertEqual(Product.objects.get(pk=self.quiet.pk).view_count, 2)
+
+
+class BilingualBatchRoutingTests(TestCase):
+    EN = (['great quality love it', 'excellent love great', 'terrible broke refund', 'awful broke terrible'] * 3, [1, 1, 0, 0] * 3)
+    VI = (['sản phẩm rất tốt', 'tốt lắm rất thích', 'hàng kém quá tệ', 'quá tệ kém chất lượng'] * 3, [1, 1, 0, 0] * 3)
+
+    def setUp(self):
+        self.service = BilingualSentimentService()
+        for language, (texts, labels) in (('en', self.EN), ('vi', self.VI)):
+            # The vi model is trained on the en preprocessor; only routing is under test
+            analyzer = NaiveBayesSentimentAnalyzer('en')
+            analyzer.train_with_validation(texts, labels)
+            analyzer.predict_batch = mock.Mock(wraps=analyzer.predict_batch)
+            self.service._analyzers[language] = analyzer
+        # Fresh cache per test: these models are in memory, so the on-disk version never changes
+        self.cache = PredictionCache(max_entries=64)
+        patcher = mock.patch('sentiment_analysis.services.get_prediction_cache', return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_detect_language_matches_upper_and_lower_case_diacritics(self):
+        self.assertEqual(detect_language('ĐẸP QUÁ'), 'vi')
+        self.assertEqual(detect_language('hàng tốt'), 'vi')
+        self.assertEqual(detect_language('Great product, cafe-style'), 'en')
+        self.assertEqual(detect_language(''), 'en')
+
+    def test_predict_batch_matches_predict(self):
+        analyzer = self.service._analyzers['en']
+        texts = ['love it', 'broke after a day', 'great but terrible refund']
+        for single, batched in zip([analyzer.predict(t) for t in texts], analyzer.predict_batch(texts)):
+            self.assertEqual(single['sentiment'], batched['sentiment'])
+            self.assertAlmostEqual(single['confidence'], batched['confidence'])
+
+    def test_predict_many_partitions_by_language_and_keeps_order(self):
+        texts = ['love it great', 'rất tốt', '  ', 'terrible broke', 'quá tệ']
+        results = self.service.predict_many(texts)
+        self.assertEqual([r['language'] for r in results], ['en', 'vi', 'en', 'en', 'vi'])
+        self.service._analyzers['en'].predict_batch.assert_called_once_with(['love it great', 'terrible broke'])
+        self.service._analyzers['vi'].predict_batch.assert_called_once_with(['rất tốt', 'quá tệ'])
+        self.assertEqual((results[2]['sentiment'], results[2]['confidence']), ('neutral', 0.0))
+        for text, result in zip(texts, results):
+            if text.strip():
+                expected = self.service._analyzers[result['language']].predict(text)
+                self.assertEqual(result['sentiment'], expected['sentiment'])
+                self.assertTrue(result['model_version'].startswith(result['language'] + '-'))
+
+    def test_predict_many_serves_repeated_texts_from_the_prediction_cache(self):
+        first = self.service.predict_many(['love it great', 'rất tốt'])
+        second = self.service.predict_many(['Love it  GREAT', 'terrible broke', 'rất tốt'])
+        en_batch = self.service._analyzers['en'].predict_batch
+        self.assertEqual(en_batch.call_args_list, [mock.call(['love it great']), mock.call(['terrible broke'])])
+        self.assertEqual(self.service._analyzers['vi'].predict_batch.call_count, 1)
+        self.assertEqual((self.cache.stats()['hits'], self.cache.stats()['misses']), (2, 3))
+        self.assertEqual(second[0]['sentiment'], first[0]['sentiment'])
+        self.assertEqual([r['language'] for r in second], ['en', 'en', 'vi'])
+        self.assertTrue(second[2]['model_version'].startswith('vi-'))
+
+    def test_unmapped_label_is_counted_as_processed_not_as_error(self):
+        category = Category.objects.create(name='Labels', slug='labels')
+        product = Product.objects.create(name='Odd', description='Desc', price=10, category=category)
+        user = User.objects.create(username='labels', email='labels@example.com')
+        with mock.patch('products.signals.SentimentAnalysisService') as signal_service:
+            signal_service.return_value.analyze_review_with_title.side_effect = RuntimeError('analyzer offline')
+            review = Review.objects.create(user=user, product=product, comment='love it great', rating=4)
+        odd = {'sentiment': 'mixed', 'confidence': 0.6, 'probabilities': {'positive': 0.6, 'negative': 0.4}}
+        with mock.patch.object(self.service, 'predict_many', return_value=[odd]):
+            stats = self.service.analyze_reviews(Review.objects.filter(pk=review.pk))
+        self.assertEqual((stats['processed'], stats['errors'], stats['mixed']), (1, 0, 1))
+
+    def test_backfill_and_signal_route_by_language(self):
+        category = Category.objects.create(name='Bilingual', slug='bilingual')
+        product = Product.objects.create(name='Mixed', description='Desc', price=10, category=category)
+        with mock.patch('products.signals.SentimentAnalysisService') as signal_service:
+            signal_service.return_value.analyze_review_with_title.side_effect = RuntimeError('analyzer offline')
+            for n, comment in enumerate(['love it great', 'sản phẩm rất tốt', 'quá tệ']):
+                user = User.objects.create(username=f'bi{n}', email=f'bi{n}@example.com')
+                Review.objects.create(user=user, product=product, comment=comment, rating=3)
+            languages = [c.kwargs['language'] for c in signal_service.call_args_list]
+        self.assertEqual(languages, ['en', 'vi', 'vi'])
+
+        stats = self.service.analyze_all_reviews(batch_size=2)
+        self.assertEqual((stats['processed'], stats['errors']), (3, 0))
+        versions = dict(Review.objects.values_list('comment', 'sentiment_model_version'))
+        self.assertTrue(versions['love it great'].startswith('en-'))
+        self.assertTrue(versions['quá tệ'].startswith('vi-'))
+        self.assertEqual(self.service._analyzers['vi'].predict_batch.call_count, 2)
+        self.assertFalse(Review.objects.filter(sentiment__isnull=True).exists())
@@ -0,0 +1,215 @@
+"""
+Cross-validated hyperparameter search for the TF-IDF sentiment classifiers.
+
+Candidates are (vectorizer params, classifier) pairs. Work is scheduled per
+(vectorizer config, fold): each joblib task fits the TF-IDF once on the fold's training
+part and then trains every still-alive classifier on that shared matrix, so vectorization
+cost is paid once per fold instead of once per candidate.
+
+With successive halving, early rungs evaluate all candidates on small stratified
+subsamples and only the best 1/eta advance to the next, larger rung; the last rung uses
+the full dataset. Survivors are refit on all data to measure single-text inference
+latency and pickled model size for the leaderboard.
+"""
+from itertools import product
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+import math
+import pickle
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.naive_bayes import ComplementNB, MultinomialNB
+from sklearn.svm import LinearSVC
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VECTORIZER_GRID = {
+    'max_features': [5000, 20000],
+    'ngram_range': [(1, 1), (1, 2)],
+    'min_df': [1, 2],
+    'sublinear_tf': [False, True],
+}
+
+DEFAULT_CLASSIFIERS = {
+    'naive_bayes': (MultinomialNB, {'alpha': [0.1, 0.5, 1.0]}),
+    'complement_nb': (ComplementNB, {'alpha': [0.3, 1.0]}),
+    'logistic_regression': (LogisticRegression, {'C': [0.5, 2.0, 8.0], 'max_iter': [1000]}),
+    'linear_svm': (LinearSVC, {'C': [0.1, 0.5, 1.0]}),
+}
+
+
+def expand_grid(grid: Dict[str, Sequence]) -> List[Dict]:
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in product(*(grid[k] for k in keys))]
+
+
+def format_params(params: Dict) -> str:
+    return ','.join(f"{k}={v}" for k, v in sorted(params.items()))
+
+
+def build_candidates(vectorizer_grid: Dict, classifiers: Dict, base_vectorizer_params: Optional[Dict] = None) -> List[Dict]:
+    candidates = []
+    for vec_index, vec_params in enumerate(expand_grid(vectorizer_grid)):
+        vec_params = {**(base_vectorizer_params or {}), **vec_params}
+        for name, (cls, clf_grid) in classifiers.items():
+            for clf_params in expand_grid(clf_grid):
+                candidates.append({
+                    'id': len(candidates),
+                    'vec_index': vec_index,
+                    'vectorizer_params': vec_params,
+                    'classifier': name,
+                    'classifier_params': clf_params,
+                    'estimator': cls(**clf_params),
+                })
+    return candidates
+
+
+def _evaluate_vectorizer_fold(vec_params: Dict, estimators: List[Tuple[int, object]], texts: np.ndarray,
+                              labels: np.ndarray, train_idx: np.ndarray, test_idx: np.ndarray) -> List[Tuple[int, float, float, float]]:
+    """Fit TF-IDF once on this fold and score every estimator on the shared matrices."""
+    vectorizer = TfidfVectorizer(**vec_params)
+    try:
+        X_train = vectorizer.fit_transform(texts[train_idx])
+    except ValueError:
+        # e.g. min_df too high for a small rung: every candidate of this config fails the fold
+        return [(cid, 0.0, 0.0, 0.0) for cid, _ in estimators]
+    X_test = vectorizer.transform(texts[test_idx])
+    y_train, y_test = labels[train_idx], labels[test_idx]
+
+    scores = []
+    for cid, estimator in estimators:
+        model = clone(estimator)
+        started = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - started
+        predictions = model.predict(X_test)
+        scores.append((cid, accuracy_score(y_test, predictions),
+                       f1_score(y_test, predictions, average='macro'), fit_seconds))
+    return scores
+
+
+def _stratified_subsample(labels: np.ndarray, size: int, seed: int) -> np.ndarray:
+    indices = np.arange(len(labels))
+    if size >= len(labels):
+        return indices
+    subset, _ = train_test_split(indices, train_size=size, stratify=labels, random_state=seed)
+    return np.sort(subset)
+
+
+def cross_validate_candidates(candidates: List[Dict], texts: np.ndarray, labels: np.ndarray, folds: int = 5,
+                              n_jobs: int = -1, seed: int = 42) -> Dict[int, Dict]:
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    splits = list(splitter.split(texts, labels))
+    by_vectorizer: Dict[int, List[Dict]] = {}
+    for candidate in candidates:
+        by_vectorizer.setdefault(candidate['vec_index'], []).append(candidate)
+
+    tasks = []
+    for group in by_vectorizer.values():
+        estimators = [(c['id'], c['estimator']) for c in group]
+        for train_idx, test_idx in splits:
+            tasks.append(delayed(_evaluate_vectorizer_fold)(
+                group[0]['vectorizer_params'], estimators, texts, labels, train_idx, test_idx
+            ))
+    fold_results = Parallel(n_jobs=n_jobs)(tasks)
+
+    collected: Dict[int, Dict[str, List[float]]] = {}
+    for scores in fold_results:
+        for cid, accuracy, f1, fit_seconds in scores:
+            entry = collected.setdefault(cid, {'accuracy': [], 'f1_macro': [], 'fit_seconds': []})
+            entry['accuracy'].append(accuracy)
+            entry['f1_macro'].append(f1)
+            entry['fit_seconds'].append(fit_seconds)
+    return {
+        cid: {
+            'accuracy': float(np.mean(v['accuracy'])),
+            'accuracy_std': float(np.std(v['accuracy'])),
+            'f1_macro': float(np.mean(v['f1_macro'])),
+            'fit_seconds': float(np.mean(v['fit_seconds'])),
+        }
+        for cid, v in collected.items()
+    }
+
+
+def measure_inference(candidate: Dict, texts: np.ndarray, labels: np.ndarray, probe_texts: Sequence[str],
+                      rounds: int = 3) -> Dict:
+    """Refit on all data; report p50/p95 single-text latency and pickled size of vectorizer + model."""
+    vectorizer = TfidfVectorizer(**candidate['vectorizer_params'])
+    model = clone(candidate['estimator']).fit(vectorizer.fit_transform(texts), labels)
+    timings = []
+    for _ in range(rounds):
+        for text in probe_texts:
+            started = time.perf_counter()
+            model.predict(vectorizer.transform([text]))
+            timings.append(time.perf_counter() - started)
+    if hasattr(vectorizer, 'stop_words_'):
+        # Only records pruned terms; not needed at inference time
+        vectorizer.stop_words_ = None
+    return {
+        'latency_p50_ms': float(np.percentile(timings, 50) * 1000),
+        'latency_p95_ms': float(np.percentile(timings, 95) * 1000),
+        'model_size_kb': len(pickle.dumps((vectorizer, model), protocol=pickle.HIGHEST_PROTOCOL)) / 1024,
+        'n_features': len(vectorizer.vocabulary_),
+    }
+
+
+def successive_halving_search(texts: Sequence[str], labels: Sequence[int], candidates: List[Dict], folds: int = 5,
+                              eta: int = 3, min_samples: Optional[int] = None, halving: bool = True,
+                              n_jobs: int = -1, seed: int = 42, measure_top: int = 10,
+                              probe_texts: Optional[Sequence[str]] = None) -> List[Dict]:
+    """Run the search and return leaderboard rows, best first."""
+    texts = np.asarray(texts, dtype=object)
+    labels = np.asarray(labels)
+    n_samples = len(texts)
+    per_class_min = int(np.bincount(np.unique(labels, return_inverse=True)[1]).min())
+    if per_class_min < folds:
+        raise ValueError(f"Smallest class has {per_class_min} samples; need at least {folds} for {folds}-fold CV")
+
+    if halving and len(candidates) > 1:
+        rungs = max(1, math.ceil(math.log(len(candidates), eta)))
+        floor = min_samples or max(folds * 20, n_samples // eta ** (rungs - 1))
+        budgets = [int(floor * eta ** r) for r in range(rungs - 1) if floor * eta ** r < n_samples] + [n_samples]
+    else:
+        budgets = [n_samples]
+
+    alive = list(candidates)
+    rows: Dict[int, Dict] = {}
+    for rung, budget in enumerate(budgets):
+        subset = _stratified_subsample(labels, budget, seed + rung)
+        started = time.perf_counter()
+        results = cross_validate_candidates(alive, texts[subset], labels[subset], folds=folds, n_jobs=n_jobs, seed=seed)
+        logger.info(f"Rung {rung}: {len(alive)} candidates on {len(subset)} samples in {time.perf_counter() - started:.1f}s")
+        for candidate in alive:
+            rows[candidate['id']] = {
+                'candidate': candidate,
+                'rung': rung,
+                'samples': int(len(subset)),
+                **results[candidate['id']],
+            }
+        if rung < len(budgets) - 1:
+            alive.sort(key=lambda c: (-rows[c['id']]['accuracy'], rows[c['id']]['fit_seconds']))
+            alive = alive[:max(1, math.ceil(len(alive) / eta))]
+
+    ranked = sorted(rows.values(), key=lambda r: (-r['rung'], -r['accuracy'], r['fit_seconds']))
+    probe_texts = list(probe_texts) if probe_texts else list(texts[:50])
+    for row in ranked[:measure_top]:
+        row.update(measure_inference(row['candidate'], texts, labels, probe_texts))
+
+    leaderboard = []
+    for rank, row in enumerate(ranked, start=1):
+        candidate = row.pop('candidate')
+        leaderboard.append({
+            'rank': rank,
+            'classifier': candidate['classifier'],
+            'classifier_params': format_params(candidate['classifier_params']),
+            'vectorizer_params': format_params(candidate['vectorizer_params']),
+            **row,
+        })
+    return leaderboard
@@ -15,9 +15,20 @@ urlpatterns = [
     # Sentiment Statistics and Trends
     path('statistics/', views.get_sentiment_statistics, name='sentiment_statistics'),
     path('trends/', views.get_sentiment_trends, name='sentiment_trends'),
+    path('cache/stats/', views.get_prediction_cache_stats, name='prediction_cache_stats'),
+    path('cascade/stats/', views.get_cascade_stats, name='cascade_stats'),
+    path('coalescing/stats/', views.get_coalescing_stats, name='coalescing_stats'),
+    path('model-versions/', views.get_model_versions, name='model_versions'),
+    path('stream/', views.sentiment_event_stream, name='sentiment_event_stream'),
+    
+    # Probability analytics (Admin only)
+    path('probabilities/products/', views.get_product_probability_means, name='product_probability_means'),
+    path('probabilities/histogram/', views.get_probability_histogram, name='probability_histogram'),
+    path('probabilities/borderline/', views.get_borderline_reviews, name='borderline_reviews'),
     
     # Model Training (Admin only)
     path('train/', views.train_models, name='train_models'),
+    path('train/status/', views.get_training_status, name='training_status'),
     
     # Real-time Analysis
     path('realtime/', views.RealTimeSentimentView.as_view(), name='realtime_sentiment'),
@@ -54,7 +54,8 @@ def get_vietnamese_stopwords():
 
 def is_sentiment_word(word):
     """Check if word carries sentiment information"""
-    return word.lower() in SENTIMENT_PRESERVING
+    # Word segmenters join syllables with underscores ('hài_lòng')
+    return word.lower().replace('_', ' ') in SENTIMENT_PRESERVING
 
 # Emotion keywords for enhanced sentiment
 POSITIVE_EMOTIONS = {
@@ -69,13 +70,18 @@ NEGATIVE_EMOTIONS = {
 
 def extract_emotion_features(text):
     """Extract emotion-based features from text"""
-    text_lower = text.lower()
-    
-    positive_count = sum(1 for emotion in POSITIVE_EMOTIONS if emotion in text_lower)
-    negative_count = sum(1 for emotion in NEGATIVE_EMOTIONS if emotion in text_lower)
+    # One Aho-Corasick pass over the text for all phrases (whole words only)
+    from .lexicon import get_emotion_matcher
+    counts = get_emotion_matcher('vi').count(text)
+    positive_count = counts['positive']
+    negative_count = counts['negative']
     
     return {
         'positive_emotions': positive_count,
         'negative_emotions': negative_count,
         'emotion_ratio': positive_count / max(negative_count, 1)
-    }
\ No newline at end of file
+    }
+
+def extract_emotion_features_batch(texts):
+    """extract_emotion_features for many texts, reusing the compiled automaton"""
+    return [extract_emotion_features(text) for text in texts]
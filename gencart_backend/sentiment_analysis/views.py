@@ -1,13 +1,19 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
+from django.db import close_old_connections
+from django.urls import reverse
+from django.conf import settings
 import json
 import logging
+import threading
 
 from products.models import Review, Product
 from .services import (
@@ -17,6 +23,13 @@ from .services import (
     update_all_review_sentiments,
     get_product_sentiment
 )
+from .models import SentimentTrainingWatermark, shared_cascade_stats
+from .incremental import IncrementalNaiveBayesUpdater, training_lock
+from .prediction_cache import get_prediction_cache
+from .single_flight import flight_stats
+from .events import SentimentEventStream, format_sse
+from .rescoring import version_breakdown
+from .probabilities import borderline_reviews, probability_histogram, product_probability_means
 
 logger = logging.getLogger(__name__)
 
@@ -128,7 +141,8 @@ def get_product_sentiment_summary(request, product_id):
 def analyze_all_reviews(request):
     """Analyze sentiment for all reviews (Admin only)"""
     try:
-        language = request.data.get('language', 'en')
+        # 'auto' scores each review with the model of its language
+        language = request.data.get('language', 'auto')
         model_type = request.data.get('model_type', 'naive_bayes')
         batch_size = request.data.get('batch_size', 100)
         
@@ -150,75 +164,28 @@ def analyze_all_reviews(request):
 
 @api_view(['GET'])
 def get_sentiment_trends(request):
-    """Get sentiment trends over time (Admin only)"""
+    """Get sentiment trends over time (Admin only)
+
+    Query params: days, product_id, mode ('analyzed' | 'effective'),
+    granularity ('hour' | 'day' | 'week' | 'month') and tz (IANA name, default TIME_ZONE).
+    """
     try:
-        days = int(request.GET.get('days', 30))
-        language = request.GET.get('language', 'en')
+        from .rollups import sentiment_trends
         product_id = request.GET.get('product_id')
-        mode = request.GET.get('mode', 'analyzed')  # 'analyzed' | 'effective'
-        
-        from django.utils import timezone
-        from datetime import timedelta
-        from django.db import models
-        from django.db.models import Case, When, Value, F, CharField
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=days)
-        base_qs = Review.objects.filter(created_at__gte=start_date)
-        if product_id:
-            try:
-                base_qs = base_qs.filter(product_id=int(product_id))
-            except ValueError:
-                pass
-
         try:
-            if mode == 'effective':
-                eff_sent = Case(
-                    When(sentiment__isnull=False, then=F('sentiment')),
-                    When(sentiment__isnull=True, rating__gte=4, then=Value('positive')),
-                    When(sentiment__isnull=True, rating=3, then=Value('neutral')),
-                    When(sentiment__isnull=True, rating__lte=2, then=Value('negative')),
-                    default=Value('neutral'),
-                    output_field=CharField(),
-                )
-                reviews = (
-                    base_qs
-                    .extra({"date": "DATE(created_at)"})
-                    .annotate(eff_sentiment=eff_sent)
-                    .values("date", "eff_sentiment")
-                    .annotate(count=models.Count("id"))
-                    .order_by("date")
-                )
-                temp = {}
-                for r in reviews:
-                    d = str(r["date"])
-                    if d not in temp:
-                        temp[d] = {"positive": 0, "negative": 0, "neutral": 0}
-                    temp[d][r["eff_sentiment"]] = r["count"]
-            else:
-                analyzed = base_qs.filter(sentiment__isnull=False)
-                reviews = (
-                    analyzed
-                    .extra({"date": "DATE(created_at)"})
-                    .values("date", "sentiment")
-                    .annotate(count=models.Count("id"))
-                    .order_by("date")
-                )
-                temp = {}
-                for r in reviews:
-                    d = str(r["date"])
-                    if d not in temp:
-                        temp[d] = {"positive": 0, "negative": 0, "neutral": 0}
-                    temp[d][r["sentiment"]] = r["count"]
-
-            dates = sorted(temp.keys())
-            trends = {
-                "dates": dates,
-                "positive": [temp[d]["positive"] for d in dates],
-                "negative": [temp[d]["negative"] for d in dates],
-                "neutral": [temp[d]["neutral"] for d in dates],
-            }
-        except Exception as inner_e:
-            logger.error(f"Error computing sentiment trends: {inner_e}")
+            product_id = int(product_id) if product_id else None
+        except ValueError:
+            product_id = None
+        try:
+            trends = sentiment_trends(
+                days=request.GET.get('days'),
+                product_id=product_id,
+                mode=request.GET.get('mode', 'analyzed'),
+                granularity=request.GET.get('granularity', 'day'),
+                tz=request.GET.get('tz'),
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'success': True,
@@ -241,16 +208,61 @@ def train_models(request):
         model_types = request.data.get('models', ['naive_bayes'])
         epochs = request.data.get('epochs', 10)
         
+        mode = request.data.get('mode', 'full')
+        background = request.data.get('background', False)
+        if mode not in ('full', 'incremental'):
+            return Response(
+                {'error': "mode must be 'full' or 'incremental'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         training_service = ModelTrainingService(language)
-        results = {}
+        # One training run per language at a time, across workers
+        lock = training_lock(language)
+        if not lock.acquire():
+            return Response(
+                {'error': f'Training for {language} is already running'},
+                status=status.HTTP_409_CONFLICT
+            )
         
-        if 'naive_bayes' in model_types:
-            accuracy = training_service.train_naive_bayes_model()
-            results['naive_bayes'] = {
-                'accuracy': accuracy,
-                'status': 'success' if accuracy > 0 else 'failed'
-            }
+        def run_training():
+            results = {}
+            if 'naive_bayes' in model_types:
+                if mode == 'incremental':
+                    results['naive_bayes'] = training_service.update_naive_bayes_incremental()
+                else:
+                    accuracy = training_service.train_naive_bayes_model()
+                    results['naive_bayes'] = {
+                        'accuracy': accuracy,
+                        'status': 'success' if accuracy > 0 else 'failed'
+                    }
+            return results
         
+        if background:
+            def run_in_background():
+                try:
+                    run_training()
+                except Exception as e:
+                    logger.error(f"Background training failed: {e}")
+                finally:
+                    lock.release()
+                    close_old_connections()
+            
+            try:
+                threading.Thread(target=run_in_background, name=f'sentiment-train-{language}', daemon=True).start()
+            except Exception:
+                lock.release()
+                raise
+            return Response({
+                'success': True,
+                'message': f'{mode.capitalize()} training started',
+                'status_url': reverse('sentiment_analysis:training_status'),
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        try:
+            results = run_training()
+        finally:
+            lock.release()
         return Response({
             'success': True,
             'message': 'Model training completed',
@@ -264,42 +276,44 @@ def train_models(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_training_status(request):
+    """Incremental training watermarks per language (Admin only)"""
+    watermarks = [
+        {
+            'language': w.language,
+            'last_review_id': w.last_review_id,
+            'rows_consumed': w.rows_consumed,
+            'oov_rate': round(w.oov_rate, 4),
+            'last_full_rebuild_at': w.last_full_rebuild_at,
+            'pending_candidate': IncrementalNaiveBayesUpdater(w.language).pending_candidate(),
+            'training': training_lock(w.language).locked(),
+            'updated_at': w.updated_at,
+        }
+        for w in SentimentTrainingWatermark.objects.order_by('language')
+    ]
+    return Response({'success': True, 'data': watermarks}, status=status.HTTP_200_OK)
+
 @api_view(['GET'])
 def get_sentiment_statistics(request):
     """Get overall sentiment statistics"""
     try:
-        from django.db.models import Count
+        from .aggregates import sentiment_aggregates
         product_id = request.GET.get('product_id')
+        try:
+            product_id = int(product_id) if product_id else None
+        except ValueError:
+            product_id = None
         
-        # Base queryset (optionally filtered by product)
-        base_qs = Review.objects.all()
-        if product_id:
-            try:
-                base_qs = base_qs.filter(product_id=int(product_id))
-            except ValueError:
-                pass
-        
-        # Total statistics
-        total_reviews = base_qs.count()
-        analyzed_reviews = base_qs.filter(sentiment__isnull=False).count()
-        unanalyzed_reviews = total_reviews - analyzed_reviews
-        
-        # Simple sentiment distribution from analyzed reviews
-        sentiment_distribution = base_qs.filter(sentiment__isnull=False).values('sentiment').annotate(
-            count=Count('id')
-        )
-        
-        # Convert to simple format
-        sentiment_counts = {'positive': 0, 'negative': 0, 'neutral': 0}
-        for item in sentiment_distribution:
-            sentiment_counts[item['sentiment']] = item['count']
-        
+        # ?model_version= restricts to reviews labeled by that model ('' = unversioned labels)
+        summary = sentiment_aggregates(product_id, request.GET.get('model_version'))
         return Response({
             'success': True,
-            'total_reviews': total_reviews,
-            'analyzed_reviews': analyzed_reviews,
-            'unanalyzed_reviews': unanalyzed_reviews,
-            'sentiment_counts': sentiment_counts
+            'total_reviews': summary['total_reviews'],
+            'analyzed_reviews': summary['analyzed_reviews'],
+            'unanalyzed_reviews': summary['unanalyzed_reviews'],
+            'sentiment_counts': summary['sentiment_counts']
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -309,6 +323,132 @@ def get_sentiment_statistics(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_prediction_cache_stats(request):
+    """Hit/miss counters of the sentiment prediction cache (Admin only)"""
+    return Response({
+        'success': True,
+        'data': get_prediction_cache().stats()
+    }, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_model_versions(request):
+    """Analyzed review counts per sentiment model version, and how many are stale (Admin only)"""
+    return Response({
+        'success': True,
+        'data': version_breakdown(_optional_int(request.GET.get('product_id')))
+    }, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_coalescing_stats(request):
+    """Per-flight counters of coalesced (single-flight) computations in this process (Admin only)"""
+    return Response({
+        'success': True,
+        'data': flight_stats()
+    }, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_cascade_stats(request):
+    """Naive Bayes -> BERT cascade counters and escalation rate per language, across requests (Admin only)"""
+    return Response({
+        'success': True,
+        'data': {
+            'threshold': getattr(settings, 'SENTIMENT_CASCADE_THRESHOLD', 0.75),
+            'languages': shared_cascade_stats(),
+        }
+    }, status=status.HTTP_200_OK)
+
+def _optional_int(value):
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets text/event-stream clients through content negotiation; errors become an SSE 'error' event."""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_sse('error', data).encode(self.charset)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+def sentiment_event_stream(request):
+    """Server-sent events: review.scored events and aggregate deltas (Admin only)
+
+    Query: product_id to follow one product. Reconnecting clients send Last-Event-ID
+    (or ?last_event_id=) to replay the review events they missed. The stream closes
+    after SENTIMENT_STREAM_MAX_SECONDS; EventSource clients reconnect on their own.
+    Under WSGI a stream holds a worker thread while open, so it closes after
+    SENTIMENT_STREAM_WSGI_MAX_SECONDS instead.
+    """
+    is_asgi = isinstance(request._request, ASGIRequest)
+    max_seconds = settings.SENTIMENT_STREAM_MAX_SECONDS
+    if not is_asgi:
+        max_seconds = min(max_seconds, settings.SENTIMENT_STREAM_WSGI_MAX_SECONDS)
+    stream = SentimentEventStream(
+        product_id=_optional_int(request.GET.get('product_id')),
+        last_event_id=_optional_int(request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('last_event_id')),
+        max_seconds=max_seconds,
+    )
+    # Under ASGI stream asynchronously so a connection does not hold a worker thread between events
+    body = stream.__aiter__() if is_asgi else iter(stream)
+    response = StreamingHttpResponse(body, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_product_probability_means(request):
+    """Mean class probabilities per product, computed in SQL (Admin only)"""
+    try:
+        data = product_probability_means(
+            min_reviews=int(request.GET.get('min_reviews', 1)),
+            order_by=request.GET.get('order_by', 'p_negative'),
+            limit=min(int(request.GET.get('limit', 50)), 500),
+            product_id=_optional_int(request.GET.get('product_id')),
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'success': True, 'data': data}, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_probability_histogram(request):
+    """Histogram of confidence or a class probability with observed positive rates (Admin only)"""
+    try:
+        data = probability_histogram(
+            field=request.GET.get('field', 'sentiment_confidence'),
+            bins=int(request.GET.get('bins', 10)),
+            product_id=_optional_int(request.GET.get('product_id')),
+            sentiment=request.GET.get('sentiment') or None,
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'success': True, 'data': data}, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_borderline_reviews(request):
+    """Reviews whose positive and negative probabilities are within `margin` (Admin only)"""
+    try:
+        data = borderline_reviews(
+            margin=float(request.GET.get('margin', 0.1)),
+            limit=min(int(request.GET.get('limit', 50)), 500),
+            product_id=_optional_int(request.GET.get('product_id')),
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'success': True, 'data': data}, status=status.HTTP_200_OK)
+
 # Real-time sentiment analysis for new reviews
 @method_decorator(csrf_exempt, name='dispatch')
 class RealTimeSentimentView(View):
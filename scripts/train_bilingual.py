@@ -10,6 +10,7 @@ from gencart_backend.sentiment_analysis.kaggle_loaders import (
     EnglishSentimentLoader,
     VietnameseSentimentLoader,
 )
+from gencart_backend.sentiment_analysis.feature_store import get_feature_store
 from gencart_backend.sentiment_analysis.models import NaiveBayesSentimentAnalyzer
 
 
@@ -23,7 +24,8 @@ def main(test_size: float = 0.2):
     os.makedirs('assets/reports', exist_ok=True)
 
     logger.info("Loading English dataset ...")
-    en_loader = EnglishSentimentLoader()
+    # SENTIMENT_DATASET_OFFLINE=True with *_DATA_DIR or a warm dataset cache avoids kagglehub
+    en_loader = EnglishSentimentLoader(data_dir=os.environ.get('SENTIMENT_EN_DATA_DIR'))
     en_df = en_loader.load()
     logger.info(f"EN shape: {en_df.shape}")
 
@@ -44,7 +46,7 @@ def main(test_size: float = 0.2):
         logger.warning(f"EN dataset analysis failed: {e}")
 
     logger.info("Loading Vietnamese dataset ...")
-    vi_loader = VietnameseSentimentLoader()
+    vi_loader = VietnameseSentimentLoader(data_dir=os.environ.get('SENTIMENT_VI_DATA_DIR'))
     vi_df = vi_loader.load()
     logger.info(f"VI shape: {vi_df.shape}")
 
@@ -77,14 +79,14 @@ def main(test_size: float = 0.2):
 
     # Train EN
     logger.info("Training English Naive Bayes ...")
-    en = NaiveBayesSentimentAnalyzer(language='en')
+    en = NaiveBayesSentimentAnalyzer(language='en', feature_store=get_feature_store())
     en_acc = en.train(en_df['text'].tolist(), en_df['label'].tolist(), test_size=test_size)
     en.save_model()
     logger.info(f"EN accuracy: {en_acc:.4f}")
 
     # Train VI
     logger.info("Training Vietnamese Naive Bayes ...")
-    vi = NaiveBayesSentimentAnalyzer(language='vi')
+    vi = NaiveBayesSentimentAnalyzer(language='vi', feature_store=get_feature_store())
     vi_acc = vi.train(vi_df['text'].tolist(), vi_df['label'].tolist(), test_size=test_size)
     vi.save_model()
     logger.info(f"VI accuracy: {vi_acc:.4f}")